@@ -0,0 +1,211 @@
+"""
+Admission control for LLM and TTS calls
+Each resource has a token bucket (requests per second, with a burst) and a cap on requests in
+flight. A turn that can't get in within its wait budget is shed: the agent answers from a template
+and TTS falls back to <Say>, so latency stays bounded under load instead of queuing behind the
+provider's rate limit. The limits live in a backend: per process ("local"), or shared by every
+worker through Redis ("redis", needs the redis package and REDIS_URL).
+
+Environment (RESOURCE is LLM or TTS):
+    ADMISSION_BACKEND             local (default) or redis
+    REDIS_URL                     Redis for the shared backend (default redis://localhost:6379/0)
+    {RESOURCE}_RATE_PER_SECOND    Token bucket refill rate; 0 = no rate limit
+    {RESOURCE}_BURST              Token bucket size
+    {RESOURCE}_MAX_CONCURRENT     Requests in flight at once; 0 = no cap
+    {RESOURCE}_ADMISSION_WAIT_SECONDS   How long a request may wait for admission before it is shed
+"""
+
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Dict, Iterator, NamedTuple, Optional
+
+import metrics
+from structured_logging import get_logger
+
+try:
+    import redis
+except ImportError:  # Only needed for ADMISSION_BACKEND=redis
+    redis = None
+
+log = get_logger("admission")
+
+ADMISSION_WAITING = metrics.gauge("roomservice_admission_waiting", "Requests waiting for admission", ("resource",))
+ADMISSION_IN_FLIGHT = metrics.gauge("roomservice_admission_in_flight", "Admitted requests in flight in this process", ("resource",))
+ADMISSION_SHED = metrics.counter("roomservice_admission_shed_total", "Requests shed by admission control", ("resource", "reason"))
+ADMISSION_WAIT_SECONDS = metrics.histogram(
+    "roomservice_admission_wait_seconds", "Time spent waiting for admission", ("resource",),
+    buckets=(0.001, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.0))
+
+# How often a waiting request re-checks the limits
+POLL_SECONDS = 0.02
+
+# Redis concurrency slots expire after this long, so a crashed worker can't hold them forever
+LEASE_SECONDS = 30
+
+
+class Limits(NamedTuple):
+    rate: float               # Tokens per second; 0 = unlimited
+    burst: float              # Bucket size
+    max_concurrent: int       # 0 = unlimited
+    wait_seconds: float       # Admission wait budget
+
+
+class Decision(NamedTuple):
+    admitted: bool
+    reason: str               # Why it wasn't admitted: "rate" or "concurrency"
+    lease: str = ""           # Passed back to release()
+
+
+class LocalBackend:
+    """Token buckets and in-flight counts for this process"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._buckets: Dict[str, list] = {}    # resource -> [tokens, updated]
+        self._in_flight: Dict[str, int] = {}
+
+    def acquire(self, resource: str, limits: Limits) -> Decision:
+        with self._lock:
+            in_flight = self._in_flight.get(resource, 0)
+            if limits.max_concurrent and in_flight >= limits.max_concurrent:
+                return Decision(False, "concurrency")
+            if limits.rate:
+                now = time.monotonic()
+                bucket = self._buckets.setdefault(resource, [limits.burst, now])
+                bucket[0] = min(limits.burst, bucket[0] + (now - bucket[1]) * limits.rate)
+                bucket[1] = now
+                if bucket[0] < 1:
+                    return Decision(False, "rate")
+                bucket[0] -= 1
+            self._in_flight[resource] = in_flight + 1
+        return Decision(True, "")
+
+    def release(self, resource: str, lease: str):
+        with self._lock:
+            self._in_flight[resource] = max(0, self._in_flight.get(resource, 0) - 1)
+
+
+# Token bucket plus leased concurrency slots, checked and taken atomically.
+# KEYS: bucket hash, in-flight sorted set. ARGV: now, rate, burst, max_concurrent, lease id, lease expiry
+_REDIS_ACQUIRE = """
+local now = tonumber(ARGV[1])
+local rate, burst, max_concurrent = tonumber(ARGV[2]), tonumber(ARGV[3]), tonumber(ARGV[4])
+redis.call('ZREMRANGEBYSCORE', KEYS[2], '-inf', now)
+if max_concurrent > 0 and redis.call('ZCARD', KEYS[2]) >= max_concurrent then
+    return 2
+end
+if rate > 0 then
+    local state = redis.call('HMGET', KEYS[1], 'tokens', 'updated')
+    local tokens = tonumber(state[1]) or burst
+    local updated = tonumber(state[2]) or now
+    tokens = math.min(burst, tokens + math.max(0, now - updated) * rate)
+    if tokens < 1 then
+        redis.call('HSET', KEYS[1], 'tokens', tokens, 'updated', now)
+        return 1
+    end
+    redis.call('HSET', KEYS[1], 'tokens', tokens - 1, 'updated', now)
+    redis.call('EXPIRE', KEYS[1], 3600)
+end
+redis.call('ZADD', KEYS[2], ARGV[6], ARGV[5])
+redis.call('EXPIRE', KEYS[2], 3600)
+return 0
+"""
+
+
+class RedisBackend:
+    """Limits shared by every worker through Redis"""
+
+    def __init__(self, url: str = None):
+        if redis is None:
+            raise RuntimeError("ADMISSION_BACKEND=redis needs the redis package (pip install redis)")
+        self._client = redis.Redis.from_url(url or os.getenv("REDIS_URL", "redis://localhost:6379/0"))
+        self._acquire = self._client.register_script(_REDIS_ACQUIRE)
+
+    def acquire(self, resource: str, limits: Limits) -> Decision:
+        lease = uuid.uuid4().hex
+        now = time.time()
+        result = self._acquire(
+            keys=(f"roomservice:admission:{resource}:bucket", f"roomservice:admission:{resource}:in_flight"),
+            args=(now, limits.rate, limits.burst, limits.max_concurrent, lease, now + LEASE_SECONDS))
+        if result == 0:
+            return Decision(True, "", lease)
+        return Decision(False, "rate" if result == 1 else "concurrency")
+
+    def release(self, resource: str, lease: str):
+        self._client.zrem(f"roomservice:admission:{resource}:in_flight", lease)
+
+
+BACKENDS = {"local": LocalBackend, "redis": RedisBackend}
+
+
+class AdmissionGate:
+    """Admits requests for one resource within its limits, or sheds them"""
+
+    def __init__(self, resource: str, limits: Limits, backend):
+        self.resource = resource
+        self.limits = limits
+        self._backend = backend
+
+    def _acquire(self) -> Decision:
+        try:
+            return self._backend.acquire(self.resource, self.limits)
+        except Exception as e:
+            # A backend outage shouldn't take calls down with it: admit and log
+            log.warning("admission_backend_failed", resource=self.resource, error=str(e))
+            return Decision(True, "", "")
+
+    @contextmanager
+    def admit(self, wait_seconds: Optional[float] = None) -> Iterator[bool]:
+        """Yields True once admitted (releasing on exit), or False if shed after the wait budget"""
+        budget = self.limits.wait_seconds if wait_seconds is None else wait_seconds
+        started = time.monotonic()
+        decision = self._acquire()
+        if not decision.admitted and budget > 0:
+            ADMISSION_WAITING.inc(resource=self.resource)
+            try:
+                while not decision.admitted and time.monotonic() - started < budget:
+                    time.sleep(min(POLL_SECONDS, max(0.0, budget - (time.monotonic() - started))))
+                    decision = self._acquire()
+            finally:
+                ADMISSION_WAITING.dec(resource=self.resource)
+        ADMISSION_WAIT_SECONDS.observe(time.monotonic() - started, resource=self.resource)
+        if not decision.admitted:
+            ADMISSION_SHED.inc(resource=self.resource, reason=decision.reason)
+            log.info("admission_shed", resource=self.resource, reason=decision.reason)
+            yield False
+            return
+        ADMISSION_IN_FLIGHT.inc(resource=self.resource)
+        try:
+            yield True
+        finally:
+            ADMISSION_IN_FLIGHT.dec(resource=self.resource)
+            try:
+                self._backend.release(self.resource, decision.lease)
+            except Exception as e:
+                log.warning("admission_release_failed", resource=self.resource, error=str(e))
+
+
+def limits_from_env(resource: str, rate: float, burst: float, max_concurrent: int, wait_seconds: float) -> Limits:
+    prefix = resource.upper()
+    return Limits(
+        float(os.getenv(f"{prefix}_RATE_PER_SECOND", str(rate))),
+        float(os.getenv(f"{prefix}_BURST", str(burst))),
+        int(os.getenv(f"{prefix}_MAX_CONCURRENT", str(max_concurrent))),
+        float(os.getenv(f"{prefix}_ADMISSION_WAIT_SECONDS", str(wait_seconds))),
+    )
+
+
+def backend_from_env():
+    name = os.getenv("ADMISSION_BACKEND", "local")
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown ADMISSION_BACKEND {name!r}; expected one of {sorted(BACKENDS)}")
+    return BACKENDS[name]()
+
+
+backend = backend_from_env()
+# Rates depend on the provider plan, so only the in-flight caps are on by default
+llm = AdmissionGate("llm", limits_from_env("llm", rate=0, burst=10, max_concurrent=8, wait_seconds=1.0), backend)
+tts = AdmissionGate("tts", limits_from_env("tts", rate=0, burst=20, max_concurrent=8, wait_seconds=0.5), backend)
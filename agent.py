@@ -4,271 +4,260 @@ Handles conversations about menu items and takes orders
 """
 
 import os
+import re
 import smtplib
+import threading
+import time
 import requests
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 from datetime import datetime
-from typing import Dict, List
-from menu_data import MENU_CATEGORIES, search_menu, get_category_items, SERVICE_CHARGE_PERCENT, DELIVERY_FEE
+from typing import Callable, Dict, List, Optional
+import admission
+import llm_usage
+import metrics
+import recommendations
+import tracing
+from conversation import ConversationHistory
+from dialogue import Dialogue, DialogueEvent, DialogueState, confirmation_text
+from languages import DEFAULT_LANGUAGE, get_language_profile
+from structured_logging import get_logger
+from menu_catalog import DELIVERY_FEE_CENTS, MenuCatalog, MenuItem, format_dollars, get_catalog
+from order_ledger import OrderLedger
+from tenants import DEFAULT_TENANT, TenantConfig
+from menu_data import SERVICE_CHARGE_PERCENT
+
+log = get_logger("agent")
+order_log = get_logger("order")
+xai_log = get_logger("xai")
+email_log = get_logger("email")
+
+TURNS = metrics.counter("roomservice_agent_turns_total", "Agent turns by how the reply was produced (template, recommendation, llm, shed)", ("source",))
+DUPLICATE_DISPATCHES = metrics.counter(
+    "roomservice_duplicate_dispatches_suppressed_total", "Orders not sent again because they were already dispatched")
+ORDER_CHANGES = metrics.counter("roomservice_order_changes_total", "Changes to call orders", ("action",))
+
+# Phrases that signal the guest wants to add something to their order
+ORDER_INTENT_KEYWORDS = ["i want", "i'd like", "add", "get me", "order", "i'll take", "i'll have", 
+                         "can i get", "can i have", "give me", "i need", "bring me"]
+
+# Phrases stripped from an order request to leave the item name
+ORDER_FILLER_WORDS = ["order", "i'll take", "i'll have", "i want", "i'd like", "add", "get me", "please", 
+                      "can i have", "can i get", "give me", "i need", "bring me", "a ", "an ", "the ",
+                      "i'd", "i'll", "i want", "me", "for", "instead"]
+
+# Phrases that take something off the order; checked before order intent ("remove the fries from my order")
+REMOVE_INTENT_KEYWORDS = ["remove", "take off", "take out", "cancel the", "delete", "drop the",
+                          "don't want the", "scratch the", "no longer want"]
+
+# Phrases stripped from a removal request to leave the item name
+REMOVE_FILLER_WORDS = ["remove", "take off", "take out", "cancel", "delete", "drop", "don't want",
+                       "scratch", "no longer want", "from my order", "from the order", "off my order",
+                       "please", "can you", "could you", "i'd like to", "i want to", "the ", "my ", "off", "out"]
+
+# Phrases that reverse the last change to the order; a request after one ("scratch that, I'll take
+# the caesar instead") is applied once the undo is done
+UNDO_PHRASES = ["undo", "scratch that", "cancel that", "never mind", "nevermind", "take that back"]
+
+# Leading quantity words in an item request ("two truffle fries", "another caesar salad")
+QUANTITY_WORDS = {"a": 1, "an": 1, "one": 1, "another": 1, "two": 2, "three": 3, "four": 4, "five": 5,
+                  "six": 6, "seven": 7, "eight": 8, "nine": 9, "ten": 10}
+QUANTITY_FILLER = {"more", "of", "x"}
+MAX_QUANTITY = 20
+
+# Phrases that signal the guest wants to place/complete their order
+POSITIVE_COMPLETION = ["place order", "checkout", "complete", "finish", "that's all", "that's it", 
+                       "that is all", "that is it", "done", "finalize", "ready", "i'm done", 
+                       "im done", "all set", "goodbye", "bye"]
+
+# Negative responses that indicate they're done (when asked "anything else?")
+NEGATIVE_COMPLETION = ["no thank you", "no thanks", "no, thank you", "no, thanks", 
+                       "that's all", "nothing else", "no more", "no that's it"]
+
+# A bare "no" to "anything else?" also means they're done
+BARE_NEGATIVES = {"no", "nope", "no thank you", "no thanks", "no, thank you", "no, thanks"}
+
+# Room number patterns: "room 123", "room number 123", "123", etc.
+ROOM_PATTERNS = [
+    re.compile(r'room\s*(?:number\s*)?(\d+)'),
+    re.compile(r'room\s*#?\s*(\d+)'),
+    re.compile(r'^(\d{3,4})$'),  # Just numbers (3-4 digits)
+    re.compile(r'(\d{3,4})'),  # Any 3-4 digit number
+]
+
+def _filler_pattern(phrases: List[str]) -> "re.Pattern":
+    """Any of the phrases as whole words ("a" but not the end of "tuna"), or clause punctuation"""
+    words = sorted({phrase.strip() for phrase in phrases}, key=len, reverse=True)
+    return re.compile(r"\b(?:" + "|".join(re.escape(word) for word in words) + r")\b|[,;:!?]")
+
+
+_ORDER_FILLER = _filler_pattern(ORDER_FILLER_WORDS)
+_REMOVE_FILLER = _filler_pattern(REMOVE_FILLER_WORDS)
+
+
+def normalize_utterance(text: str) -> str:
+    """Lowercase a transcript and drop the closing punctuation Twilio adds to final results"""
+    return " ".join(text.lower().split()).rstrip(".!?。？！")
+
 
 class RoomServiceAgent:
-    def __init__(self):
+    # Sends the xAI request in place of requests.post when set (call_replay.py answers from recordings)
+    xai_post: Optional[Callable] = None
+
+    def __init__(self, tenant: TenantConfig = DEFAULT_TENANT):
+        self.tenant = tenant  # Persona, menu and order email (see tenants.py)
         xai_key = os.getenv("XAI_API_KEY")
         if xai_key:
             self.xai_api_key = xai_key
             self.xai_model = "grok-2-1212"  # Latest Grok model
-            print(f"xAI (Grok) API configured successfully")
+            log.info("xai_configured", model=self.xai_model)
         else:
             self.xai_api_key = None
             self.xai_model = None
-            print("xAI API key not found")
-        
-        self.conversation_history: Dict[str, List[Dict]] = {}
-        self.active_orders: Dict[str, List[Dict]] = {}
-        self.room_numbers: Dict[str, str] = {}  # Store room numbers per call
-        self.awaiting_room_number: Dict[str, bool] = {}  # Track if we're waiting for room number
-        self.order_complete: Dict[str, bool] = {}  # Track if order has been placed
-        self.last_item_added: Dict[str, str] = {}  # Track last item added for confirmation
-        self.conversation_state: Dict[str, str] = {}  # Track conversation state (browsing, ordering, reviewing, completing)
-        
-    def get_conversation_context(self, call_sid: str) -> str:
-        """Get conversation history as context"""
-        if call_sid not in self.conversation_history:
-            return ""
+            log.warning("xai_key_missing")
         
-        context = ""
-        for msg in self.conversation_history[call_sid][-5:]:  # Last 5 messages
-            role = msg.get("role", "user")
-            content = msg.get("content", "")
-            context += f"{role}: {content}\n"
+        self.conversation_history: Dict[str, ConversationHistory] = {}
+        self.orders: Dict[str, OrderLedger] = {}
+        self.dialogues: Dict[str, Dialogue] = {}  # Order-flow state and room number per call
+        self.dispatched: Dict[str, str] = {}  # Fingerprint of the order dispatched (or dispatching) per call
+        self._dispatch_lock = threading.Lock()
         
-        return context
+    def catalog(self) -> MenuCatalog:
+        """This tenant's menu as currently in service"""
+        return get_catalog(self.tenant.catalog_owner)
     
     def get_menu_summary(self) -> str:
         """Get a summary of menu categories"""
-        summary = "Our menu includes the following categories:\n"
-        for category in MENU_CATEGORIES.values():
-            item_count = len(category["items"])
-            summary += f"- {category['name']} ({item_count} items)\n"
-        return summary
+        return self.catalog().summary_text()
     
-    def format_item_response(self, items: List[Dict]) -> str:
+    def format_item_response(self, items: List[MenuItem]) -> str:
         """Format menu items for voice response"""
         if not items:
             return "I couldn't find that item on our menu. Would you like to hear about a specific category?"
         
         if len(items) == 1:
             item = items[0]
-            response = f"We have {item['name']}"
-            if item.get('description'):
-                response += f", which includes {item['description']}"
-            response += f". The price is {item['price']} Canadian dollars."
-            if 'category' in item:
-                response += f" It's from our {item['category']} section."
+            response = f"We have {item.name}"
+            if item.description:
+                response += f", which includes {item.description}"
+            response += f". The price is {item.price} Canadian dollars."
+            response += f" It's from our {item.category} section."
             return response
         
         response = f"I found {len(items)} items matching your request:\n"
         for i, item in enumerate(items[:5], 1):  # Limit to 5 items
-            response += f"{i}. {item['name']} - {item['price']} dollars"
-            if 'category' in item:
-                response += f" from {item['category']}"
-            response += ". "
+            response += f"{i}. {item.name} - {item.price} dollars from {item.category}. "
         if len(items) > 5:
             response += f" And {len(items) - 5} more items."
         return response
     
+    def order(self, call_sid: str) -> OrderLedger:
+        """The call's order ledger, created on first use"""
+        ledger = self.orders.get(call_sid)
+        if ledger is None:
+            ledger = self.orders[call_sid] = OrderLedger()
+        return ledger
+    
     def get_current_order_info(self, call_sid: str) -> str:
         """Get formatted information about current order"""
-        order = self.active_orders.get(call_sid, [])
-        if not order:
-            return "No items in current order."
-        
-        info = "Current order:\n"
-        total = 0
-        for item in order:
-            info += f"- {item['name']} - ${item['price']:.2f}\n"
-            total += item['price']
-        service_charge = total * (SERVICE_CHARGE_PERCENT / 100)
-        final_total = total + service_charge + DELIVERY_FEE
-        info += f"Subtotal: ${total:.2f}\n"
-        info += f"Service charge ({SERVICE_CHARGE_PERCENT}%): ${service_charge:.2f}\n"
-        info += f"Delivery fee: ${DELIVERY_FEE:.2f}\n"
-        info += f"Total: ${final_total:.2f}"
-        return info
+        return self.order(call_sid).describe()
     
     def get_detailed_menu_info(self) -> str:
         """Get detailed menu information for AI context"""
-        menu_text = "MENU ITEMS:\n\n"
-        for category_key, category in MENU_CATEGORIES.items():
-            menu_text += f"{category['name']}:\n"
-            for item in category['items']:
-                menu_text += f"  - {item['name']}: ${item['price']:.2f}"
-                if item.get('description'):
-                    menu_text += f" - {item['description']}"
-                menu_text += "\n"
-            menu_text += "\n"
-        return menu_text
+        return self.catalog().prompt_text()
     
-    def process_message(self, call_sid: str, user_message: str) -> str:
-        """Process user message and generate response using xAI (Grok) for all responses"""
-        # Store user message
-        if call_sid not in self.conversation_history:
-            self.conversation_history[call_sid] = []
-            self.active_orders[call_sid] = []
-            self.conversation_state[call_sid] = "browsing"
-        
-        self.conversation_history[call_sid].append({
-            "role": "user",
-            "content": user_message
-        })
-        
-        # Handle order actions (add/remove items) before AI call
-        message_lower = user_message.lower()
-        
-        # Check if user wants to add item to order - expanded detection
-        order_intent_keywords = ["i want", "i'd like", "add", "get me", "order", "i'll take", "i'll have", 
-                                "can i get", "can i have", "give me", "i need", "bring me"]
-        
-        # Check if message contains order intent
-        has_order_intent = any(word in message_lower for word in order_intent_keywords)
-        
-        if has_order_intent:
-            # Try to find menu item - be smarter about extracting item name
-            search_terms = user_message.lower()
-            
-            # Remove common phrases but keep the item name
-            remove_words = ["order", "i'll take", "i'll have", "i want", "i'd like", "add", "get me", "please", 
-                           "can i have", "can i get", "give me", "i need", "bring me", "a ", "an ", "the ",
-                           "i'd", "i'll", "i want", "me", "for"]
-            for word in remove_words:
-                search_terms = search_terms.replace(word, " ").strip()
-            
-            # Clean up extra spaces
-            search_terms = " ".join(search_terms.split())
-            
-            print(f"[ORDER] Searching for menu item with terms: '{search_terms}'")
-            
-            if search_terms:
-                items = search_menu(search_terms)
-                if items:
-                    # Add first matching item to order
-                    item = items[0]
-                    order_item = {
-                        "name": item["name"],
-                        "price": item["price"],
-                        "quantity": 1
-                    }
-                    self.active_orders[call_sid].append(order_item)
-                    self.last_item_added[call_sid] = item['name']
-                    self.conversation_state[call_sid] = "ordering"
-                    print(f"[ORDER] ✅ Added {item['name']} (${item['price']:.2f}) to order for call {call_sid}. Order now has {len(self.active_orders[call_sid])} items.")
-                else:
-                    print(f"[ORDER] ⚠️ Could not find menu item matching: '{search_terms}'. Full message: '{user_message}'")
-        
-        # Check if user wants to place/complete order - expanded keywords
-        # Separate positive completion from negative responses
-        positive_completion = ["place order", "checkout", "complete", "finish", "that's all", "that's it", 
-                              "that is all", "that is it", "done", "finalize", "ready", "i'm done", 
-                              "im done", "all set", "goodbye", "bye"]
-        
-        # Negative responses that indicate they're done (when asked "anything else?")
-        negative_completion = ["no thank you", "no thanks", "no, thank you", "no, thanks", 
-                              "that's all", "nothing else", "no more", "no that's it"]
-        
-        order = self.active_orders.get(call_sid, [])
-        
-        # Check for positive completion
-        wants_to_complete = any(word in message_lower for word in positive_completion)
-        
-        # Check for negative completion (only if we have items and they're responding to "anything else?")
-        is_negative_completion = any(phrase in message_lower for phrase in negative_completion) and order
-        
-        # If user has items and wants to complete (positive or negative), place order
-        if (wants_to_complete or is_negative_completion) and order:
-            print(f"[ORDER] User wants to complete order. Items: {len(order)}, Room: {self.room_numbers.get(call_sid, 'NOT SET')}")
-            # Check if we have room number
-            if call_sid not in self.room_numbers or not self.room_numbers[call_sid]:
-                # Need to ask for room number first
-                self.awaiting_room_number[call_sid] = True
-                print(f"[ORDER] Order ready but missing room number for call {call_sid}")
-            else:
-                # We have room number, place the order and send email
-                print(f"[ORDER] Room number present, placing order...")
-                self.conversation_state[call_sid] = "completing"
-                order_placed = self.place_order(call_sid)
-                if order_placed:
-                    # Mark that order is complete
-                    self.order_complete[call_sid] = True
-                    self.conversation_state[call_sid] = "complete"
-        
-        # Extract room number if user provides it
-        import re
-        # Look for room number patterns: "room 123", "room number 123", "123", etc.
-        room_patterns = [
-            r'room\s*(?:number\s*)?(\d+)',
-            r'room\s*#?\s*(\d+)',
-            r'^(\d{3,4})$',  # Just numbers (3-4 digits)
-            r'(\d{3,4})',  # Any 3-4 digit number
-        ]
-        
-        room_provided = False
-        for pattern in room_patterns:
-            match = re.search(pattern, message_lower)
+    def has_order_intent(self, message_lower: str) -> bool:
+        """Check if a lowercased message expresses intent to order something"""
+        return any(word in message_lower for word in ORDER_INTENT_KEYWORDS)
+    
+    def extract_search_terms(self, message_lower: str) -> str:
+        """Strip ordering phrases from a lowercased message, leaving the item name"""
+        # Remove common phrases but keep the item name
+        return " ".join(_ORDER_FILLER.sub(" ", message_lower).split())
+    
+    def extract_quantity(self, search_terms: str):
+        """Split a leading quantity off search terms: "two truffle fries" -> (2, "truffle fries")"""
+        words = search_terms.split()
+        quantity = None
+        while words and (words[0] in QUANTITY_WORDS or words[0] in QUANTITY_FILLER
+                         or (words[0].isdigit() and len(words[0]) <= 2)):
+            word = words.pop(0)
+            if word in QUANTITY_WORDS:
+                quantity = QUANTITY_WORDS[word]
+            elif word.isdigit():
+                quantity = int(word)
+        return quantity, " ".join(words)
+    
+    def extract_removal_terms(self, message_lower: str) -> str:
+        """Strip removal phrases from a lowercased message, leaving the item name"""
+        return " ".join(_REMOVE_FILLER.sub(" ", message_lower).split())
+    
+    def extract_room_number(self, message_lower: str) -> str:
+        """Return the room number mentioned in a lowercased message, or empty string"""
+        for pattern in ROOM_PATTERNS:
+            match = pattern.search(message_lower)
             if match:
-                room_num = match.group(1)
-                self.room_numbers[call_sid] = room_num
-                self.awaiting_room_number[call_sid] = False
-                print(f"Room number captured for call {call_sid}: {room_num}")
-                room_provided = True
-                break
-        
-        # If room number was just provided and we have an order waiting, try to place it
-        if room_provided and self.awaiting_room_number.get(call_sid, False):
-            order = self.active_orders.get(call_sid, [])
-            if order:
-                print(f"[ORDER] Room number provided, placing order automatically...")
-                self.conversation_state[call_sid] = "completing"
-                order_placed = self.place_order(call_sid)
-                if order_placed:
-                    self.order_complete[call_sid] = True
-                    self.conversation_state[call_sid] = "complete"
-        
-        # Build comprehensive context for xAI (Grok)
-        context = self.get_conversation_context(call_sid)
+                return match.group(1)
+        return ""
+    
+    def parse_turn(self, message_lower: str) -> Dict:
+        """Extract order changes, menu matches, completion signals and room number from a lowercased message"""
+        # Only what follows the last undo phrase can be a new change
+        request, undo = message_lower, False
+        undo_at = max(((message_lower.rfind(phrase), phrase) for phrase in UNDO_PHRASES if phrase in message_lower),
+                      default=None)
+        if undo_at is not None:
+            start, phrase = undo_at
+            before, request = message_lower[:start], message_lower[start + len(phrase):]
+            # "Add the fries, no wait, cancel that" takes back its own request, not the last change
+            undo = not (any(word in before for word in REMOVE_INTENT_KEYWORDS) or self.has_order_intent(before))
+        remove_intent = any(word in request for word in REMOVE_INTENT_KEYWORDS)
+        has_order_intent = not remove_intent and self.has_order_intent(request)
+        quantity, search_terms = None, ""
+        if has_order_intent:
+            quantity, search_terms = self.extract_quantity(self.extract_search_terms(request))
+        elif remove_intent:
+            quantity, search_terms = self.extract_quantity(self.extract_removal_terms(request))
+        recommendation = recommendations.parse_query(message_lower)
+        # "Under 100 dollars" is a price, not a room number
+        room_text = message_lower if recommendation is None or recommendation.max_cents is None \
+            else recommendations.strip_price_limits(message_lower)
+        return {
+            "has_order_intent": has_order_intent,
+            "remove_intent": remove_intent,
+            "undo": undo,
+            "quantity": min(quantity, MAX_QUANTITY) if quantity else quantity,
+            "search_terms": search_terms,
+            "items": self.catalog().search(search_terms) if has_order_intent and search_terms else [],
+            "wants_to_complete": any(word in message_lower for word in POSITIVE_COMPLETION),
+            "said_negative": message_lower in BARE_NEGATIVES or any(phrase in message_lower for phrase in NEGATIVE_COMPLETION),
+            "room_number": self.extract_room_number(room_text),
+            "recommendation": recommendation,
+        }
+    
+    def build_prompt(self, call_sid: str, user_message: str, order_change: str = "",
+                     dispatch_failed: bool = False) -> str:
+        """Assemble the xAI (Grok) prompt for a free-form turn"""
+        # Build comprehensive context for xAI (Grok); recent messages go in as chat turns,
+        # only the summary of older ones is part of the prompt
+        history = self.conversation_history.get(call_sid)
+        earlier = history.summary.render() if history else ""
+        earlier_section = f"EARLIER IN THIS CALL:\n{earlier}\n\n" if earlier else ""
         menu_info = self.get_detailed_menu_info()
         order_info = self.get_current_order_info(call_sid)
         
-        # Check if we're awaiting room number
-        awaiting_room = self.awaiting_room_number.get(call_sid, False)
-        has_room = call_sid in self.room_numbers and self.room_numbers[call_sid]
-        order = self.active_orders.get(call_sid, [])
-        
-        # Build natural, conversational prompt with better state awareness
+        # Asking for the room, the total and the closing line are templated (see dialogue.py);
+        # this only steers the free-form turns around them
         order_status = ""
-        state = self.conversation_state.get(call_sid, "browsing")
-        last_item = self.last_item_added.get(call_sid, "")
-        
-        if order:
-            if awaiting_room and not has_room:
-                order_status = "CRITICAL: The customer wants to complete their order but hasn't provided their room number yet. You MUST ask for their room number NOW in a friendly, natural way. Say something like 'Perfect! May I have your room number, please?' or 'What room number should I deliver this to?'"
-            elif has_room and not self.order_complete.get(call_sid, False):
-                # Show order summary before finalizing
-                subtotal = sum(item['price'] * item.get('quantity', 1) for item in order)
-                service_charge = subtotal * (SERVICE_CHARGE_PERCENT / 100)
-                total = subtotal + service_charge + DELIVERY_FEE
-                order_status = f"The customer has provided room number {self.room_numbers[call_sid]}. You have {len(order)} item(s) ready. When they confirm, summarize: '{len(order)} item(s), total ${total:.2f} including service charge and delivery. Delivery in 30-45 minutes.' Then confirm the order is placed."
-            elif self.order_complete.get(call_sid, False):
-                order_status = "The order has already been placed and confirmed. Thank the customer warmly and wish them a pleasant stay. Keep it brief."
-            elif not has_room:
-                # We have items but no room number - if they say no/decline, ask for room number
-                if is_negative_completion or (message_lower in ["no", "no thank you", "no thanks", "no, thank you", "no, thanks"]):
-                    order_status = "CRITICAL: The customer has items in their order and just declined further items. You MUST ask for their room number NOW to complete the order. Say something like 'Perfect! May I have your room number, please?' in a friendly, natural way."
-                elif last_item:
-                    # Just added an item - confirm and offer to add more
-                    order_status = f"You just added {last_item} to their order. Confirm it was added, mention the current order total, and naturally ask if they'd like anything else. Be conversational, not robotic."
-        
-        prompt = f"""You are Nasrin, a warm and professional room service concierge at Four Seasons Hotel Toronto. You're speaking on the phone, so be natural, conversational, and concise.
+        if dispatch_failed:
+            order_status = "The order could not be sent to the kitchen just now. Apologize briefly and ask them to say \"that's all\" to try again."
+        elif self.dialogue_state(call_sid) is DialogueState.AWAITING_ROOM:
+            order_status = "We still need their room number to place the order. Answer them briefly, then ask for it."
+        elif order_change:
+            # Just changed the order - confirm and offer to add more
+            order_status = f"{order_change} Mention the current order total, and naturally ask if they'd like anything else. Be conversational, not robotic."
+        
+        prompt = f"""You are {self.tenant.concierge}, a warm and professional room service concierge at {self.tenant.hotel}. You're speaking on the phone, so be natural, conversational, and concise.
 
 MENU INFORMATION:
 {menu_info}
@@ -278,10 +267,7 @@ CURRENT ORDER STATUS:
 
 {order_status}
 
-CONVERSATION HISTORY:
-{context}
-
-CUSTOMER JUST SAID: "{user_message}"
+{earlier_section}CUSTOMER JUST SAID: "{user_message}"
 
 YOUR RESPONSE GUIDELINES:
 - Speak naturally and warmly, like a real person on the phone - not a robot
@@ -291,50 +277,212 @@ YOUR RESPONSE GUIDELINES:
 - When they ask about menu items: give item name, brief description, and price clearly and naturally
 - When they order something: warmly confirm what they ordered and the price, then naturally ask if they'd like anything else
 - When they want to review their order: clearly list each item and the total in a friendly way
-- When placing order: {"CRITICAL: You MUST ask for their room number RIGHT NOW in a natural, friendly way. Say something like 'Perfect! May I have your room number, please?' or 'What room number should I deliver this to?'" if awaiting_room and not has_room and order else "If they have a room number, confirm the order: summarize items, total price, and delivery time (30-45 minutes) warmly, then thank them"}
-- If they provide a room number: acknowledge it warmly, confirm the order is placed with a brief summary, and thank them
-- If they say goodbye or seem done: {"Ask for room number if you have items but no room number" if order and not has_room else "Thank them warmly and wish them a pleasant stay"}
 - Be proactive but not pushy - guide the conversation naturally
 - Sound natural and human - avoid robotic phrases like 'How may I assist you today?' - be more casual and warm"""
-
-        # Use xAI (Grok) for all AI responses
-        if self.xai_api_key:
-            print(f"Calling xAI (Grok) for message: {user_message[:50]}...")
-            response = self._call_xai(prompt, call_sid)
+        return prompt
+    
+    def process_message(self, call_sid: str, user_message: str, language: Optional[str] = None,
+                        parsed: Optional[Dict] = None) -> str:
+        """
+        Process user message: apply order actions, advance the dialogue state, then answer from a
+        template for deterministic states or with xAI (Grok) for free-form turns
+        `parsed` is parse_turn's result if it was already computed (e.g. speculatively on a partial result)
+        """
+        history = self.conversation_history.get(call_sid)
+        if history is None:
+            history = self.conversation_history[call_sid] = ConversationHistory()
+        dialogue = self.dialogues.setdefault(call_sid, Dialogue())
+        if language:
+            history.summary.language = language
+        
+        # Parse the turn first, then apply order actions (add/remove items) before AI call
+        if parsed is None:
+            with tracing.span("intent_parse"):
+                parsed = self.parse_turn(normalize_utterance(user_message))
+        
+        discussed = [item.name for item in parsed["items"][:3]]
+        ledger = self.order(call_sid)
+        changes = []  # What this turn did to the order, for the prompt
+        added = None
+        if parsed["undo"]:
+            event = ledger.undo()
+            if event is not None:
+                ORDER_CHANGES.inc(action="undo")
+                verb = "adding" if event.quantity > 0 else "removing"
+                changes.append(f"You just undid {verb} {self._count(abs(event.quantity), event.name)}. Confirm the change.")
+                order_log.info("change_undone", call_sid=call_sid, item_id=event.item_id, seq=event.seq, order_size=len(ledger))
+        if parsed["has_order_intent"]:
+            search_terms = parsed["search_terms"]
+            order_log.debug("item_search", call_sid=call_sid, terms=search_terms)
+            
+            if search_terms:
+                items = parsed["items"]
+                if items:
+                    # Add first matching item to order; ordering it again raises the quantity
+                    item = items[0]
+                    quantity = parsed["quantity"] or 1
+                    line = ledger.add(item, quantity)
+                    added = item
+                    ORDER_CHANGES.inc(action="add")
+                    changes.append(f"You just added {self._count(quantity, item.name)} to their order (now {line.quantity}). Confirm it was added.")
+                    if dialogue.state is DialogueState.COMPLETE:
+                        # A follow-up order: it may match the one already sent, and must still go out
+                        with self._dispatch_lock:
+                            self.dispatched.pop(call_sid, None)
+                    dialogue.fire(DialogueEvent.ITEM_ADDED, call_sid)
+                    history.summary.note_order(item.name)
+                    order_log.info("item_added", call_sid=call_sid, item_id=item.id, price_cents=item.price_cents,
+                                   quantity=quantity, order_size=len(ledger))
+                else:
+                    order_log.info("item_not_found", call_sid=call_sid, terms=search_terms)
+        elif parsed["remove_intent"]:
+            line = ledger.find(parsed["search_terms"])
+            if line is not None:
+                removed = ledger.remove(line.item_id, parsed["quantity"])
+                ORDER_CHANGES.inc(action="remove")
+                changes.append(f"You just took {self._count(removed, line.name)} off their order. Confirm it was removed.")
+                order_log.info("item_removed", call_sid=call_sid, item_id=line.item_id, quantity=removed, order_size=len(ledger))
+            else:
+                changes.append(f"They asked to remove \"{parsed['search_terms']}\", which is not in their order. Say so briefly.")
+                order_log.info("remove_not_found", call_sid=call_sid, terms=parsed["search_terms"])
+        order_change = " ".join(changes)
+        if dialogue.state in (DialogueState.ORDERING, DialogueState.AWAITING_ROOM) and not ledger:
+            dialogue.fire(DialogueEvent.ORDER_EMPTIED, call_sid)
+        elif ledger and dialogue.state is DialogueState.BROWSING:
+            dialogue.fire(DialogueEvent.ITEM_ADDED, call_sid)
+        
+        # Store room number whenever the guest gives it
+        if parsed["room_number"]:
+            dialogue.room = parsed["room_number"]
+            history.summary.room = dialogue.room
+            order_log.info("room_number_captured", call_sid=call_sid)
+        
+        # Done ordering: "that's all", or "no" (to "anything else?") once there's something in the order
+        checkout = bool(ledger) and (parsed["wants_to_complete"] or parsed["said_negative"])
+        if checkout:
+            order_log.info("complete_requested", call_sid=call_sid, order_size=len(ledger), has_room=bool(dialogue.room))
+            dialogue.fire(DialogueEvent.CHECKOUT, call_sid)
+        if dialogue.state is DialogueState.AWAITING_ROOM and dialogue.room:
+            dialogue.fire(DialogueEvent.ROOM_KNOWN, call_sid)
+        
+        profile = get_language_profile(language or DEFAULT_LANGUAGE)
+        response = None
+        source = "template"
+        dispatch_failed = False
+        if dialogue.state is DialogueState.CONFIRMING:
+            # Read back the total before the order (and its items) is cleared
+            confirmation = confirmation_text(profile, ledger.total_cents)
+            order_log.debug("placing_order", call_sid=call_sid)
+            if self.place_order(call_sid):
+                dialogue.fire(DialogueEvent.ORDER_PLACED, call_sid)
+                response = confirmation
+            else:
+                dialogue.fire(DialogueEvent.DISPATCH_FAILED, call_sid)
+                dispatch_failed = True
+        elif dialogue.state is DialogueState.COMPLETE:
+            response = profile.closing
+        elif dialogue.state is DialogueState.AWAITING_ROOM and checkout:
+            order_log.info("awaiting_room_number", call_sid=call_sid)
+            response = profile.ask_room
+        elif parsed["recommendation"] is not None and added is None and not order_change \
+                and dialogue.state is not DialogueState.AWAITING_ROOM:
+            # "Something vegetarian under $20": answered from the menu's attributes, without the LLM.
+            # If nothing fits, the LLM answers; the request may not have been about food at all.
+            query = parsed["recommendation"]
+            with tracing.span("recommend"):
+                picks = recommendations.index_for(self.catalog()).recommend(query)
+            log.info("recommended", call_sid=call_sid, tags=sorted(query.tags), max_cents=query.max_cents,
+                     matches=len(picks))
+            if picks:
+                discussed = [item.name for item in picks]
+                response = recommendations.recommendation_text(profile, picks)
+                source = "recommendation"
+        
+        if response is not None:
+            TURNS.inc(source=source)
         else:
-            print("xAI not available, using default response")
-            response = "How can I help you with our menu today?"
-        
-        # Store agent response
-        self.conversation_history[call_sid].append({
-            "role": "assistant",
-            "content": response
-        })
+            # Use xAI (Grok) for free-form turns, unless it's over its admission limit
+            with admission.llm.admit() as admitted:
+                if admitted:
+                    TURNS.inc(source="llm")
+                    with tracing.span("prompt_build"):
+                        prompt = self.build_prompt(call_sid, user_message, order_change, dispatch_failed)
+                    
+                    if self.xai_api_key:
+                        xai_log.debug("xai_call", call_sid=call_sid, message_chars=len(user_message))
+                        response = self._call_xai(prompt, call_sid)
+                    else:
+                        xai_log.warning("xai_unavailable", call_sid=call_sid)
+                        response = "How can I help you with our menu today?"
+            if not admitted:
+                TURNS.inc(source="shed")
+                response = self.shed_reply(profile, dialogue, parsed, added, ledger)
+        
+        # Store the exchange only now, so this turn's message is sent once (in the prompt)
+        history.append("user", user_message, discussed)
+        history.append("assistant", response)
         
         return response
 
+    def dialogue_state(self, call_sid: str) -> DialogueState:
+        dialogue = self.dialogues.get(call_sid)
+        return dialogue.state if dialogue is not None else DialogueState.BROWSING
+    
+    def room_number(self, call_sid: str) -> str:
+        dialogue = self.dialogues.get(call_sid)
+        return dialogue.room if dialogue is not None else ""
+    
+    def order_total_cents(self, call_sid: str) -> int:
+        """Order total including service charge and delivery"""
+        return self.order(call_sid).total_cents
+    
+    def shed_reply(self, profile, dialogue: Dialogue, parsed: Dict, added: Optional[MenuItem],
+                   ledger: OrderLedger) -> str:
+        """Templated answer for a free-form turn when the LLM is over its admission limit"""
+        if dialogue.state is DialogueState.AWAITING_ROOM:
+            return profile.ask_room
+        if added is not None:
+            return profile.item_added.format(item=added.name, total=format_dollars(ledger.total_cents))
+        if parsed["items"]:
+            item = parsed["items"][0]
+            return profile.item_price.format(item=item.name, price=item.price)
+        return profile.busy
+    
+    @staticmethod
+    def _count(quantity: int, name: str) -> str:
+        return f"{quantity} x {name}" if quantity > 1 else name
+    
+    def end_call(self, call_sid: str):
+        """Drop everything kept for a call once it has ended"""
+        self.conversation_history.pop(call_sid, None)
+        self.orders.pop(call_sid, None)
+        self.dialogues.pop(call_sid, None)
+        self.dispatched.pop(call_sid, None)
+
+    def build_messages(self, prompt: str, call_sid: str) -> List[Dict]:
+        """Build the chat messages array sent to xAI (Grok) for this turn"""
+        messages = []
+        
+        # System instruction
+        system_instruction = f"You are {self.tenant.concierge}, room service concierge at {self.tenant.hotel}. Be professional, helpful, and concise. Keep responses short (1-2 sentences). ALWAYS respond in the SAME LANGUAGE the user is speaking."
+        messages.append({"role": "system", "content": system_instruction})
+        
+        # Recent conversation as chat turns - the only place the verbatim history is sent
+        history = self.conversation_history.get(call_sid)
+        if history is not None:
+            messages.extend(history.chat_messages())
+        
+        # Add current prompt
+        messages.append({"role": "user", "content": prompt})
+        return messages
+    
     def _call_xai(self, prompt: str, call_sid: str) -> str:
         """Generate response using xAI (Grok) API"""
+        request_start = None
+        prompt_size = 0
         try:
-            # Build conversation history for context
-            messages = []
-            
-            # System instruction
-            system_instruction = "You are Nasrin, room service concierge at Four Seasons Toronto. Be professional, helpful, and concise. Keep responses short (1-2 sentences). ALWAYS respond in the SAME LANGUAGE the user is speaking."
-            messages.append({"role": "system", "content": system_instruction})
-            
-            # Add recent conversation history if available
-            if call_sid in self.conversation_history:
-                for msg in self.conversation_history[call_sid][-6:]:  # Last 6 messages for context
-                    role = msg.get("role", "user")
-                    content = msg.get("content", "")
-                    if role == "user":
-                        messages.append({"role": "user", "content": content})
-                    elif role == "assistant":
-                        messages.append({"role": "assistant", "content": content})
-            
-            # Add current prompt
-            messages.append({"role": "user", "content": prompt})
+            messages = self.build_messages(prompt, call_sid)
+            prompt_size = llm_usage.prompt_bytes(messages)
             
             # Call xAI API with optimized settings for natural conversation
             url = "https://api.x.ai/v1/chat/completions"
@@ -352,38 +500,40 @@ YOUR RESPONSE GUIDELINES:
                 "presence_penalty": 0.2,  # Encourage new topics
             }
             
-            response = requests.post(url, headers=headers, json=data, timeout=10)
-            response.raise_for_status()
+            # Stream so the request span ends at the response headers (connect + generation)
+            # and the read span covers downloading the body
+            request_start = time.perf_counter()
+            with tracing.span("xai_request"):
+                post = self.xai_post or requests.post
+                response = post(url, headers=headers, json=data, timeout=10, stream=True)
+                response.raise_for_status()
             
-            result = response.json()
+            with tracing.span("xai_read"):
+                result = response.json()
+            llm_usage.record_turn(call_sid, prompt_size, time.perf_counter() - request_start, result.get("usage"))
             xai_response = result["choices"][0]["message"]["content"].strip()
-            print(f"xAI (Grok) response received: {xai_response[:100]}...")
+            xai_log.debug("xai_response", call_sid=call_sid, response_chars=len(xai_response))
             return xai_response
             
         except Exception as e:
-            print(f"xAI API error: {str(e)}")
-            import traceback
-            traceback.print_exc()
+            if request_start is not None:
+                llm_usage.record_turn(call_sid, prompt_size, time.perf_counter() - request_start, None, ok=False)
+            xai_log.exception("xai_error", call_sid=call_sid, error=str(e))
             return "How can I help you with our menu today?"
     
     def send_order_email(self, call_sid: str) -> bool:
-        """Send order confirmation email to saeedghods@me.com"""
-        order = self.active_orders.get(call_sid, [])
-        room_number = self.room_numbers.get(call_sid, "Not provided")
+        """Email the order to the tenant's order address (ORDER_EMAIL by default)"""
+        ledger = self.orders.get(call_sid)
+        room_number = self.room_number(call_sid) or "Not provided"
         
-        if not order:
-            print(f"No order to send for call {call_sid}")
+        if not ledger:
+            email_log.warning("no_order_to_send", call_sid=call_sid)
             return False
         
         try:
-            # Calculate totals
-            subtotal = sum(item['price'] * item.get('quantity', 1) for item in order)
-            service_charge = subtotal * (SERVICE_CHARGE_PERCENT / 100)
-            final_total = subtotal + service_charge + DELIVERY_FEE
-            
             # Create email content
             email_body = f"""
-NEW ROOM SERVICE ORDER - Four Seasons Toronto
+NEW ROOM SERVICE ORDER - {self.tenant.hotel}
 
 Order Details:
 {'=' * 50}
@@ -394,20 +544,18 @@ Order Time: {datetime.now().strftime('%Y-%m-%d %H:%M:%S EST')}
 Items Ordered:
 {'-' * 50}
 """
-            for item in order:
-                quantity = item.get('quantity', 1)
-                item_total = item['price'] * quantity
-                email_body += f"{item['name']} x{quantity}\n"
-                email_body += f"  ${item['price']:.2f} each = ${item_total:.2f}\n\n"
+            for line in ledger.lines:
+                email_body += f"{line.name} x{line.quantity}\n"
+                email_body += f"  ${format_dollars(line.price_cents)} each = ${format_dollars(line.total_cents)}\n\n"
             
             email_body += f"""
 Pricing Breakdown:
 {'-' * 50}
-Subtotal: ${subtotal:.2f}
-Service Charge ({SERVICE_CHARGE_PERCENT}%): ${service_charge:.2f}
-Delivery Fee: ${DELIVERY_FEE:.2f}
+Subtotal: ${format_dollars(ledger.subtotal_cents)}
+Service Charge ({SERVICE_CHARGE_PERCENT}%): ${format_dollars(ledger.service_charge_cents)}
+Delivery Fee: ${format_dollars(DELIVERY_FEE_CENTS)}
 {'=' * 50}
-TOTAL: ${final_total:.2f}
+TOTAL: ${format_dollars(ledger.total_cents)}
 
 Estimated Delivery Time: 30-45 minutes
 
@@ -420,69 +568,73 @@ This is an automated order notification from the Four Seasons Room Service Phone
             smtp_port = int(os.getenv("SMTP_PORT", "587"))
             email_user = os.getenv("EMAIL_USER")
             email_password = os.getenv("EMAIL_PASSWORD")
-            recipient_email = os.getenv("ORDER_EMAIL", "saeedghods@me.com")
-            
-            print(f"[EMAIL] Config check - Server: {smtp_server}, Port: {smtp_port}, From: {email_user}, To: {recipient_email}")
+            recipient_email = self.tenant.order_email or os.getenv("ORDER_EMAIL", "saeedghods@me.com")
             
             if not email_user or not email_password:
-                print(f"[EMAIL] ❌ Email credentials not configured. EMAIL_USER: {'SET' if email_user else 'MISSING'}, EMAIL_PASSWORD: {'SET' if email_password else 'MISSING'}")
+                email_log.error("email_not_configured", call_sid=call_sid, email_user_set=bool(email_user), email_password_set=bool(email_password))
                 return False
             
             # Create message
             msg = MIMEMultipart()
             msg['From'] = email_user
             msg['To'] = recipient_email
-            msg['Subject'] = f"🍽️ New Room Service Order - Room {room_number} - ${final_total:.2f}"
+            msg['Subject'] = f"🍽️ New Room Service Order - Room {room_number} - ${format_dollars(ledger.total_cents)}"
             
             msg.attach(MIMEText(email_body, 'plain'))
             
             # Send email with better error handling
-            print(f"[EMAIL] Attempting to connect to {smtp_server}:{smtp_port}")
+            email_log.debug("smtp_connect", server=smtp_server, port=smtp_port)
             server = smtplib.SMTP(smtp_server, smtp_port, timeout=10)
-            print(f"[EMAIL] Starting TLS...")
             server.starttls()
-            print(f"[EMAIL] Logging in as {email_user}...")
             server.login(email_user, email_password)
-            print(f"[EMAIL] Sending message to {recipient_email}...")
             server.send_message(msg)
             server.quit()
             
-            print(f"[EMAIL] ✅ Order email sent successfully for call {call_sid} to {recipient_email}")
+            email_log.info("order_email_sent", call_sid=call_sid, recipient=recipient_email)
             return True
             
         except Exception as e:
-            print(f"Error sending order email: {str(e)}")
-            import traceback
-            traceback.print_exc()
+            email_log.exception("order_email_failed", call_sid=call_sid, error=str(e))
             return False
     
     def place_order(self, call_sid: str) -> bool:
         """Place order and send email notification"""
-        order = self.active_orders.get(call_sid, [])
-        room_number = self.room_numbers.get(call_sid)
+        ledger = self.orders.get(call_sid)
+        room_number = self.room_number(call_sid)
         
-        if not order:
-            print(f"[ORDER] No order to place for call {call_sid}")
+        if not ledger:
+            order_log.warning("no_order_to_place", call_sid=call_sid)
             return False
         
         if not room_number:
-            print(f"[ORDER] Cannot place order without room number for call {call_sid}")
+            order_log.warning("missing_room_number", call_sid=call_sid)
             return False
         
-        print(f"[ORDER] Attempting to place order for call {call_sid}, room {room_number}, {len(order)} items")
+        # The same order is only ever sent once, however many times this is reached
+        fingerprint = ledger.fingerprint()
+        with self._dispatch_lock:
+            if self.dispatched.get(call_sid) == fingerprint:
+                DUPLICATE_DISPATCHES.inc()
+                order_log.warning("duplicate_dispatch_suppressed", call_sid=call_sid)
+                return True
+            self.dispatched[call_sid] = fingerprint
+        
+        order_log.info("place_order", call_sid=call_sid, order_size=len(ledger))
         
         # Send email
-        email_sent = self.send_order_email(call_sid)
+        with tracing.span("order_dispatch"):
+            email_sent = self.send_order_email(call_sid)
         
         if email_sent:
-            # Clear order after successful email
-            self.active_orders[call_sid] = []
-            self.awaiting_room_number[call_sid] = False
-            self.order_complete[call_sid] = True  # Mark order as complete
-            print(f"[ORDER] ✅ Order successfully placed and email sent for call {call_sid}, room {room_number}")
+            # Start a fresh order after a successful email; the placed one goes to the log in full
+            self.orders[call_sid] = OrderLedger()
+            order_log.info("order_placed", call_sid=call_sid, order=ledger.to_dict())
             return True
         else:
-            print(f"[ORDER] ❌ Order email failed for call {call_sid}, order NOT cleared - will retry")
+            order_log.error("order_dispatch_failed", call_sid=call_sid)
+            with self._dispatch_lock:
+                if self.dispatched.get(call_sid) == fingerprint:
+                    del self.dispatched[call_sid]
             # Don't clear order if email fails - allows retry
             return False
 
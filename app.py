@@ -3,25 +3,96 @@ Flask application for Four Seasons Room Service Phone Agent
 Handles Twilio webhooks for incoming calls
 """
 
-from flask import Flask, request, send_file
-from twilio.twiml.voice_response import VoiceResponse, Gather, Play
+from flask import Flask, g, has_request_context, request, send_file, Response
+from flask_sock import Sock
 from twilio.rest import Client
 import os
 import tempfile
 import uuid
 import time
 import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
 from datetime import datetime, timedelta
 import pytz
 import json
+import hashlib
+import functools
 from dotenv import load_dotenv
 from agent import RoomServiceAgent
+from dialogue import DialogueState, confirmation_text
+from languages import GREETING_NO_INPUT_TAIL, LANGUAGE_SWITCH_KEYWORDS, NO_INPUT_PATH, get_language_profile
+from language_switch import LanguageSwitchDetector, menu_item_names
+from menu_catalog import CatalogCache, get_catalog, has_catalog, install_catalog
+import menu_source
+from menu_source import MenuWatcher
+import speech_hints
+from prefetch import Prefetcher, predict_next_prompts
+from speculation import PARTIAL_CALLBACK, SpeculationStore, partial_results_enabled
+import twiml
+from twiml import TwimlResponse
+import media_stream
+from media_stream import MEDIA_STREAM_PATH, MediaStreamSession, StreamReply
+import diagnostics
+import llm_usage
+import metrics
+import admission
+import call_recorder
+import idempotency
+import language_id
+import endpointing
+import tenants
+from tenants import Tenant, TenantError
+import tracing
+from structured_logging import get_logger
 from google.cloud import texttospeech
+from audio_profiles import get_audio_profile
 
 load_dotenv()
 
+log = get_logger("app")
+call_log = get_logger("call")
+trace_log = get_logger("trace")
+tts_log = get_logger("tts")
+tts_cache_log = get_logger("tts.cache")
+audio_log = get_logger("audio")
+audio_fetch_log = get_logger("audio.fetch")
+
 app = Flask(__name__)
-agent = RoomServiceAgent()
+sock = Sock(app)
+
+
+def build_tenant(config):
+    """Agent, speculation store and (if it has its own menu) menu watcher for a tenant"""
+    watcher = None
+    if config.menu_path:
+        watcher = MenuWatcher(config.menu_path, install=functools.partial(install_catalog, owner=config.catalog_owner)).start()
+        if not has_catalog(config.catalog_owner):
+            watcher.stop()
+            raise TenantError(f"menu for tenant {config.id} failed to load from {config.menu_path}")
+    tenant_agent = RoomServiceAgent(config)
+    speculations = SpeculationStore(lambda text: detect_language_switch(text, tenant_agent.catalog()), tenant_agent.parse_turn)
+    return Tenant(config, tenant_agent, speculations, watcher)
+
+
+# Hotels served by this deployment, chosen by the number called (TENANTS_PATH)
+tenant_registry = tenants.registry_from_env(build_tenant)
+
+# The default tenant's agent - the only one unless TENANTS_PATH is set
+agent = tenant_registry.default.agent
+
+
+def tenant_for(call_sid):
+    """Tenant handling a call"""
+    to_number = request.form.get("To") if has_request_context() else None
+    return tenant_registry.for_call(call_sid, to_number)
+
+
+def greeting_for(tenant, lang_code):
+    """The tenant's own greeting for a language, or the language's standard one"""
+    greeting = tenant.config.greetings.get(lang_code)
+    if greeting:
+        return greeting.format(version=VERSION)
+    return get_language_profile(lang_code).greeting_text(VERSION)
 
 # Store detected language per call
 call_languages = {}
@@ -39,19 +110,42 @@ if gcp_credentials_json:
         temp_creds_file.close()
         os.environ['GOOGLE_APPLICATION_CREDENTIALS'] = temp_creds_file.name
         gcp_tts_client = texttospeech.TextToSpeechClient()
-        print("Google Cloud TTS initialized successfully")
+        tts_log.info("gcp_tts_initialized")
     except Exception as e:
-        print(f"Error initializing Google Cloud TTS: {e}")
+        tts_log.error("gcp_tts_init_failed", error=str(e))
         gcp_tts_client = None
 else:
-    print("GCP_CREDENTIALS_JSON not found - TTS will use fallback")
+    tts_log.warning("gcp_credentials_missing")
 
-# Store generated audio files temporarily with metadata for cleanup
-audio_cache = {}  # {audio_id: {"path": str, "created": datetime, "text_hash": str}}
+# Output format for synthesized speech (TTS_AUDIO_PROFILE)
+audio_profile = get_audio_profile()
+
+# Store generated audio temporarily with metadata for cleanup. Small clips keep their bytes in
+# memory ("data"), larger ones are written to a temp file ("path").
+# {audio_id: {"path": str|None, "data": bytes|None, "size": int, "etag": str, "mimetype": str,
+#             "created": datetime, "text_hash": str}}
+audio_cache = {}
+
+# Clips up to this size are served from memory, within an overall memory budget
+AUDIO_MEMORY_MAX_BYTES = int(os.getenv("AUDIO_MEMORY_MAX_BYTES", str(256 * 1024)))
+AUDIO_MEMORY_BUDGET_BYTES = int(os.getenv("AUDIO_MEMORY_BUDGET_BYTES", str(32 * 1024 * 1024)))
+audio_memory_bytes = 0
+audio_memory_lock = threading.Lock()
 
 # Cache common responses to avoid regenerating
 response_cache = {}  # {text_hash: audio_id}
 
+# How long a turn waits for synthesis before falling back to Twilio's <Say>
+TTS_DEADLINE_SECONDS = float(os.getenv("TTS_DEADLINE_SECONDS", "2.0"))
+
+# Synthesis runs on a small pool so a turn can stop waiting without abandoning the clip
+tts_executor = ThreadPoolExecutor(max_workers=int(os.getenv("TTS_WORKERS", "4")), thread_name_prefix="tts")
+tts_in_flight = {}  # {text_hash: Future} - one synthesis per clip however many requests want it
+tts_in_flight_lock = threading.Lock()
+
+# Languages whose configured GCP voice doesn't exist - synthesized with the language's default voice
+default_voice_languages = set()
+
 # Twilio credentials
 TWILIO_ACCOUNT_SID = os.getenv("TWILIO_ACCOUNT_SID")
 TWILIO_AUTH_TOKEN = os.getenv("TWILIO_AUTH_TOKEN")
@@ -67,102 +161,188 @@ def health_check():
     return f"Four Seasons Room Service Agent is running! Last updated: {edit_time}", 200
 
 
-def get_voice_for_language(lang_code):
-    """Get appropriate Twilio voice for language"""
-    voice_map = {
-        "en-US": "alice", "en-GB": "alice", "en-AU": "alice", "en-CA": "alice",
-        "es-ES": "Conchita", "es-MX": "Conchita", "es-US": "Conchita",
-        "fr-FR": "Mathieu", "fr-CA": "Mathieu",
-        "de-DE": "Hans",
-        "it-IT": "Carla",
-        "pt-BR": "Vitoria", "pt-PT": "Cristiano",
-        "ja-JP": "Takumi",
-        "ko-KR": "Seoyeon",
-        "zh-CN": "Zhiyu", "zh-TW": "Zhiyu",
-        "ar-SA": "Zeina", "ar-EG": "Zeina",
-        "fa-IR": "Zeina",  # Farsi/Persian - use Arabic voice (closest available)
-        "hi-IN": "Aditi",
-        "ru-RU": "Tatyana",
-        "nl-NL": "Lotte",
-        "pl-PL": "Ewa",
-        "tr-TR": "Filiz",
-        "sv-SE": "Astrid",
-        "da-DK": "Naja",
-        "no-NO": "Liv",
-        "fi-FI": "Suvi",
-        "cs-CZ": "Josef",
-        "hu-HU": "Gyorgy",
-        "ro-RO": "Carmen",
-        "th-TH": "Kanya",
-        "vi-VN": "Linh"
-    }
-    # Default to alice for English if language not found
-    return voice_map.get(lang_code, "alice")
-
-def get_twilio_language_code(lang_code):
-    """Map language codes to Twilio-supported language codes"""
-    # Twilio doesn't support fa-IR, use Arabic which is closest
-    twilio_lang_map = {
-        "fa-IR": "ar-SA",  # Use Arabic for Farsi (closest supported language)
-    }
-    return twilio_lang_map.get(lang_code, lang_code)
-
-def get_gcp_tts_voice(lang_code):
-    """Get Google Cloud TTS voice name and language code - using premium Neural2 voices for natural sound"""
-    # Google Cloud TTS voice mapping - format: (voice_name, language_code)
-    # Using Neural2 voices for most natural, human-like sound
-    voice_map = {
-        "en-US": ("en-US-Neural2-F", "en-US"),
-        "es-ES": ("es-ES-Neural2-F", "es-ES"),
-        "es-MX": ("es-MX-Neural2-F", "es-MX"),
-        "fr-FR": ("fr-FR-Neural2-C", "fr-FR"),
-        "de-DE": ("de-DE-Neural2-F", "de-DE"),
-        "it-IT": ("it-IT-Neural2-C", "it-IT"),
-        "pt-BR": ("pt-BR-Neural2-C", "pt-BR"),
-        "ja-JP": ("ja-JP-Neural2-C", "ja-JP"),
-        "ko-KR": ("ko-KR-Neural2-C", "ko-KR"),
-        "zh-CN": ("zh-CN-Neural2-C", "zh-CN"),
-        "zh-TW": ("zh-TW-Neural2-C", "zh-TW"),
-        "ar-SA": ("ar-XA-Neural2-C", "ar-XA"),  # Arabic - Neural2 for more natural sound
-        "fa-IR": ("ar-XA-Neural2-C", "ar-XA"),  # Farsi - use Arabic Neural2 (more natural than Wavenet)
-        "hi-IN": ("hi-IN-Neural2-D", "hi-IN"),
-        "ru-RU": ("ru-RU-Neural2-D", "ru-RU"),
-        "nl-NL": ("nl-NL-Neural2-C", "nl-NL"),
-        "pl-PL": ("pl-PL-Neural2-A", "pl-PL"),
-        "tr-TR": ("tr-TR-Neural2-C", "tr-TR"),
-        "sv-SE": ("sv-SE-Neural2-C", "sv-SE"),
-        "da-DK": ("da-DK-Neural2-D", "da-DK"),
-        "no-NO": ("nb-NO-Neural2-C", "nb-NO"),
-        "fi-FI": ("fi-FI-Neural2-C", "fi-FI"),
-        "cs-CZ": ("cs-CZ-Neural2-A", "cs-CZ"),  # Neural2 if available
-        "hu-HU": ("hu-HU-Neural2-A", "hu-HU"),
-        "ro-RO": ("ro-RO-Neural2-A", "ro-RO"),
-        "th-TH": ("th-TH-Neural2-C", "th-TH"),
-        "vi-VN": ("vi-VN-Neural2-A", "vi-VN")
-    }
-    return voice_map.get(lang_code, ("en-US-Neural2-F", "en-US"))
+# Webhooks that get a per-request trace
+TRACED_ENDPOINTS = {"handle_incoming_call", "process_speech", "no_input", "call_status"}
+
+# Call transcripts for offline replay (CALL_RECORD_DIR); None when recording is off
+recorder = call_recorder.from_env()
+RECORDED_ENDPOINTS = TRACED_ENDPOINTS | {"partial_speech"}
+
+ACTIVE_CALLS = metrics.gauge("roomservice_active_calls", "Calls with conversation state in memory")
+AUDIO_CACHE_ENTRIES = metrics.gauge("roomservice_audio_cache_entries", "Generated audio clips held in the cache")
+AUDIO_MEMORY_BYTES = metrics.gauge("roomservice_audio_memory_bytes", "Bytes of audio clips held in memory")
+AUDIO_BYTES_SERVED = metrics.counter(
+    "roomservice_audio_bytes_served_total", "Audio bytes sent to Twilio", ("source",))
+TTS_DEADLINE_MISSES = metrics.counter(
+    "roomservice_tts_deadline_misses_total", "Turns that fell back to <Say> because synthesis ran past the deadline")
+AUDIO_SYNTHESIZED_BYTES = metrics.histogram(
+    "roomservice_audio_clip_bytes", "Size of synthesized audio clips",
+    buckets=(4096, 16384, 32768, 65536, 131072, 262144, 524288, 1048576))
+
+
+app.register_blueprint(diagnostics.admin)
+
+
+def register_diagnostic_structures():
+    """Expose the usual memory-growth suspects to /admin/memory/snapshot"""
+    diagnostics.register_structure("audio_cache", lambda: audio_cache)
+    diagnostics.register_structure("response_cache", lambda: response_cache)
+    diagnostics.register_structure("call_languages", lambda: call_languages)
+    diagnostics.register_structure("tenants", tenant_registry.loaded)
+    diagnostics.register_structure("webhook_replays", lambda: webhook_replays)
+    diagnostics.register_structure("endpoints", lambda: endpoints)
+    for name, value in vars(agent).items():
+        if isinstance(value, dict):
+            diagnostics.register_structure(f"agent.{name}", lambda name=name: getattr(agent, name))
+
+register_diagnostic_structures()
+
+
+@app.before_request
+def start_request_profile():
+    """Profile this request if an admin cProfile capture is running"""
+    diagnostics.start_request_profile()
+
+
+@app.teardown_request
+def finish_request_profile(exc):
+    diagnostics.finish_request_profile()
+
+
+@app.before_request
+def start_request_trace():
+    """Start a trace for Twilio webhooks, keyed by CallSid"""
+    if request.endpoint not in TRACED_ENDPOINTS:
+        return
+    # First access to request.form parses the POST body
+    start = time.perf_counter()
+    call_sid = request.form.get("CallSid")
+    form_seconds = time.perf_counter() - start
+    tracing.start_trace(call_sid, request.path)
+    tracing.record_span("form_parse", form_seconds)
+
+
+def log_trace(trace):
+    if trace is not None:
+        trace_log.info("turn_trace", endpoint=trace.endpoint, total_ms=round(trace.elapsed() * 1000, 1), spans={name: round(seconds * 1000, 2) for name, seconds in trace.spans})
+
+
+@app.after_request
+def finish_request_trace(response):
+    """Record end-to-end time for traced webhooks"""
+    trace = tracing.finish_trace(response.status_code)
+    if trace is not None:
+        response.headers["X-Trace-Id"] = trace.trace_id
+    log_trace(trace)
+    if recorder is not None and request.endpoint in RECORDED_ENDPOINTS:
+        record_webhook(response, trace)
+    return response
+
+
+def record_webhook(response, trace):
+    """Append this webhook, and what the agent made of it, to the call's transcript"""
+    call_sid = request.form.get("CallSid")
+    if not recorder.wants(call_sid):
+        return
+    try:
+        record = {"at": round(time.time(), 3), "path": request.full_path.rstrip("?"), "status": response.status_code}
+        token = request.headers.get("I-Twilio-Idempotency-Token")
+        if token:
+            record["token"] = token
+        room = ""
+        if request.endpoint in ("handle_incoming_call", "process_speech"):
+            # Not for /status: the call has been handed back, and looking its tenant up again would re-register it
+            call_agent = tenant_for(call_sid).agent
+            room = call_agent.room_number(call_sid)
+            record["lang"] = call_languages.get(call_sid)
+            record["state"] = call_agent.dialogue_state(call_sid).value
+            placed = g.get("placed_order")
+            record["order"] = call_recorder.order_snapshot(placed if placed is not None else call_agent.orders.get(call_sid))
+            record["placed"] = placed is not None
+        record["form"] = call_recorder.form_fields(request.form, room)
+        if "agent_reply" in g:
+            record["reply"] = call_recorder.redact(g.agent_reply, room)
+        if trace is not None:
+            record["ms"] = round(trace.elapsed() * 1000, 2)
+            record["spans"] = [[name, round(seconds * 1000, 2)] for name, seconds in trace.spans]
+        recorder.write(call_sid, record)
+    except Exception as e:
+        # A transcript is never worth failing the call over
+        log.warning("call_record_failed", error=str(e))
+
+
+@app.route("/metrics", methods=["GET"])
+def metrics_endpoint():
+    """Prometheus metrics"""
+    ACTIVE_CALLS.set(sum(len(tenant.agent.conversation_history) for tenant in tenant_registry.loaded()))
+    AUDIO_CACHE_ENTRIES.set(len(audio_cache))
+    AUDIO_MEMORY_BYTES.set(audio_memory_bytes)
+    return Response(metrics.render_prometheus(), mimetype="text/plain; version=0.0.4")
+
+
+def discard_audio(audio_id):
+    """Drop a clip from the cache, freeing its memory or temp file"""
+    global audio_memory_bytes
+    metadata = audio_cache.pop(audio_id, None)
+    if metadata is None:
+        return
+    if response_cache.get(metadata.get("text_hash")) == audio_id:
+        response_cache.pop(metadata["text_hash"], None)
+    if metadata.get("data") is not None:
+        with audio_memory_lock:
+            audio_memory_bytes -= metadata["size"]
+    elif metadata.get("path"):
+        try:
+            os.remove(metadata["path"])
+        except FileNotFoundError:
+            pass
+
 
 def cleanup_old_audio():
-    """Remove audio files older than 1 hour"""
+    """Remove audio clips older than 1 hour"""
     try:
-        current_time = datetime.now()
-        to_remove = []
-        for audio_id, metadata in audio_cache.items():
-            if current_time - metadata["created"] > timedelta(hours=1):
-                try:
-                    if os.path.exists(metadata["path"]):
-                        os.remove(metadata["path"])
-                    to_remove.append(audio_id)
-                except Exception as e:
-                    print(f"Error removing audio file {audio_id}: {e}")
-        
-        for audio_id in to_remove:
-            del audio_cache[audio_id]
-            # Also remove from response cache if present
-            if metadata.get("text_hash") in response_cache:
-                del response_cache[metadata["text_hash"]]
+        cutoff = datetime.now() - timedelta(hours=1)
+        expired = [audio_id for audio_id, metadata in list(audio_cache.items()) if metadata["created"] < cutoff]
+        for audio_id in expired:
+            try:
+                discard_audio(audio_id)
+            except Exception as e:
+                audio_log.warning("audio_remove_failed", audio_id=audio_id, error=str(e))
     except Exception as e:
-        print(f"Error in cleanup: {e}")
+        audio_log.error("audio_cleanup_failed", error=str(e))
+
+
+def store_audio(audio_content, text_hash, profile):
+    """Cache a synthesized clip - in memory if small enough, otherwise in a temp file"""
+    global audio_memory_bytes
+    size = len(audio_content)
+    in_memory = False
+    if size <= AUDIO_MEMORY_MAX_BYTES:
+        with audio_memory_lock:
+            if audio_memory_bytes + size <= AUDIO_MEMORY_BUDGET_BYTES:
+                audio_memory_bytes += size
+                in_memory = True
+
+    path = None
+    if not in_memory:
+        temp_file = tempfile.NamedTemporaryFile(delete=False, suffix=profile.suffix, dir=tempfile.gettempdir())
+        temp_file.write(audio_content)
+        temp_file.close()
+        path = temp_file.name
+
+    audio_id = str(uuid.uuid4())
+    audio_cache[audio_id] = {
+        "path": path,
+        "data": audio_content if in_memory else None,
+        "size": size,
+        # Strong validator: the clip's bytes never change for a given audio_id
+        "etag": hashlib.sha256(audio_content).hexdigest(),
+        "mimetype": profile.mimetype,
+        "created": datetime.now(),
+        "text_hash": text_hash,
+    }
+    response_cache[text_hash] = audio_id
+    return audio_id
 
 def get_version_timestamp():
     """Get last code edit time formatted as '2:57 PM'"""
@@ -194,7 +374,7 @@ def get_version_timestamp():
         time_str = time_str.replace(' AM', ' am').replace(' PM', ' pm')
         return time_str
     except Exception as e:
-        print(f"Error getting version timestamp: {e}")
+        log.warning("version_timestamp_failed", error=str(e))
         # Fallback to current time
         try:
             et_tz = pytz.timezone('America/New_York')
@@ -205,6 +385,9 @@ def get_version_timestamp():
             return "unknown"
         return datetime.utcnow().strftime("%y-%m-%d-%H%M")
 
+# Code version shown in the greeting - fixed for the life of the process
+VERSION = get_version_timestamp()
+
 def get_base_url():
     """Get the base URL for the service - prefer environment variable, fallback to request"""
     # Check environment variable first (set in Render)
@@ -220,230 +403,415 @@ def get_base_url():
     # Last resort - use the known Render URL
     return "https://four-seasons-room-service-1.onrender.com"
 
-def generate_audio_with_gcp(text, lang_code, base_url):
-    """Generate high-quality audio using Google Cloud TTS - excellent Farsi support"""
-    if not gcp_tts_client:
-        print("Google Cloud TTS client not available")
+def audio_text_hash(text, lang_code):
+    """Cache key for a clip: text, language and output profile"""
+    return hashlib.md5(f"{text}_{lang_code}_{audio_profile.name}".encode()).hexdigest()
+
+
+def cached_audio_id(text_hash):
+    """audio_id of an already synthesized clip, refreshing its age, or None"""
+    cached_id = response_cache.get(text_hash)
+    metadata = audio_cache.get(cached_id) if cached_id else None
+    if metadata is None:
         return None
-    
+    metadata["created"] = datetime.now()
+    return cached_id
+
+
+def voice_params(lang_code):
+    """Voice for a language - its configured voice unless GCP has told us it doesn't exist"""
+    voice_name, language_code = get_language_profile(lang_code).gcp_voice
+    if voice_name and lang_code not in default_voice_languages:
+        return texttospeech.VoiceSelectionParams(language_code=language_code, name=voice_name)
+    return texttospeech.VoiceSelectionParams(language_code=language_code)
+
+
+def synthesize_audio(text, lang_code, text_hash):
+    """Synthesize and cache a clip (runs on the TTS pool); returns its audio_id or None"""
     try:
-        # Create hash for caching
-        import hashlib
-        text_hash = hashlib.md5(f"{text}_{lang_code}".encode()).hexdigest()
-        
-        # Check cache first
-        if text_hash in response_cache:
-            cached_id = response_cache[text_hash]
-            if cached_id in audio_cache:
-                # Update access time
-                audio_cache[cached_id]["created"] = datetime.now()
-                print(f"Using cached audio for text hash: {text_hash[:8]}...")
-                return cached_id
-        
-        print(f"Generating new audio with Google Cloud TTS for language {lang_code}, text length: {len(text)}")
-        voice_name, language_code = get_gcp_tts_voice(lang_code)
-        
-        # Configure the synthesis input
+        synthesis_start = time.perf_counter()
+        tts_log.debug("tts_synthesize", lang=lang_code, text_chars=len(text))
         synthesis_input = texttospeech.SynthesisInput(text=text)
+        # Encoded for the phone leg (see audio_profiles.py)
+        audio_config = audio_profile.audio_config()
         
-        # Select the type of audio file you want returned - optimized for natural voice
-        audio_config = texttospeech.AudioConfig(
-            audio_encoding=texttospeech.AudioEncoding.MP3,
-            speaking_rate=1.0,  # Natural speaking rate (was 0.95 - too slow/robotic)
-            pitch=2.0,  # Slightly higher pitch for more natural, friendly voice (was 0.0)
-            volume_gain_db=2.0,  # Slightly louder for clarity
-        )
-        
-        # Build the voice request - only include name if specified
-        if voice_name:
-            voice = texttospeech.VoiceSelectionParams(
-                language_code=language_code,
-                name=voice_name,
-            )
-        else:
-            # Use default voice for language
-            voice = texttospeech.VoiceSelectionParams(
-                language_code=language_code,
-            )
-        
-        # Perform the text-to-speech request
-        try:
-            response = gcp_tts_client.synthesize_speech(
-                input=synthesis_input,
-                voice=voice,
-                audio_config=audio_config
-            )
-        except Exception as voice_error:
-            # If specific voice fails, try without voice name (use default for language)
-            if "does not exist" in str(voice_error) or "Voice" in str(voice_error):
-                print(f"Voice {voice_name} not found, trying with language code only")
-                voice = texttospeech.VoiceSelectionParams(
-                    language_code=language_code,
-                )
+        # Over the TTS admission limit: the turn falls back to <Say>, and the next request retries
+        with admission.tts.admit() as admitted:
+            if not admitted:
+                return None
+            try:
                 response = gcp_tts_client.synthesize_speech(
-                    input=synthesis_input,
-                    voice=voice,
-                    audio_config=audio_config
-                )
-            else:
-                raise  # Re-raise if it's a different error
-        
-        # Save to temporary file
-        audio_id = str(uuid.uuid4())
-        temp_file = tempfile.NamedTemporaryFile(delete=False, suffix='.mp3', dir=tempfile.gettempdir())
-        temp_file.write(response.audio_content)
-        temp_file.close()
-        
-        file_size = os.path.getsize(temp_file.name)
-        print(f"Generated audio file: {audio_id}, size: {file_size} bytes, path: {temp_file.name}")
+                    input=synthesis_input, voice=voice_params(lang_code), audio_config=audio_config)
+            except Exception as voice_error:
+                # If the configured voice doesn't exist, remember that and use the language's default voice
+                if lang_code not in default_voice_languages and (
+                        "does not exist" in str(voice_error) or "Voice" in str(voice_error)):
+                    default_voice_languages.add(lang_code)
+                    tts_log.warning("tts_voice_not_found", voice=get_language_profile(lang_code).gcp_voice[0], lang=lang_code)
+                    response = gcp_tts_client.synthesize_speech(
+                        input=synthesis_input, voice=voice_params(lang_code), audio_config=audio_config)
+                else:
+                    raise  # Re-raise if it's a different error
         
-        # Verify file is not empty
-        if file_size == 0:
-            print(f"ERROR: Generated audio file is empty for {audio_id}")
-            os.remove(temp_file.name)
+        # Verify audio is not empty
+        if not response.audio_content:
+            tts_log.error("tts_empty_audio", lang=lang_code)
             return None
         
-        # Store in cache with metadata
-        audio_cache[audio_id] = {
-            "path": temp_file.name,
-            "created": datetime.now(),
-            "text_hash": text_hash
-        }
-        response_cache[text_hash] = audio_id
-        
-        # Cleanup old files in background (non-blocking)
-        threading.Thread(target=cleanup_old_audio, daemon=True).start()
+        audio_id = store_audio(response.audio_content, text_hash, audio_profile)
+        AUDIO_SYNTHESIZED_BYTES.observe(len(response.audio_content))
+        tts_log.info("tts_generated", audio_id=audio_id, bytes=len(response.audio_content), profile=audio_profile.name)
+        tracing.record_span("tts_synthesis", time.perf_counter() - synthesis_start)
         
+        # Already off the request path, so clean up old clips here
+        cleanup_old_audio()
         return audio_id
     except Exception as e:
-        print(f"Error generating Google Cloud TTS audio: {e}")
-        import traceback
-        traceback.print_exc()
+        tts_log.exception("tts_failed", lang=lang_code, error=str(e))
+        return None
+
+
+def synthesis_future(text, lang_code, text_hash):
+    """Future for a clip's synthesis, shared by every request that needs the same clip"""
+    with tts_in_flight_lock:
+        future = tts_in_flight.get(text_hash)
+        if future is None:
+            future = tts_executor.submit(synthesize_audio, text, lang_code, text_hash)
+            tts_in_flight[text_hash] = future
+            future.add_done_callback(lambda _: tts_in_flight.pop(text_hash, None))
+        return future
+
+
+def turn_tts_deadline():
+    """Monotonic time by which this turn's audio must be ready, shared by all clips in the turn"""
+    if not has_request_context():
+        return time.monotonic() + TTS_DEADLINE_SECONDS
+    if "tts_deadline" not in g:
+        g.tts_deadline = time.monotonic() + TTS_DEADLINE_SECONDS
+    return g.tts_deadline
+
+
+def generate_audio_with_gcp(text, lang_code, base_url, deadline=None):
+    """
+    Audio for text from Google Cloud TTS - excellent Farsi support
+    Returns None if the clip isn't ready by the deadline; synthesis then carries on in the
+    background so the next request for the same text is a cache hit.
+    """
+    if not gcp_tts_client:
+        tts_log.debug("gcp_tts_unavailable")
+        return None
+    
+    try:
+        text_hash = audio_text_hash(text, lang_code)
+        
+        # Check cache first
+        lookup_start = time.perf_counter()
+        cached_id = cached_audio_id(text_hash)
+        if cached_id:
+            tracing.record_span("tts_cache_hit", time.perf_counter() - lookup_start)
+            tts_cache_log.info("tts_cache_hit", text_hash=text_hash[:8])
+            return cached_id
+        
+        future = synthesis_future(text, lang_code, text_hash)
+        remaining = max(0.0, (deadline or turn_tts_deadline()) - time.monotonic())
+        wait_start = time.perf_counter()
+        try:
+            return future.result(timeout=remaining)
+        except FutureTimeoutError:
+            TTS_DEADLINE_MISSES.inc()
+            tts_log.info("tts_deadline_missed", lang=lang_code, waited_ms=round((time.perf_counter() - wait_start) * 1000, 1))
+            return None
+        finally:
+            tracing.record_span("tts_wait", time.perf_counter() - wait_start)
+    except Exception as e:
+        tts_log.exception("tts_failed", lang=lang_code, error=str(e))
         return None
 
 @app.route("/audio/<audio_id>")
 def serve_audio(audio_id):
-    """Serve generated audio file with proper headers"""
-    print(f"Audio request received for ID: {audio_id}")
-    if audio_id in audio_cache:
-        metadata = audio_cache[audio_id]
-        file_path = metadata.get("path") if isinstance(metadata, dict) else metadata
-        if file_path and os.path.exists(file_path):
-            file_size = os.path.getsize(file_path)
-            print(f"Serving audio file: {audio_id}, size: {file_size} bytes")
-            if file_size == 0:
-                print(f"ERROR: Audio file is empty: {audio_id}")
-                return "Audio file is empty", 500
-            response = send_file(file_path, mimetype='audio/mpeg')
-            # Add cache headers for better performance
-            response.headers['Cache-Control'] = 'public, max-age=3600'
-            response.headers['Content-Type'] = 'audio/mpeg'
-            response.headers['Content-Length'] = str(file_size)
-            return response
-        else:
-            print(f"Audio file not found on disk: {file_path}")
+    """Serve generated audio with a strong ETag, 304s and Range support"""
+    metadata = audio_cache.get(audio_id)
+    if metadata is None:
+        audio_log.warning("audio_not_cached", audio_id=audio_id, cache_size=len(audio_cache))
+        return "Audio not found", 404
+    
+    data = metadata.get("data")
+    if data is not None:
+        response = Response(data, mimetype=metadata["mimetype"])
+        response.set_etag(metadata["etag"])
+        response.cache_control.public = True
+        response.cache_control.max_age = 3600
+        response.make_conditional(request, accept_ranges=True, complete_length=len(data))
+        source = "memory"
     else:
-        print(f"Audio ID not in cache: {audio_id}, cache size: {len(audio_cache)}")
-    return "Audio not found", 404
+        try:
+            response = send_file(metadata["path"], mimetype=metadata["mimetype"], conditional=True,
+                                 etag=metadata["etag"], max_age=3600)
+        except FileNotFoundError:
+            audio_log.warning("audio_missing_on_disk", audio_id=audio_id)
+            return "Audio not found", 404
+        source = "disk"
+    
+    sent = 0 if response.status_code == 304 else (response.content_length or 0)
+    AUDIO_BYTES_SERVED.inc(sent, source=source)
+    audio_fetch_log.info("audio_served", audio_id=audio_id, status=response.status_code, bytes=sent, source=source)
+    return response
+
+def note_spoken(text, lang_code):
+    """Remember what this turn spoke, to score prefetch predictions"""
+    if has_request_context():
+        g.setdefault("spoken", set()).add((text, lang_code))
+
 
 def say_with_gcp_tts(response, text, lang_code, base_url):
     """Use Google Cloud TTS for superior voice quality and excellent Farsi support"""
     if not text or not text.strip():
-        print("Empty text provided to TTS")
+        tts_log.warning("tts_empty_text")
         return False
+    note_spoken(text, lang_code)
         
     if gcp_tts_client:
         try:
-            print(f"Attempting Google Cloud TTS for language {lang_code}, text preview: {text[:50]}...")
             audio_id = generate_audio_with_gcp(text, lang_code, base_url)
             if audio_id:
                 # Use absolute URL for reliable playback
                 audio_url = f"{base_url}/audio/{audio_id}"
-                print(f"Successfully generated audio, URL: {audio_url}")
                 response.play(audio_url)
                 return True
             else:
-                print("Google Cloud TTS returned None, falling back to Twilio")
+                tts_log.warning("tts_fallback", lang=lang_code, reason="no_audio")
         except Exception as e:
-            print(f"Google Cloud TTS failed with exception, falling back to Twilio: {e}")
-            import traceback
-            traceback.print_exc()
+            tts_log.exception("tts_fallback", lang=lang_code, reason="exception", error=str(e))
     
     # Fallback to Twilio's Say if Google Cloud TTS fails
     try:
-        print(f"Using Twilio TTS fallback for language {lang_code}")
-        voice = get_voice_for_language(lang_code)
-        twilio_lang = get_twilio_language_code(lang_code)
-        response.say(text, voice=voice, language=twilio_lang)
+        profile = get_language_profile(lang_code)
+        response.say(text, voice=profile.twilio_voice, language=profile.twilio_language)
         return False
     except Exception as e:
-        print(f"Twilio TTS also failed: {e}")
+        tts_log.error("twilio_say_failed", lang=lang_code, error=str(e))
         # Last resort: just say it in English
         response.say(text, voice="alice", language="en-US")
         return False
 
+def play_if_cached(response, text, lang_code, base_url):
+    """
+    Play a clip that is already synthesized (e.g. prefetched); never waits on synthesis.
+    Not noted as spoken: callers note the turn's reply themselves, not fallback prompts.
+    """
+    audio_id = cached_audio_id(audio_text_hash(text, lang_code)) if gcp_tts_client else None
+    if not audio_id:
+        return False
+    response.play(f"{base_url}/audio/{audio_id}")
+    return True
+
+
+def prefetch_audio(text, lang_code):
+    return synthesis_future(text, lang_code, audio_text_hash(text, lang_code))
+
+
+def audio_is_cached(text, lang_code):
+    return response_cache.get(audio_text_hash(text, lang_code)) in audio_cache
+
+
+# Synthesizes the likely next prompts in the background, at most PREFETCH_MAX_IN_FLIGHT at a time
+prefetcher = Prefetcher(prefetch_audio, audio_is_cached, int(os.getenv("PREFETCH_MAX_IN_FLIGHT", "2")))
+
+
+def prefetch_next_turn(call_sid, lang_code, hanging_up=False):
+    """Score last turn's predictions, then start on the prompts the next turn will likely need"""
+    with tracing.span("prefetch"):
+        prefetcher.score(call_sid, g.get("spoken", set()))
+        if hanging_up or not gcp_tts_client:
+            return
+        profile = get_language_profile(lang_code)
+        call_agent = tenant_for(call_sid).agent
+        state = call_agent.dialogue_state(call_sid)
+        confirmation = ""
+        if state is DialogueState.AWAITING_ROOM:
+            confirmation = confirmation_text(profile, call_agent.order_total_cents(call_sid))
+        texts = predict_next_prompts(profile, state, confirmation)
+        prefetcher.prefetch(call_sid, lang_code, texts)
+
+
+def twiml_response(response):
+    """Serialize a TwiML response (or pre-rendered TwiML string) for returning from a Flask view"""
+    with tracing.span("twiml_serialize"):
+        body = str(response)
+    return body, 200, {"Content-Type": "text/xml"}
+
+
+# Responses to recent webhooks, so Twilio's retries and duplicate posts are answered without redoing the turn
+webhook_replays = idempotency.ReplayCache()
+
+# Each call's speech pauses, for the speechTimeout of its next Gather
+endpoints = endpointing.EndpointTracker()
+
+# Gathers in a row that may hear nothing before the call is ended
+NO_INPUT_LIMIT = 3
+
+
+def replay_safe(view):
+    """Answer repeated deliveries of a webhook with the first delivery's TwiML"""
+    @functools.wraps(view)
+    def handle():
+        call_sid = request.form.get("CallSid")
+        key = idempotency.request_key(call_sid, request.args.get("turn"), request.form.get("SpeechResult", "").strip(),
+                                      request.headers.get("I-Twilio-Idempotency-Token"))
+        if key is None:
+            return view()
+        claim = webhook_replays.claim(key, call_sid)
+        if not claim.owner:
+            return claim.response if claim.response is not None else still_working(call_sid)
+        try:
+            result = view()
+        except Exception:
+            webhook_replays.abandon(key)
+            raise
+        webhook_replays.complete(key, result)
+        return result
+    return handle
+
+
+def still_working(call_sid):
+    """The original of a duplicate is still running after the wait: keep listening rather than redo it"""
+    lang_code = call_languages.get(call_sid, "en-US")
+    response = TwimlResponse()
+    response.pause(length=1)
+    response.append(gather_for(lang_code, hint_state(call_sid), catalog=tenant_for(call_sid).agent.catalog(), call_sid=call_sid))
+    return twiml_response(response)
+
+
 @app.route("/voice", methods=["POST"])
+@replay_safe
 def handle_incoming_call():
     """
     Handle incoming phone call
     Twilio will POST to this endpoint when a call comes in
     """
     call_sid = request.form.get("CallSid")
+    tenant = tenant_registry.start_call(call_sid, request.form.get("To"))
     
     # Default to English, but will detect from user's speech
     default_lang = "en-US"
     call_languages[call_sid] = default_lang
     
-    response = VoiceResponse()
-    
-    # Get version timestamp for this call
-    version = get_version_timestamp()
+    response = TwimlResponse()
+    base_url = get_base_url()
     
-    # Initial greeting in multiple languages with version info
-    greetings = {
-        "en-US": f"Hello, this is Nasrin from Four Seasons room service. Last updated at {version}. I speak multiple languages—say the language name to switch. How can I help you today?",
-        "es-ES": f"Saludos desde Four Seasons. Soy Nasrin, su conserje dedicada de servicio a la habitación. Actualizado a las {version}. ¿Cómo puedo elevar su experiencia con un momento gastronómico delicioso hoy?",
-        "fr-FR": f"Salutations du Four Seasons. Je suis Nasrin, votre concierge dédiée au service en chambre. Mis à jour à {version}. Comment puis-je rehausser votre expérience avec un moment de dégustation délicieux aujourd'hui?",
-        "de-DE": f"Grüße vom Four Seasons. Ich bin Nasrin, Ihre persönliche Concierge für den Zimmerservice. Aktualisiert um {version}. Wie kann ich Ihr Erlebnis heute mit einem köstlichen kulinarischen Moment bereichern?",
-        "it-IT": f"Saluti dal Four Seasons. Sono Nasrin, la vostra concierge dedicata al servizio in camera. Aggiornato alle {version}. Come posso elevare la vostra esperienza con un delizioso momento gastronomico oggi?",
-        "ja-JP": f"フォーシーズンズよりご挨拶申し上げます。ルームサービスの専属コンシェルジュ、ナスリンでございます。{version}に更新されました。本日、素晴らしい食事のひとときでお客様の体験をより豊かにするには、どのようにお手伝いできるでしょうか？",
-        "zh-CN": f"来自四季酒店的问候。我是纳斯林，您专属的客房服务礼宾。更新于{version}。今天，我如何通过美妙的用餐时刻来提升您的体验？",
-        "ar-SA": f"تحيات من فور سيزونز. أنا نسرين، كونسيرج خدمة الغرف المخصصة لك. تم التحديث في {version}. كيف يمكنني رفع تجربتك مع لحظة طعام لذيذة اليوم؟",
-        "fa-IR": f"درود از فور سیزونز. من نسرین هستم، کونسیرژ اختصاصی سرویس اتاق شما. به‌روزرسانی شده در {version}. امروز چگونه می‌توانم تجربه شما را با یک لحظه لذیذ غذایی ارتقا دهم؟",
-        "hi-IN": f"फोर सीज़न्स से अभिवादन। मैं नसरीन हूं, आपकी समर्पित रूम सर्विस कॉन्सिएर्ज। {version} पर अपडेट किया गया। आज मैं एक स्वादिष्ट भोजन के क्षण के साथ आपके अनुभव को कैसे बढ़ा सकती हूं?",
-        "ru-RU": f"Приветствие от Four Seasons. Я Насрин, ваш персональный консьерж службы номеров. Обновлено в {version}. Как я могу улучшить ваше впечатление сегодня с помощью восхитительного кулинарного момента?",
-        "pt-BR": f"Saudações do Four Seasons. Sou Nasrin, sua concierge dedicada de serviço de quarto. Atualizado às {version}. Como posso elevar sua experiência com um momento gastronômico delicioso hoje?",
-    }
+    if media_stream.call_mode() == "stream":
+        # Audio both ways over a WebSocket; the greeting is streamed once it connects
+        response.append(twiml.stream_fragment(stream_url(base_url)))
+        response.hangup()
+        return twiml_response(response)
     
-    # Start with greeting using OpenAI TTS for superior voice quality
-    base_url = get_base_url()
-    greeting_text = greetings.get(default_lang, greetings["en-US"])
+    # Start with greeting using Google Cloud TTS for superior voice quality
+    greeting_text = greeting_for(tenant, default_lang)
     say_with_gcp_tts(response, greeting_text, default_lang, base_url)
     
-    # Gather user input - support multiple languages
-    # Twilio will auto-detect language, but we can specify multiple
-    gather = Gather(
-        input="speech",
-        action="/process-speech",
-        method="POST",
-        speech_timeout="auto",
-        language="auto",  # Auto-detect language
-        hints="menu, order, price, burger, salad, pasta, dessert, chicken, salmon, beef, menú, orden, precio, menù, ordine, prezzo, メニュー, 注文, 価格, 菜单, 订单, 价格, قائمة, طلب, سعر, منو, سفارش, قیمت, فهرست, غذا, نوشیدنی, صبحانه, ناهار, شام, پیش غذا, دسر, نوشابه, آب, چای, قهوه"
-    )
-    response.append(gather)
+    # Gather user input in any language, with a prompt and another listen if there is no input
+    response.append(gather_for(default_lang, speech_hints.GREETING, catalog=tenant.agent.catalog(), call_sid=call_sid))
+    append_no_input_prompt(response, speech_hints.GREETING, default_lang, base_url)
     
-    # Fallback if no input
-    response.say(
-        "I didn't catch that. Please tell me how I can help you with our menu.",
-        voice=get_voice_for_language(default_lang),
-        language=default_lang
-    )
-    response.redirect("/voice")
+    return twiml_response(response)
+
+
+# Speech hints per language and conversation state, built once per menu version
+hint_tables = CatalogCache(speech_hints.HintTable)
+
+# Phrase index over every language keyword, guarded against dish names on the menu in service
+switch_detectors = CatalogCache(lambda catalog: LanguageSwitchDetector(LANGUAGE_SWITCH_KEYWORDS, menu_item_names(catalog)))
+
+# Serve the menu from MENU_PATH, reloading it when the files change
+menu_watcher = menu_source.watch_from_env()
+
+
+def hint_state(call_sid):
+    """Conversation state used to pick the next Gather's speech hints"""
+    if tenant_for(call_sid).agent.dialogue_state(call_sid) is DialogueState.AWAITING_ROOM:
+        return speech_hints.AWAITING_ROOM
+    return speech_hints.ORDERING
+
+
+def detect_language_switch(speech_lower, catalog=None):
+    """Return the language code the guest asked to switch to, or None"""
+    return switch_detectors.get(catalog if catalog is not None else get_catalog()).detect(speech_lower)
+
+
+# Ask Twilio for partial transcripts and speculate on them (PARTIAL_SPEECH_RESULTS)
+partial_callback = PARTIAL_CALLBACK if partial_results_enabled() else ""
+
+
+def gather_for(lang_code, state=speech_hints.ORDERING, gather_language="auto", catalog=None, call_sid=None):
+    """Speech <Gather> with the hints for this language, state and menu (numbered and timed for the call's next turn)"""
+    hints = hint_tables.get(catalog if catalog is not None else get_catalog())
+    if not call_sid:
+        return hints.gather(lang_code, state, gather_language, partial_callback=partial_callback)
+    gather = hints.gather(lang_code, state, gather_language, partial_callback=partial_callback,
+                          speech_timeout=endpoints.speech_timeout(call_sid, lang_code, state))
+    return twiml.with_turn(gather, webhook_replays.next_turn(call_sid))
+
+
+def append_no_input_prompt(response, state, lang_code, base_url):
+    """What a Gather that heard nothing falls through to: the state's prompt, then another listen"""
+    if state == speech_hints.GREETING:
+        response.append(GREETING_NO_INPUT_TAIL)
+        return
+    profile = get_language_profile(lang_code)
+    if state == speech_hints.AWAITING_ROOM:
+        if not play_if_cached(response, profile.ask_room, lang_code, base_url):
+            response.say(profile.ask_room, voice=profile.twilio_voice, language=profile.twilio_language)
+        response.redirect(NO_INPUT_PATH)
+    elif play_if_cached(response, profile.anything_else, lang_code, base_url):
+        response.redirect(NO_INPUT_PATH)
+    else:
+        response.append(profile.anything_else_tail)
+
+
+def apply_detected_language(call_sid, detected_lang, speech=""):
+    """
+    The language of this turn, kept for the call: the language the guest's words are in, else the
+    recognizer's language unless one was chosen explicitly
+    """
+    current_lang = call_languages.get(call_sid, "en-US")
+    with tracing.span("language_id"):
+        spoken_lang = language_id.identify(speech, current_lang)
+    if spoken_lang is not None:
+        if spoken_lang != current_lang:
+            call_languages[call_sid] = spoken_lang
+            call_log.info("language_identified", lang=spoken_lang, previous=current_lang)
+        return spoken_lang
     
-    return str(response), 200, {"Content-Type": "text/xml"}
+    if detected_lang:
+        # Only update if we haven't explicitly set a language
+        if call_sid not in call_languages or call_languages[call_sid] == "en-US":
+            call_languages[call_sid] = detected_lang
+            call_log.info("language_detected", lang=detected_lang)
+    
+    # Use stored language or default to English
+    return call_languages.get(call_sid, "en-US")
 
 
+@app.route(PARTIAL_CALLBACK, methods=["POST"])
+def partial_speech():
+    """
+    Partial transcript while the guest is still talking
+    Stable partials get the turn's language check and parse done ahead of the final result
+    """
+    call_sid = request.form.get("CallSid")
+    text = request.form.get("UnstableSpeechResult", "")
+    try:
+        stability = float(request.form.get("Stability", 0))
+        sequence = int(request.form.get("SequenceNumber", 0))
+    except ValueError:
+        return "", 400
+    endpoints.on_partial(call_sid)
+    with tracing.span("speculate"):
+        tenant_for(call_sid).speculations.on_partial(call_sid, text, stability, sequence)
+    return "", 204
+
 @app.route("/process-speech", methods=["POST"])
+@replay_safe
 def process_speech():
     """
     Process speech input from user
@@ -451,209 +819,184 @@ def process_speech():
     """
     call_sid = request.form.get("CallSid")
     speech_result = request.form.get("SpeechResult", "").strip()
+    if speech_result:
+        endpoints.on_final(call_sid, call_languages.get(call_sid, "en-US"))
+    tenant = tenant_for(call_sid)
+    agent = tenant.agent
+    catalog = agent.catalog()
     
     # Log what Twilio transcribed
-    print(f"Twilio transcribed for call {call_sid}: '{speech_result}'")
-    
-    # Check for explicit language change requests FIRST, before any other processing
-    language_switch_keywords = {
-        "farsi": "fa-IR", "persian": "fa-IR", "فارسی": "fa-IR",
-        "far see": "fa-IR", "farcy": "fa-IR", "farsy": "fa-IR",  # Common mis-transcriptions
-        "english": "en-US", "انگلیسی": "en-US",
-        "spanish": "es-ES", "español": "es-ES",
-        "french": "fr-FR", "français": "fr-FR",
-        "german": "de-DE", "deutsch": "de-DE",
-        "italian": "it-IT", "italiano": "it-IT",
-        "japanese": "ja-JP", "日本語": "ja-JP",
-        "chinese": "zh-CN", "中文": "zh-CN",
-        "arabic": "ar-SA", "عربي": "ar-SA",
-        "hindi": "hi-IN", "हिन्दी": "hi-IN",
-        "russian": "ru-RU", "русский": "ru-RU",
-        "portuguese": "pt-BR", "português": "pt-BR",
-    }
+    call_log.debug("speech_received", speech=speech_result)
     
     speech_lower = speech_result.lower().strip() if speech_result else ""
     
-    # Check if user is requesting a language change - be more lenient
-    # First, check if message is very short and matches a language keyword exactly
-    if len(speech_lower.split()) <= 2:  # Short message (1-2 words)
-        for keyword, lang_code in language_switch_keywords.items():
-            if keyword in speech_lower and (speech_lower == keyword or speech_lower.startswith(keyword) or speech_lower.endswith(keyword)):
-                call_languages[call_sid] = lang_code
-                print(f"User requested language switch to {lang_code} for call {call_sid}. Original message: '{speech_result}'")
-                # Acknowledge language change
-                response = VoiceResponse()
-                lang_confirmations = {
-                    "fa-IR": "بله، حالا به فارسی صحبت می‌کنم. چطور می‌توانم به شما کمک کنم؟",
-                    "en-US": "Of course, I'll speak English. How may I assist you?",
-                    "es-ES": "Por supuesto, hablaré en español. ¿Cómo puedo ayudarle?",
-                    "fr-FR": "Bien sûr, je parlerai en français. Comment puis-je vous aider?",
-                    "de-DE": "Natürlich, ich werde Deutsch sprechen. Wie kann ich Ihnen helfen?",
-                    "it-IT": "Certamente, parlerò in italiano. Come posso aiutarti?",
-                    "ja-JP": "もちろん、日本語で話します。どのようにお手伝いできますか？",
-                    "zh-CN": "当然，我会说中文。我能为您做些什么？",
-                    "ar-SA": "بالطبع، سأتحدث بالعربية. كيف يمكنني مساعدتك؟",
-                    "hi-IN": "बिल्कुल, मैं हिंदी में बोलूंगी। मैं आपकी कैसे मदद कर सकती हूं?",
-                    "ru-RU": "Конечно, я буду говорить по-русски. Чем могу помочь?",
-                    "pt-BR": "Claro, falarei em português. Como posso ajudá-lo?",
-                }
-                current_lang = lang_code
-                base_url = get_base_url()
-                confirmation_text = lang_confirmations.get(lang_code, lang_confirmations["en-US"])
-                say_with_gcp_tts(response, confirmation_text, current_lang, base_url)
-                gather = Gather(
-                    input="speech",
-                    action="/process-speech",
-                    method="POST",
-                    speech_timeout="auto",
-                    language=current_lang  # Use specific language after switch
-                )
-                response.append(gather)
-                return str(response), 200, {"Content-Type": "text/xml"}
+    # Work already done on a matching partial result, if any
+    speculation = tenant.speculations.take(call_sid, speech_result)
     
-    # Check if message contains language switch phrases
-    for keyword, lang_code in language_switch_keywords.items():
-        # Check if the message is just the keyword, or contains language switch phrases
-        is_language_request = (
-            speech_lower == keyword or
-            speech_lower == f"speak {keyword}" or
-            speech_lower == f"use {keyword}" or
-            speech_lower == f"switch to {keyword}" or
-            speech_lower == f"switch {keyword}" or
-            f"speak {keyword}" in speech_lower or
-            f"use {keyword}" in speech_lower or
-            f"switch to {keyword}" in speech_lower
-        )
+    # Check for explicit language change requests FIRST, before any other processing
+    with tracing.span("language_detect"):
+        if speculation is not None:
+            requested_lang = speculation.requested_lang
+        else:
+            requested_lang = detect_language_switch(speech_lower, catalog)
         
-        if is_language_request:
-            call_languages[call_sid] = lang_code
-            print(f"User requested language switch to {lang_code} for call {call_sid}. Original message: '{speech_result}'")
-            # Acknowledge language change
-            response = VoiceResponse()
-            lang_confirmations = {
-                "fa-IR": "بله، حالا به فارسی صحبت می‌کنم. چطور می‌توانم به شما کمک کنم؟",
-                "en-US": "Of course, I'll speak English. How may I assist you?",
-                "es-ES": "Por supuesto, hablaré en español. ¿Cómo puedo ayudarle?",
-                "fr-FR": "Bien sûr, je parlerai en français. Comment puis-je vous aider?",
-                "de-DE": "Natürlich, ich werde Deutsch sprechen. Wie kann ich Ihnen helfen?",
-                "it-IT": "Certamente, parlerò in italiano. Come posso aiutarti?",
-                "ja-JP": "もちろん、日本語で話します。どのようにお手伝いできますか？",
-                "zh-CN": "当然，我会说中文。我能为您做些什么？",
-                "ar-SA": "بالطبع، سأتحدث بالعربية. كيف يمكنني مساعدتك؟",
-                "hi-IN": "बिल्कुल, मैं हिंदी में बोलूंगी। मैं आपकी कैसे मदद कर सकती हूं?",
-                "ru-RU": "Конечно, я буду говорить по-русски. Чем могу помочь?",
-                "pt-BR": "Claro, falarei em português. Como posso ajudá-lo?",
-            }
-            current_lang = lang_code
-            base_url = get_base_url()
-            confirmation_text = lang_confirmations.get(lang_code, lang_confirmations["en-US"])
-            say_with_gcp_tts(response, confirmation_text, current_lang, base_url)
-            gather = Gather(
-                input="speech",
-                action="/process-speech",
-                method="POST",
-                speech_timeout="auto",
-                language=current_lang  # Use specific language after switch
-            )
-            response.append(gather)
-            return str(response), 200, {"Content-Type": "text/xml"}
+        # Detect language from Twilio (if available) or use stored/default
+        detected_lang = request.form.get("SpeechLanguage", None)
     
-    # Detect language from Twilio (if available) or use stored/default
-    detected_lang = request.form.get("SpeechLanguage", None)
-    if detected_lang:
-        # Only update if we haven't explicitly set a language
-        if call_sid not in call_languages or call_languages[call_sid] == "en-US":
-            call_languages[call_sid] = detected_lang
-            print(f"Detected language for call {call_sid}: {detected_lang}")
+    if requested_lang:
+        call_languages[call_sid] = requested_lang
+        call_log.info("language_switch", lang=requested_lang)
+        # Acknowledge language change, then listen in the new language
+        profile = get_language_profile(requested_lang)
+        response = TwimlResponse()
+        say_with_gcp_tts(response, profile.switch_confirmation, requested_lang, get_base_url())
+        response.append(gather_for(requested_lang, gather_language=requested_lang, catalog=catalog, call_sid=call_sid))
+        prefetch_next_turn(call_sid, requested_lang)
+        return twiml_response(response)
     
-    # Use stored language or default to English
-    current_lang = call_languages.get(call_sid, "en-US")
-    voice = get_voice_for_language(current_lang)
+    current_lang = apply_detected_language(call_sid, detected_lang, speech_result)
+    profile = get_language_profile(current_lang)
     
     if not speech_result:
-        response = VoiceResponse()
-        fallback_messages = {
-            "en-US": "I didn't catch that. Could you please repeat?",
-            "es-ES": "No entendí eso. ¿Podría repetir, por favor?",
-            "fr-FR": "Je n'ai pas compris. Pourriez-vous répéter, s'il vous plaît?",
-            "de-DE": "Das habe ich nicht verstanden. Könnten Sie das bitte wiederholen?",
-            "it-IT": "Non ho capito. Potresti ripetere, per favore?",
-            "ja-JP": "聞き取れませんでした。もう一度言っていただけますか？",
-            "zh-CN": "我没听清楚。请您再说一遍好吗？",
-            "ar-SA": "لم أفهم ذلك. هل يمكنك التكرار من فضلك؟",
-            "fa-IR": "متوجه نشدم. لطفاً دوباره بگویید؟",
-            "hi-IN": "मैं समझ नहीं पाया। क्या आप कृपया दोहरा सकते हैं?",
-            "ru-RU": "Я не понял. Не могли бы вы повторить?",
-            "pt-BR": "Não entendi. Você poderia repetir, por favor?",
-        }
-        response.say(
-            fallback_messages.get(current_lang, fallback_messages["en-US"]),
-            voice=voice,
-            language=current_lang
-        )
-        gather = Gather(
-            input="speech",
-            action="/process-speech",
-            method="POST",
-            speech_timeout="auto",
-            language="auto"  # Continue auto-detecting
-        )
-        response.append(gather)
-        return str(response), 200, {"Content-Type": "text/xml"}
+        # Ask them to repeat (or, if we're waiting on it, for the room number) and keep auto-detecting
+        response = TwimlResponse()
+        if agent.dialogue_state(call_sid) is not DialogueState.AWAITING_ROOM:
+            response.append(profile.repeat_say)
+        else:
+            note_spoken(profile.ask_room, current_lang)
+            if not play_if_cached(response, profile.ask_room, current_lang, get_base_url()):
+                response.say(profile.ask_room, voice=profile.twilio_voice, language=profile.twilio_language)
+        response.append(gather_for(current_lang, hint_state(call_sid), catalog=catalog, call_sid=call_sid))
+        prefetch_next_turn(call_sid, current_lang)
+        return twiml_response(response)
     
     # Process with agent (xAI/Grok will respond in the detected language)
-    agent_response = agent.process_message(call_sid, speech_result)
+    ledger = agent.orders.get(call_sid)
+    with tracing.span("agent_turn"):
+        agent_response = agent.process_message(
+            call_sid, speech_result, current_lang, speculation.parsed if speculation is not None else None)
+    # Noted for the call transcript: the reply, and the order if this turn placed it (the ledger is then replaced)
+    g.agent_reply = agent_response
+    if ledger is not None and agent.orders.get(call_sid) is not ledger:
+        g.placed_order = ledger
     
     # Check if order is complete - if so, end the call gracefully
-    order_complete = agent.order_complete.get(call_sid, False)
+    order_complete = agent.dialogue_state(call_sid) is DialogueState.COMPLETE
     
     # Create TwiML response
-    response = VoiceResponse()
+    response = TwimlResponse()
     base_url = get_base_url()
     say_with_gcp_tts(response, agent_response, current_lang, base_url)
     
     # If order is complete, end the call after a brief pause
     if order_complete:
-        print(f"[CALL] Order complete for {call_sid}, ending call gracefully")
+        call_log.info("call_ending", reason="order_complete")
         # Add a brief pause, then hangup
         response.pause(length=1)
         response.hangup()
-        return str(response), 200, {"Content-Type": "text/xml"}
-    
-    # Continue conversation with language detection
-    gather = Gather(
-        input="speech",
-        action="/process-speech",
-        method="POST",
-        speech_timeout="auto",
-        language="auto",  # Auto-detect language
-        hints="menu, order, price, burger, salad, pasta, dessert, chicken, salmon, beef, yes, no, add, remove, review, checkout, room, number, menú, orden, menù, ordine, メニュー, 注文, 菜单, 订单, قائمة, طلب, منو, سفارش, بله, نه, فهرست, غذا, قیمت, اضافه, حذف, بررسی, پرداخت"
-    )
-    response.append(gather)
+        prefetch_next_turn(call_sid, current_lang, hanging_up=True)
+        return twiml_response(response)
     
-    # Fallback
-    fallback_messages = {
-        "en-US": "Is there anything else I can help you with?",
-        "es-ES": "¿Hay algo más en lo que pueda ayudarle?",
-        "fr-FR": "Y a-t-il autre chose avec laquelle je peux vous aider?",
-        "de-DE": "Gibt es noch etwas, womit ich Ihnen helfen kann?",
-        "it-IT": "C'è qualcos'altro con cui posso aiutarti?",
-        "ja-JP": "他に何かお手伝いできることはありますか？",
-        "zh-CN": "还有什么我可以帮助您的吗？",
-        "ar-SA": "هل هناك أي شيء آخر يمكنني مساعدتك فيه؟",
-        "fa-IR": "چیز دیگری هست که بتوانم کمکتان کنم؟",
-        "hi-IN": "क्या मैं आपकी और किसी चीज़ में मदद कर सकता हूं?",
-        "ru-RU": "Могу ли я еще чем-то помочь?",
-        "pt-BR": "Há mais alguma coisa com que eu possa ajudá-lo?",
-    }
-    response.say(
-        fallback_messages.get(current_lang, fallback_messages["en-US"]),
-        voice=voice,
-        language=current_lang
-    )
-    response.redirect("/process-speech")
+    # Continue conversation with language detection, then "anything else?" (or the room) if they stay quiet
+    state = hint_state(call_sid)
+    response.append(gather_for(current_lang, state, catalog=catalog, call_sid=call_sid))
+    append_no_input_prompt(response, state, current_lang, base_url)
+    prefetch_next_turn(call_sid, current_lang)
     
-    return str(response), 200, {"Content-Type": "text/xml"}
+    return twiml_response(response)
+
+
+@app.route(NO_INPUT_PATH, methods=["POST"])
+@replay_safe
+def no_input():
+    """
+    A Gather heard nothing and the prompt after it has played
+    Listen again in the call's current state instead of restarting the call at the greeting
+    """
+    call_sid = request.form.get("CallSid")
+    lang_code = call_languages.get(call_sid, "en-US")
+    state = speech_hints.GREETING if request.args.get("state") == speech_hints.GREETING else hint_state(call_sid)
+    response = TwimlResponse()
+    if endpoints.on_no_input(call_sid, state) > NO_INPUT_LIMIT:
+        call_log.info("call_ending", reason="no_input")
+        response.hangup()
+        return twiml_response(response)
+    response.append(gather_for(lang_code, state, catalog=tenant_for(call_sid).agent.catalog(), call_sid=call_sid))
+    append_no_input_prompt(response, state, lang_code, get_base_url())
+    return twiml_response(response)
+
+
+def stream_url(base_url):
+    """wss:// URL of the media stream endpoint"""
+    return base_url.replace("https://", "wss://", 1).replace("http://", "ws://", 1) + MEDIA_STREAM_PATH
+
+
+def stream_greeting(call_sid):
+    default_lang = "en-US"
+    call_languages[call_sid] = default_lang
+    return StreamReply(greeting_for(tenant_for(call_sid), default_lang), default_lang)
+
+
+def stream_reply(call_sid, transcript):
+    """One streamed turn: the same language handling and agent call as /process-speech"""
+    tracing.start_trace(call_sid, MEDIA_STREAM_PATH)
+    try:
+        speech_result = transcript.text.strip()
+        call_log.debug("speech_received", speech=speech_result, mode="stream")
+        agent = tenant_for(call_sid).agent
+        with tracing.span("language_detect"):
+            requested_lang = detect_language_switch(speech_result.lower(), agent.catalog())
+        if requested_lang:
+            call_languages[call_sid] = requested_lang
+            call_log.info("language_switch", lang=requested_lang)
+            return StreamReply(get_language_profile(requested_lang).switch_confirmation, requested_lang)
+        
+        current_lang = apply_detected_language(call_sid, transcript.language, speech_result)
+        with tracing.span("agent_turn"):
+            agent_response = agent.process_message(call_sid, speech_result, current_lang)
+        order_complete = agent.dialogue_state(call_sid) is DialogueState.COMPLETE
+        if order_complete:
+            call_log.info("call_ending", reason="order_complete")
+        return StreamReply(agent_response, current_lang, order_complete)
+    finally:
+        log_trace(tracing.finish_trace())
+
+
+def stream_audio(text, lang_code):
+    """Raw 8 kHz μ-law for a streamed reply, from the same TTS cache as <Play>; None if unavailable"""
+    if audio_profile.encoding != "MULAW":
+        tts_log.warning("stream_needs_mulaw", profile=audio_profile.name)
+        return None
+    audio_id = generate_audio_with_gcp(text, lang_code, None, deadline=time.monotonic() + media_stream.STREAM_TTS_SECONDS)
+    metadata = audio_cache.get(audio_id) if audio_id else None
+    if metadata is None:
+        return None
+    data = metadata.get("data")
+    if data is None:
+        try:
+            with open(metadata["path"], "rb") as f:
+                data = f.read()
+        except FileNotFoundError:
+            return None
+    return media_stream.mulaw_payload(data)
+
+
+@sock.route(MEDIA_STREAM_PATH)
+def handle_media_stream(ws):
+    """
+    Twilio Media Streams WebSocket (CALL_MODE=stream)
+    Caller audio comes in as μ-law frames, replies go back the same way
+    """
+    session = MediaStreamSession(stream_greeting, stream_reply, stream_audio,
+                                 lambda message: ws.send(json.dumps(message)))
+    record_dir = os.getenv("MEDIA_STREAM_RECORD_DIR")
+    record = open(os.path.join(record_dir, f"{uuid.uuid4().hex}.jsonl"), "w") if record_dir else None
+    try:
+        media_stream.run(session, ws.receive, record)
+    finally:
+        if record is not None:
+            record.close()
+    call_log.info("stream_ended", call_sid=session.call_sid, turns=session.turns)
 
 
 @app.route("/status", methods=["POST"])
@@ -664,12 +1007,18 @@ def call_status():
     
     # Clean up conversation history when call ends
     if call_status in ["completed", "failed", "busy", "no-answer", "canceled"]:
-        if hasattr(agent, 'conversation_history') and call_sid in agent.conversation_history:
-            del agent.conversation_history[call_sid]
-        if hasattr(agent, 'active_orders') and call_sid in agent.active_orders:
-            del agent.active_orders[call_sid]
+        tenant = tenant_for(call_sid)
+        tenant.agent.end_call(call_sid)
         if call_sid in call_languages:
             del call_languages[call_sid]
+        tracing.end_call(call_sid)
+        llm_usage.finish_call(call_sid)
+        prefetcher.end_call(call_sid)
+        tenant.speculations.discard(call_sid)
+        webhook_replays.end_call(call_sid)
+        endpoints.end_call(call_sid)
+        tenant_registry.end_call(call_sid)
+        tenant_registry.evict_idle()
     
     return "", 200
 
@@ -0,0 +1,50 @@
+"""
+Output profiles for synthesized speech
+The phone leg is 8 kHz μ-law, so anything richer is thrown away by Twilio after we've paid to
+synthesize, store and transfer it. The default profile asks Google Cloud TTS for exactly that
+(μ-law WAV, which <Play> accepts as is); a low-bitrate MP3 profile is kept as an alternative.
+
+Environment:
+    TTS_AUDIO_PROFILE   "mulaw" (default) or "mp3"
+"""
+
+import os
+from typing import NamedTuple, Tuple
+
+from google.cloud import texttospeech
+
+
+class AudioProfile(NamedTuple):
+    name: str
+    encoding: str             # texttospeech.AudioEncoding member name
+    sample_rate_hertz: int
+    mimetype: str
+    suffix: str
+    effects_profile_id: Tuple[str, ...] = ("telephony-class-application",)
+    speaking_rate: float = 1.0
+    pitch: float = 2.0        # Slightly higher pitch for a friendlier voice
+
+    def audio_config(self) -> texttospeech.AudioConfig:
+        return texttospeech.AudioConfig(
+            audio_encoding=texttospeech.AudioEncoding[self.encoding],
+            sample_rate_hertz=self.sample_rate_hertz,
+            effects_profile_id=list(self.effects_profile_id),
+            speaking_rate=self.speaking_rate,
+            pitch=self.pitch,
+        )
+
+
+AUDIO_PROFILES = {
+    # 8 kHz μ-law with a WAV header - the phone leg's native format, no transcoding at Twilio
+    "mulaw": AudioProfile("mulaw", "MULAW", 8000, "audio/wav", ".wav"),
+    # Narrowband MP3 (MPEG-2, ~32 kbps) for deployments that prefer smaller files over no transcoding
+    "mp3": AudioProfile("mp3", "MP3", 16000, "audio/mpeg", ".mp3"),
+}
+
+DEFAULT_AUDIO_PROFILE = "mulaw"
+
+
+def get_audio_profile(name: str = None) -> AudioProfile:
+    """Profile by name (default from TTS_AUDIO_PROFILE), falling back to μ-law"""
+    name = (name or os.getenv("TTS_AUDIO_PROFILE") or DEFAULT_AUDIO_PROFILE).lower()
+    return AUDIO_PROFILES.get(name) or AUDIO_PROFILES[DEFAULT_AUDIO_PROFILE]
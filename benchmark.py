@@ -0,0 +1,426 @@
+"""
+Micro-benchmarks for the agent turn hot path
+Network is stubbed (xAI and Google Cloud TTS), so results measure only our own CPU and allocations
+
+Usage:
+    python benchmark.py                              # run and write benchmark_results.json
+    python benchmark.py --quick                      # fewer iterations, for a smoke run
+    python benchmark.py --compare old_results.json   # flag regressions against an earlier run
+"""
+
+import argparse
+import gc
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+from contextlib import contextmanager, redirect_stdout
+from datetime import datetime
+
+import recommendations
+import structured_logging
+from conversation import ConversationHistory
+from dialogue import Dialogue, DialogueState
+from fakes import FakeTTSClient
+from menu_catalog import MenuCatalog, get_catalog, set_catalog
+from menu_data import MENU_CATEGORIES
+from order_ledger import OrderLedger
+
+# Menu sizes to scale across: the real menu, 10x and 100x
+MENU_SCALES = [1, 10, 100]
+
+# Conversation history lengths (number of prior user/assistant messages)
+HISTORY_LENGTHS = [0, 10, 50]
+
+# Dietary and price requests answered by recommendations.py
+RECOMMENDATION_REQUESTS = ["something vegetarian under $20", "anything spicy", "something light", "vegan desserts",
+                           "a gluten free pasta", "nothing spicy, maybe a salad", "something cheap", "i want to splurge"]
+
+# A regression is flagged when mean time per op grows by more than this fraction
+REGRESSION_THRESHOLD = 0.25
+
+BENCH_CALL_SID = "bench_call"
+
+# What run_case measures; the rest of a result (its name and parameters) identifies the case
+METRIC_FIELDS = frozenset({"iterations", "mean_us", "min_us", "stdev_us", "retained_bytes_per_op",
+                           "retained_blocks_per_op", "peak_traced_bytes"})
+
+
+class _FakeXaiResponse:
+    """Stands in for the requests.Response returned by the xAI API"""
+    status_code = 200
+
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return {
+            "choices": [{"message": {"content": "Of course! The Truffle Fries are 17 dollars. Anything else?"}}],
+            "usage": {"prompt_tokens": 1200, "completion_tokens": 18, "total_tokens": 1218},
+        }
+
+
+def _fake_post(*args, **kwargs):
+    return _FakeXaiResponse()
+
+
+@contextmanager
+def stubbed_network():
+    """Replace outbound xAI and GCP calls with in-process fakes"""
+    import agent as agent_module
+    original_post = agent_module.requests.post
+    agent_module.requests.post = _fake_post
+    try:
+        yield
+    finally:
+        agent_module.requests.post = original_post
+
+
+@contextmanager
+def scaled_menu(scale):
+    """Temporarily swap in a catalog of `scale` renamed copies of the real menu"""
+    scaled = {}
+    for copy_index in range(scale):
+        for key, category in MENU_CATEGORIES.items():
+            suffix = "" if copy_index == 0 else f" {copy_index}"
+            scaled[f"{key}{suffix.replace(' ', '_')}"] = {
+                "name": f"{category['name']}{suffix}",
+                "items": [
+                    {**item, "name": f"{item['name']}{suffix}"}
+                    for item in category["items"]
+                ],
+            }
+    previous = set_catalog(MenuCatalog(scaled))
+    try:
+        yield
+    finally:
+        set_catalog(previous)
+
+
+def make_agent(history_length):
+    """Build an agent with a call that already has `history_length` messages and a small order"""
+    from agent import RoomServiceAgent
+    agent = RoomServiceAgent()
+    agent.xai_api_key = "bench-key"
+    agent.xai_model = "bench-model"
+    seed_call(agent, BENCH_CALL_SID, history_length)
+    return agent
+
+
+def seed_call(agent, call_sid, history_length):
+    """Fill in conversation history and an order for a call"""
+    history = agent.conversation_history[call_sid] = ConversationHistory()
+    for i in range(history_length):
+        role = "user" if i % 2 == 0 else "assistant"
+        history.append(role, f"Message {i}: could you tell me more about the Truffle Fries and the Tuna Tacos?",
+                       ("Truffle Fries", "Tuna Tacos") if role == "user" else ())
+    ledger = agent.orders[call_sid] = OrderLedger()
+    for item_id in ("to_share/truffle-fries", "to_share/tuna-tacos"):
+        ledger.add(get_catalog().get(item_id))
+    agent.dialogues[call_sid] = Dialogue()
+    agent.dialogues[call_sid].state = DialogueState.ORDERING
+
+
+def time_op(fn, iterations, repeats):
+    """Return per-op timings (seconds) for `repeats` batches of `iterations` calls"""
+    fn()  # warm up caches and lazy imports
+    samples = []
+    gc_was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        for _ in range(repeats):
+            start = time.perf_counter()
+            for _ in range(iterations):
+                fn()
+            samples.append((time.perf_counter() - start) / iterations)
+    finally:
+        if gc_was_enabled:
+            gc.enable()
+    return samples
+
+
+def measure_allocations(fn, iterations):
+    """Return (bytes allocated per op, allocation blocks per op, peak traced bytes)"""
+    tracemalloc.start()
+    try:
+        tracemalloc.reset_peak()
+        before = tracemalloc.take_snapshot()
+        for _ in range(iterations):
+            fn()
+        after = tracemalloc.take_snapshot()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    stats = after.compare_to(before, "filename")
+    size = sum(max(stat.size_diff, 0) for stat in stats)
+    blocks = sum(max(stat.count_diff, 0) for stat in stats)
+    return size / iterations, blocks / iterations, peak
+
+
+def run_case(name, fn, iterations, repeats, **params):
+    """Benchmark one operation and return a JSON-friendly result"""
+    # Keep the cost of any stray print() output but not the noise
+    with open(os.devnull, "w") as devnull, redirect_stdout(devnull):
+        samples = time_op(fn, iterations, repeats)
+        alloc_bytes, alloc_blocks, peak = measure_allocations(fn, max(1, iterations // 4))
+    result = {
+        "name": name,
+        **params,
+        "iterations": iterations * repeats,
+        "mean_us": statistics.mean(samples) * 1e6,
+        "min_us": min(samples) * 1e6,
+        "stdev_us": (statistics.stdev(samples) if len(samples) > 1 else 0.0) * 1e6,
+        "retained_bytes_per_op": round(alloc_bytes, 1),
+        "retained_blocks_per_op": round(alloc_blocks, 2),
+        "peak_traced_bytes": peak,
+    }
+    label = ", ".join(f"{k}={v}" for k, v in params.items())
+    print(f"{name:<32} {label:<28} {result['mean_us']:>12.1f} us/op  {result['retained_bytes_per_op']:>10.0f} B/op")
+    return result
+
+
+def agent_cases(iterations, repeats):
+    """Benchmarks for RoomServiceAgent and the menu catalog"""
+    results = []
+    for scale in MENU_SCALES:
+        with scaled_menu(scale), stubbed_network():
+            # Heavier cases run fewer iterations at larger menu sizes
+            scaled_iterations = max(1, iterations // scale)
+            agent = make_agent(10)
+            catalog = get_catalog()
+            params = {"menu_scale": scale, "menu_items": len(catalog)}
+
+            results.append(run_case(
+                "search_menu", lambda: catalog.search("truffle fries"),
+                scaled_iterations, repeats, **params))
+            results.append(run_case(
+                "search_menu_partial", lambda: catalog.search("truffle"),
+                scaled_iterations, repeats, **params))
+            results.append(run_case(
+                "catalog_by_id", lambda: catalog.get("to_share/truffle-fries"),
+                iterations * 10, repeats, **params))
+            results.append(run_case(
+                "get_detailed_menu_info", agent.get_detailed_menu_info,
+                scaled_iterations, repeats, **params))
+
+            index = recommendations.index_for(catalog)
+            queries = [recommendations.parse_query(text) for text in RECOMMENDATION_REQUESTS]
+            results.append(run_case(
+                "recommend", lambda: index.recommend(queries[0]),
+                iterations, repeats, **params))
+            results.append(run_case(
+                "recommend_batch", lambda: index.recommend_many(queries),
+                scaled_iterations, repeats, **params, requests=len(queries)))
+            results.append(run_case(
+                "build_recommendation_index", lambda: recommendations.RecommendationIndex(catalog),
+                max(1, scaled_iterations // 10), repeats, **params))
+
+            for history_length in HISTORY_LENGTHS:
+                agent = make_agent(history_length)
+                hist_params = {**params, "history": history_length}
+                results.append(run_case(
+                    "build_prompt",
+                    lambda: agent.build_prompt(BENCH_CALL_SID, "what desserts do you have?"),
+                    scaled_iterations, repeats, **hist_params))
+
+                def full_turn():
+                    # Reset so history length and order stay constant across iterations
+                    seed_call(agent, BENCH_CALL_SID, history_length)
+                    agent.process_message(BENCH_CALL_SID, "I'd like the truffle fries please")
+
+                results.append(run_case(
+                    "process_message", full_turn, scaled_iterations, repeats, **hist_params))
+
+    # Scale-independent pieces
+    agent = make_agent(10)
+    message = "can i get the tuna tacos for room 1204 please"
+    results.append(run_case(
+        "has_order_intent", lambda: agent.has_order_intent(message), iterations * 10, repeats))
+    results.append(run_case(
+        "extract_search_terms", lambda: agent.extract_search_terms(message), iterations * 10, repeats))
+    results.append(run_case(
+        "extract_room_number", lambda: agent.extract_room_number(message), iterations * 10, repeats))
+    results.append(run_case(
+        "get_current_order_info", lambda: agent.get_current_order_info(BENCH_CALL_SID),
+        iterations * 10, repeats))
+    return results
+
+
+def language_switch_cases(iterations, repeats):
+    """Benchmarks for language switch detection on typical turns"""
+    from language_switch import LanguageSwitchDetector, menu_item_names
+    from languages import LANGUAGE_SWITCH_KEYWORDS
+
+    detector = LanguageSwitchDetector(LANGUAGE_SWITCH_KEYWORDS, menu_item_names(get_catalog()))
+    results = []
+    utterances = {
+        "order": "can i get the french fries and a club sandwich for room 1204 please",
+        "switch": "could you please speak farsi with me",
+        "bare": "español",
+    }
+    for kind, utterance in utterances.items():
+        results.append(run_case(
+            "detect_language_switch", lambda: detector.detect(utterance),
+            iterations * 10, repeats, utterance=kind))
+    results.append(run_case(
+        "build_language_switch_detector",
+        lambda: LanguageSwitchDetector(LANGUAGE_SWITCH_KEYWORDS, menu_item_names(get_catalog())),
+        iterations, repeats))
+    return results
+
+
+def language_id_cases(iterations, repeats):
+    """Benchmarks for identifying the language of a transcript, and its accuracy on the multilingual test set"""
+    import language_id
+    from test_language_id import SAMPLES
+
+    results = []
+    utterances = {
+        "english": "can i get the french fries and a club sandwich for room 1204 please",
+        "accented": "je voudrais une salade niçoise, s'il vous plaît",
+        "script": "من یک چای می‌خواهم",
+    }
+    for kind, utterance in utterances.items():
+        results.append(run_case(
+            f"identify_language_{kind}", lambda: language_id.identify_base(utterance), iterations * 10, repeats))
+    correct = sum(language_id.identify_base(text) == expected for text, expected in SAMPLES)
+    print(f"{'identify_language accuracy':<32} {correct}/{len(SAMPLES)} on the multilingual test set")
+    results.append({"name": "identify_language_accuracy", "correct": correct, "samples": len(SAMPLES)})
+    return results
+
+
+def app_cases(iterations, repeats):
+    """Benchmarks for TwiML building in app.py"""
+    import app as app_module
+    from twiml import TwimlResponse
+
+    results = []
+    original_client = app_module.gcp_tts_client
+    app_module.gcp_tts_client = FakeTTSClient()
+    try:
+        with stubbed_network():
+            base_url = "https://bench.example.com"
+            text = "Of course! The Truffle Fries are 17 dollars. Anything else?"
+
+            # First call synthesizes, the rest are cache hits
+            results.append(run_case(
+                "say_with_gcp_tts",
+                lambda: app_module.say_with_gcp_tts(TwimlResponse(), text, "en-US", base_url),
+                iterations, repeats))
+
+            client = app_module.app.test_client()
+            audio_id = app_module.response_cache[next(iter(app_module.response_cache))]
+            etag = app_module.audio_cache[audio_id]["etag"]
+            for fetch, headers in (("full", {}), ("not_modified", {"If-None-Match": f'"{etag}"'}),
+                                   ("range", {"Range": "bytes=0-1023"})):
+                results.append(run_case(
+                    "serve_audio", lambda: client.get(f"/audio/{audio_id}", headers=headers).close(),
+                    iterations, repeats, fetch=fetch))
+
+            form = {"CallSid": BENCH_CALL_SID, "SpeechResult": "I'd like the truffle fries please"}
+
+            for history_length in HISTORY_LENGTHS:
+                def speech_turn():
+                    seed_call(app_module.agent, BENCH_CALL_SID, history_length)
+                    client.post("/process-speech", data=form)
+
+                results.append(run_case(
+                    "process_speech", speech_turn, max(1, iterations // 4), repeats,
+                    history=history_length))
+
+            results.append(run_case(
+                "handle_incoming_call",
+                lambda: client.post("/voice", data={"CallSid": BENCH_CALL_SID}),
+                max(1, iterations // 4), repeats))
+    finally:
+        app_module.gcp_tts_client = original_client
+        for audio_id in list(app_module.audio_cache):
+            app_module.discard_audio(audio_id)
+    return results
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            stderr=subprocess.DEVNULL,
+        ).decode().strip()
+    except Exception:
+        return "unknown"
+
+
+def compare(results, baseline_path):
+    """Print per-case changes against a baseline results file, return number of regressions"""
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+
+    def key(result):
+        return tuple(sorted((k, v) for k, v in result.items() if k not in METRIC_FIELDS))
+
+    old_by_key = {key(r): r for r in baseline.get("results", [])}
+    regressions = 0
+    print(f"\nComparison against {baseline_path} (rev {baseline.get('meta', {}).get('git_rev', '?')}):")
+    for result in results:
+        old = old_by_key.get(key(result))
+        if not old or not old.get("mean_us") or "mean_us" not in result:
+            continue
+        change = (result["mean_us"] - old["mean_us"]) / old["mean_us"]
+        flag = ""
+        if change > REGRESSION_THRESHOLD:
+            flag = "  <-- REGRESSION"
+            regressions += 1
+        label = ", ".join(f"{k}={v}" for k, v in key(result) if k != "name")
+        print(f"{result['name']:<32} {label:<28} {old['mean_us']:>10.1f} -> {result['mean_us']:>10.1f} us ({change:+.0%}){flag}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the room service agent turn hot path")
+    parser.add_argument("--output", default="benchmark_results.json", help="Where to write JSON results")
+    parser.add_argument("--compare", help="Earlier results JSON to compare against")
+    parser.add_argument("--iterations", type=int, default=200, help="Calls per timing batch")
+    parser.add_argument("--repeats", type=int, default=5, help="Timing batches per case")
+    parser.add_argument("--quick", action="store_true", help="Few iterations, for a smoke run")
+    args = parser.parse_args(argv)
+
+    if args.quick:
+        args.iterations, args.repeats = 20, 2
+
+    # Log records are still built and queued (that cost is measured), but written nowhere
+    structured_logging.configure(stream=open(os.devnull, "w"))
+
+    results = agent_cases(args.iterations, args.repeats)
+    results.extend(language_switch_cases(args.iterations, args.repeats))
+    results.extend(language_id_cases(args.iterations, args.repeats))
+    results.extend(app_cases(args.iterations, args.repeats))
+
+    report = {
+        "meta": {
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "git_rev": git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "iterations": args.iterations,
+            "repeats": args.repeats,
+        },
+        "results": results,
+    }
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nWrote {len(results)} results to {args.output}")
+
+    if args.compare:
+        regressions = compare(results, args.compare)
+        if regressions:
+            print(f"{regressions} regression(s) over {REGRESSION_THRESHOLD:.0%}")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,123 @@
+"""
+Call transcript recorder
+When CALL_RECORD_DIR is set, every webhook of a call is appended to {CALL_RECORD_DIR}/{CallSid}.jsonl:
+the Twilio form fields that drive the agent, the call's language and dialogue state afterwards, the
+reply and order, and the request's latency spans. Room numbers (and any other 3-5 digit run) are
+replaced with zeros before anything is written. call_replay.py plays these files back through the app.
+
+Environment:
+    CALL_RECORD_DIR    Directory for transcripts; unset = no recording
+    CALL_RECORD_RATE   Fraction of calls recorded, chosen by CallSid (default 1.0)
+"""
+
+import hashlib
+import json
+import os
+import re
+import threading
+from typing import Dict, Iterator, List, Mapping, Optional
+
+import metrics
+from structured_logging import get_logger
+
+log = get_logger("recorder")
+
+# Form fields kept in a transcript; everything else Twilio sends (From, AccountSid, ...) is dropped
+FORM_FIELDS = ("CallSid", "To", "CallStatus", "SpeechResult", "SpeechLanguage", "Confidence",
+               "UnstableSpeechResult", "Stability", "SequenceNumber")
+
+# Fields holding what the guest said, redacted before writing
+SPEECH_FIELDS = ("SpeechResult", "UnstableSpeechResult")
+
+_ROOM = re.compile(r"(room\s*(?:number\s*)?#?\s*)(\d+)", re.IGNORECASE)
+_DIGIT_RUN = re.compile(r"\d{3,5}")
+
+RECORDED_WEBHOOKS = metrics.counter("roomservice_recorded_webhooks_total", "Webhooks written to call transcripts")
+
+
+def _zeros(match) -> str:
+    return "0" * len(match.group(0))
+
+
+def redact(text: str, room: str = "") -> str:
+    """Text with room numbers replaced by zeros of the same length, so a replayed order still gets placed"""
+    if not text:
+        return text
+    if room:
+        text = text.replace(room, "0" * len(room))
+    text = _ROOM.sub(lambda match: match.group(1) + "0" * len(match.group(2)), text)
+    return _DIGIT_RUN.sub(_zeros, text)
+
+
+def form_fields(form: Mapping[str, str], room: str = "") -> Dict[str, str]:
+    """The recorded subset of a webhook's form, redacted"""
+    fields = {name: form[name] for name in FORM_FIELDS if name in form}
+    for name in SPEECH_FIELDS:
+        if name in fields:
+            fields[name] = redact(fields[name], room)
+    return fields
+
+
+def order_snapshot(ledger) -> Dict:
+    """Compact order outcome: quantity by item ID, and the total"""
+    if ledger is None:
+        return {"items": {}, "total_cents": 0}
+    return {"items": {line.item_id: line.quantity for line in ledger.lines}, "total_cents": ledger.total_cents}
+
+
+class CallRecorder:
+    """Appends webhook records to one transcript per call (kept in memory without a directory)"""
+
+    def __init__(self, directory: Optional[str] = None, rate: float = 1.0):
+        self.directory = directory
+        self.rate = rate
+        self.calls: Dict[str, List[Dict]] = {}
+        self._lock = threading.Lock()
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def wants(self, call_sid: Optional[str]) -> bool:
+        """Whether this call is sampled for recording (the same answer for every webhook of the call)"""
+        if not call_sid:
+            return False
+        if self.rate >= 1:
+            return True
+        return int(hashlib.sha1(call_sid.encode()).hexdigest()[:8], 16) / 0xFFFFFFFF < self.rate
+
+    def path(self, call_sid: str) -> str:
+        # CallSids are alphanumeric; anything else is dropped so a form value can't escape the directory
+        return os.path.join(self.directory, re.sub(r"[^A-Za-z0-9_-]", "", call_sid) + ".jsonl")
+
+    def write(self, call_sid: str, record: Dict):
+        line = json.dumps(record, separators=(",", ":"), ensure_ascii=False)
+        with self._lock:
+            if self.directory:
+                with open(self.path(call_sid), "a", encoding="utf-8") as f:
+                    f.write(line + "\n")
+            else:
+                self.calls.setdefault(call_sid, []).append(record)
+        RECORDED_WEBHOOKS.inc()
+
+
+def read_transcript(path: str) -> List[Dict]:
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def read_transcripts(path: str) -> Iterator[List[Dict]]:
+    """Transcripts from one .jsonl file or every .jsonl file in a directory"""
+    if os.path.isdir(path):
+        for name in sorted(os.listdir(path)):
+            if name.endswith(".jsonl"):
+                yield read_transcript(os.path.join(path, name))
+    else:
+        yield read_transcript(path)
+
+
+def from_env() -> Optional[CallRecorder]:
+    directory = os.getenv("CALL_RECORD_DIR")
+    if not directory:
+        return None
+    rate = float(os.getenv("CALL_RECORD_RATE", "1.0"))
+    log.info("call_recording_enabled", directory=directory, rate=rate)
+    return CallRecorder(directory, rate)
@@ -0,0 +1,240 @@
+"""
+Replay recorded calls (call_recorder.py) through the app, offline and faster than real time
+Every call is replayed on its own thread with the recorded timing divided by --speed, so calls overlap
+the way they did in production. xAI answers with the replies recorded for each turn (or a fixed stub),
+Google Cloud TTS and the order email are stubbed. The report gives the /process-speech latency
+distribution, the TTS cache hit rate, and each call's order outcome; with --compare, the differences
+from an earlier report (another build), otherwise from what the recorded calls actually did.
+
+Usage:
+    python call_replay.py recordings/                           # every .jsonl in the directory
+    python call_replay.py recordings/ --output before.json      # ...make changes...
+    python call_replay.py recordings/ --compare before.json     # exit status 1 if any outcome changed
+    python call_replay.py CA123.jsonl --speed 0 --llm stub      # no pauses, canned xAI reply
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import threading
+import time
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional
+from unittest import mock
+
+import requests
+
+# Recorded seconds per replayed second; 0 replays without pauses (every call at once)
+DEFAULT_SPEED = 20.0
+
+STUB_REPLY = "Of course! Anything else I can get for you?"
+
+
+def percentiles(values: List[float]) -> Dict[str, float]:
+    if not values:
+        return {"count": 0}
+    ordered = sorted(values)
+
+    def at(fraction):
+        return round(ordered[min(len(ordered) - 1, int(fraction * len(ordered)))], 2)
+    return {"count": len(ordered), "p50": round(statistics.median(ordered), 2), "p90": at(0.9), "p99": at(0.99),
+            "max": ordered[-1]}
+
+
+def call_outcome(records: List[Dict]) -> Dict:
+    """What a call ended with: the order placed (or left unplaced), and the last dialogue state"""
+    turns = [record for record in records if "order" in record]
+    if not turns:
+        return {"placed": False, "items": {}, "total_cents": 0, "state": None}
+    placed = [record for record in turns if record.get("placed")]
+    final = placed[-1] if placed else turns[-1]
+    return {"placed": bool(placed), **final["order"], "state": turns[-1].get("state")}
+
+
+def summarize(transcripts: Iterable[List[Dict]]) -> Dict:
+    """Latency, cache and outcome figures for a set of call transcripts"""
+    turn_ms, hits, misses, llm_turns = [], 0, 0, 0
+    outcomes = {}
+    for records in transcripts:
+        if not records:
+            continue
+        outcomes[records[0]["form"].get("CallSid", "")] = call_outcome(records)
+        for record in records:
+            spans = [name for name, _ in record.get("spans", ())]
+            hits += spans.count("tts_cache_hit")
+            misses += spans.count("tts_wait")
+            if record["path"].split("?")[0] == "/process-speech" and "ms" in record:
+                turn_ms.append(record["ms"])
+                llm_turns += "xai_request" in spans
+    lookups = hits + misses
+    return {
+        "turn_ms": percentiles(turn_ms),
+        "llm_turns": llm_turns,
+        "tts_cache": {"hits": hits, "misses": misses, "hit_rate": round(hits / lookups, 3) if lookups else None},
+        "outcomes": outcomes,
+    }
+
+
+def outcome_diffs(old: Dict, new: Dict) -> List[str]:
+    """Calls whose outcome changed, described one per line"""
+    diffs = []
+    for call_sid in sorted(set(old) | set(new)):
+        before, after = old.get(call_sid), new.get(call_sid)
+        if before != after:
+            diffs.append(f"{call_sid}: {json.dumps(before, sort_keys=True)} -> {json.dumps(after, sort_keys=True)}")
+    return diffs
+
+
+class _ReplayResponse:
+    status_code = 200
+
+    def __init__(self, content):
+        self._content = content
+
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return {"choices": [{"message": {"content": self._content}}],
+                "usage": {"prompt_tokens": 0, "completion_tokens": 0}}
+
+
+class ReplayXai:
+    """
+    Stands in for requests.post to xAI (RoomServiceAgent.xai_post), answering with the reply recorded
+    for the turn being replayed. Only replay threads get the recorded replies; any other thread's
+    request goes out as usual.
+    """
+
+    def __init__(self, recorded: bool = True):
+        self.recorded = recorded
+        self._turn = threading.local()
+
+    @property
+    def replaying(self) -> bool:
+        """Whether the current thread is replaying a call"""
+        return hasattr(self._turn, "reply")
+
+    def set_reply(self, reply: Optional[str]):
+        self._turn.reply = reply
+
+    def __call__(self, url, headers=None, json=None, timeout=None, stream=False):
+        if not self.replaying:
+            return requests.post(url, headers=headers, json=json, timeout=timeout, stream=stream)
+        reply = self._turn.reply if self.recorded else None
+        return _ReplayResponse(reply or STUB_REPLY)
+
+
+def replay_call(client, records: List[Dict], speed: float, xai: ReplayXai, start_at: float):
+    """Post one call's webhooks in order, keeping the recorded gaps (scaled by speed)"""
+    first = records[0]["at"]
+    for record in records:
+        if speed:
+            delay = start_at + (record["at"] - first) / speed - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+        xai.set_reply(record.get("reply"))
+        headers = {"I-Twilio-Idempotency-Token": record["token"]} if "token" in record else None
+        client.post(record["path"], data=record["form"], headers=headers)
+
+
+def replay(transcripts: List[List[Dict]], speed: float = DEFAULT_SPEED, recorded_llm: bool = True) -> List[List[Dict]]:
+    """Run the calls through the app in-process; returns the transcripts the replay itself recorded"""
+    os.environ.setdefault("XAI_API_KEY", "replay-key")
+    from agent import RoomServiceAgent
+    from call_recorder import CallRecorder
+    from fakes import FakeTTSClient
+    import app as app_module
+    import speculation
+
+    app_module.partial_callback = speculation.PARTIAL_CALLBACK
+    app_module.gcp_tts_client = FakeTTSClient()
+    app_module.recorder = CallRecorder()
+    xai = ReplayXai(recorded_llm)
+    send_order_email = RoomServiceAgent.send_order_email
+
+    def replay_send_order_email(agent, call_sid):
+        return True if xai.replaying else send_order_email(agent, call_sid)
+
+    # Patched only while the calls replay; tenants loaded during the replay get the stubs too
+    with mock.patch.object(RoomServiceAgent, "xai_post", xai), \
+            mock.patch.object(RoomServiceAgent, "send_order_email", replay_send_order_email):
+        transcripts = [records for records in transcripts if records]
+        origin = min((records[0]["at"] for records in transcripts), default=0)
+        started = time.monotonic()
+        threads = [
+            threading.Thread(target=replay_call, args=(
+                app_module.app.test_client(), records, speed, xai,
+                started + ((records[0]["at"] - origin) / speed if speed else 0)))
+            for records in transcripts
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    return list(app_module.recorder.calls.values())
+
+
+def print_report(summary: Dict, baseline: Optional[Dict] = None, baseline_label: str = "recorded"):
+    turn_ms, cache = summary["turn_ms"], summary["tts_cache"]
+    print(f"{turn_ms['count']} turns, {summary['llm_turns']} sent to xAI, {len(summary['outcomes'])} calls")
+    if turn_ms["count"]:
+        print("turn latency: " + ", ".join(f"{name} {turn_ms[name]:.2f} ms" for name in ("p50", "p90", "p99", "max")))
+    print(f"TTS cache: {cache['hits']} hits, {cache['misses']} misses, hit rate {cache['hit_rate']}")
+    if baseline is None:
+        return 0
+    old_ms = baseline["turn_ms"]
+    if old_ms.get("count") and turn_ms["count"]:
+        print(f"vs {baseline_label}: " + ", ".join(
+            f"{name} {old_ms[name]:.2f} -> {turn_ms[name]:.2f} ms" for name in ("p50", "p90", "p99", "max")))
+    print(f"vs {baseline_label}: TTS cache hit rate {baseline['tts_cache']['hit_rate']} -> {cache['hit_rate']}")
+    diffs = outcome_diffs(baseline["outcomes"], summary["outcomes"])
+    print(f"{len(diffs)} order outcome(s) differ from {baseline_label}")
+    for diff in diffs:
+        print(f"  {diff}")
+    return len(diffs)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Replay recorded calls through the app and compare builds")
+    parser.add_argument("path", help="Transcript .jsonl, or a directory of them (CALL_RECORD_DIR)")
+    parser.add_argument("--speed", type=float, default=DEFAULT_SPEED, help="Speed-up over real time; 0 = no pauses")
+    parser.add_argument("--llm", choices=("recorded", "stub"), default="recorded", help="xAI replies to use")
+    parser.add_argument("--output", help="Write the report JSON here")
+    parser.add_argument("--compare", help="Earlier report JSON to compare against (default: the recordings)")
+    args = parser.parse_args(argv)
+
+    # The app's own log lines would drown the report
+    import structured_logging
+    structured_logging.configure(stream=open(os.devnull, "w"))
+    from call_recorder import read_transcripts
+
+    recordings = list(read_transcripts(args.path))
+    replayed = replay(recordings, args.speed, args.llm == "recorded")
+    summary = summarize(replayed)
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        label = f"{args.compare} (rev {baseline.get('meta', {}).get('git_rev', '?')})"
+        changed = print_report(summary, baseline["summary"], label)
+    else:
+        changed = print_report(summary, summarize(recordings))
+
+    if args.output:
+        import benchmark
+        report = {
+            "meta": {"timestamp": datetime.now().isoformat(timespec="seconds"), "git_rev": benchmark.git_revision(),
+                     "calls": len(recordings), "speed": args.speed, "llm": args.llm},
+            "summary": summary,
+        }
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Wrote report to {args.output}")
+    return 1 if changed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,84 @@
+"""
+Bounded per-call conversation history
+The last few messages are kept verbatim in a fixed-size ring buffer and sent to the LLM as chat
+turns. Messages that fall out of the buffer are folded into a small structured summary (items
+discussed, items ordered, room, language), so prompt size and memory per call stay constant
+however long the guest stays on the line.
+"""
+
+from collections import deque
+from typing import Dict, Iterable, List, Optional
+
+# Messages kept verbatim (user and assistant messages each count as one)
+HISTORY_CAPACITY = 6
+
+# Most item names remembered per summary list
+MAX_SUMMARY_ITEMS = 12
+
+
+def _remember(names: Dict[str, None], new: Iterable[str]):
+    """Add names to an insertion-ordered set, keeping only the most recent MAX_SUMMARY_ITEMS"""
+    for name in new:
+        names.pop(name, None)
+        names[name] = None
+    while len(names) > MAX_SUMMARY_ITEMS:
+        del names[next(iter(names))]
+
+
+class ConversationSummary:
+    """Facts about the call that outlive the verbatim history"""
+
+    def __init__(self):
+        self.folded_messages = 0
+        self.items_discussed: Dict[str, None] = {}
+        self.items_ordered: Dict[str, None] = {}
+        self.room: Optional[str] = None
+        self.language: Optional[str] = None
+
+    def fold(self, message: Dict):
+        """Absorb a message leaving the verbatim history"""
+        self.folded_messages += 1
+        _remember(self.items_discussed, message.get("items", ()))
+
+    def note_order(self, item_name: str):
+        _remember(self.items_ordered, (item_name,))
+
+    def render(self) -> str:
+        """One line per known fact, or "" while nothing has been folded"""
+        if not self.folded_messages:
+            return ""
+        lines = [f"{self.folded_messages} earlier messages summarized."]
+        if self.items_discussed:
+            lines.append(f"Items discussed: {', '.join(self.items_discussed)}")
+        if self.items_ordered:
+            lines.append(f"Items ordered this call: {', '.join(self.items_ordered)}")
+        if self.room:
+            lines.append(f"Room number: {self.room}")
+        if self.language:
+            lines.append(f"Language: {self.language}")
+        return "\n".join(lines)
+
+
+class ConversationHistory:
+    """Ring buffer of recent messages plus a summary of everything older"""
+
+    def __init__(self, capacity: int = HISTORY_CAPACITY):
+        self.messages: deque = deque(maxlen=capacity)
+        self.summary = ConversationSummary()
+
+    def __len__(self) -> int:
+        return len(self.messages)
+
+    def append(self, role: str, content: str, items: Iterable[str] = ()):
+        """Record a message; `items` are menu item names it mentioned, kept for the summary"""
+        if len(self.messages) == self.messages.maxlen:
+            self.summary.fold(self.messages[0])
+        message = {"role": role, "content": content}
+        items = tuple(items)
+        if items:
+            message["items"] = items
+        self.messages.append(message)
+
+    def chat_messages(self) -> List[Dict]:
+        """The canonical rendering: recent messages as chat turns for the LLM"""
+        return [{"role": message["role"], "content": message["content"]} for message in self.messages]
@@ -0,0 +1,349 @@
+"""
+Admin-only diagnostics for live workers: sampling/cProfile capture and tracemalloc snapshots
+Disabled unless ADMIN_TOKEN is set; every request must send it as "Authorization: Bearer <token>"
+or "X-Admin-Token: <token>". Captures are per worker process.
+
+Profiling (runs in the background so a sync worker keeps serving calls while it captures):
+    POST /admin/profile/start?seconds=10&mode=sample&interval_ms=5
+    GET  /admin/profile          -> collapsed stacks ("frame;frame;frame count"), ready for flamegraph.pl
+                                    or pstats text for mode=cprofile; 202 while still running
+
+Memory:
+    POST /admin/memory/start?frames=10   -> start tracemalloc
+    GET  /admin/memory/snapshot?limit=25 -> growth by allocation site since the previous snapshot,
+                                            plus sizes of registered structures (audio cache, per-call dicts)
+    POST /admin/memory/stop
+"""
+
+import cProfile
+import hmac
+import io
+import math
+import os
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter, deque
+from typing import Callable, Dict, Optional
+
+from flask import Blueprint, abort, jsonify, request, Response
+
+from structured_logging import get_logger
+
+log = get_logger("diagnostics")
+
+admin = Blueprint("admin", __name__, url_prefix="/admin")
+
+MAX_PROFILE_SECONDS = 60
+MAX_STACK_DEPTH = 64
+
+# Named callables returning structures worth watching for growth
+_structures: Dict[str, Callable[[], object]] = {}
+
+_profile_lock = threading.Lock()
+_profile_state: Dict[str, object] = {"running": False, "mode": None, "result": None, "finished": None}
+
+# Per-request cProfile capture window (monotonic deadline) and aggregated stats.
+# Only one profiler may be active per process (Python 3.12+ raises ValueError for a second one),
+# so one request is profiled at a time; requests overlapping it are counted and left unprofiled.
+_cprofile_until = 0.0
+_cprofile_stats: Optional[pstats.Stats] = None
+_cprofile_skipped = 0
+_cprofile_lock = threading.Lock()
+_profiler_slot = threading.Lock()
+_request_profiles = threading.local()
+
+_memory_lock = threading.Lock()
+_last_snapshot: Optional[tracemalloc.Snapshot] = None
+
+
+def admin_token() -> Optional[str]:
+    return os.getenv("ADMIN_TOKEN") or None
+
+
+def register_structure(name: str, getter: Callable[[], object]):
+    """Report the size of a structure in memory snapshots"""
+    _structures[name] = getter
+
+
+@admin.before_request
+def require_admin():
+    """Hide the endpoints entirely unless ADMIN_TOKEN is configured and matches"""
+    token = admin_token()
+    if not token:
+        abort(404)
+    supplied = request.headers.get("X-Admin-Token", "")
+    auth = request.headers.get("Authorization", "")
+    if auth.startswith("Bearer "):
+        supplied = auth[len("Bearer "):]
+    if not hmac.compare_digest(supplied.encode(), token.encode()):
+        abort(403)
+
+
+# --- Profiling ---------------------------------------------------------------
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{os.path.basename(code.co_filename)}:{code.co_name}"
+
+
+def collapse_stack(frame) -> str:
+    """Render a frame's stack root-first, joined with ';' (Brendan Gregg's collapsed format)"""
+    labels = []
+    while frame is not None and len(labels) < MAX_STACK_DEPTH:
+        labels.append(_frame_label(frame))
+        frame = frame.f_back
+    return ";".join(reversed(labels))
+
+
+def sample_stacks(seconds: float, interval: float, exclude_thread_ids=()) -> Counter:
+    """Sample every thread's stack periodically and count identical stacks"""
+    stacks: Counter = Counter()
+    own_id = threading.get_ident()
+    skip = set(exclude_thread_ids) | {own_id}
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        for thread_id, frame in sys._current_frames().items():
+            if thread_id in skip:
+                continue
+            stacks[collapse_stack(frame)] += 1
+        time.sleep(interval)
+    return stacks
+
+
+def render_collapsed(stacks: Counter) -> str:
+    return "".join(f"{stack} {count}\n" for stack, count in stacks.most_common())
+
+
+def _skip_request_profile():
+    global _cprofile_skipped
+    with _cprofile_lock:
+        _cprofile_skipped += 1
+
+
+def start_request_profile():
+    """Called before each request - profile it if a cProfile capture window is open and no other request is"""
+    if time.monotonic() >= _cprofile_until:
+        return
+    if not _profiler_slot.acquire(blocking=False):
+        _skip_request_profile()
+        return
+    profiler = cProfile.Profile()
+    try:
+        profiler.enable()
+    except ValueError:
+        # Another profiling tool (a debugger, coverage) owns the interpreter's profiling hook
+        _profiler_slot.release()
+        _skip_request_profile()
+        return
+    _request_profiles.profiler = profiler
+
+
+def finish_request_profile():
+    """Called when each request ends - fold its profile into the capture"""
+    global _cprofile_stats
+    profiler = getattr(_request_profiles, "profiler", None)
+    if profiler is None:
+        return
+    profiler.disable()
+    _request_profiles.profiler = None
+    _profiler_slot.release()
+    with _cprofile_lock:
+        if _cprofile_stats is None:
+            _cprofile_stats = pstats.Stats(profiler)
+        else:
+            _cprofile_stats.add(profiler)
+
+
+def _run_capture(mode: str, seconds: float, interval: float):
+    global _cprofile_until, _cprofile_stats, _cprofile_skipped
+    try:
+        if mode == "cprofile":
+            with _cprofile_lock:
+                _cprofile_stats, _cprofile_skipped = None, 0
+            _cprofile_until = time.monotonic() + seconds
+            time.sleep(seconds)
+            _cprofile_until = 0.0
+            with _cprofile_lock:
+                stats, _cprofile_stats = _cprofile_stats, None
+                skipped = _cprofile_skipped
+            if stats is None:
+                result = "No requests were profiled during the capture window.\n"
+            else:
+                out = io.StringIO()
+                stats.stream = out
+                stats.sort_stats("cumulative").print_stats(60)
+                result = out.getvalue()
+            if skipped:
+                result += f"{skipped} requests overlapped a profiled request and were not profiled.\n"
+        else:
+            result = render_collapsed(sample_stacks(seconds, interval))
+    except Exception as e:
+        log.exception("profile_capture_failed", mode=mode, error=str(e))
+        result = f"Profile capture failed: {e}\n"
+    with _profile_lock:
+        _profile_state.update(running=False, result=result, finished=time.time())
+    log.info("profile_capture_finished", mode=mode, seconds=seconds)
+
+
+def _positive_arg(name: str, default: float) -> Optional[float]:
+    """A positive finite number from the query string, or None if it isn't one"""
+    try:
+        value = float(request.args.get(name, default))
+    except ValueError:
+        return None
+    return value if math.isfinite(value) and value > 0 else None
+
+
+def _positive_int_arg(name: str, default: int) -> Optional[int]:
+    """A positive whole number from the query string, or None if it isn't one"""
+    try:
+        value = int(request.args.get(name, default))
+    except ValueError:
+        return None
+    return value if value > 0 else None
+
+
+@admin.route("/profile/start", methods=["POST"])
+def profile_start():
+    mode = request.args.get("mode", "sample")
+    if mode not in ("sample", "cprofile"):
+        return jsonify(error="mode must be 'sample' or 'cprofile'"), 400
+    seconds = _positive_arg("seconds", 10)
+    interval_ms = _positive_arg("interval_ms", 5)
+    if seconds is None or interval_ms is None:
+        return jsonify(error="seconds and interval_ms must be positive numbers"), 400
+    seconds = min(seconds, MAX_PROFILE_SECONDS)
+    interval = max(interval_ms, 1.0) / 1000
+    with _profile_lock:
+        if _profile_state["running"]:
+            return jsonify(error="a capture is already running"), 409
+        _profile_state.update(running=True, mode=mode, result=None, finished=None)
+    threading.Thread(target=_run_capture, args=(mode, seconds, interval), daemon=True,
+                     name="admin-profiler").start()
+    log.info("profile_capture_started", mode=mode, seconds=seconds)
+    return jsonify(status="started", mode=mode, seconds=seconds, pid=os.getpid()), 202
+
+
+@admin.route("/profile", methods=["GET"])
+def profile_result():
+    with _profile_lock:
+        state = dict(_profile_state)
+    if state["running"]:
+        return jsonify(status="running", mode=state["mode"], pid=os.getpid()), 202
+    if state["result"] is None:
+        return jsonify(error="no capture has been run on this worker", pid=os.getpid()), 404
+    return Response(state["result"], mimetype="text/plain")
+
+
+# --- Memory ------------------------------------------------------------------
+
+def approximate_size(obj, max_objects: int = 200000) -> int:
+    """Rough deep size of containers (dicts, lists, deques, sets, tuples and their contents)"""
+    seen = set()
+    stack = [obj]
+    total = 0
+    while stack and len(seen) < max_objects:
+        current = stack.pop()
+        if id(current) in seen:
+            continue
+        seen.add(id(current))
+        total += sys.getsizeof(current)
+        if isinstance(current, dict):
+            stack.extend(current.keys())
+            stack.extend(current.values())
+        elif isinstance(current, (list, tuple, set, frozenset, deque)):
+            stack.extend(current)
+        elif hasattr(current, "__dict__") and not isinstance(current, type):
+            stack.append(vars(current))
+    return total
+
+
+def structure_sizes() -> Dict[str, Dict[str, int]]:
+    sizes = {}
+    for name, getter in _structures.items():
+        try:
+            value = getter()
+            sizes[name] = {
+                "entries": len(value) if hasattr(value, "__len__") else None,
+                "approx_bytes": approximate_size(value),
+            }
+        except Exception as e:
+            sizes[name] = {"error": str(e)}
+    return sizes
+
+
+@admin.route("/memory/start", methods=["POST"])
+def memory_start():
+    frames = _positive_int_arg("frames", 10)
+    if frames is None:
+        return jsonify(error="frames must be a positive whole number"), 400
+    frames = min(frames, 50)
+    if not tracemalloc.is_tracing():
+        tracemalloc.start(frames)
+    log.info("tracemalloc_started", frames=frames)
+    return jsonify(status="tracing", frames=tracemalloc.get_traceback_limit(), pid=os.getpid())
+
+
+@admin.route("/memory/stop", methods=["POST"])
+def memory_stop():
+    global _last_snapshot
+    with _memory_lock:
+        _last_snapshot = None
+    tracemalloc.stop()
+    return jsonify(status="stopped", pid=os.getpid())
+
+
+@admin.route("/memory/snapshot", methods=["GET"])
+def memory_snapshot():
+    global _last_snapshot
+    limit = _positive_int_arg("limit", 25)
+    if limit is None:
+        return jsonify(error="limit must be a positive whole number"), 400
+    limit = min(limit, 200)
+    group_by = request.args.get("group_by", "lineno")
+    if group_by not in ("lineno", "filename", "traceback"):
+        return jsonify(error="group_by must be lineno, filename or traceback"), 400
+
+    report = {"pid": os.getpid(), "structures": structure_sizes()}
+    if not tracemalloc.is_tracing():
+        report["tracemalloc"] = "not running - POST /admin/memory/start first"
+        return jsonify(report)
+
+    snapshot = tracemalloc.take_snapshot().filter_traces((
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+    ))
+    current, peak = tracemalloc.get_traced_memory()
+    report.update(traced_bytes=current, peak_traced_bytes=peak)
+
+    with _memory_lock:
+        previous, _last_snapshot = _last_snapshot, snapshot
+
+    if previous is None:
+        stats = snapshot.statistics(group_by)[:limit]
+        report["top"] = [
+            {"site": _format_site(stat.traceback, group_by), "bytes": stat.size, "blocks": stat.count}
+            for stat in stats
+        ]
+    else:
+        stats = snapshot.compare_to(previous, group_by)[:limit]
+        report["growth"] = [
+            {
+                "site": _format_site(stat.traceback, group_by),
+                "bytes": stat.size,
+                "bytes_diff": stat.size_diff,
+                "blocks_diff": stat.count_diff,
+            }
+            for stat in stats
+        ]
+    return jsonify(report)
+
+
+def _format_site(traceback, group_by: str):
+    if group_by == "traceback":
+        return [f"{frame.filename}:{frame.lineno}" for frame in traceback]
+    frame = traceback[0]
+    return frame.filename if group_by == "filename" else f"{frame.filename}:{frame.lineno}"
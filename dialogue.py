@@ -0,0 +1,80 @@
+"""
+Order-flow state machine for a call
+browsing -> ordering -> awaiting_room -> confirming -> complete, and back to ordering for a
+follow-up order. Turns that land in a deterministic state (asking for the room, confirming the
+total, the closing line) are answered from localized templates in languages.py, so only free-form
+turns go to the LLM.
+"""
+
+from enum import Enum
+from typing import Dict, Optional, Tuple
+
+from languages import LanguageProfile
+from menu_catalog import format_dollars
+from structured_logging import get_logger
+
+log = get_logger("dialogue")
+
+
+class DialogueState(str, Enum):
+    BROWSING = "browsing"             # Nothing ordered yet
+    ORDERING = "ordering"             # Items in the order
+    AWAITING_ROOM = "awaiting_room"   # Guest is done; we need the room number
+    CONFIRMING = "confirming"         # Room known, order being dispatched
+    COMPLETE = "complete"             # Order placed
+
+
+class DialogueEvent(str, Enum):
+    ITEM_ADDED = "item_added"
+    ORDER_EMPTIED = "order_emptied"   # Last item removed (or its add undone)
+    CHECKOUT = "checkout"             # "that's all", or "no" to "anything else?"
+    ROOM_KNOWN = "room_known"         # Room number on file while awaiting it
+    ORDER_PLACED = "order_placed"
+    DISPATCH_FAILED = "dispatch_failed"
+
+
+TRANSITIONS: Dict[Tuple[DialogueState, DialogueEvent], DialogueState] = {
+    (DialogueState.BROWSING, DialogueEvent.ITEM_ADDED): DialogueState.ORDERING,
+    (DialogueState.ORDERING, DialogueEvent.ITEM_ADDED): DialogueState.ORDERING,
+    (DialogueState.ORDERING, DialogueEvent.CHECKOUT): DialogueState.AWAITING_ROOM,
+    (DialogueState.ORDERING, DialogueEvent.ORDER_EMPTIED): DialogueState.BROWSING,
+    (DialogueState.AWAITING_ROOM, DialogueEvent.ITEM_ADDED): DialogueState.ORDERING,
+    (DialogueState.AWAITING_ROOM, DialogueEvent.CHECKOUT): DialogueState.AWAITING_ROOM,
+    (DialogueState.AWAITING_ROOM, DialogueEvent.ROOM_KNOWN): DialogueState.CONFIRMING,
+    (DialogueState.AWAITING_ROOM, DialogueEvent.ORDER_EMPTIED): DialogueState.BROWSING,
+    (DialogueState.CONFIRMING, DialogueEvent.ORDER_PLACED): DialogueState.COMPLETE,
+    # The order stays in place, so saying "that's all" again retries the dispatch
+    (DialogueState.CONFIRMING, DialogueEvent.DISPATCH_FAILED): DialogueState.ORDERING,
+    # Ordering more after the order went out starts a new order, which goes through checkout again
+    (DialogueState.COMPLETE, DialogueEvent.ITEM_ADDED): DialogueState.ORDERING,
+}
+
+
+def transition(state: DialogueState, event: DialogueEvent) -> Optional[DialogueState]:
+    """Next state, or None if the event doesn't apply in this state"""
+    return TRANSITIONS.get((state, event))
+
+
+class Dialogue:
+    """Where one call is in the order flow, plus the room number once we have it"""
+    __slots__ = ("state", "room")
+
+    def __init__(self):
+        self.state = DialogueState.BROWSING
+        self.room = ""
+
+    def fire(self, event: DialogueEvent, call_sid: str = None) -> bool:
+        """Apply an event; returns False (and stays put) if it doesn't apply"""
+        next_state = transition(self.state, event)
+        if next_state is None:
+            return False
+        if next_state is not self.state:
+            log.info("transition", call_sid=call_sid, trigger=event.value,
+                     from_state=self.state.value, to_state=next_state.value)
+        self.state = next_state
+        return True
+
+
+def confirmation_text(profile: LanguageProfile, total_cents: int) -> str:
+    """Order total read back when the order is placed, followed by the closing line"""
+    return f"{profile.confirm_total.format(total=format_dollars(total_cents))} {profile.closing}"
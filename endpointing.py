@@ -0,0 +1,145 @@
+"""
+Adaptive end-of-speech detection
+speechTimeout="auto" waits the same silence after every utterance. Instead, each <Gather> gets a
+numeric timeout: short while we wait for a room number, and otherwise sized to how long this guest
+pauses mid-sentence. The pauses are the gaps between Twilio's partial results (PARTIAL_SPEECH_RESULTS),
+smoothed per call; until a guest has spoken once, the average for their language is used, and until
+that is known, "auto". Consecutive turns with no speech are counted so the call can resume its
+state (and eventually give up) rather than start over.
+
+Environment:
+    ADAPTIVE_SPEECH_TIMEOUT   0 = always speechTimeout="auto" (default 1)
+    ROOM_SPEECH_TIMEOUT       Seconds of silence that end a room number (default 1)
+    MAX_SPEECH_TIMEOUT        Longest timeout for hesitant speakers (default 3)
+"""
+
+import math
+import os
+import threading
+import time
+from typing import Dict, Optional
+
+import metrics
+from speech_hints import AWAITING_ROOM
+
+ADAPTIVE_SPEECH_TIMEOUT = os.getenv("ADAPTIVE_SPEECH_TIMEOUT", "1").lower() not in ("0", "false", "no")
+ROOM_SPEECH_TIMEOUT = int(os.getenv("ROOM_SPEECH_TIMEOUT", "1"))
+MAX_SPEECH_TIMEOUT = int(os.getenv("MAX_SPEECH_TIMEOUT", "3"))
+
+# Silence allowed beyond the guest's usual mid-sentence pause before their turn is cut off
+PAUSE_MARGIN = 1.5
+
+# Weight of the newest pause in the per-call and per-language averages
+PAUSE_SMOOTHING = 0.3
+
+# Turns a language needs before its average stands in for a new caller's
+MIN_LANGUAGE_TURNS = 5
+
+SPEECH_TIMEOUTS = metrics.counter(
+    "roomservice_speech_timeouts_total", "Gathers by conversation state and speechTimeout chosen", ("state", "timeout"))
+END_OF_SPEECH_SECONDS = metrics.histogram(
+    "roomservice_end_of_speech_seconds", "Time from the last partial result to the final result, by speechTimeout",
+    ("timeout",), buckets=(0.25, 0.5, 0.75, 1.0, 1.5, 2.0, 3.0, 5.0))
+NO_INPUT = metrics.counter("roomservice_no_input_total", "Gathers that heard nothing, by conversation state", ("state",))
+
+
+class _CallTiming:
+    __slots__ = ("pause", "last_partial", "partials", "longest_gap", "timeout", "silent_turns")
+
+    def __init__(self):
+        self.pause: Optional[float] = None     # Smoothed longest mid-sentence pause
+        self.last_partial: Optional[float] = None
+        self.partials = 0                      # Partial results this turn
+        self.longest_gap = 0.0                 # Longest gap between them
+        self.timeout = "auto"                  # speechTimeout of the last Gather
+        self.silent_turns = 0                  # Consecutive Gathers that heard nothing
+
+    def reset_turn(self):
+        self.last_partial, self.partials, self.longest_gap = None, 0, 0.0
+
+
+def _smooth(average: Optional[float], sample: float) -> float:
+    return sample if average is None else average + PAUSE_SMOOTHING * (sample - average)
+
+
+class EndpointTracker:
+    """Per-call pause timings and the speechTimeout they call for"""
+
+    def __init__(self, adaptive: bool = ADAPTIVE_SPEECH_TIMEOUT):
+        self.adaptive = adaptive
+        self._lock = threading.Lock()
+        self._calls: Dict[str, _CallTiming] = {}
+        self._languages: Dict[str, list] = {}   # language -> [smoothed pause, turns]
+
+    def _call(self, call_sid: str) -> _CallTiming:
+        timing = self._calls.get(call_sid)
+        if timing is None:
+            timing = self._calls[call_sid] = _CallTiming()
+        return timing
+
+    def on_partial(self, call_sid: str, now: Optional[float] = None):
+        """A partial result arrived: the gap since the previous one is a pause in the guest's speech"""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            timing = self._call(call_sid)
+            if timing.last_partial is not None:
+                timing.longest_gap = max(timing.longest_gap, now - timing.last_partial)
+            timing.last_partial = now
+            timing.partials += 1
+
+    def on_final(self, call_sid: str, language: str, now: Optional[float] = None):
+        """The final result arrived: learn this turn's pauses and time its end of speech"""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            timing = self._call(call_sid)
+            timing.silent_turns = 0
+            if timing.last_partial is None:
+                return
+            END_OF_SPEECH_SECONDS.observe(now - timing.last_partial, timeout=timing.timeout)
+            # A one-word answer says nothing about how long this guest pauses
+            if timing.partials > 1:
+                timing.pause = _smooth(timing.pause, timing.longest_gap)
+                stats = self._languages.setdefault(language, [None, 0])
+                stats[0] = _smooth(stats[0], timing.longest_gap)
+                stats[1] += 1
+            timing.reset_turn()
+
+    def on_no_input(self, call_sid: str, state: str) -> int:
+        """A Gather heard nothing; returns how many in a row have"""
+        NO_INPUT.inc(state=state)
+        with self._lock:
+            timing = self._call(call_sid)
+            timing.silent_turns += 1
+            timing.reset_turn()
+            return timing.silent_turns
+
+    def _pause(self, timing: _CallTiming, language: str) -> Optional[float]:
+        if timing.pause is not None:
+            return timing.pause
+        stats = self._languages.get(language)
+        if stats is not None and stats[1] >= MIN_LANGUAGE_TURNS:
+            return stats[0]
+        return None
+
+    def speech_timeout(self, call_sid: Optional[str], language: str, state: str) -> str:
+        """speechTimeout for the call's next Gather: whole seconds, or "auto" while nothing is known"""
+        timeout = "auto"
+        if self.adaptive:
+            with self._lock:
+                timing = self._call(call_sid) if call_sid else _CallTiming()
+                pause = self._pause(timing, language)
+                if pause is not None:
+                    seconds = min(MAX_SPEECH_TIMEOUT, max(1, math.ceil(pause * PAUSE_MARGIN)))
+                    timeout = str(min(seconds, ROOM_SPEECH_TIMEOUT) if state == AWAITING_ROOM else seconds)
+                elif state == AWAITING_ROOM:
+                    timeout = str(ROOM_SPEECH_TIMEOUT)
+                timing.timeout = timeout
+        SPEECH_TIMEOUTS.inc(state=state, timeout=timeout)
+        return timeout
+
+    def end_call(self, call_sid: str):
+        with self._lock:
+            self._calls.pop(call_sid, None)
+
+    def __len__(self) -> int:
+        return len(self._calls)
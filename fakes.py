@@ -0,0 +1,16 @@
+"""
+In-process stand-ins for outside services
+Shared by the benchmarks, the offline replay tools and the tests, so none of them reach Google
+Cloud TTS.
+"""
+
+
+class FakeSynthesisResponse:
+    audio_content = b"\xff\xf3" * 2048
+
+
+class FakeTTSClient:
+    """Stands in for texttospeech.TextToSpeechClient"""
+
+    def synthesize_speech(self, input=None, voice=None, audio_config=None):
+        return FakeSynthesisResponse()
@@ -0,0 +1,127 @@
+"""
+Idempotent webhook handling
+Twilio retries a webhook that is slow or fails, and can deliver the same POST twice. Each
+<Gather> we return carries a turn number in its action URL (/process-speech?turn=N), so a POST is
+identified by CallSid, turn and a hash of the speech; requests without a turn (the greeting at
+/voice) by Twilio's I-Twilio-Idempotency-Token, which its retries repeat. The first request for a key does the turn.
+Duplicates that arrive while it runs wait for its response, and later ones are served the cached
+TwiML, so a retry costs no LLM, TTS or email work.
+
+Environment:
+    WEBHOOK_REPLAY_TTL_SECONDS       How long responses are kept for replay (default 300)
+    WEBHOOK_DUPLICATE_WAIT_SECONDS   How long a duplicate waits for the original to finish (default 10)
+"""
+
+import hashlib
+import os
+import threading
+import time
+from typing import Any, Dict, NamedTuple, Optional
+
+import metrics
+from structured_logging import get_logger
+
+log = get_logger("idempotency")
+
+WEBHOOK_REPLAY_TTL_SECONDS = float(os.getenv("WEBHOOK_REPLAY_TTL_SECONDS", "300"))
+WEBHOOK_DUPLICATE_WAIT_SECONDS = float(os.getenv("WEBHOOK_DUPLICATE_WAIT_SECONDS", "10"))
+
+WEBHOOK_DUPLICATES = metrics.counter(
+    "roomservice_webhook_duplicates_total", "Duplicate webhook deliveries, by how they were answered", ("outcome",))
+
+
+def request_key(call_sid: Optional[str], turn: Optional[str], speech: str = "",
+                idempotency_token: Optional[str] = None) -> Optional[str]:
+    """Key identifying one webhook delivery, or None if a repeat can't be told from a new turn"""
+    if not call_sid:
+        return None
+    if turn:
+        speech_hash = hashlib.sha1(speech.encode()).hexdigest()[:12]
+        return f"{call_sid}:{turn}:{speech_hash}"
+    if idempotency_token:
+        return f"{call_sid}:token:{idempotency_token}"
+    return None
+
+
+class Claim(NamedTuple):
+    owner: bool               # This request should do the work and complete() the key
+    response: Any = None      # Cached response of the original request, for duplicates
+
+
+class _Entry:
+    __slots__ = ("call_sid", "done", "response", "expires")
+
+    def __init__(self, call_sid: str):
+        self.call_sid = call_sid
+        self.done = threading.Event()
+        self.response = None
+        self.expires = float("inf")
+
+
+class ReplayCache:
+    """Short-lived responses by request key, plus the turn counter for each call"""
+
+    def __init__(self, ttl: float = WEBHOOK_REPLAY_TTL_SECONDS, wait: float = WEBHOOK_DUPLICATE_WAIT_SECONDS):
+        self._ttl = ttl
+        self._wait = wait
+        self._lock = threading.Lock()
+        self._entries: Dict[str, _Entry] = {}
+        self._turns: Dict[str, int] = {}
+
+    def next_turn(self, call_sid: str) -> int:
+        """Number for the next <Gather> of a call"""
+        with self._lock:
+            turn = self._turns.get(call_sid, 0) + 1
+            self._turns[call_sid] = turn
+        return turn
+
+    def claim(self, key: str, call_sid: str) -> Claim:
+        """Take ownership of a new key, or wait for and return the original's response"""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry.expires <= now:
+                self._entries[key] = _Entry(call_sid)
+                return Claim(True)
+        if entry.done.is_set():
+            WEBHOOK_DUPLICATES.inc(outcome="cached")
+            log.info("webhook_replayed", key=key)
+            return Claim(False, entry.response)
+        if entry.done.wait(self._wait) and entry.response is not None:
+            WEBHOOK_DUPLICATES.inc(outcome="waited")
+            log.info("webhook_replayed", key=key, waited=True)
+            return Claim(False, entry.response)
+        WEBHOOK_DUPLICATES.inc(outcome="timeout")
+        log.warning("webhook_duplicate_timeout", key=key)
+        return Claim(False)
+
+    def complete(self, key: str, response):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return
+            entry.response = response
+            entry.expires = time.monotonic() + self._ttl
+            self._expire_locked()
+        entry.done.set()
+
+    def abandon(self, key: str):
+        """The original failed; let the next delivery do the work"""
+        with self._lock:
+            entry = self._entries.pop(key, None)
+        if entry is not None:
+            entry.done.set()
+
+    def end_call(self, call_sid: str):
+        with self._lock:
+            self._turns.pop(call_sid, None)
+            for key in [key for key, entry in self._entries.items() if entry.call_sid == call_sid and entry.done.is_set()]:
+                del self._entries[key]
+
+    def _expire_locked(self):
+        now = time.monotonic()
+        for key in [key for key, entry in self._entries.items() if entry.expires <= now]:
+            del self._entries[key]
+
+    def __len__(self) -> int:
+        return len(self._entries)
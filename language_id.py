@@ -0,0 +1,179 @@
+"""
+In-process language identification of what the guest said
+Each final transcript is classified in microseconds, so the turn's reply, templates and TTS voice
+match the language actually spoken, without waiting on Twilio's optional SpeechLanguage or on the
+LLM switching by itself. Scripts with a single language (Hangul, kana, Thai, ...) decide directly;
+Arabic script is split into Farsi and Arabic by their own letters. Latin-script text is scored
+against compact per-language stopword lists plus distinctive letters and letter groups, and only a
+clear winner counts, so dish names ("crème brûlée", "truffle fries") don't flip the call's language.
+"""
+
+import re
+from types import MappingProxyType
+from typing import Dict, Mapping, Optional, Tuple
+
+import metrics
+from languages import LANGUAGE_PROFILES
+
+LANGUAGE_IDS = metrics.counter(
+    "roomservice_language_id_total", "Turns by what language identification concluded", ("outcome",))
+
+# Scripts that identify a language (or a pair) by themselves: found with one character class, then told apart
+_SCRIPT_RANGES = {
+    "ko": "가-힯ᄀ-ᇿ㄰-㆏", "ja": "぀-ヿ", "zh": "一-鿿㐀-䶿", "arabic": "؀-ۿݐ-ݿﭐ-﷿ﹰ-﻿",
+    "hi": "ऀ-ॿ", "ru": "Ѐ-ӿ", "th": "฀-๿",
+}
+_ANY_SCRIPT = re.compile("[" + "".join(_SCRIPT_RANGES.values()) + "]")
+_SCRIPTS = re.compile("|".join(f"(?P<{name}>[{ranges}])" for name, ranges in _SCRIPT_RANGES.items()))
+_KANA = re.compile(r"[぀-ヿ]")
+
+# Letters only Farsi uses, and letters Farsi writes differently from Arabic
+_FARSI_LETTERS = re.compile(r"[پچژگیک]")
+_ARABIC_LETTERS = re.compile(r"[ةيكى]")
+
+# Words, keeping an apostrophe inside them ("i'd", "c'est")
+_WORD_RE = re.compile(r"[^\W\d_]+(?:['’][^\W\d_]+)?")
+
+# Everyday words of ordering speech. A word listed for several languages scores for each, split evenly.
+STOPWORDS: Mapping[str, str] = MappingProxyType({
+    "en": "the and i i'd i'll i'm like to of is it for please with can could would have you my what do does that "
+          "that's this want get some me thanks thank yes how much are an order room just any anything else all",
+    "es": "el la los las de del que y por favor quiero quisiera me gustaría una un con para es está tiene tienen "
+          "qué cuánto cuesta sí gracias también nada más mi habitación pedir postre eso todo",
+    "fr": "le la les des du de et je voudrais veux un une avec pour est c'est s'il vous plaît merci oui non aussi "
+          "quoi combien mon ma chambre commander rien d'autre ça",
+    "de": "der die das und ich möchte hätte gern gerne bitte ein eine einen mit für ist ja nein danke auch was "
+          "kostet wie viel mein meine zimmer bestellen nichts mehr noch",
+    "it": "il lo la gli le di del e vorrei voglio un una con per è sì grazie anche cosa quanto costa mio mia "
+          "camera ordinare niente altro ancora favore",
+    "pt": "o a os as de do da e eu quero gostaria um uma com para é sim obrigado obrigada também quanto custa "
+          "meu minha quarto pedir nada mais por favor você",
+    "nl": "de het een en ik wil graag mag met voor is ja nee dank bedankt ook wat kost hoeveel mijn kamer "
+          "bestellen niets meer nog alstublieft",
+    "pl": "i w z na do się jest poproszę chciałbym chciałabym proszę tak nie dziękuję też co ile kosztuje mój "
+          "moja pokój zamówić nic więcej jeszcze",
+    "tr": "ve bir ile için bu evet hayır teşekkürler teşekkür ederim lütfen istiyorum ne kadar odam oda "
+          "numaram sipariş başka şey",
+    "sv": "och jag vill ha en ett med för är ja nej tack också vad kostar hur mycket mitt min rum beställa "
+          "inget mer",
+    "da": "og jeg vil gerne have en et med til er ja nej tak også hvad koster hvor meget mit min værelse "
+          "bestille intet mere",
+    "no": "og jeg vil gjerne ha en et med til er ja nei takk også hva koster hvor mye mitt min rom bestille "
+          "ingenting mer",
+    "fi": "ja minä haluaisin haluan kiitos kyllä ei myös mitä paljonko maksaa huone huoneeni tilata muuta "
+          "se on",
+    "cs": "a já bych chtěl chtěla prosím ano ne děkuji také co kolik stojí můj moje pokoj objednat nic další je",
+    "hu": "és én szeretnék kérek kérem igen nem köszönöm is mit mennyibe kerül szobám szoba rendelni semmi "
+          "más egy az",
+    "ro": "și eu aș vrea vreau un o cu pentru este da nu mulțumesc ce cât costă camera mea comanda nimic "
+          "altceva vă rog",
+    "vi": "tôi muốn cho và một với là có không cảm ơn cũng gì bao nhiêu phòng của đặt món nữa vâng",
+})
+
+# Letters and letter groups typical of a language's spelling, scored per occurrence at half a word
+MARKERS: Mapping[str, Tuple[str, ...]] = MappingProxyType({
+    "es": ("ñ", "¿", "¡", "ción"),
+    "fr": ("ç", "œ", "è", "ê", "eau", "oux", "qu'"),
+    "de": ("ß", "ä", "ö", "ü", "sch", "tz"),
+    "it": ("gli", "zz", "cch", "ò", "ù"),
+    "pt": ("ã", "õ", "ção", "lh", "nh"),
+    "nl": ("ij", "aa", "oe", "uu"),
+    "pl": ("ł", "ś", "ż", "ź", "ę", "ą", "ń", "rz", "cz"),
+    "tr": ("ğ", "ı", "ş", "ü", "ö"),
+    "sv": ("å", "ä", "ö"),
+    "da": ("ø", "æ", "å"),
+    "no": ("ø", "æ", "å"),
+    "fi": ("ää", "yy", "ö"),
+    "cs": ("ě", "ř", "ů", "č", "ž"),
+    "hu": ("ő", "ű", "gy", "sz"),
+    "ro": ("ă", "ș", "ț", "î", "â"),
+    "vi": ("ơ", "ư", "đ", "ạ", "ả", "ế", "ộ", "ờ"),
+})
+
+MARKER_WEIGHT = 0.5
+
+# A Latin-script guess needs this score, and this multiple of the runner-up's
+MIN_SCORE = 1.5
+MIN_MARGIN = 1.5
+
+
+def _weights(words_by_language: Mapping[str, Tuple[str, ...]]) -> Dict[str, Tuple[Tuple[str, float], ...]]:
+    languages_by_word: Dict[str, list] = {}
+    for language, words in words_by_language.items():
+        for word in words:
+            languages_by_word.setdefault(word, []).append(language)
+    return {word: tuple((language, 1 / len(languages)) for language in languages)
+            for word, languages in languages_by_word.items()}
+
+
+_WORD_WEIGHTS = _weights({language: tuple(set(words.split())) for language, words in STOPWORDS.items()})
+_MARKER_WEIGHTS = _weights(MARKERS)
+# Letter groups are counted in every text; single accented letters only when the text has them
+_GROUP_WEIGHTS = {marker: weights for marker, weights in _MARKER_WEIGHTS.items() if len(marker) > 1}
+_LETTER_WEIGHTS = {marker: weights for marker, weights in _MARKER_WEIGHTS.items() if len(marker) == 1}
+
+
+def _default_codes() -> Dict[str, str]:
+    """Base language -> the first profile for it ("es" -> "es-ES")"""
+    codes: Dict[str, str] = {}
+    for code in LANGUAGE_PROFILES:
+        codes.setdefault(code.split("-")[0], code)
+    return codes
+
+
+DEFAULT_CODES = MappingProxyType(_default_codes())
+
+
+def latin_scores(text: str) -> Dict[str, float]:
+    """Stopword and spelling scores per base language for lowercased Latin-script text"""
+    scores: Dict[str, float] = {}
+    for word in _WORD_RE.findall(text.replace("’", "'")):
+        for language, weight in _WORD_WEIGHTS.get(word, ()):
+            scores[language] = scores.get(language, 0.0) + weight
+    markers = [(marker, weights) for marker, weights in _GROUP_WEIGHTS.items() if marker in text]
+    if not text.isascii():
+        markers.extend((letter, _LETTER_WEIGHTS[letter]) for letter in _LETTER_WEIGHTS.keys() & set(text))
+    for marker, weights in markers:
+        count = text.count(marker)
+        for language, weight in weights:
+            scores[language] = scores.get(language, 0.0) + count * weight * MARKER_WEIGHT
+    return scores
+
+
+def identify_base(text: str) -> Optional[str]:
+    """Base language ("es", "fa", ...) of an utterance, or None if it isn't clear"""
+    if not text:
+        return None
+    if not text.isascii():
+        match = _ANY_SCRIPT.search(text)
+        if match is not None:
+            language = _SCRIPTS.match(match.group()).lastgroup
+            if language == "zh" and _KANA.search(text):
+                return "ja"    # Japanese mixes kanji with kana
+            if language == "arabic":
+                farsi, arabic = len(_FARSI_LETTERS.findall(text)), len(_ARABIC_LETTERS.findall(text))
+                return "ar" if arabic > farsi else "fa"
+            return language
+    scores = latin_scores(text.lower())
+    if not scores:
+        return None
+    ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)
+    best, score = ranked[0]
+    runner_up = ranked[1][1] if len(ranked) > 1 else 0.0
+    if score < MIN_SCORE or score < runner_up * MIN_MARGIN:
+        return None
+    return best
+
+
+def identify(text: str, current: str) -> Optional[str]:
+    """Language code for an utterance, keeping the call's regional variant; None if unclear"""
+    base = identify_base(text)
+    if base is None:
+        LANGUAGE_IDS.inc(outcome="unknown")
+        return None
+    if current.split("-")[0] == base:
+        LANGUAGE_IDS.inc(outcome="same")
+        return current
+    code = DEFAULT_CODES.get(base)
+    LANGUAGE_IDS.inc(outcome="changed" if code else "unsupported")
+    return code
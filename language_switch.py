@@ -0,0 +1,117 @@
+"""
+Single-pass detection of "switch language" requests
+The utterance is tokenized once and matched against a prebuilt phrase index of language names.
+A match only counts as a switch request when it is bare ("Farsi", "in Spanish please") or next to
+a request word ("speak French", "switch to German"). Language names followed by a food word are
+not switch requests - "French fries", "French toast", "Italian soda".
+"""
+
+import re
+from typing import Dict, Iterable, Mapping, Optional, Tuple
+
+# Split on whitespace and punctuation only - \w would break up Devanagari and Arabic words
+_TOKEN_RE = re.compile(r"[^\s.,!?;:\"()\[\]¿¡،؟。、！？，]+")
+
+# Words that may surround a bare language name ("Farsi please", "in Spanish", "English now")
+FILLER_WORDS = frozenset({
+    "please", "language", "now", "ok", "okay", "yes", "yeah", "in", "only", "just", "thanks",
+    "thank", "you", "oh", "um", "uh", "lets", "let's", "the", "to",
+    "por", "favor", "en", "auf", "bitte", "s'il", "vous", "plaît", "per", "favore",
+    "لطفا", "لطفاً", "به", "بله",
+})
+
+# Words that turn a nearby language name into a switch request ("speak Farsi", "hablar español")
+REQUEST_WORDS = frozenset({
+    "speak", "speaking", "use", "switch", "change", "talk", "talking",
+    "hablar", "habla", "hable", "parler", "parlez", "parle", "sprechen", "sprich",
+    "parlare", "parli", "falar", "fale", "говорить", "говорите", "बोलो", "बोलिए", "बात",
+    "صحبت", "تكلم", "تحدث",
+})
+
+# Dish words that commonly follow a language name on menus
+FOOD_FOLLOWERS = frozenset({
+    "fries", "fry", "toast", "dressing", "onion", "soup", "bread", "press", "roast", "vanilla",
+    "cheese", "butter", "wine", "sausage", "salad", "dip", "crepe", "crepes", "beans", "pastry", "omelette",
+    "omelet", "rice", "chocolate", "cake", "soda", "meringue", "chicken", "noodles", "whisky",
+    "whiskey", "wagyu", "tea", "coffee", "cuisine", "food", "dish", "style", "breakfast",
+})
+
+# How many tokens away a request word may be from the language name
+REQUEST_WINDOW = 3
+
+
+def tokenize(text: str) -> Tuple[str, ...]:
+    return tuple(_TOKEN_RE.findall(text.lower()))
+
+
+def _has_unspaced_script(keyword: str) -> bool:
+    """Chinese and Japanese are written without spaces between words"""
+    return any("぀" <= ch <= "ヿ" or "一" <= ch <= "鿿" for ch in keyword)
+
+
+class LanguageSwitchDetector:
+    """Compiled matcher mapping an utterance to the language the guest asked for, if any"""
+
+    def __init__(self, keywords: Mapping[str, str], menu_names: Iterable[str] = ()):
+        # Phrase index: first token -> [(full token tuple, language code)], longest phrases first
+        self._phrases: Dict[str, list] = {}
+        # Unspaced-script keywords, matched as a prefix/suffix of a token
+        self._affixes: Tuple[Tuple[str, str], ...] = ()
+        affixes = []
+        for keyword, lang_code in keywords.items():
+            if _has_unspaced_script(keyword):
+                affixes.append((keyword, lang_code))
+                continue
+            tokens = tokenize(keyword)
+            if tokens:
+                self._phrases.setdefault(tokens[0], []).append((tokens, lang_code))
+        for entries in self._phrases.values():
+            entries.sort(key=lambda entry: -len(entry[0]))
+        self._affixes = tuple(affixes)
+
+        # Words that, right after a language name, mean it is part of a dish name
+        menu_words = {token for name in menu_names for token in tokenize(name)}
+        language_words = {token for entries in self._phrases.values() for phrase, _ in entries for token in phrase}
+        self._food_followers = frozenset(FOOD_FOLLOWERS | (menu_words - language_words - FILLER_WORDS))
+
+    def detect(self, text: str) -> Optional[str]:
+        """Return the requested language code, or None if this isn't a switch request"""
+        tokens = tokenize(text)
+        if not tokens:
+            return None
+
+        for i, token in enumerate(tokens):
+            entries = self._phrases.get(token)
+            if not entries:
+                continue
+            for phrase, lang_code in entries:
+                end = i + len(phrase)
+                if tokens[i:end] != phrase:
+                    continue
+                # "french fries", "italian soda" - part of a dish name
+                if end < len(tokens) and tokens[end] in self._food_followers:
+                    break
+                if self._is_request(tokens, i, end):
+                    return lang_code
+                break
+
+        if self._affixes and len(tokens) <= 2:
+            for token in tokens:
+                for keyword, lang_code in self._affixes:
+                    if token.startswith(keyword) or token.endswith(keyword):
+                        return lang_code
+        return None
+
+    def _is_request(self, tokens: Tuple[str, ...], start: int, end: int) -> bool:
+        rest = tokens[:start] + tokens[end:]
+        # Bare language name, optionally with filler words around it
+        if all(token in FILLER_WORDS for token in rest):
+            return True
+        # A request word close by: "speak Farsi", "switch to German", "español, hablar"
+        window = tokens[max(0, start - REQUEST_WINDOW):start] + tokens[end:end + REQUEST_WINDOW]
+        return any(token in REQUEST_WORDS for token in window)
+
+
+def menu_item_names(catalog) -> Iterable[str]:
+    """Item and category names from a MenuCatalog, for the dish-name guard"""
+    return catalog.names()
@@ -0,0 +1,380 @@
+"""
+Per-language profiles for the Room Service Agent
+Voices, Twilio/GCP language codes, spoken prompts and pre-rendered TwiML fragments are built
+once at import into an immutable registry. Adding a language is a data change to LANGUAGE_DATA.
+"""
+
+from types import MappingProxyType
+from typing import Dict, Mapping, NamedTuple, Optional, Tuple
+
+import twiml
+
+DEFAULT_LANGUAGE = "en-US"
+
+# Default Google Cloud TTS voice for languages without their own
+DEFAULT_GCP_VOICE = ("en-US-Neural2-F", "en-US")
+
+# Said (with Twilio's voice) when the guest says nothing after the greeting
+GREETING_NO_INPUT = "I didn't catch that. Please tell me how I can help you with our menu."
+
+# Where a <Gather> that heard nothing falls through to; it listens again in the call's current state
+NO_INPUT_PATH = "/no-input"
+
+# Raw language data. Prompts missing for a language fall back to English.
+#   twilio_voice     - Twilio <Say> voice
+#   twilio_language  - language code Twilio accepts for <Say> (defaults to the code itself)
+#   gcp_voice        - (Google Cloud TTS voice name, GCP language code); Neural2 for natural sound
+#   switch_keywords  - names a guest may say to switch to this language
+#   hint_words       - everyday ordering words biased into speech recognition (see speech_hints.py)
+#   room_words       - words for "room"/"room number", biased in while we wait for a room number
+#   greeting         - first prompt of the call; {version} is the code version timestamp
+#   switch_confirmation, repeat_prompt, anything_else, ask_room, closing - spoken prompts
+#   confirm_total    - order total read back when the order is placed; {total} is e.g. "42.50"
+#   item_added, item_price, busy - answers used when the LLM is over its admission limit (admission.py)
+#   recommend        - answer to a dietary/price request (recommendations.py); {items} is a list of dishes
+LANGUAGE_DATA: Dict[str, Dict] = {
+    "en-US": {
+        "twilio_voice": "alice",
+        "gcp_voice": ("en-US-Neural2-F", "en-US"),
+        "switch_keywords": ("english", "انگلیسی"),
+        "hint_words": ("menu", "order", "price", "dessert", "drinks", "yes", "no", "add", "remove", "review", "checkout", "that's all", "nothing else"),
+        "room_words": ("room", "room number", "my room is", "suite", "floor"),
+        "greeting": "Hello, this is Nasrin from Four Seasons room service. Last updated at {version}. I speak multiple languages—say the language name to switch. How can I help you today?",
+        "switch_confirmation": "Of course, I'll speak English. How may I assist you?",
+        "repeat_prompt": "I didn't catch that. Could you please repeat?",
+        "anything_else": "Is there anything else I can help you with?",
+        "ask_room": "Perfect! May I have your room number, please?",
+        "confirm_total": "That comes to {total} dollars, including service charge and delivery.",
+        "item_added": "{item} is on your order. That's {total} dollars so far. Anything else?",
+        "item_price": "{item} is {price} dollars. Would you like to order it?",
+        "busy": "Sorry, we're very busy at the moment. You can order any dish by name, or say that's all when you're done.",
+        "recommend": "You might enjoy {items}. Would you like one of those?",
+        "closing": "Thank you! Your order is on its way and will arrive in 30 to 45 minutes. Enjoy your stay!",
+    },
+    "en-GB": {"twilio_voice": "alice"},
+    "en-AU": {"twilio_voice": "alice"},
+    "en-CA": {"twilio_voice": "alice"},
+    "es-ES": {
+        "twilio_voice": "Conchita",
+        "gcp_voice": ("es-ES-Neural2-F", "es-ES"),
+        "switch_keywords": ("spanish", "español"),
+        "hint_words": ("menú", "orden", "pedido", "precio", "postre", "bebidas", "sí", "no", "añadir", "quitar", "eso es todo"),
+        "room_words": ("habitación", "número de habitación", "suite"),
+        "greeting": "Saludos desde Four Seasons. Soy Nasrin, su conserje dedicada de servicio a la habitación. Actualizado a las {version}. ¿Cómo puedo elevar su experiencia con un momento gastronómico delicioso hoy?",
+        "switch_confirmation": "Por supuesto, hablaré en español. ¿Cómo puedo ayudarle?",
+        "repeat_prompt": "No entendí eso. ¿Podría repetir, por favor?",
+        "anything_else": "¿Hay algo más en lo que pueda ayudarle?",
+        "ask_room": "¡Perfecto! ¿Me indica su número de habitación, por favor?",
+        "confirm_total": "El total es de {total} dólares, con el cargo por servicio y la entrega incluidos.",
+        "item_added": "{item} está en su pedido. Van {total} dólares hasta ahora. ¿Algo más?",
+        "item_price": "{item} cuesta {price} dólares. ¿Desea pedirlo?",
+        "busy": "Disculpe, estamos muy ocupados en este momento. Puede pedir cualquier plato por su nombre, o decir eso es todo cuando termine.",
+        "recommend": "Le podría gustar {items}. ¿Desea alguno?",
+        "closing": "¡Gracias! Su pedido está en camino y llegará en 30 a 45 minutos. ¡Disfrute su estancia!",
+    },
+    "es-MX": {"twilio_voice": "Conchita", "gcp_voice": ("es-MX-Neural2-F", "es-MX")},
+    "es-US": {"twilio_voice": "Conchita"},
+    "fr-FR": {
+        "twilio_voice": "Mathieu",
+        "gcp_voice": ("fr-FR-Neural2-C", "fr-FR"),
+        "switch_keywords": ("french", "français"),
+        "hint_words": ("menu", "commande", "prix", "dessert", "boissons", "oui", "non", "ajouter", "enlever", "c'est tout"),
+        "room_words": ("chambre", "numéro de chambre", "suite"),
+        "greeting": "Salutations du Four Seasons. Je suis Nasrin, votre concierge dédiée au service en chambre. Mis à jour à {version}. Comment puis-je rehausser votre expérience avec un moment de dégustation délicieux aujourd'hui?",
+        "switch_confirmation": "Bien sûr, je parlerai en français. Comment puis-je vous aider?",
+        "repeat_prompt": "Je n'ai pas compris. Pourriez-vous répéter, s'il vous plaît?",
+        "anything_else": "Y a-t-il autre chose avec laquelle je peux vous aider?",
+        "ask_room": "Parfait ! Puis-je avoir votre numéro de chambre, s'il vous plaît ?",
+        "confirm_total": "Le total est de {total} dollars, service et livraison compris.",
+        "item_added": "{item} est dans votre commande. Cela fait {total} dollars pour l'instant. Autre chose?",
+        "item_price": "{item} coûte {price} dollars. Souhaitez-vous le commander?",
+        "busy": "Désolée, nous sommes très occupés en ce moment. Vous pouvez commander un plat par son nom, ou dire c'est tout quand vous avez terminé.",
+        "recommend": "Vous pourriez aimer {items}. Souhaitez-vous l'un d'eux?",
+        "closing": "Merci ! Votre commande est en route et arrivera dans 30 à 45 minutes. Bon séjour !",
+    },
+    "fr-CA": {"twilio_voice": "Mathieu"},
+    "de-DE": {
+        "twilio_voice": "Hans",
+        "gcp_voice": ("de-DE-Neural2-F", "de-DE"),
+        "switch_keywords": ("german", "deutsch"),
+        "hint_words": ("Speisekarte", "bestellen", "Bestellung", "Preis", "Nachtisch", "Getränke", "ja", "nein", "hinzufügen", "entfernen", "das ist alles"),
+        "room_words": ("Zimmer", "Zimmernummer", "Suite"),
+        "greeting": "Grüße vom Four Seasons. Ich bin Nasrin, Ihre persönliche Concierge für den Zimmerservice. Aktualisiert um {version}. Wie kann ich Ihr Erlebnis heute mit einem köstlichen kulinarischen Moment bereichern?",
+        "switch_confirmation": "Natürlich, ich werde Deutsch sprechen. Wie kann ich Ihnen helfen?",
+        "repeat_prompt": "Das habe ich nicht verstanden. Könnten Sie das bitte wiederholen?",
+        "anything_else": "Gibt es noch etwas, womit ich Ihnen helfen kann?",
+        "ask_room": "Perfekt! Darf ich bitte Ihre Zimmernummer haben?",
+        "confirm_total": "Das macht {total} Dollar, inklusive Servicegebühr und Lieferung.",
+        "item_added": "{item} ist in Ihrer Bestellung. Das sind bisher {total} Dollar. Sonst noch etwas?",
+        "item_price": "{item} kostet {price} Dollar. Möchten Sie es bestellen?",
+        "busy": "Entschuldigung, wir sind gerade sehr beschäftigt. Sie können jedes Gericht beim Namen bestellen oder das ist alles sagen, wenn Sie fertig sind.",
+        "recommend": "Ihnen könnte {items} gefallen. Möchten Sie etwas davon?",
+        "closing": "Vielen Dank! Ihre Bestellung ist unterwegs und kommt in 30 bis 45 Minuten. Einen schönen Aufenthalt!",
+    },
+    "it-IT": {
+        "twilio_voice": "Carla",
+        "gcp_voice": ("it-IT-Neural2-C", "it-IT"),
+        "switch_keywords": ("italian", "italiano"),
+        "hint_words": ("menù", "ordine", "prezzo", "dolce", "bevande", "sì", "no", "aggiungere", "togliere", "è tutto"),
+        "room_words": ("camera", "numero di camera", "suite"),
+        "greeting": "Saluti dal Four Seasons. Sono Nasrin, la vostra concierge dedicata al servizio in camera. Aggiornato alle {version}. Come posso elevare la vostra esperienza con un delizioso momento gastronomico oggi?",
+        "switch_confirmation": "Certamente, parlerò in italiano. Come posso aiutarti?",
+        "repeat_prompt": "Non ho capito. Potresti ripetere, per favore?",
+        "anything_else": "C'è qualcos'altro con cui posso aiutarti?",
+        "ask_room": "Perfetto! Posso avere il numero della sua camera, per favore?",
+        "confirm_total": "Il totale è di {total} dollari, servizio e consegna inclusi.",
+        "item_added": "{item} è nel suo ordine. Finora sono {total} dollari. Altro?",
+        "item_price": "{item} costa {price} dollari. Desidera ordinarlo?",
+        "busy": "Mi scusi, in questo momento siamo molto occupati. Può ordinare qualsiasi piatto per nome, o dire è tutto quando ha finito.",
+        "recommend": "Potrebbe piacerle {items}. Desidera uno di questi?",
+        "closing": "Grazie! Il suo ordine è in arrivo e sarà da lei tra 30 e 45 minuti. Buon soggiorno!",
+    },
+    "pt-BR": {
+        "twilio_voice": "Vitoria",
+        "gcp_voice": ("pt-BR-Neural2-C", "pt-BR"),
+        "switch_keywords": ("portuguese", "português"),
+        "hint_words": ("cardápio", "pedido", "preço", "sobremesa", "bebidas", "sim", "não", "adicionar", "remover", "é só isso"),
+        "room_words": ("quarto", "número do quarto", "suíte"),
+        "greeting": "Saudações do Four Seasons. Sou Nasrin, sua concierge dedicada de serviço de quarto. Atualizado às {version}. Como posso elevar sua experiência com um momento gastronômico delicioso hoje?",
+        "switch_confirmation": "Claro, falarei em português. Como posso ajudá-lo?",
+        "repeat_prompt": "Não entendi. Você poderia repetir, por favor?",
+        "anything_else": "Há mais alguma coisa com que eu possa ajudá-lo?",
+        "ask_room": "Perfeito! Pode me informar o número do seu quarto, por favor?",
+        "confirm_total": "O total é de {total} dólares, com taxa de serviço e entrega incluídas.",
+        "item_added": "{item} está no seu pedido. Até agora são {total} dólares. Mais alguma coisa?",
+        "item_price": "{item} custa {price} dólares. Gostaria de pedir?",
+        "busy": "Desculpe, estamos muito ocupados no momento. Você pode pedir qualquer prato pelo nome, ou dizer é só isso quando terminar.",
+        "recommend": "Você pode gostar de {items}. Gostaria de algum?",
+        "closing": "Obrigada! Seu pedido está a caminho e chegará em 30 a 45 minutos. Aproveite sua estadia!",
+    },
+    "pt-PT": {"twilio_voice": "Cristiano"},
+    "ja-JP": {
+        "twilio_voice": "Takumi",
+        "gcp_voice": ("ja-JP-Neural2-C", "ja-JP"),
+        "switch_keywords": ("japanese", "日本語"),
+        "hint_words": ("メニュー", "注文", "価格", "デザート", "飲み物", "はい", "いいえ", "追加", "以上です"),
+        "room_words": ("部屋", "部屋番号", "号室"),
+        "greeting": "フォーシーズンズよりご挨拶申し上げます。ルームサービスの専属コンシェルジュ、ナスリンでございます。{version}に更新されました。本日、素晴らしい食事のひとときでお客様の体験をより豊かにするには、どのようにお手伝いできるでしょうか？",
+        "switch_confirmation": "もちろん、日本語で話します。どのようにお手伝いできますか？",
+        "repeat_prompt": "聞き取れませんでした。もう一度言っていただけますか？",
+        "anything_else": "他に何かお手伝いできることはありますか？",
+        "ask_room": "かしこまりました。お部屋番号を教えていただけますか？",
+        "confirm_total": "合計はサービス料と配達料込みで{total}ドルです。",
+        "item_added": "{item}をご注文に追加しました。現在の合計は{total}ドルです。他にご注文はございますか？",
+        "item_price": "{item}は{price}ドルです。ご注文なさいますか？",
+        "busy": "申し訳ございません、ただいま大変混み合っております。料理名でご注文いただくか、以上ですとおっしゃってください。",
+        "recommend": "{items}はいかがでしょうか。どれかご注文なさいますか？",
+        "closing": "ありがとうございます。ご注文は30分から45分ほどでお届けします。どうぞごゆっくりお過ごしください。",
+    },
+    "ko-KR": {"twilio_voice": "Seoyeon", "gcp_voice": ("ko-KR-Neural2-C", "ko-KR")},
+    "zh-CN": {
+        "twilio_voice": "Zhiyu",
+        "gcp_voice": ("zh-CN-Neural2-C", "zh-CN"),
+        "switch_keywords": ("chinese", "中文"),
+        "hint_words": ("菜单", "订单", "点餐", "价格", "甜点", "饮料", "是", "不", "添加", "就这些"),
+        "room_words": ("房间", "房间号", "号房"),
+        "greeting": "来自四季酒店的问候。我是纳斯林，您专属的客房服务礼宾。更新于{version}。今天，我如何通过美妙的用餐时刻来提升您的体验？",
+        "switch_confirmation": "当然，我会说中文。我能为您做些什么？",
+        "repeat_prompt": "我没听清楚。请您再说一遍好吗？",
+        "anything_else": "还有什么我可以帮助您的吗？",
+        "ask_room": "好的！请问您的房间号是多少？",
+        "confirm_total": "总计{total}加元，已包含服务费和送餐费。",
+        "item_added": "{item}已加入您的订单，目前共计{total}加元。还需要别的吗？",
+        "item_price": "{item}的价格是{price}加元。您要点吗？",
+        "busy": "抱歉，我们现在非常忙。您可以直接说菜名点餐，点完后请说就这些。",
+        "recommend": "您可能会喜欢{items}。要点其中一道吗？",
+        "closing": "谢谢！您的订单正在准备中，将在30到45分钟内送达。祝您入住愉快！",
+    },
+    "zh-TW": {"twilio_voice": "Zhiyu", "gcp_voice": ("zh-TW-Neural2-C", "zh-TW")},
+    "ar-SA": {
+        "twilio_voice": "Zeina",
+        "gcp_voice": ("ar-XA-Neural2-C", "ar-XA"),
+        "switch_keywords": ("arabic", "عربي"),
+        "hint_words": ("قائمة", "طلب", "سعر", "حلويات", "مشروبات", "نعم", "لا", "أضف", "احذف"),
+        "room_words": ("غرفة", "رقم الغرفة", "جناح"),
+        "greeting": "تحيات من فور سيزونز. أنا نسرين، كونسيرج خدمة الغرف المخصصة لك. تم التحديث في {version}. كيف يمكنني رفع تجربتك مع لحظة طعام لذيذة اليوم؟",
+        "switch_confirmation": "بالطبع، سأتحدث بالعربية. كيف يمكنني مساعدتك؟",
+        "repeat_prompt": "لم أفهم ذلك. هل يمكنك التكرار من فضلك؟",
+        "anything_else": "هل هناك أي شيء آخر يمكنني مساعدتك فيه؟",
+        "ask_room": "ممتاز! هل يمكنني معرفة رقم غرفتك من فضلك؟",
+        "confirm_total": "المجموع {total} دولار، شاملًا رسوم الخدمة والتوصيل.",
+        "item_added": "تمت إضافة {item} إلى طلبك. المجموع حتى الآن {total} دولار. هل تريد شيئًا آخر؟",
+        "item_price": "سعر {item} هو {price} دولار. هل تود طلبه؟",
+        "busy": "عذرًا، نحن مشغولون جدًا الآن. يمكنك طلب أي طبق باسمه، أو قل هذا كل شيء عندما تنتهي.",
+        "recommend": "قد يعجبك {items}. هل تود طلب أحدها؟",
+        "closing": "شكرًا لك! طلبك في الطريق وسيصل خلال 30 إلى 45 دقيقة. نتمنى لك إقامة ممتعة!",
+    },
+    "ar-EG": {"twilio_voice": "Zeina"},
+    "fa-IR": {
+        # Twilio has no Farsi voice or <Say> language - use Arabic, the closest available
+        "twilio_voice": "Zeina",
+        "twilio_language": "ar-SA",
+        "gcp_voice": ("ar-XA-Neural2-C", "ar-XA"),
+        # Includes common mis-transcriptions of "Farsi"
+        "switch_keywords": ("farsi", "persian", "فارسی", "far see", "farcy", "farsy"),
+        "hint_words": ("منو", "سفارش", "قیمت", "فهرست", "غذا", "نوشیدنی", "صبحانه", "ناهار", "شام", "پیش غذا", "دسر", "نوشابه", "آب", "چای", "قهوه", "بله", "نه", "اضافه", "حذف", "بررسی", "پرداخت"),
+        "room_words": ("اتاق", "شماره اتاق", "سوئیت"),
+        "greeting": "درود از فور سیزونز. من نسرین هستم، کونسیرژ اختصاصی سرویس اتاق شما. به‌روزرسانی شده در {version}. امروز چگونه می‌توانم تجربه شما را با یک لحظه لذیذ غذایی ارتقا دهم؟",
+        "switch_confirmation": "بله، حالا به فارسی صحبت می‌کنم. چطور می‌توانم به شما کمک کنم؟",
+        "repeat_prompt": "متوجه نشدم. لطفاً دوباره بگویید؟",
+        "anything_else": "چیز دیگری هست که بتوانم کمکتان کنم؟",
+        "ask_room": "عالی! لطفاً شماره اتاقتان را بفرمایید؟",
+        "confirm_total": "جمع کل با هزینه سرویس و ارسال {total} دلار می‌شود.",
+        "item_added": "{item} به سفارش شما اضافه شد. تا اینجا {total} دلار می‌شود. چیز دیگری میل دارید؟",
+        "item_price": "قیمت {item} {price} دلار است. مایلید سفارش بدهید؟",
+        "busy": "عذر می‌خواهم، الان سرمان خیلی شلوغ است. می‌توانید هر غذایی را با نامش سفارش دهید، یا وقتی تمام شد بگویید همین کافی است.",
+        "recommend": "شاید {items} را دوست داشته باشید. مایلید یکی را سفارش دهید؟",
+        "closing": "متشکرم! سفارش شما در راه است و ظرف ۳۰ تا ۴۵ دقیقه می‌رسد. اقامت خوشی داشته باشید!",
+    },
+    "hi-IN": {
+        "twilio_voice": "Aditi",
+        "gcp_voice": ("hi-IN-Neural2-D", "hi-IN"),
+        "switch_keywords": ("hindi", "हिन्दी"),
+        "hint_words": ("मेनू", "ऑर्डर", "कीमत", "मिठाई", "हाँ", "नहीं"),
+        "room_words": ("कमरा", "कमरा नंबर"),
+        "greeting": "फोर सीज़न्स से अभिवादन। मैं नसरीन हूं, आपकी समर्पित रूम सर्विस कॉन्सिएर्ज। {version} पर अपडेट किया गया। आज मैं एक स्वादिष्ट भोजन के क्षण के साथ आपके अनुभव को कैसे बढ़ा सकती हूं?",
+        "switch_confirmation": "बिल्कुल, मैं हिंदी में बोलूंगी। मैं आपकी कैसे मदद कर सकती हूं?",
+        "repeat_prompt": "मैं समझ नहीं पाया। क्या आप कृपया दोहरा सकते हैं?",
+        "anything_else": "क्या मैं आपकी और किसी चीज़ में मदद कर सकता हूं?",
+        "ask_room": "बहुत अच्छा! कृपया अपना कमरा नंबर बताइए?",
+        "confirm_total": "सर्विस चार्ज और डिलीवरी मिलाकर कुल {total} डॉलर हुए।",
+        "item_added": "{item} आपके ऑर्डर में जोड़ दिया गया है। अभी तक कुल {total} डॉलर हुए। और कुछ?",
+        "item_price": "{item} की कीमत {price} डॉलर है। क्या आप इसे ऑर्डर करना चाहेंगे?",
+        "busy": "क्षमा करें, अभी हम बहुत व्यस्त हैं। आप किसी भी व्यंजन का नाम लेकर ऑर्डर कर सकते हैं, या पूरा होने पर बस इतना ही कहें।",
+        "recommend": "आपको {items} पसंद आ सकते हैं। क्या आप इनमें से कुछ लेना चाहेंगे?",
+        "closing": "धन्यवाद! आपका ऑर्डर रास्ते में है और 30 से 45 मिनट में पहुँच जाएगा। आपका प्रवास सुखद हो!",
+    },
+    "ru-RU": {
+        "twilio_voice": "Tatyana",
+        "gcp_voice": ("ru-RU-Neural2-D", "ru-RU"),
+        "switch_keywords": ("russian", "русский"),
+        "hint_words": ("меню", "заказ", "цена", "десерт", "напитки", "да", "нет", "добавить", "убрать", "это всё"),
+        "room_words": ("номер", "номер комнаты", "комната"),
+        "greeting": "Приветствие от Four Seasons. Я Насрин, ваш персональный консьерж службы номеров. Обновлено в {version}. Как я могу улучшить ваше впечатление сегодня с помощью восхитительного кулинарного момента?",
+        "switch_confirmation": "Конечно, я буду говорить по-русски. Чем могу помочь?",
+        "repeat_prompt": "Я не понял. Не могли бы вы повторить?",
+        "anything_else": "Могу ли я еще чем-то помочь?",
+        "ask_room": "Отлично! Назовите, пожалуйста, номер вашей комнаты.",
+        "confirm_total": "Итого {total} долларов, включая плату за обслуживание и доставку.",
+        "item_added": "{item} добавлено в ваш заказ. Пока выходит {total} долларов. Что-нибудь ещё?",
+        "item_price": "{item} стоит {price} долларов. Хотите заказать?",
+        "busy": "Извините, сейчас у нас очень много заказов. Вы можете заказать любое блюдо по названию или сказать это всё, когда закончите.",
+        "recommend": "Вам может понравиться {items}. Хотите что-нибудь из этого?",
+        "closing": "Спасибо! Ваш заказ уже готовится и будет доставлен через 30–45 минут. Приятного пребывания!",
+    },
+    "nl-NL": {"twilio_voice": "Lotte", "gcp_voice": ("nl-NL-Neural2-C", "nl-NL")},
+    "pl-PL": {"twilio_voice": "Ewa", "gcp_voice": ("pl-PL-Neural2-A", "pl-PL")},
+    "tr-TR": {"twilio_voice": "Filiz", "gcp_voice": ("tr-TR-Neural2-C", "tr-TR")},
+    "sv-SE": {"twilio_voice": "Astrid", "gcp_voice": ("sv-SE-Neural2-C", "sv-SE")},
+    "da-DK": {"twilio_voice": "Naja", "gcp_voice": ("da-DK-Neural2-D", "da-DK")},
+    "no-NO": {"twilio_voice": "Liv", "gcp_voice": ("nb-NO-Neural2-C", "nb-NO")},
+    "fi-FI": {"twilio_voice": "Suvi", "gcp_voice": ("fi-FI-Neural2-C", "fi-FI")},
+    "cs-CZ": {"twilio_voice": "Josef", "gcp_voice": ("cs-CZ-Neural2-A", "cs-CZ")},
+    "hu-HU": {"twilio_voice": "Gyorgy", "gcp_voice": ("hu-HU-Neural2-A", "hu-HU")},
+    "ro-RO": {"twilio_voice": "Carmen", "gcp_voice": ("ro-RO-Neural2-A", "ro-RO")},
+    "th-TH": {"twilio_voice": "Kanya", "gcp_voice": ("th-TH-Neural2-C", "th-TH")},
+    "vi-VN": {"twilio_voice": "Linh", "gcp_voice": ("vi-VN-Neural2-A", "vi-VN")},
+}
+
+
+class LanguageProfile(NamedTuple):
+    """Everything needed to speak and listen in one language"""
+    code: str
+    twilio_voice: str
+    twilio_language: str
+    gcp_voice: Tuple[str, str]
+    switch_keywords: Tuple[str, ...]
+    greeting: str
+    switch_confirmation: str
+    repeat_prompt: str
+    anything_else: str
+    ask_room: str            # asks for the room number before placing the order
+    confirm_total: str       # reads back the order total; {total} placeholder
+    item_added: str          # {item} added, {total} so far - used when the LLM turn is shed
+    item_price: str          # {item} costs {price} - used when the LLM turn is shed
+    busy: str                # anything else when the LLM turn is shed
+    recommend: str           # {items} suggested for a dietary or price request
+    closing: str             # thanks the guest once the order is placed
+    hint_words: Tuple[str, ...]
+    room_words: Tuple[str, ...]
+    # Pre-rendered TwiML, placed after a <Gather> carrying the turn's speech hints
+    anything_else_tail: str  # "anything else?" + redirect, after each agent reply
+    repeat_say: str          # "could you repeat?", when Twilio posts no speech
+
+    def greeting_text(self, version: str) -> str:
+        return self.greeting.format(version=version)
+
+
+def _build_profile(code: str, data: Dict, english: Dict, base: Dict) -> LanguageProfile:
+    def text(field):
+        # Regional variants speak their base language's prompts before falling back to English
+        return data.get(field) or base.get(field) or english[field]
+
+    def words(field):
+        # Regional variants (es-MX, pt-PT) share their base language's words
+        return tuple(data.get(field) or base.get(field) or ())
+
+    twilio_voice = data.get("twilio_voice", "alice")
+    twilio_language = data.get("twilio_language", code)
+    repeat_prompt = text("repeat_prompt")
+    anything_else = text("anything_else")
+
+    return LanguageProfile(
+        code=code,
+        twilio_voice=twilio_voice,
+        twilio_language=twilio_language,
+        gcp_voice=tuple(data.get("gcp_voice", DEFAULT_GCP_VOICE)),
+        switch_keywords=tuple(data.get("switch_keywords", ())),
+        greeting=text("greeting"),
+        switch_confirmation=text("switch_confirmation"),
+        repeat_prompt=repeat_prompt,
+        anything_else=anything_else,
+        ask_room=text("ask_room"),
+        confirm_total=text("confirm_total"),
+        item_added=text("item_added"),
+        item_price=text("item_price"),
+        busy=text("busy"),
+        recommend=text("recommend"),
+        closing=text("closing"),
+        hint_words=words("hint_words"),
+        room_words=words("room_words"),
+        anything_else_tail=(
+            twiml.cached_say_fragment(anything_else, twilio_voice, twilio_language)
+            + f"<Redirect>{NO_INPUT_PATH}</Redirect>"
+        ),
+        repeat_say=twiml.cached_say_fragment(repeat_prompt, twilio_voice, twilio_language),
+    )
+
+
+def build_profiles(data: Dict[str, Dict] = LANGUAGE_DATA) -> Mapping[str, LanguageProfile]:
+    """Build the immutable code -> LanguageProfile registry"""
+    english = data[DEFAULT_LANGUAGE]
+    bases = {}
+    for code, entry in data.items():
+        if entry.get("hint_words"):
+            bases.setdefault(code.split("-")[0], entry)
+    return MappingProxyType({
+        code: _build_profile(code, entry, english, bases.get(code.split("-")[0], {}))
+        for code, entry in data.items()
+    })
+
+
+LANGUAGE_PROFILES = build_profiles()
+
+# Greeting-turn TwiML after the greeting <Gather>: if nothing was heard, prompt and listen again
+GREETING_NO_INPUT_TAIL = (
+    twiml.cached_say_fragment(GREETING_NO_INPUT, LANGUAGE_PROFILES[DEFAULT_LANGUAGE].twilio_voice, DEFAULT_LANGUAGE)
+    + f"<Redirect>{NO_INPUT_PATH}?state=greeting</Redirect>"
+)
+
+# Spoken language name -> language code, across all profiles
+LANGUAGE_SWITCH_KEYWORDS = MappingProxyType({
+    keyword: profile.code
+    for profile in LANGUAGE_PROFILES.values()
+    for keyword in profile.switch_keywords
+})
+
+
+def get_language_profile(code: Optional[str]) -> LanguageProfile:
+    """Profile for a language code, falling back to the default language"""
+    return LANGUAGE_PROFILES.get(code) or LANGUAGE_PROFILES[DEFAULT_LANGUAGE]
@@ -0,0 +1,111 @@
+"""
+LLM token and prompt-size accounting
+Tracks prompt/completion tokens, prompt bytes and latency per turn and per call,
+exports them as metrics and writes a compact summary when a call ends.
+"""
+
+import json
+import os
+import threading
+import time
+from typing import Dict, Optional
+
+import metrics
+from structured_logging import get_logger
+
+# Prompt sizes range from a few KB (short turns) to tens of KB (full menu + history)
+PROMPT_BYTES_BUCKETS = (1024, 2048, 4096, 8192, 12288, 16384, 24576, 32768, 65536, 131072)
+TOKEN_BUCKETS = (50, 100, 250, 500, 1000, 2000, 4000, 8000, 16000, 32000)
+
+LLM_CALLS = metrics.counter("roomservice_llm_calls_total", "LLM requests made", ("outcome",))
+LLM_PROMPT_TOKENS = metrics.counter("roomservice_llm_prompt_tokens_total", "Prompt tokens reported by the LLM provider")
+LLM_COMPLETION_TOKENS = metrics.counter("roomservice_llm_completion_tokens_total", "Completion tokens reported by the LLM provider")
+LLM_PROMPT_BYTES = metrics.histogram("roomservice_llm_prompt_bytes", "Serialized prompt size per LLM request", buckets=PROMPT_BYTES_BUCKETS)
+LLM_PROMPT_TOKENS_PER_TURN = metrics.histogram("roomservice_llm_prompt_tokens", "Prompt tokens per LLM request", buckets=TOKEN_BUCKETS)
+LLM_LATENCY = metrics.histogram("roomservice_llm_latency_seconds", "LLM request latency")
+
+log = get_logger("llm_usage")
+
+# Optional JSON-lines file that receives one summary per finished call
+USAGE_LOG_PATH = os.getenv("LLM_USAGE_LOG")
+
+_usage_by_call: Dict[str, Dict] = {}
+_lock = threading.Lock()
+
+
+def prompt_bytes(messages) -> int:
+    """Size in bytes of the chat messages as they are sent on the wire"""
+    return len(json.dumps(messages, ensure_ascii=False).encode("utf-8"))
+
+
+def record_turn(call_sid: str, prompt_size: int, latency: float, usage: Optional[Dict], ok: bool = True) -> Dict:
+    """Record one LLM request and return its per-turn record"""
+    usage = usage or {}
+    turn = {
+        "prompt_bytes": prompt_size,
+        "prompt_tokens": int(usage.get("prompt_tokens") or 0),
+        "completion_tokens": int(usage.get("completion_tokens") or 0),
+        "latency_ms": round(latency * 1000, 1),
+        "ok": ok,
+    }
+
+    LLM_CALLS.inc(outcome="ok" if ok else "error")
+    LLM_PROMPT_BYTES.observe(prompt_size)
+    LLM_LATENCY.observe(latency)
+    if turn["prompt_tokens"]:
+        LLM_PROMPT_TOKENS.inc(turn["prompt_tokens"])
+        LLM_PROMPT_TOKENS_PER_TURN.observe(turn["prompt_tokens"])
+    if turn["completion_tokens"]:
+        LLM_COMPLETION_TOKENS.inc(turn["completion_tokens"])
+
+    with _lock:
+        totals = _usage_by_call.get(call_sid)
+        if totals is None:
+            totals = {
+                "call_sid": call_sid,
+                "started": time.time(),
+                "llm_calls": 0,
+                "errors": 0,
+                "prompt_tokens": 0,
+                "completion_tokens": 0,
+                "prompt_bytes": 0,
+                "max_prompt_bytes": 0,
+                "llm_ms": 0.0,
+            }
+            _usage_by_call[call_sid] = totals
+        totals["llm_calls"] += 1
+        totals["errors"] += 0 if ok else 1
+        totals["prompt_tokens"] += turn["prompt_tokens"]
+        totals["completion_tokens"] += turn["completion_tokens"]
+        totals["prompt_bytes"] += prompt_size
+        totals["max_prompt_bytes"] = max(totals["max_prompt_bytes"], prompt_size)
+        totals["llm_ms"] = round(totals["llm_ms"] + turn["latency_ms"], 1)
+        totals["last_turn"] = turn
+    return turn
+
+
+def call_usage(call_sid: str) -> Optional[Dict]:
+    """Running totals for a call, or None if it made no LLM requests"""
+    with _lock:
+        totals = _usage_by_call.get(call_sid)
+        return dict(totals) if totals else None
+
+
+def finish_call(call_sid: str) -> Optional[Dict]:
+    """Remove a call's totals and write its compact summary"""
+    with _lock:
+        totals = _usage_by_call.pop(call_sid, None)
+    if not totals:
+        return None
+
+    summary = {key: value for key, value in totals.items() if key != "last_turn"}
+    summary["duration_s"] = round(time.time() - summary.pop("started"), 1)
+    line = json.dumps(summary, separators=(",", ":"))
+    log.info("llm_usage_summary", **summary)
+    if USAGE_LOG_PATH:
+        try:
+            with open(USAGE_LOG_PATH, "a") as f:
+                f.write(line + "\n")
+        except OSError as e:
+            log.error("llm_usage_log_failed", path=USAGE_LOG_PATH, error=str(e))
+    return summary
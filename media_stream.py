@@ -0,0 +1,274 @@
+"""
+Bidirectional Twilio Media Streams mode
+With CALL_MODE=stream, /voice answers with <Connect><Stream> and the call's audio flows over a
+WebSocket: Twilio sends the caller's 8 kHz μ-law frames, a streaming recognizer turns them into
+utterances, and the agent's reply is synthesized and streamed straight back as μ-law frames.
+That replaces the per-turn /process-speech POST, TwiML response and /audio fetch.
+
+MediaStreamSession holds one stream's state and only deals in decoded Twilio messages, so it runs
+the same over a real socket, in tests, or from media_stream_client.py replaying recorded frames.
+
+Environment:
+    CALL_MODE              "gather" (default) or "stream"
+    STT_BACKEND            Speech recognizer for streams (default "fake"; see RECOGNIZERS)
+    STREAM_TTS_SECONDS     How long a streamed turn waits for synthesis (default 10)
+"""
+
+import base64
+import json
+import os
+import struct
+import time
+from typing import Callable, Dict, List, NamedTuple, Optional
+
+import metrics
+from structured_logging import get_logger
+
+log = get_logger("stream")
+
+MEDIA_STREAM_PATH = "/media-stream"
+
+STREAM_TTS_SECONDS = float(os.getenv("STREAM_TTS_SECONDS", "10"))
+
+# Twilio sends 20 ms frames: 160 bytes of 8 kHz μ-law
+SAMPLE_RATE = 8000
+FRAME_BYTES = 160
+# Outbound audio goes back in half-second messages, so a barge-in "clear" cuts playback quickly
+CHUNK_BYTES = FRAME_BYTES * 25
+
+STREAM_RESPONSE_SECONDS = metrics.histogram(
+    "roomservice_stream_response_seconds", "End of the caller's utterance to first reply audio on a media stream")
+STREAM_BARGE_INS = metrics.counter(
+    "roomservice_stream_barge_ins_total", "Replies cut short because the caller started talking")
+
+
+def call_mode() -> str:
+    return os.getenv("CALL_MODE", "gather").lower()
+
+
+def _mulaw_to_linear(byte: int) -> int:
+    byte = ~byte & 0xFF
+    exponent = (byte >> 4) & 0x07
+    sample = ((((byte & 0x0F) << 3) + 0x84) << exponent) - 0x84
+    return -sample if byte & 0x80 else sample
+
+
+MULAW_TO_LINEAR = tuple(_mulaw_to_linear(byte) for byte in range(256))
+_MULAW_MAGNITUDE = tuple(abs(sample) for sample in MULAW_TO_LINEAR)
+
+
+def linear_to_mulaw(sample: int) -> int:
+    """Encode one 16-bit PCM sample as G.711 μ-law"""
+    sign = 0x80 if sample < 0 else 0
+    sample = min(abs(sample), 32635) + 0x84
+    exponent = 7
+    while exponent > 0 and not sample & (0x80 << exponent):
+        exponent -= 1
+    mantissa = (sample >> (exponent + 3)) & 0x0F
+    return ~(sign | (exponent << 4) | mantissa) & 0xFF
+
+
+def frame_energy(audio: bytes) -> float:
+    """Mean absolute amplitude of a μ-law frame"""
+    if not audio:
+        return 0.0
+    return sum(_MULAW_MAGNITUDE[byte] for byte in audio) / len(audio)
+
+
+# Size of a canonical WAV header, for clips whose chunks can't be walked
+WAV_HEADER_BYTES = 44
+
+
+def mulaw_payload(audio: bytes) -> bytes:
+    """Raw μ-law samples from a synthesized clip (Google returns μ-law wrapped in a WAV header)"""
+    if not audio.startswith(b"RIFF"):
+        return audio
+    offset = 12
+    while offset + 8 <= len(audio):
+        chunk_id = audio[offset:offset + 4]
+        (size,) = struct.unpack_from("<I", audio, offset + 4)
+        if chunk_id == b"data":
+            return audio[offset + 8:offset + 8 + size]
+        offset += 8 + size + (size & 1)
+    return audio[WAV_HEADER_BYTES:]
+
+
+class Transcript(NamedTuple):
+    text: str
+    language: Optional[str] = None    # Language the recognizer heard, if it reports one
+
+
+class SpeechRecognizer:
+    """Streaming speech-to-text for one call: feed it caller audio, get back finished utterances"""
+
+    # True while the caller is mid-utterance; a session uses it to stop playback on barge-in
+    speaking = False
+
+    def feed(self, audio: bytes) -> Optional[Transcript]:
+        """Take one frame of μ-law audio; returns a Transcript when an utterance ends"""
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class FakeRecognizer(SpeechRecognizer):
+    """
+    Local stand-in for a streaming STT service
+    Finds utterances with a simple energy endpointer and answers each one with the next scripted
+    transcript, so the stream path can be exercised without a speech API.
+    """
+
+    def __init__(self, transcripts: List[str], threshold: float = 500.0, silence_ms: int = 600,
+                 min_speech_ms: int = 100):
+        self._transcripts = list(transcripts)
+        self._threshold = threshold
+        self._silence_frames = silence_ms // 20
+        self._min_speech_frames = max(1, min_speech_ms // 20)
+        self._speech_frames = 0
+        self._quiet_frames = 0
+
+    def feed(self, audio: bytes) -> Optional[Transcript]:
+        if frame_energy(audio) >= self._threshold:
+            self._speech_frames += 1
+            self._quiet_frames = 0
+            self.speaking = self._speech_frames >= self._min_speech_frames
+            return None
+        if not self._speech_frames:
+            return None
+        self._quiet_frames += 1
+        if self._quiet_frames < self._silence_frames:
+            return None
+        heard_speech = self.speaking
+        self._speech_frames = self._quiet_frames = 0
+        self.speaking = False
+        if not heard_speech or not self._transcripts:
+            return None
+        return Transcript(self._transcripts.pop(0))
+
+
+def fake_recognizer(parameters: Dict[str, str]) -> SpeechRecognizer:
+    """FakeRecognizer scripted from the stream's "transcripts" custom parameter (a JSON list)"""
+    return FakeRecognizer(json.loads(parameters.get("transcripts") or "[]"))
+
+
+# STT backends by name; a real service registers a factory taking the stream's custom parameters
+RECOGNIZERS: Dict[str, Callable[[Dict[str, str]], SpeechRecognizer]] = {
+    "fake": fake_recognizer,
+}
+
+
+def create_recognizer(parameters: Dict[str, str], backend: str = None) -> SpeechRecognizer:
+    backend = (backend or os.getenv("STT_BACKEND") or "fake").lower()
+    if backend not in RECOGNIZERS:
+        raise ValueError(f"Unknown STT_BACKEND {backend!r}")
+    return RECOGNIZERS[backend](parameters)
+
+
+class StreamReply(NamedTuple):
+    text: str
+    lang_code: str
+    hangup: bool = False
+
+
+class MediaStreamSession:
+    """
+    One Media Streams connection, driven by Twilio's JSON messages
+    greet(call_sid) and respond(call_sid, transcript) return StreamReply; speak(text, lang_code)
+    returns raw μ-law bytes (or None); send(message) delivers a message back to Twilio.
+    """
+
+    def __init__(self, greet: Callable[[str], StreamReply], respond: Callable[[str, Transcript], StreamReply],
+                 speak: Callable[[str, str], Optional[bytes]], send: Callable[[Dict], None],
+                 recognizer_factory: Callable[[Dict[str, str]], SpeechRecognizer] = create_recognizer):
+        self._greet = greet
+        self._respond = respond
+        self._speak = speak
+        self._send = send
+        self._recognizer_factory = recognizer_factory
+        self.recognizer: Optional[SpeechRecognizer] = None
+        self.stream_sid = None
+        self.call_sid = None
+        self.closed = False
+        self.turns = 0
+        self._playing = set()      # Marks sent after reply audio that Twilio hasn't echoed yet
+        self._closing_mark = None  # Mark after the last reply; the stream ends once it has played
+
+    def handle(self, message: Dict):
+        event = message.get("event")
+        if event == "start":
+            self._start(message["start"])
+        elif event == "media":
+            self._media(message["media"])
+        elif event == "mark":
+            self._mark(message["mark"]["name"])
+        elif event == "stop":
+            self.close()
+
+    def close(self):
+        if self.recognizer is not None:
+            self.recognizer.close()
+        self.closed = True
+
+    def _start(self, start: Dict):
+        self.stream_sid = start["streamSid"]
+        self.call_sid = start["callSid"]
+        self.recognizer = self._recognizer_factory(start.get("customParameters") or {})
+        log.info("stream_started", call_sid=self.call_sid, stream_sid=self.stream_sid)
+        self._play(self._greet(self.call_sid))
+
+    def _media(self, media: Dict):
+        if self.recognizer is None or media.get("track", "inbound") != "inbound":
+            return
+        transcript = self.recognizer.feed(base64.b64decode(media["payload"]))
+        if self.recognizer.speaking and self._playing and self._closing_mark is None:
+            # Caller talked over the reply: drop whatever Twilio still has buffered
+            self._send({"event": "clear", "streamSid": self.stream_sid})
+            self._playing.clear()
+            STREAM_BARGE_INS.inc()
+        if transcript is None or not transcript.text.strip():
+            return
+        started = time.perf_counter()
+        reply = self._respond(self.call_sid, transcript)
+        self._play(reply, started)
+
+    def _mark(self, name: str):
+        self._playing.discard(name)
+        if name == self._closing_mark:
+            log.info("stream_closing", call_sid=self.call_sid, reason="order_complete")
+            self.close()
+
+    def _play(self, reply: StreamReply, started: float = None):
+        """Stream a reply's audio followed by a mark, so we hear back when it has played"""
+        self.turns += 1
+        audio = self._speak(reply.text, reply.lang_code) if reply.text else None
+        if not audio:
+            log.warning("stream_reply_silent", call_sid=self.call_sid, lang=reply.lang_code)
+            if reply.hangup:
+                self.close()
+            return
+        for offset in range(0, len(audio), CHUNK_BYTES):
+            self._send({
+                "event": "media",
+                "streamSid": self.stream_sid,
+                "media": {"payload": base64.b64encode(audio[offset:offset + CHUNK_BYTES]).decode("ascii")},
+            })
+            if offset == 0 and started is not None:
+                STREAM_RESPONSE_SECONDS.observe(time.perf_counter() - started)
+        mark = f"turn-{self.turns}"
+        self._send({"event": "mark", "streamSid": self.stream_sid, "mark": {"name": mark}})
+        self._playing.add(mark)
+        if reply.hangup:
+            self._closing_mark = mark
+
+
+def run(session: MediaStreamSession, receive: Callable[[], Optional[str]], record=None):
+    """Feed a socket's messages to a session until either side ends the stream"""
+    while not session.closed:
+        raw = receive()
+        if raw is None:
+            break
+        if record is not None:
+            record.write(raw.strip() + "\n")
+        session.handle(json.loads(raw))
+    session.close()
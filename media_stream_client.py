@@ -0,0 +1,185 @@
+"""
+Local Media Streams client: replays recorded caller audio frames against the stream handler
+A recording is a JSON-lines file of the messages Twilio sent on a stream (set
+MEDIA_STREAM_RECORD_DIR on the server to capture them). Without one, a synthetic call is built
+from a script: a burst of tone per utterance, then silence, with the script passed to the fake
+recognizer as its transcripts. Marks are echoed back as if playback finished immediately.
+
+Runs in-process with xAI and Google Cloud TTS stubbed, or against a live server.
+
+Usage:
+    python media_stream_client.py                              # built-in script, in-process
+    python media_stream_client.py --frames call.jsonl --script call.json
+    python media_stream_client.py --url ws://localhost:5000/media-stream --realtime
+"""
+
+import argparse
+import base64
+import json
+import math
+import os
+import statistics
+import sys
+import time
+import uuid
+from typing import Callable, Dict, Iterator, List
+
+from media_stream import FRAME_BYTES, SAMPLE_RATE, linear_to_mulaw
+from webhook_replayer import DEFAULT_SCRIPT, load_script
+
+FRAME_SECONDS = FRAME_BYTES / SAMPLE_RATE
+
+
+def tone_frame(frequency: float = 440.0, amplitude: int = 8000) -> bytes:
+    return bytes(linear_to_mulaw(int(amplitude * math.sin(2 * math.pi * frequency * n / SAMPLE_RATE)))
+                 for n in range(FRAME_BYTES))
+
+
+SILENCE_FRAME = bytes([0xFF]) * FRAME_BYTES
+
+
+def _media(stream_sid: str, audio: bytes, chunk: int) -> Dict:
+    return {
+        "event": "media",
+        "streamSid": stream_sid,
+        "media": {"track": "inbound", "chunk": str(chunk), "timestamp": str(int(chunk * FRAME_SECONDS * 1000)),
+                  "payload": base64.b64encode(audio).decode("ascii")},
+    }
+
+
+def synthetic_call(script: List[str], speech_ms: int = 800, silence_ms: int = 1000) -> Iterator[Dict]:
+    """Twilio messages for a call that says each scripted utterance in turn"""
+    stream_sid = f"MZ{uuid.uuid4().hex}"
+    call_sid = f"CAstream{uuid.uuid4().hex[:24]}"
+    yield {"event": "connected", "protocol": "Call", "version": "1.0.0"}
+    yield {"event": "start", "streamSid": stream_sid,
+           "start": {"streamSid": stream_sid, "callSid": call_sid, "tracks": ["inbound"],
+                     "mediaFormat": {"encoding": "audio/x-mulaw", "sampleRate": SAMPLE_RATE, "channels": 1},
+                     "customParameters": {"transcripts": json.dumps(script)}}}
+    tone = tone_frame()
+    chunk = 0
+    for _ in script:
+        for audio in [tone] * (speech_ms // 20) + [SILENCE_FRAME] * (silence_ms // 20):
+            chunk += 1
+            yield _media(stream_sid, audio, chunk)
+    yield {"event": "stop", "streamSid": stream_sid, "stop": {"callSid": call_sid}}
+
+
+def load_frames(path: str, script: List[str] = None) -> Iterator[Dict]:
+    """Recorded stream messages, optionally re-scripting the fake recognizer's transcripts"""
+    with open(path) as f:
+        for line in f:
+            if not line.strip():
+                continue
+            message = json.loads(line)
+            if script is not None and message.get("event") == "start":
+                message["start"].setdefault("customParameters", {})["transcripts"] = json.dumps(script)
+            yield message
+
+
+def replay(messages: Iterator[Dict], send: Callable[[Dict], None], receive: Callable[[], List[Dict]],
+           realtime: bool = False) -> List[Dict]:
+    """
+    Send each message, echo marks for audio we got back, and time every reply
+    receive() returns whatever the server has sent since the last call, without blocking.
+    """
+    turns = []
+    last_sent = time.perf_counter()
+    for message in messages:
+        if realtime and message.get("event") == "media":
+            time.sleep(FRAME_SECONDS)
+        last_sent = time.perf_counter()
+        send(message)
+        for reply in receive():
+            if reply["event"] == "media":
+                if not turns or turns[-1]["done"]:
+                    turns.append({"first_audio_ms": round((time.perf_counter() - last_sent) * 1000, 2),
+                                  "bytes": 0, "done": False})
+                turns[-1]["bytes"] += len(base64.b64decode(reply["media"]["payload"]))
+            elif reply["event"] == "mark":
+                if turns:
+                    turns[-1]["done"] = True
+                send({"event": "mark", "streamSid": reply["streamSid"], "mark": reply["mark"]})
+            elif reply["event"] == "clear" and turns:
+                turns[-1]["done"] = turns[-1]["cleared"] = True
+    return turns
+
+
+def local_connection(flask_app_module):
+    """send/receive pair wired straight to a MediaStreamSession, with no socket"""
+    from media_stream import MediaStreamSession
+
+    outbox = []
+    session = MediaStreamSession(flask_app_module.stream_greeting, flask_app_module.stream_reply,
+                                 flask_app_module.stream_audio, outbox.append)
+
+    def send(message):
+        if not session.closed:
+            session.handle(message)
+
+    def receive():
+        replies = list(outbox)
+        outbox.clear()
+        return replies
+    return send, receive
+
+
+def websocket_connection(url: str):
+    import simple_websocket
+    ws = simple_websocket.Client.connect(url)
+
+    def send(message):
+        ws.send(json.dumps(message))
+
+    def receive():
+        replies = []
+        while True:
+            raw = ws.receive(timeout=0)
+            if raw is None:
+                return replies
+            replies.append(json.loads(raw))
+    return send, receive
+
+
+def print_report(turns: List[Dict]):
+    for number, turn in enumerate(turns):
+        label = "greeting" if number == 0 else f"turn {number}"
+        cleared = "  [barge-in]" if turn.get("cleared") else ""
+        print(f"{label:>9}  first audio {turn['first_audio_ms']:8.2f} ms  {turn['bytes']:7d} bytes{cleared}")
+    replies = [turn["first_audio_ms"] for turn in turns[1:]]
+    if replies:
+        print(f"utterance end -> first audio: median {statistics.median(replies):.2f} ms, max {max(replies):.2f} ms")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Replay caller audio frames against the media stream handler")
+    parser.add_argument("--frames", help="JSON-lines recording of Twilio stream messages")
+    parser.add_argument("--script", help="JSON list of utterances the fake recognizer should hear")
+    parser.add_argument("--url", help="ws:// URL of a running server's /media-stream; default runs in-process")
+    parser.add_argument("--realtime", action="store_true", help="Send frames at 20 ms intervals, like Twilio")
+    args = parser.parse_args(argv)
+    script = load_script(args.script) if args.script else None
+    messages = load_frames(args.frames, script) if args.frames else synthetic_call(script or DEFAULT_SCRIPT)
+
+    if args.url:
+        print_report(replay(messages, *websocket_connection(args.url), realtime=args.realtime))
+        return 0
+
+    # First, so nothing the app logs while it loads lands in the report
+    import structured_logging
+    structured_logging.configure(stream=open(os.devnull, "w"))
+    import benchmark
+    from fakes import FakeTTSClient
+    import app as app_module
+
+    app_module.gcp_tts_client = FakeTTSClient()
+    app_module.agent.xai_api_key = app_module.agent.xai_api_key or "replay-key"
+    app_module.agent.xai_model = app_module.agent.xai_model or "replay-model"
+    app_module.agent.send_order_email = lambda call_sid: True
+    with benchmark.stubbed_network():
+        print_report(replay(messages, *local_connection(app_module), realtime=args.realtime))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,234 @@
+"""
+Compiled, immutable menu catalog
+The raw MENU_CATEGORIES dict is compiled once into compact item records with stable IDs and
+integer-cent prices, indexed by ID, name and category, plus a content hash (`version`) that keys
+every cache derived from the menu: the LLM menu text, speech hints, the language-switch guard.
+Items marked "available": false are left out, so an item can be 86'd without deleting it.
+"""
+
+import hashlib
+import json
+import re
+import threading
+from types import MappingProxyType
+from typing import Callable, Dict, Iterable, List, Mapping, NamedTuple, Optional, Tuple
+
+from menu_data import DELIVERY_FEE, MENU_ALIASES, MENU_CATEGORIES, SERVICE_CHARGE_PERCENT
+
+DELIVERY_FEE_CENTS = round(DELIVERY_FEE * 100)
+
+
+def menu_version(menu_categories: Mapping, aliases: Mapping = MENU_ALIASES) -> str:
+    """Short content hash identifying a menu (and its aliases)"""
+    content = json.dumps([menu_categories, aliases], sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(content.encode()).hexdigest()[:12]
+
+
+def item_id(category_key: str, name: str) -> str:
+    """Stable ID from the category key and item name: "to_share/truffle-fries" """
+    slug = re.sub(r"[^a-z0-9]+", "-", name.casefold()).strip("-")
+    return f"{category_key}/{slug}"
+
+
+def format_dollars(cents: int) -> str:
+    """12345 -> "123.45" """
+    return f"{cents // 100}.{cents % 100:02d}"
+
+
+def service_charge_cents(subtotal_cents: int) -> int:
+    """Service charge on a subtotal, rounded half up to the cent"""
+    return (subtotal_cents * SERVICE_CHARGE_PERCENT + 50) // 100
+
+
+def total_cents(subtotal_cents: int) -> int:
+    """Subtotal plus service charge and delivery"""
+    return subtotal_cents + service_charge_cents(subtotal_cents) + DELIVERY_FEE_CENTS
+
+
+class MenuItem(NamedTuple):
+    id: str
+    name: str
+    description: str
+    price_cents: int
+    category_id: str
+    category: str             # Category display name
+    tags: Tuple[str, ...] = ()  # Attributes the menu states outright ("vegan", "gluten-free"); see recommendations.py
+
+    @property
+    def price(self) -> str:
+        return format_dollars(self.price_cents)
+
+
+class MenuCategory(NamedTuple):
+    id: str
+    name: str
+    items: Tuple[MenuItem, ...]
+
+
+class MenuCatalog:
+    """Read-only menu with O(1) lookups by item ID, item name and category"""
+    __slots__ = ("version", "items", "categories", "by_id", "_by_name", "_by_category", "_aliases",
+                 "_search_text", "_prompt_text", "_summary_text")
+
+    def __init__(self, menu_categories: Mapping = MENU_CATEGORIES, aliases: Mapping = MENU_ALIASES):
+        categories = []
+        for key, category in menu_categories.items():
+            categories.append(MenuCategory(key, category["name"], tuple(
+                MenuItem(item_id(key, raw["name"]), raw["name"], raw.get("description", ""),
+                         round(raw["price"] * 100), key, category["name"], tuple(raw.get("tags", ())))
+                for raw in category["items"] if raw.get("available", True)
+            )))
+        self.version = menu_version(menu_categories, aliases)
+        self.categories: Tuple[MenuCategory, ...] = tuple(categories)
+        self.items: Tuple[MenuItem, ...] = tuple(item for category in categories for item in category.items)
+        self.by_id: Mapping[str, MenuItem] = MappingProxyType({item.id: item for item in self.items})
+        self._by_name: Dict[str, MenuItem] = {}
+        for item in self.items:
+            self._by_name.setdefault(item.name.casefold(), item)
+        self._by_category: Dict[str, MenuCategory] = {}
+        for category in categories:
+            self._by_category[category.id] = category
+            self._by_category.setdefault(category.name.casefold(), category)
+        self._aliases = MappingProxyType({name: tuple(names) for name, names in aliases.items()})
+        # Lowercased name and description, scanned by search()
+        self._search_text = tuple((item.name.lower(), item.description.lower()) for item in self.items)
+        self._prompt_text = None
+        self._summary_text = None
+
+    def __len__(self) -> int:
+        return len(self.items)
+
+    def get(self, item_id: str) -> Optional[MenuItem]:
+        return self.by_id.get(item_id)
+
+    def by_name(self, name: str) -> Optional[MenuItem]:
+        return self._by_name.get(name.casefold())
+
+    def aliases(self, name: str) -> Tuple[str, ...]:
+        return self._aliases.get(name, ())
+
+    def category_items(self, category: str) -> Tuple[MenuItem, ...]:
+        """Items in a category, by key or name; falls back to a partial name match"""
+        found = self._by_category.get(category.casefold())
+        if found is None:
+            query = category.casefold()
+            found = next((c for c in self.categories if query in c.name.casefold() or query in c.id), None)
+        return found.items if found is not None else ()
+
+    def search(self, query: str) -> List[MenuItem]:
+        """Items whose name or description contains the query; an exact name match wins outright"""
+        exact = self.by_name(query)
+        if exact is not None:
+            return [exact]
+        query_lower = query.lower()
+        return [item for item, (name, description) in zip(self.items, self._search_text)
+                if query_lower in name or query_lower in description]
+
+    def names(self) -> Iterable[str]:
+        """Category and item names"""
+        for category in self.categories:
+            yield category.name
+            for item in category.items:
+                yield item.name
+
+    def prompt_text(self) -> str:
+        """Full menu as sent to the LLM, rendered once per catalog"""
+        if self._prompt_text is None:
+            menu_text = "MENU ITEMS:\n\n"
+            for category in self.categories:
+                menu_text += f"{category.name}:\n"
+                for item in category.items:
+                    menu_text += f"  - {item.name}: ${item.price}"
+                    if item.description:
+                        menu_text += f" - {item.description}"
+                    menu_text += "\n"
+                menu_text += "\n"
+            self._prompt_text = menu_text
+        return self._prompt_text
+
+    def summary_text(self) -> str:
+        """Category list with item counts"""
+        if self._summary_text is None:
+            summary = "Our menu includes the following categories:\n"
+            for category in self.categories:
+                summary += f"- {category.name} ({len(category.items)} items)\n"
+            self._summary_text = summary
+        return self._summary_text
+
+
+class CatalogCache:
+    """Something derived from the catalog (hint table, switch guard), built once per catalog version"""
+
+    def __init__(self, build: Callable[[MenuCatalog], object]):
+        self._build = build
+        self._built: Dict[str, object] = {}
+        # Request threads add entries while the menu watcher's thread prunes them
+        self._lock = threading.Lock()
+        _caches.append(self)
+
+    def get(self, catalog: MenuCatalog):
+        built = self._built.get(catalog.version)
+        if built is None:
+            # Built outside the lock; if two threads race, the first one stored wins
+            built = self._build(catalog)
+            with self._lock:
+                built = self._built.setdefault(catalog.version, built)
+        return built
+
+    def retain(self, versions: Iterable[str]):
+        """Drop entries for any other catalog version"""
+        keep = set(versions)
+        with self._lock:
+            for version in [v for v in self._built if v not in keep]:
+                del self._built[version]
+
+
+# Catalogs in service by owner: the default menu, plus one per tenant with its own menu (tenants.py)
+DEFAULT_OWNER = "default"
+
+_caches: List[CatalogCache] = []
+_catalogs: Dict[str, MenuCatalog] = {DEFAULT_OWNER: MenuCatalog()}
+_catalog_lock = threading.Lock()
+
+
+def get_catalog(owner: str = DEFAULT_OWNER) -> MenuCatalog:
+    """The catalog currently in use"""
+    return _catalogs[owner]
+
+
+def has_catalog(owner: str) -> bool:
+    return owner in _catalogs
+
+
+def set_catalog(catalog: MenuCatalog, owner: str = DEFAULT_OWNER) -> Optional[MenuCatalog]:
+    """Swap in a new catalog (a single reference assignment); returns the previous one"""
+    with _catalog_lock:
+        previous = _catalogs.get(owner)
+        _catalogs[owner] = catalog
+    return previous
+
+
+def _retain_live_versions():
+    live = {catalog.version for catalog in list(_catalogs.values())}
+    for cache in _caches:
+        cache.retain(live)
+
+
+def install_catalog(catalog: MenuCatalog, owner: str = DEFAULT_OWNER) -> Optional[MenuCatalog]:
+    """Build everything derived from a catalog, swap it in, then drop what the old one built"""
+    catalog.prompt_text()
+    catalog.summary_text()
+    for cache in _caches:
+        cache.get(catalog)
+    previous = set_catalog(catalog, owner)
+    _retain_live_versions()
+    return previous
+
+
+def release_catalog(owner: str):
+    """Take a tenant's catalog out of service, with everything built from it"""
+    if owner == DEFAULT_OWNER:
+        return
+    with _catalog_lock:
+        _catalogs.pop(owner, None)
+    _retain_live_versions()
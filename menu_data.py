@@ -9,17 +9,20 @@ MENU_CATEGORIES = {
             {
                 "name": "Truffle Fries",
                 "description": "Shaved Parmesan, Truffle Aioli",
-                "price": 17
+                "price": 17,
+                "tags": ["vegetarian"]
             },
             {
                 "name": "Steamed Edamame",
                 "description": "Everything but the Bagel Spice, Lemon",
-                "price": 9
+                "price": 9,
+                "tags": ["vegan"]
             },
             {
                 "name": "Pita and House Dips",
                 "description": "Smoked Aubergine and Garlic, Classic Hummus, Grilled Capsicum and Feta, served with warm pita",
-                "price": 26
+                "price": 26,
+                "tags": ["vegetarian"]
             },
             {
                 "name": "Tuna Tacos",
@@ -59,12 +62,14 @@ MENU_CATEGORIES = {
             {
                 "name": "Beetroot and Stracciatella Cheese Salad",
                 "description": "Artisanal Leaf, Grapefruit, Orange, Pistachios, Local Honey, Champagne Vinaigrette",
-                "price": 26
+                "price": 26,
+                "tags": ["vegetarian"]
             },
             {
                 "name": "Fall Salad",
                 "description": "Artisanal Leaf, Squash, Apple, Pumpkin Goat Cheese, Sunflower Seeds, Cranberry, Apple Cider Dressing",
-                "price": 26
+                "price": 26,
+                "tags": ["vegetarian"]
             },
             {
                 "name": "Classic Caesar",
@@ -74,15 +79,16 @@ MENU_CATEGORIES = {
             {
                 "name": "Falafel",
                 "description": "Cos Lettuce, Radish, Pomegranate, Parsley, Mint, Capsicum, Heirloom Tomato, Cucumber, Sumac, Treacle Dressing",
-                "price": 23
+                "price": 23,
+                "tags": ["vegan"]
             }
         ]
     },
     "enhancements": {
         "name": "Enhancements",
         "items": [
-            {"name": "Avocado", "description": "", "price": 11},
-            {"name": "Grilled Tofu", "description": "", "price": 12},
+            {"name": "Avocado", "description": "", "price": 11, "tags": ["vegan"]},
+            {"name": "Grilled Tofu", "description": "", "price": 12, "tags": ["vegan"]},
             {"name": "Rotisserie Chicken Breast", "description": "", "price": 15},
             {"name": "Atlantic Salmon (6 oz.)", "description": "", "price": 18},
             {"name": "Garlic Prawns", "description": "", "price": 18}
@@ -114,7 +120,8 @@ MENU_CATEGORIES = {
             {
                 "name": "Mediterranean Garden Toast",
                 "description": "Courgette, Aubergine, Carrot, Red Capsicum Spread, Toasted Sourdough",
-                "price": 19
+                "price": 19,
+                "tags": ["vegan"]
             }
         ]
     },
@@ -171,12 +178,14 @@ MENU_CATEGORIES = {
             {
                 "name": "Basil Pesto Orecchiette",
                 "description": "Green Beans, Cherry Tomato, Creamy Pesto Sauce, Parmesan",
-                "price": 25
+                "price": 25,
+                "tags": ["vegetarian"]
             },
             {
                 "name": "Pasta Al Pomodoro",
                 "description": "Basil, Parmigiano Reggiano, Extra Virgin Olive Oil; Pasta options: Orecchiette, Rigatoni, or Gluten-Free",
-                "price": 22
+                "price": 22,
+                "tags": ["vegetarian"]
             }
         ]
     },
@@ -191,7 +200,8 @@ MENU_CATEGORIES = {
             {
                 "name": "Raspberry-Cashew Cheesecake",
                 "description": "Cashew Cheesecake, Raspberry Gel, Vanilla Shortbread",
-                "price": 17
+                "price": 17,
+                "tags": ["vegetarian"]
             },
             {
                 "name": "Banana Pudding",
@@ -201,7 +211,8 @@ MENU_CATEGORIES = {
             {
                 "name": "Matcha Raspberry Tiramisu",
                 "description": "Matcha Mascarpone Cream, Freeze-Dried Raspberry, Lady Finger Sponge",
-                "price": 18
+                "price": 18,
+                "tags": ["vegetarian"]
             },
             {
                 "name": "House-made Ice Cream and Sorbet",
@@ -212,38 +223,26 @@ MENU_CATEGORIES = {
     }
 }
 
+# Other ways guests say an item's name (used for speech recognition hints)
+MENU_ALIASES = {
+    "Steamed Edamame": ("edamame",),
+    "Buffalo Chicken Wings": ("wings", "chicken wings"),
+    "Caviar - Kristal": ("Kristal caviar", "Kristal"),
+    "Caviar - Ossetra Prestige": ("Ossetra caviar", "Ossetra"),
+    "Beetroot and Stracciatella Cheese Salad": ("stracciatella", "beet salad"),
+    "Classic Caesar": ("Caesar salad",),
+    "d|Burger": ("burger", "D burger"),
+    "Herb-Crusted Beef Tenderloin (7 oz.)": ("beef tenderloin", "steak"),
+    "Salmon Poke Bowl": ("poke bowl",),
+    "Pomme Purée": ("mashed potatoes", "pomme puree"),
+    "Macaroni and Cheese": ("mac and cheese",),
+    "Classic Bolognese": ("bolognese", "spaghetti bolognese"),
+    "Basil Pesto Orecchiette": ("orecchiette", "pesto pasta"),
+    "Pasta Al Pomodoro": ("pomodoro",),
+    "Matcha Raspberry Tiramisu": ("tiramisu",),
+    "Chocolate Caramel Mousse": ("chocolate mousse",),
+    "House-made Ice Cream and Sorbet": ("ice cream", "sorbet"),
+}
+
 SERVICE_CHARGE_PERCENT = 20
 DELIVERY_FEE = 6
-
-def get_all_items():
-    """Get all menu items flattened"""
-    all_items = []
-    for category in MENU_CATEGORIES.values():
-        all_items.extend(category["items"])
-    return all_items
-
-def search_menu(query):
-    """Search menu items by name or description"""
-    query_lower = query.lower()
-    results = []
-    
-    for category_key, category in MENU_CATEGORIES.items():
-        for item in category["items"]:
-            if (query_lower in item["name"].lower() or 
-                query_lower in item["description"].lower()):
-                results.append({
-                    "category": category["name"],
-                    **item
-                })
-    
-    return results
-
-def get_category_items(category_name):
-    """Get all items in a category"""
-    category_lower = category_name.lower()
-    for category_key, category in MENU_CATEGORIES.items():
-        if category_lower in category["name"].lower() or category_lower in category_key:
-            return category["items"]
-    return []
-
-
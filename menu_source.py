@@ -0,0 +1,209 @@
+"""
+External menu source with hot reload
+With MENU_PATH set, the menu comes from a JSON or YAML file, or a directory of them merged in
+filename order, instead of menu_data.py. A background thread watches the files' mtimes. When
+they change, the menu is parsed, validated and compiled (with everything derived from it) off the
+request path, then swapped in with a single reference assignment. A menu that fails validation
+is logged and ignored; the previous one stays in service.
+
+File format (YAML equivalent accepted):
+    {"categories": {"to_share": {"name": "To Share", "items": [
+        {"name": "Truffle Fries", "description": "...", "price": 17, "available": true,
+         "tags": ["vegetarian"]}]}},
+     "aliases": {"Truffle Fries": ["fries"]}}
+
+Environment:
+    MENU_PATH            File or directory to load the menu from (default: menu_data.py)
+    MENU_WATCH_SECONDS   How often to check for changes (default 2)
+"""
+
+import json
+import math
+import os
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+import metrics
+from menu_catalog import MenuCatalog, install_catalog
+from structured_logging import get_logger
+
+try:
+    import yaml
+except ImportError:  # PyYAML is optional; JSON menus work without it
+    yaml = None
+
+log = get_logger("menu")
+
+MENU_FILE_SUFFIXES = (".json", ".yaml", ".yml")
+MENU_WATCH_SECONDS = float(os.getenv("MENU_WATCH_SECONDS", "2"))
+
+MENU_RELOADS = metrics.counter("roomservice_menu_reloads_total", "Menu reloads from MENU_PATH, by outcome", ("outcome",))
+MENU_ITEMS = metrics.gauge("roomservice_menu_items", "Items on the menu currently in service")
+
+
+class MenuError(ValueError):
+    """The menu source couldn't be read or isn't a valid menu"""
+
+
+def menu_files(path: str) -> List[str]:
+    if os.path.isdir(path):
+        return sorted(os.path.join(path, name) for name in os.listdir(path)
+                      if name.endswith(MENU_FILE_SUFFIXES) and not name.startswith("."))
+    return [path]
+
+
+def signature(path: str) -> Tuple:
+    """Changes whenever a menu file is added, removed or modified"""
+    files = []
+    for file_path in menu_files(path):
+        try:
+            stat = os.stat(file_path)
+        except FileNotFoundError:
+            continue
+        files.append((file_path, stat.st_mtime_ns, stat.st_size))
+    return tuple(files)
+
+
+def _parse(file_path: str) -> Dict:
+    with open(file_path, encoding="utf-8") as f:
+        if file_path.endswith(".json"):
+            try:
+                return json.load(f)
+            except (json.JSONDecodeError, UnicodeDecodeError) as e:
+                raise MenuError(f"{file_path}: {e}") from e
+        if yaml is None:
+            raise MenuError(f"{file_path}: PyYAML is not installed; use a .json menu or pip install pyyaml")
+        try:
+            return yaml.safe_load(f) or {}
+        except (yaml.YAMLError, UnicodeDecodeError) as e:
+            raise MenuError(f"{file_path}: {e}") from e
+
+
+def validate_menu(categories: Dict, aliases: Dict):
+    """Raise MenuError describing the first problem found"""
+    if not isinstance(categories, dict) or not categories:
+        raise MenuError("menu has no categories")
+    names = set()
+    for key, category in categories.items():
+        if not isinstance(category, dict) or not isinstance(category.get("name"), str) or not category["name"]:
+            raise MenuError(f"category {key!r} needs a name")
+        if not isinstance(category.get("items"), list):
+            raise MenuError(f"category {key!r} needs a list of items")
+        # Item IDs are scoped by category, so the same dish may appear in two categories
+        category_names = set()
+        for index, item in enumerate(category["items"]):
+            where = f"{key}[{index}]"
+            if not isinstance(item, dict) or not isinstance(item.get("name"), str) or not item["name"].strip():
+                raise MenuError(f"{where} needs a name")
+            price = item.get("price")
+            if isinstance(price, bool) or not isinstance(price, (int, float)) or not math.isfinite(price) or price < 0:
+                raise MenuError(f"{where} ({item['name']}) needs a non-negative price")
+            if not isinstance(item.get("description", ""), str):
+                raise MenuError(f"{where} ({item['name']}) description must be text")
+            tags = item.get("tags", [])
+            if not isinstance(tags, list) or not all(isinstance(tag, str) for tag in tags):
+                raise MenuError(f"{where} ({item['name']}) tags must be a list of text")
+            if item["name"].casefold() in category_names:
+                raise MenuError(f"{where} duplicates the item name {item['name']!r}")
+            category_names.add(item["name"].casefold())
+        names |= category_names
+    for name, phrases in aliases.items():
+        if name.casefold() not in names:
+            raise MenuError(f"aliases refer to unknown item {name!r}")
+        if not isinstance(phrases, (list, tuple)) or not all(isinstance(p, str) for p in phrases):
+            raise MenuError(f"aliases for {name!r} must be a list of phrases")
+
+
+def load_menu(path: str) -> Tuple[Dict, Dict]:
+    """Read and validate a menu file or directory; returns (categories, aliases)"""
+    files = menu_files(path)
+    if not files:
+        raise MenuError(f"no menu files in {path}")
+    categories: Dict = {}
+    aliases: Dict = {}
+    for file_path in files:
+        data = _parse(file_path)
+        if not isinstance(data, dict):
+            raise MenuError(f"{file_path}: expected a mapping with \"categories\"")
+        file_categories = data.get("categories") or {}
+        file_aliases = data.get("aliases") or {}
+        if not isinstance(file_categories, dict):
+            raise MenuError(f"{file_path}: \"categories\" must map category keys to categories")
+        if not isinstance(file_aliases, dict) or not all(isinstance(name, str) for name in file_aliases):
+            raise MenuError(f"{file_path}: \"aliases\" must map item names to phrases")
+        for key in file_categories:
+            if key in categories:
+                raise MenuError(f"{file_path}: category {key!r} is defined twice")
+        categories.update(file_categories)
+        aliases.update(file_aliases)
+    validate_menu(categories, aliases)
+    return categories, {name: tuple(phrases) for name, phrases in aliases.items()}
+
+
+def compile_menu(path: str) -> MenuCatalog:
+    categories, aliases = load_menu(path)
+    try:
+        return MenuCatalog(categories, aliases)
+    except (ValueError, TypeError) as e:
+        raise MenuError(f"{path}: menu failed to compile: {e}") from e
+
+
+class MenuWatcher:
+    """Polls a menu source and installs a freshly compiled catalog when it changes"""
+
+    def __init__(self, path: str, interval: float = MENU_WATCH_SECONDS,
+                 install: Callable[[MenuCatalog], None] = install_catalog):
+        self.path = path
+        self.interval = interval
+        self._install = install
+        self._signature: Optional[Tuple] = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def check(self) -> bool:
+        """Reload if the source changed since the last check; returns True if a new menu went live"""
+        current = signature(self.path)
+        if current == self._signature:
+            return False
+        self._signature = current
+        started = time.perf_counter()
+        try:
+            catalog = compile_menu(self.path)
+            self._install(catalog)
+        except (MenuError, OSError) as e:
+            MENU_RELOADS.inc(outcome="invalid")
+            log.error("menu_reload_failed", path=self.path, error=str(e))
+            return False
+        MENU_RELOADS.inc(outcome="ok")
+        MENU_ITEMS.set(len(catalog))
+        log.info("menu_reloaded", path=self.path, version=catalog.version, items=len(catalog),
+                 ms=round((time.perf_counter() - started) * 1000, 1))
+        return True
+
+    def start(self):
+        self.check()
+        self._thread = threading.Thread(target=self._run, name="menu-watcher", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """Stop watching; returns once a reload in progress has finished"""
+        self._stop.set()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.check()
+            except Exception as e:
+                log.exception("menu_watch_failed", path=self.path, error=str(e))
+
+
+def watch_from_env() -> Optional[MenuWatcher]:
+    """Load MENU_PATH now and keep watching it, if set"""
+    path = os.getenv("MENU_PATH")
+    if not path:
+        return None
+    return MenuWatcher(path).start()
@@ -0,0 +1,150 @@
+"""
+Per-call order ledger
+Lines are keyed by menu item ID, so ordering the same dish again raises its quantity instead of
+adding a line. The subtotal is kept in integer cents and updated on every change, so totals are
+O(1) to read. Every change is also appended to an event log (add / remove / undo) that the
+dispatcher can serialize as-is. The prompt, the read-back total and the order email all read
+from here.
+"""
+
+import hashlib
+import time
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from menu_catalog import DELIVERY_FEE_CENTS, MenuItem, format_dollars, service_charge_cents
+from menu_data import SERVICE_CHARGE_PERCENT
+
+
+class OrderLine(NamedTuple):
+    item_id: str
+    name: str
+    price_cents: int          # Price when it was ordered; a menu reload doesn't change it
+    quantity: int
+
+    @property
+    def total_cents(self) -> int:
+        return self.price_cents * self.quantity
+
+
+class OrderEvent(NamedTuple):
+    seq: int
+    action: str               # "add", "remove" or "undo"
+    item_id: str
+    name: str
+    price_cents: int
+    quantity: int             # Signed change in quantity
+    at: float                 # Unix time
+
+
+class OrderLedger:
+    """Order lines, running totals and the log of changes for one call"""
+    __slots__ = ("_lines", "_events", "_undo", "subtotal_cents", "item_count")
+
+    def __init__(self):
+        self._lines: Dict[str, OrderLine] = {}
+        self._events: List[OrderEvent] = []
+        self._undo: List[OrderEvent] = []   # Changes that can still be undone, newest last
+        self.subtotal_cents = 0
+        self.item_count = 0
+
+    def __len__(self) -> int:
+        return len(self._lines)
+
+    @property
+    def lines(self) -> Tuple[OrderLine, ...]:
+        return tuple(self._lines.values())
+
+    @property
+    def events(self) -> Tuple[OrderEvent, ...]:
+        return tuple(self._events)
+
+    @property
+    def service_charge_cents(self) -> int:
+        return service_charge_cents(self.subtotal_cents)
+
+    @property
+    def total_cents(self) -> int:
+        """Subtotal plus service charge and delivery"""
+        return self.subtotal_cents + self.service_charge_cents + DELIVERY_FEE_CENTS
+
+    def get(self, item_id: str) -> Optional[OrderLine]:
+        return self._lines.get(item_id)
+
+    def find(self, terms: str) -> Optional[OrderLine]:
+        """The line whose name contains the terms (or all of their words), most recent first"""
+        terms = terms.casefold()
+        words = terms.split()
+        if not words:
+            return None
+        for line in reversed(self._lines.values()):
+            name = line.name.casefold()
+            if terms in name or all(word in name for word in words):
+                return line
+        return None
+
+    def add(self, item: MenuItem, quantity: int = 1) -> OrderLine:
+        self._apply("add", item.id, item.name, item.price_cents, quantity)
+        return self._lines[item.id]
+
+    def remove(self, item_id: str, quantity: Optional[int] = None) -> int:
+        """Take some (default: all) of an item off the order; returns how many were removed"""
+        line = self._lines.get(item_id)
+        if line is None:
+            return 0
+        removed = line.quantity if quantity is None else min(quantity, line.quantity)
+        self._apply("remove", item_id, line.name, line.price_cents, -removed)
+        return removed
+
+    def undo(self) -> Optional[OrderEvent]:
+        """Reverse the latest add or remove not already undone; returns the event it reversed"""
+        if not self._undo:
+            return None
+        event = self._undo.pop()
+        self._apply("undo", event.item_id, event.name, event.price_cents, -event.quantity)
+        return event
+
+    def _apply(self, action: str, item_id: str, name: str, price_cents: int, change: int):
+        line = self._lines.get(item_id)
+        # A line keeps the price it was first ordered at, even if the menu changes meanwhile
+        line_price = line.price_cents if line is not None else price_cents
+        quantity = (line.quantity if line is not None else 0) + change
+        if quantity > 0:
+            self._lines[item_id] = OrderLine(item_id, name, line_price, quantity)
+        else:
+            self._lines.pop(item_id, None)
+        self.subtotal_cents += line_price * change
+        self.item_count += change
+        event = OrderEvent(len(self._events) + 1, action, item_id, name, line_price, change, time.time())
+        self._events.append(event)
+        if action != "undo":
+            self._undo.append(event)
+
+    def fingerprint(self) -> str:
+        """Identifies the order's contents, so the same order isn't dispatched twice"""
+        content = "|".join(f"{line.item_id}:{line.quantity}:{line.price_cents}" for line in self._lines.values())
+        return hashlib.sha1(content.encode()).hexdigest()[:16]
+
+    def describe(self) -> str:
+        """Current order with totals, as given to the LLM"""
+        if not self._lines:
+            return "No items in current order."
+        info = "Current order:\n"
+        for line in self._lines.values():
+            quantity = f"{line.quantity} x " if line.quantity > 1 else ""
+            info += f"- {quantity}{line.name} - ${format_dollars(line.price_cents)}\n"
+        info += f"Subtotal: ${format_dollars(self.subtotal_cents)}\n"
+        info += f"Service charge ({SERVICE_CHARGE_PERCENT}%): ${format_dollars(self.service_charge_cents)}\n"
+        info += f"Delivery fee: ${format_dollars(DELIVERY_FEE_CENTS)}\n"
+        info += f"Total: ${format_dollars(self.total_cents)}"
+        return info
+
+    def to_dict(self) -> Dict:
+        """JSON-ready snapshot: lines, totals and the full event log"""
+        return {
+            "lines": [line._asdict() for line in self._lines.values()],
+            "subtotal_cents": self.subtotal_cents,
+            "service_charge_cents": self.service_charge_cents,
+            "delivery_fee_cents": DELIVERY_FEE_CENTS,
+            "total_cents": self.total_cents,
+            "events": [event._asdict() for event in self._events],
+        }
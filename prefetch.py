@@ -0,0 +1,83 @@
+"""
+Predictive prefetch of next-turn audio
+After each turn we can usually guess the next deterministic prompt from the dialogue state -
+"anything else?" after an item is added, the room-number request once the guest is done, the
+order total and closing line once we're waiting on the room number. Those clips are synthesized
+in the background while the guest is still talking, so the next turn plays them from the cache.
+Predictions are scored on the following turn against the reply it spoke; the no-input fallback
+prompt after the Gather doesn't count.
+"""
+
+import threading
+from typing import Callable, Dict, Set, Tuple
+
+import metrics
+from dialogue import DialogueState
+from languages import LanguageProfile
+from structured_logging import get_logger
+
+log = get_logger("prefetch")
+
+PREFETCH_REQUESTS = metrics.counter(
+    "roomservice_prefetch_requests_total", "Predicted clips by what prefetch did with them", ("outcome",))
+PREFETCH_PREDICTIONS = metrics.counter(
+    "roomservice_prefetch_predictions_total", "Predicted clips by whether the next turn spoke them", ("outcome",))
+
+
+def predict_next_prompts(profile: LanguageProfile, state: DialogueState, confirmation: str = "") -> Tuple[str, ...]:
+    """Prompts the next turn is likely to speak, most likely first"""
+    if state is DialogueState.COMPLETE:
+        return (profile.closing,)
+    if state is DialogueState.AWAITING_ROOM:
+        # Next is the room number, answered with the order total and closing line
+        return (confirmation, profile.ask_room) if confirmation else (profile.ask_room,)
+    if state is DialogueState.ORDERING:
+        return (profile.anything_else, profile.ask_room)
+    return (profile.anything_else,)
+
+
+class Prefetcher:
+    """Runs speculative synthesis under a concurrency cap and scores predictions per call"""
+
+    def __init__(self, synthesize: Callable[[str, str], object], is_cached: Callable[[str, str], bool],
+                 max_in_flight: int = 2):
+        # synthesize(text, lang_code) returns a concurrent.futures.Future
+        self._synthesize = synthesize
+        self._is_cached = is_cached
+        self._slots = threading.BoundedSemaphore(max_in_flight)
+        self._lock = threading.Lock()
+        self._predictions: Dict[str, Set[Tuple[str, str]]] = {}
+
+    def score(self, call_sid: str, spoken: Set[Tuple[str, str]]):
+        """Count last turn's predictions for this call as used or unused"""
+        with self._lock:
+            predicted = self._predictions.pop(call_sid, set())
+        used = len(predicted & spoken)
+        if used:
+            PREFETCH_PREDICTIONS.inc(used, outcome="used")
+        if len(predicted) - used:
+            PREFETCH_PREDICTIONS.inc(len(predicted) - used, outcome="unused")
+
+    def prefetch(self, call_sid: str, lang_code: str, texts: Tuple[str, ...]):
+        """Synthesize predicted clips that aren't cached yet, skipping any over the cap"""
+        with self._lock:
+            self._predictions[call_sid] = {(text, lang_code) for text in texts}
+        for text in texts:
+            if self._is_cached(text, lang_code):
+                PREFETCH_REQUESTS.inc(outcome="cached")
+                continue
+            if not self._slots.acquire(blocking=False):
+                PREFETCH_REQUESTS.inc(outcome="over_cap")
+                continue
+            try:
+                future = self._synthesize(text, lang_code)
+            except Exception as e:
+                self._slots.release()
+                log.warning("prefetch_failed", call_sid=call_sid, error=str(e))
+                continue
+            future.add_done_callback(lambda _: self._slots.release())
+            PREFETCH_REQUESTS.inc(outcome="started")
+
+    def end_call(self, call_sid: str):
+        """Predictions left when a call ends were never spoken"""
+        self.score(call_sid, set())
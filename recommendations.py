@@ -0,0 +1,320 @@
+"""
+Dietary, spice and price recommendations over the menu
+"Something light", "anything vegetarian?", "something spicy under $20" are answered without the LLM.
+Dietary tags come from the menu's own item tags; spice level and lightness are inferred from each
+item's name and description. These and the price band are packed with a TF-IDF matrix of the item
+text into NumPy arrays built once per catalog version. A request is then a boolean filter and a
+matrix product over every item at once, so several requests can be ranked in one batch.
+"""
+
+import math
+import re
+import unicodedata
+from types import MappingProxyType
+from typing import Dict, FrozenSet, List, Mapping, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+
+import metrics
+from language_id import STOPWORDS
+from menu_catalog import CatalogCache, MenuCatalog, MenuItem
+
+RECOMMENDATIONS = metrics.counter(
+    "roomservice_recommendations_total", "Dietary and price requests, by whether anything fit", ("outcome",))
+
+TAGS = ("vegetarian", "vegan", "gluten-free", "spicy", "light")
+_TAG_BITS = MappingProxyType({tag: 1 << bit for bit, tag in enumerate(TAGS)})
+_NO_LIMIT = 2 ** 62
+
+# Dishes suggested per request
+TOP_K = 3
+
+# Words in a request that ask for each tag (English, plus the obvious cognates)
+TAG_PHRASES: Mapping[str, Tuple[str, ...]] = MappingProxyType({
+    "vegetarian": ("vegetarian", "veggie", "meatless", "no meat", "without meat", "vegetariano", "vegetariana",
+                   "vegetarien", "vegetarienne", "vegetarisch"),
+    "vegan": ("vegan", "vegano", "vegana", "plant based", "plant-based", "vegetalien"),
+    "gluten-free": ("gluten free", "gluten-free", "no gluten", "without gluten", "celiac", "coeliac", "sin gluten",
+                    "sans gluten", "glutenfrei", "senza glutine"),
+    "spicy": ("spicy", "hot and spicy", "with a kick", "picante", "epice", "scharf", "piccante"),
+    # "light" alone is too often something else ("turn on the light"): only next to food words
+    "light": ("something light", "anything light", "something lighter", "anything lighter", "light meal",
+              "light dish", "light bite", "light lunch", "light dinner", "light snack", "light option",
+              "lighter option", "healthy", "not too heavy", "not heavy", "algo ligero", "qualcosa di leggero",
+              "quelque chose de leger", "etwas leichtes"),
+})
+
+# Dietary tags (vegetarian, vegan) come only from the menu's own "tags": a description lists the
+# notable ingredients, not all of them, so a missing "butter" or "gelatin" says nothing.
+# The menu saying "gluten-free" outright counts too.
+GLUTEN_FREE_WORDS = ("gluten-free", "gluten free")
+# Words in an item's name or description that count towards a soft attribute (spicy, light) or against it
+SPICY_WORDS = ("spicy", "jalapeno", "chili", "chilli", "chile", "sriracha", "harissa", "kung pao", "buffalo",
+               "cayenne", "chipotle", "wasabi", "habanero", "gochujang", "szechuan", "sichuan", "peri peri")
+LIGHT_WORDS = ("salad", "soup", "steamed", "poke", "sorbet", "edamame", "vegetables", "crudites", "leaf",
+               "greens", "grilled", "broth", "lemon", "cucumber")
+HEAVY_WORDS = ("fried", "fries", "crispy", "burger", "cream", "creamy", "cheese", "bacon", "macaroni", "brownie",
+               "mousse", "pudding", "caramel", "braised", "butter", "breaded", "aioli", "mayo", "barbecue", "caviar",
+               "wings", "hearty", "ranch")
+
+# (band, highest price in cents); "cheap" asks for the first band, "a splurge" for the last
+PRICE_BANDS = (("budget", 1500), ("moderate", 3500), ("premium", None))
+CHEAP_WORDS = ("cheap", "inexpensive", "affordable", "budget", "not too expensive", "economical")
+PREMIUM_WORDS = ("splurge", "premium", "luxurious", "fancy", "treat myself", "most expensive")
+
+# Ranking: what the request's words match, then how spicy or light a dish is, then dishes over add-ons
+SPICE_WEIGHT = 0.5
+LIGHT_WEIGHT = 0.25
+DESCRIBED_WEIGHT = 0.05
+# An item's name counts this many times over its description in the TF-IDF matrix
+NAME_WEIGHT = 2
+
+# A price needs a money marker ("$20", "20 dollars"): "up to 2 people" is not one
+_AMOUNT = r"(?:\$\s*(\d+(?:\.\d{1,2})?)|(\d+(?:\.\d{1,2})?)\s*(?:dollars?|bucks))"
+_PRICE_LIMIT = re.compile(
+    r"(?:under|less than|below|cheaper than|no more than|at most|up to|max(?:imum)?)\s+" + _AMOUNT
+    + r"|" + _AMOUNT + r"\s+or (?:less|under|below)")
+_WORD_RE = re.compile(r"[a-z]+")
+# Plural endings, most specific first: "fries" -> "fry", "sandwiches" -> "sandwich", "tomatoes" -> "tomato"
+_PLURALS = (("ies", "y"), ("ches", "ch"), ("shes", "sh"), ("sses", "ss"), ("xes", "x"), ("oes", "o"), ("s", ""))
+
+# Request words that stand for words on the menu
+SYNONYMS: Mapping[str, str] = MappingProxyType({
+    "sweet": "dessert", "appetizer": "share", "starter": "share", "snack": "share", "main": "entree",
+    "veggie": "vegetable", "noodle": "pasta", "fish": "salmon",
+})
+
+# Words of a request that aren't about the food itself
+_FILLER = frozenset(
+    {word for word in STOPWORDS["en"].split() if "'" not in word}
+    | {"something", "anything", "recommend", "suggest", "suggestion", "suggestions", "options", "option", "dish",
+       "dishes", "food", "eat", "good", "nice", "have", "there", "got", "which", "one", "ones", "really", "very",
+       "maybe", "bit", "little", "too", "not", "no", "nothing", "without", "under", "less", "than", "below", "dollars",
+       "dollar", "bucks", "or", "on", "menu", "your", "we", "us", "we're", "am", "be", "also", "but", "in"})
+
+
+def normalize(text: str) -> str:
+    """Lowercase without accents: "Jalapeño" -> "jalapeno" """
+    if text.isascii():
+        return text.lower()
+    decomposed = unicodedata.normalize("NFKD", text.casefold())
+    return "".join(char for char in decomposed if not unicodedata.combining(char))
+
+
+def _phrase_pattern(phrases: Sequence[str]) -> "re.Pattern":
+    """Any of the phrases as whole words, plural or not"""
+    return re.compile(r"\b(?:" + "|".join(re.escape(phrase) for phrase in phrases) + r")(?:e?s)?\b")
+
+
+_GLUTEN_FREE = _phrase_pattern(GLUTEN_FREE_WORDS)
+_SPICY = _phrase_pattern(SPICY_WORDS)
+_LIGHT = _phrase_pattern(LIGHT_WORDS)
+_HEAVY = _phrase_pattern(HEAVY_WORDS)
+_TAG_PATTERNS = {tag: _phrase_pattern(phrases) for tag, phrases in TAG_PHRASES.items()}
+# "nothing spicy", "not too spicy", "non vegetarian": the tag is ruled out rather than asked for
+_NEGATION = re.compile(r"\b(?:not|no|non|nothing|without|isn't|aren't)\W+(?:\w+\W+)?$")
+_CHEAP = _phrase_pattern(CHEAP_WORDS)
+_PREMIUM = _phrase_pattern(PREMIUM_WORDS)
+# Most turns aren't requests like these: looking up their words (less any final "s") rules them out.
+# Each phrase is looked up by its last word.
+_TRIGGER_WORDS = frozenset(
+    word.rstrip("s") for word in
+    [_WORD_RE.findall(phrase)[-1] for phrases in (*TAG_PHRASES.values(), CHEAP_WORDS, PREMIUM_WORDS)
+     for phrase in phrases]
+    + ["under", "less", "below", "cheaper", "most", "up", "max", "maximum", "dollar", "buck"])
+
+
+def singular(word: str) -> str:
+    if len(word) > 3 and not word.endswith("ss"):
+        for plural, ending in _PLURALS:
+            if word.endswith(plural):
+                return word[:-len(plural)] + ending
+    return word
+
+
+def terms(text: str) -> List[str]:
+    """Normalized singular words of three letters or more, as indexed and queried"""
+    return [singular(word) for word in _WORD_RE.findall(normalize(text)) if len(word) > 2]
+
+
+class ItemAttributes(NamedTuple):
+    tags: FrozenSet[str]
+    spice: int                # Spicy ingredients named
+    lightness: int            # Light words minus heavy ones
+    price_band: str
+
+
+def price_band(price_cents: int) -> str:
+    return next(band for band, highest in PRICE_BANDS if highest is None or price_cents <= highest)
+
+
+def item_attributes(item: MenuItem) -> ItemAttributes:
+    """Attributes of a menu item: the dietary tags the menu gives it, spice and lightness from its text"""
+    text = normalize(f"{item.name} {item.description}")
+    tags = {tag.casefold() for tag in item.tags}
+    if _GLUTEN_FREE.search(text):
+        tags.add("gluten-free")
+    if "vegan" in tags:
+        tags.add("vegetarian")
+    spice = min(3, len(_SPICY.findall(text)))
+    # A salad is light wherever it sits, and so is most of a "Soups & Salads" category
+    described = normalize(f"{text} {item.category}")
+    lightness = len(_LIGHT.findall(described)) - len(_HEAVY.findall(described))
+    if spice:
+        tags.add("spicy")
+    if lightness > 0:
+        tags.add("light")
+    return ItemAttributes(frozenset(tags), spice, lightness, price_band(item.price_cents))
+
+
+class Query(NamedTuple):
+    tags: FrozenSet[str]          # Every one required
+    excluded: FrozenSet[str]      # None allowed ("nothing spicy")
+    max_cents: Optional[int]
+    min_cents: Optional[int]
+    terms: Tuple[str, ...]        # What else was asked for ("pasta", "chicken"), matched by similarity
+
+
+def parse_query(message: str) -> Optional[Query]:
+    """The dietary, spice or price request in a guest's message, or None if it isn't one"""
+    text = normalize(message)
+    if not any(word.rstrip("s") in _TRIGGER_WORDS for word in _WORD_RE.findall(text)):
+        return None
+    tags, excluded = set(), set()
+    for tag, pattern in _TAG_PATTERNS.items():
+        for match in pattern.finditer(text):
+            (excluded if _NEGATION.search(text, 0, match.start()) else tags).add(tag)
+    max_cents = min_cents = None
+    limit = _PRICE_LIMIT.search(text)
+    if limit is not None:
+        max_cents = round(float(next(amount for amount in limit.groups() if amount)) * 100)
+        text = text[:limit.start()] + text[limit.end():]
+    elif _CHEAP.search(text):
+        max_cents = PRICE_BANDS[0][1]
+    elif _PREMIUM.search(text):
+        min_cents = PRICE_BANDS[-2][1] + 1
+    if not tags and not excluded and max_cents is None and min_cents is None:
+        return None
+    for pattern in _TAG_PATTERNS.values():
+        text = pattern.sub(" ", text)
+    words = tuple(SYNONYMS.get(word, word) for word in terms(text) if word not in _FILLER)
+    return Query(frozenset(tags), frozenset(excluded - tags), max_cents, min_cents, words)
+
+
+class RecommendationIndex:
+    """Item attributes and TF-IDF features of a catalog as NumPy arrays"""
+
+    def __init__(self, catalog: MenuCatalog):
+        self.items: Tuple[MenuItem, ...] = catalog.items
+        self.attributes: Mapping[str, ItemAttributes] = MappingProxyType(
+            {item.id: item_attributes(item) for item in self.items})
+        documents = [terms(item.name) * NAME_WEIGHT + terms(f"{item.description} {item.category}")
+                     for item in self.items]
+        vocabulary: Dict[str, int] = {}
+        for document in documents:
+            for term in document:
+                vocabulary.setdefault(term, len(vocabulary))
+        self.vocabulary: Mapping[str, int] = MappingProxyType(vocabulary)
+
+        counts = np.zeros((len(self.items), len(vocabulary)), dtype=np.float32)
+        for row, document in enumerate(documents):
+            for term in document:
+                counts[row, vocabulary[term]] += 1
+        document_frequency = np.count_nonzero(counts, axis=0)
+        self.idf = (np.log((1 + len(self.items)) / (1 + document_frequency)) + 1).astype(np.float32)
+        features = counts * self.idf
+        norms = np.linalg.norm(features, axis=1, keepdims=True)
+        self.features = features / np.where(norms == 0, 1, norms)
+
+        attributes = [self.attributes[item.id] for item in self.items]
+        # One bit per tag, in TAGS order
+        self.tag_bits = np.array([self._bits(attrs.tags) for attrs in attributes], dtype=np.uint8)
+        self.prices = np.array([item.price_cents for item in self.items], dtype=np.int64)
+        # Ranked on beyond word similarity: spicier or lighter when asked, dishes over plain add-ons
+        self.spice = np.array([attrs.spice for attrs in attributes], dtype=np.float32)
+        self.lightness = np.array([attrs.lightness for attrs in attributes], dtype=np.float32)
+        self.described = np.array([bool(item.description) for item in self.items], dtype=np.float32)
+        self.categories = np.array([item.category_id for item in self.items], dtype=object)
+
+    def __len__(self) -> int:
+        return len(self.items)
+
+    @staticmethod
+    def _bits(tags: FrozenSet[str]) -> int:
+        return sum(_TAG_BITS[tag] for tag in tags if tag in _TAG_BITS)
+
+    def vector(self, query_terms: Sequence[str]) -> np.ndarray:
+        """Unit TF-IDF vector of a request's words; all zeros if none are on the menu"""
+        vector = np.zeros(len(self.vocabulary), dtype=np.float32)
+        for term in query_terms:
+            column = self.vocabulary.get(term)
+            if column is not None:
+                vector[column] += self.idf[column]
+        norm = float(np.linalg.norm(vector))
+        return vector / norm if norm else vector
+
+    def scores(self, queries: Sequence[Query]) -> np.ndarray:
+        """Score of every item for every request (queries x items); -inf where an item doesn't fit"""
+        required = np.array([self._bits(query.tags) for query in queries], dtype=np.uint8)[:, None]
+        excluded = np.array([self._bits(query.excluded) for query in queries], dtype=np.uint8)[:, None]
+        max_cents = np.array([_NO_LIMIT if query.max_cents is None else query.max_cents for query in queries],
+                             dtype=np.int64)[:, None]
+        min_cents = np.array([query.min_cents or 0 for query in queries], dtype=np.int64)[:, None]
+        # An item fits when it has every required tag, none of the excluded ones, and is in the price range
+        fits = ((self.tag_bits & required) == required) & ((self.tag_bits & excluded) == 0)
+        fits &= (self.prices <= max_cents) & (self.prices >= min_cents)
+
+        scores = np.broadcast_to(DESCRIBED_WEIGHT * self.described, fits.shape)
+        if any(query.terms for query in queries):
+            vectors = np.zeros((len(queries), len(self.vocabulary)), dtype=np.float32)
+            for row, query in enumerate(queries):
+                vectors[row] = self.vector(query.terms)
+            similarity = vectors @ self.features.T
+            # Words that are on the menu ("pasta", "dessert") narrow the request to what they match
+            fits &= (similarity > 0) | ~vectors.any(axis=1)[:, None]
+            scores = scores + similarity
+        wants_spicy = np.array(["spicy" in query.tags for query in queries], dtype=np.float32)[:, None]
+        wants_light = np.array(["light" in query.tags for query in queries], dtype=np.float32)[:, None]
+        scores = scores + SPICE_WEIGHT * wants_spicy * self.spice + LIGHT_WEIGHT * wants_light * self.lightness
+        return np.where(fits, scores, -np.inf)
+
+    def recommend_many(self, queries: Sequence[Query], k: int = TOP_K) -> List[List[MenuItem]]:
+        """Top `k` fitting items per request, best first; one per category unless the request named a dish"""
+        scores = self.scores(queries)
+        order = np.argsort(-scores, axis=1, kind="stable")
+        results = []
+        for row, query in enumerate(queries):
+            named = any(term in self.vocabulary for term in query.terms)
+            picks, categories = [], set()
+            for index in order[row]:
+                if scores[row, index] == -math.inf or len(picks) == k:
+                    break
+                category = self.categories[index]
+                if named or category not in categories:
+                    categories.add(category)
+                    picks.append(self.items[index])
+            results.append(picks)
+        return results
+
+    def recommend(self, query: Query, k: int = TOP_K) -> List[MenuItem]:
+        items = self.recommend_many([query], k)[0]
+        RECOMMENDATIONS.inc(outcome="matched" if items else "none")
+        return items
+
+
+_indexes = CatalogCache(RecommendationIndex)
+
+
+def index_for(catalog: MenuCatalog) -> RecommendationIndex:
+    """The catalog's recommendation index, built with the catalog when it is installed"""
+    return _indexes.get(catalog)
+
+
+def strip_price_limits(text: str) -> str:
+    """Text without its spoken price limits, so "under 100 dollars" isn't taken for a room number"""
+    return _PRICE_LIMIT.sub(" ", text)
+
+
+def recommendation_text(profile, items: Sequence[MenuItem]) -> str:
+    """Templated answer naming the recommended dishes, in the profile's language"""
+    return profile.recommend.format(items=", ".join(item.name for item in items))
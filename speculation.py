@@ -0,0 +1,103 @@
+"""
+Speculative turn processing on partial speech results
+With partial results enabled, Twilio posts the transcript so far to /partial-speech while the
+guest is still talking. Once a partial is stable, the language-switch check and the turn parse
+(intent, menu lookup, completion, room number) are run on it. When the final SpeechResult
+arrives, that work is used if the final transcript matches, and thrown away otherwise.
+
+Environment:
+    PARTIAL_SPEECH_RESULTS        "true" to ask Twilio for partial results (default off)
+    PARTIAL_STABILITY_THRESHOLD   Twilio Stability at which a partial counts as stable (default 0.8)
+"""
+
+import os
+import threading
+from typing import Callable, Dict, NamedTuple, Optional
+
+import metrics
+from agent import normalize_utterance
+
+PARTIAL_CALLBACK = "/partial-speech"
+
+STABILITY_THRESHOLD = float(os.getenv("PARTIAL_STABILITY_THRESHOLD", "0.8"))
+
+SPECULATIONS = metrics.counter(
+    "roomservice_speculations_total", "Speculative turn work on partial results, by outcome", ("outcome",))
+
+
+def partial_results_enabled() -> bool:
+    return os.getenv("PARTIAL_SPEECH_RESULTS", "").lower() in ("1", "true", "yes")
+
+
+class Speculation(NamedTuple):
+    """Turn work done ahead of the final transcript"""
+    text: str                     # normalized transcript it was computed from
+    requested_lang: Optional[str]
+    parsed: Dict
+
+
+class _PartialState:
+    __slots__ = ("sequence", "last_text", "speculation")
+
+    def __init__(self):
+        self.sequence = -1
+        self.last_text = ""
+        self.speculation: Optional[Speculation] = None
+
+
+class SpeculationStore:
+    """Latest speculation per call, built from stable partials and claimed by the final result"""
+
+    def __init__(self, detect_language: Callable[[str], Optional[str]], parse_turn: Callable[[str], Dict],
+                 stability_threshold: float = STABILITY_THRESHOLD):
+        self._detect_language = detect_language
+        self._parse_turn = parse_turn
+        self._threshold = stability_threshold
+        self._lock = threading.Lock()
+        self._calls: Dict[str, _PartialState] = {}
+
+    def on_partial(self, call_sid: str, text: str, stability: float, sequence: int) -> Optional[Speculation]:
+        """Speculate on a partial if it is stable; returns the speculation now held for the call"""
+        normalized = normalize_utterance(text)
+        with self._lock:
+            state = self._calls.setdefault(call_sid, _PartialState())
+            if sequence <= state.sequence:
+                return state.speculation  # Late, out-of-order callback
+            state.sequence = sequence
+            # Stable if Twilio says so, or if the transcript didn't change since the last partial
+            stable = stability >= self._threshold or normalized == state.last_text
+            state.last_text = normalized
+            if not normalized or not stable:
+                return state.speculation
+            if state.speculation is not None and state.speculation.text == normalized:
+                return state.speculation
+
+        speculation = Speculation(normalized, self._detect_language(normalized), self._parse_turn(normalized))
+        with self._lock:
+            state = self._calls.get(call_sid)
+            if state is None or state.last_text != normalized:
+                SPECULATIONS.inc(outcome="stale")
+                return None
+            if state.speculation is not None:
+                SPECULATIONS.inc(outcome="superseded")
+            state.speculation = speculation
+        SPECULATIONS.inc(outcome="started")
+        return speculation
+
+    def take(self, call_sid: str, final_text: str) -> Optional[Speculation]:
+        """Claim the call's speculation if it matches the final transcript; clears partial state"""
+        with self._lock:
+            state = self._calls.pop(call_sid, None)
+        if state is None or state.speculation is None:
+            return None
+        if state.speculation.text == normalize_utterance(final_text):
+            SPECULATIONS.inc(outcome="committed")
+            return state.speculation
+        SPECULATIONS.inc(outcome="discarded")
+        return None
+
+    def discard(self, call_sid: str):
+        with self._lock:
+            state = self._calls.pop(call_sid, None)
+        if state is not None and state.speculation is not None:
+            SPECULATIONS.inc(outcome="discarded")
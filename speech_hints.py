@@ -0,0 +1,93 @@
+"""
+Speech recognition hints for <Gather>, generated from the menu
+Hints bias Twilio's recognizer toward words we expect, so "Ossetra" or "Stracciatella" aren't
+mis-heard and turned into an extra LLM + TTS round-trip. They are built per language and per
+conversation state (e.g. digits while we wait for a room number), once per catalog version.
+"""
+
+import re
+from typing import Dict, Iterable, Mapping, Tuple
+
+import twiml
+from languages import DEFAULT_LANGUAGE, LANGUAGE_PROFILES, LANGUAGE_SWITCH_KEYWORDS, LanguageProfile
+from menu_catalog import MenuCatalog
+
+# Conversation states that get their own hints
+GREETING = "greeting"
+ORDERING = "ordering"
+AWAITING_ROOM = "awaiting_room"
+
+# Twilio accepts up to 500 hint phrases of up to 100 characters each
+MAX_HINT_PHRASES = 500
+MAX_HINT_CHARS = 100
+
+# Room numbers: Twilio's digit-sequence class token plus spoken digits
+DIGIT_HINTS = (
+    "$OOV_CLASS_DIGIT_SEQUENCE",
+    "zero", "oh", "one", "two", "three", "four", "five", "six", "seven", "eight", "nine", "hundred",
+)
+
+
+def spoken_name(name: str) -> str:
+    """Menu name as a guest would say it: "Caviar - Ossetra Prestige" -> "Caviar Ossetra Prestige" """
+    name = re.sub(r"\s*\([^)]*\)", "", name)
+    name = re.sub(r"[|\-,]+", " ", name)
+    return " ".join(name.split())
+
+
+def menu_phrases(catalog: MenuCatalog) -> Tuple[str, ...]:
+    """Item names, their aliases, then category names"""
+    phrases = []
+    for item in catalog.items:
+        phrases.append(spoken_name(item.name))
+        phrases.extend(catalog.aliases(item.name))
+    phrases.extend(spoken_name(category.name) for category in catalog.categories)
+    return tuple(phrases)
+
+
+def join_hints(phrases: Iterable[str]) -> str:
+    """Deduplicate phrases in priority order and apply Twilio's limits"""
+    seen = set()
+    kept = []
+    for phrase in phrases:
+        phrase = phrase.replace(",", " ").strip()
+        key = phrase.casefold()
+        if not phrase or len(phrase) > MAX_HINT_CHARS or key in seen:
+            continue
+        seen.add(key)
+        kept.append(phrase)
+        if len(kept) == MAX_HINT_PHRASES:
+            break
+    return ", ".join(kept)
+
+
+class HintTable:
+    """Hints string per (language, state), precomputed for one catalog version"""
+
+    def __init__(self, catalog: MenuCatalog, profiles: Mapping[str, LanguageProfile] = LANGUAGE_PROFILES):
+        self.version = catalog.version
+        menu = menu_phrases(catalog)
+        switch_keywords = tuple(LANGUAGE_SWITCH_KEYWORDS)
+        english = profiles[DEFAULT_LANGUAGE]
+
+        # First turn: the language isn't known yet, so every language's words
+        every_language = tuple(word for profile in profiles.values() for word in profile.hint_words)
+        self._greeting = join_hints(english.hint_words + menu + switch_keywords + every_language)
+
+        self._hints: Dict[Tuple[str, str], str] = {}
+        for code, profile in profiles.items():
+            words = profile.hint_words + english.hint_words
+            self._hints[(code, ORDERING)] = join_hints(words + menu + switch_keywords)
+            self._hints[(code, AWAITING_ROOM)] = join_hints(
+                profile.room_words + english.room_words + DIGIT_HINTS + words + menu)
+
+    def hints(self, language: str, state: str = ORDERING) -> str:
+        if state == GREETING:
+            return self._greeting
+        return self._hints.get((language, state)) or self._hints[(DEFAULT_LANGUAGE, state)]
+
+    def gather(self, language: str, state: str = ORDERING, gather_language: str = "auto",
+               partial_callback: str = "", speech_timeout: str = "auto") -> str:
+        """Rendered speech <Gather> carrying this language and state's hints"""
+        return twiml.gather_fragment(gather_language, self.hints(language, state), speech_timeout=speech_timeout,
+                                     partial_callback=partial_callback)
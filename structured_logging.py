@@ -0,0 +1,225 @@
+"""
+Structured, non-blocking logging for the Room Service Agent
+Log records are JSON lines written by a background thread, so request threads only
+pay for putting a record on a queue. The CallSid and trace ID of the current request
+are attached automatically, and chatty categories can be sampled.
+
+Environment:
+    LOG_LEVEL          minimum level (default INFO)
+    LOG_SAMPLE_RATES   per-category sampling, e.g. "tts.cache=0.05,audio.fetch=0.2"
+"""
+
+import atexit
+import contextvars
+import itertools
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+import threading
+import time
+from typing import Dict, Optional
+
+import metrics
+import tracing
+
+# Chatty informational events that are sampled unless overridden by LOG_SAMPLE_RATES
+DEFAULT_SAMPLE_RATES = {
+    "tts.cache": 0.1,
+    "audio.fetch": 0.1,
+}
+
+# Records waiting for the writer thread; when full, new records are dropped rather than blocking
+QUEUE_SIZE = 10000
+
+LOGS_DROPPED = metrics.counter("roomservice_logs_dropped_total", "Log records dropped because the log queue was full")
+LOGS_SAMPLED_OUT = metrics.counter("roomservice_logs_sampled_out_total", "Log records skipped by sampling", ("category",))
+
+# CallSid for work running outside a traced request (e.g. background threads)
+_call_sid_override: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("log_call_sid", default=None)
+
+_listener: Optional[logging.handlers.QueueListener] = None
+_configure_lock = threading.Lock()
+_loggers: Dict[str, "StructuredLogger"] = {}
+
+
+def parse_sample_rates(value: str) -> Dict[str, float]:
+    """Parse "category=rate,category=rate" into a dict"""
+    rates = {}
+    for part in (value or "").split(","):
+        if "=" not in part:
+            continue
+        category, rate = part.split("=", 1)
+        try:
+            rates[category.strip()] = min(1.0, max(0.0, float(rate)))
+        except ValueError:
+            continue
+    return rates
+
+
+class JsonFormatter(logging.Formatter):
+    """Render a record as one compact JSON object per line"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": round(record.created, 3),
+            "level": record.levelname,
+            "category": getattr(record, "category", record.name),
+            "event": record.getMessage(),
+        }
+        call_sid = getattr(record, "call_sid", None)
+        if call_sid:
+            entry["call_sid"] = call_sid
+        trace_id = getattr(record, "trace_id", None)
+        if trace_id:
+            entry["trace_id"] = trace_id
+        fields = getattr(record, "fields", None)
+        if fields:
+            entry.update(fields)
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str, separators=(",", ":"))
+
+
+class _StdoutHandler(logging.StreamHandler):
+    """Writes to whatever sys.stdout is at emit time (it may be swapped after configure)"""
+
+    def __init__(self):
+        logging.Handler.__init__(self)
+
+    @property
+    def stream(self):
+        return sys.stdout
+
+    @stream.setter
+    def stream(self, value):
+        pass
+
+
+class NonBlockingQueueHandler(logging.handlers.QueueHandler):
+    """Queue handler that never blocks the caller and defers formatting to the writer thread"""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # The stock handler formats here, on the request thread - leave that to the listener
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            LOGS_DROPPED.inc()
+
+
+class StructuredLogger:
+    """Logger for one category: log.info("event_name", key=value, ...)"""
+
+    def __init__(self, category: str, sample_rate: float = 1.0):
+        self.category = category
+        self._logger = logging.getLogger(f"roomservice.{category}")
+        self.sample_rate = sample_rate
+        # Keep 1 in N informational records when sampled
+        self._sample_every = max(1, round(1 / sample_rate)) if sample_rate > 0 else 0
+        self._counter = itertools.count()
+
+    def _sampled_out(self, level: int) -> bool:
+        if level >= logging.WARNING or self.sample_rate >= 1.0:
+            return False
+        if self._sample_every == 0 or next(self._counter) % self._sample_every:
+            LOGS_SAMPLED_OUT.inc(category=self.category)
+            return True
+        return False
+
+    def log(self, level: int, event: str, exc_info=None, **fields):
+        if not self._logger.isEnabledFor(level) or self._sampled_out(level):
+            return
+        trace = tracing.current_trace()
+        call_sid = fields.pop("call_sid", None) or _call_sid_override.get() or (trace.call_sid if trace else None)
+        extra = {
+            "category": self.category,
+            "call_sid": call_sid,
+            "trace_id": trace.trace_id if trace else None,
+            "fields": fields,
+        }
+        self._logger.log(level, event, exc_info=exc_info, extra=extra)
+
+    def debug(self, event: str, **fields):
+        self.log(logging.DEBUG, event, **fields)
+
+    def info(self, event: str, **fields):
+        self.log(logging.INFO, event, **fields)
+
+    def warning(self, event: str, **fields):
+        self.log(logging.WARNING, event, **fields)
+
+    def error(self, event: str, **fields):
+        self.log(logging.ERROR, event, **fields)
+
+    def exception(self, event: str, **fields):
+        """Log at ERROR with the current exception's traceback"""
+        self.log(logging.ERROR, event, exc_info=sys.exc_info(), **fields)
+
+
+def configure(stream=None, level: Optional[str] = None) -> logging.handlers.QueueListener:
+    """
+    Install the queue handler and start the background writer. Once that's done, only a call with
+    a stream changes anything: records already queued go to the old output, later ones to the stream.
+    """
+    global _listener
+    with _configure_lock:
+        root = logging.getLogger("roomservice")
+        if _listener is not None:
+            if stream is None:
+                return _listener
+            log_queue = _listener.queue
+            _listener.stop()
+        else:
+            log_queue = queue.Queue(maxsize=QUEUE_SIZE)
+            root.handlers = [NonBlockingQueueHandler(log_queue)]
+            root.setLevel(os.getenv("LOG_LEVEL", "INFO").upper())
+            root.propagate = False
+            atexit.register(shutdown)
+        if level:
+            root.setLevel(level.upper())
+
+        output = logging.StreamHandler(stream) if stream else _StdoutHandler()
+        output.setFormatter(JsonFormatter())
+        _listener = logging.handlers.QueueListener(log_queue, output, respect_handler_level=False)
+        _listener.start()
+        return _listener
+
+
+def shutdown():
+    """Flush queued records and stop the writer thread"""
+    global _listener
+    with _configure_lock:
+        if _listener is None:
+            return
+        _listener.stop()
+        _listener = None
+
+
+def get_logger(category: str) -> StructuredLogger:
+    """Get the structured logger for a category, configuring logging on first use"""
+    logger = _loggers.get(category)
+    if logger is None:
+        configure()
+        rates = {**DEFAULT_SAMPLE_RATES, **parse_sample_rates(os.getenv("LOG_SAMPLE_RATES", ""))}
+        logger = StructuredLogger(category, rates.get(category, 1.0))
+        _loggers[category] = logger
+    return logger
+
+
+def bind_call_sid(call_sid: Optional[str]):
+    """Attach a CallSid to log records from this context (for work outside a traced request)"""
+    return _call_sid_override.set(call_sid)
+
+
+def flush(timeout: float = 1.0):
+    """Wait briefly for queued records to be written (used by tests and scripts)"""
+    if _listener is None:
+        return
+    deadline = time.monotonic() + timeout
+    while _listener.queue.unfinished_tasks and time.monotonic() < deadline:
+        time.sleep(0.005)
@@ -0,0 +1,224 @@
+"""
+Multi-property tenancy
+One deployment can answer several hotels' numbers. The Twilio `To` number picks the tenant; each
+tenant has its own menu catalog (and the hints and indexes built from it), persona, greetings and
+order email, plus its own agent holding its calls. Tenants are loaded on their first call and
+evicted after TENANT_IDLE_SECONDS with no calls. Synthesized audio stays in the one shared store,
+keyed by text, language and audio profile, so phrases the hotels have in common are synthesized once.
+
+Numbers not listed in TENANTS_PATH (or every number, without it) go to the default tenant: the
+menu from menu_data.py or MENU_PATH and the persona below.
+
+TENANTS_PATH file:
+    {"tenants": [{"id": "fs-vancouver", "numbers": ["+16045550100"],
+                  "hotel": "Four Seasons Hotel Vancouver", "concierge": "Nasrin",
+                  "menu_path": "menus/vancouver.json", "order_email": "ird@example.com",
+                  "greetings": {"en-US": "Hello, this is Nasrin from Four Seasons Vancouver. ..."}}]}
+"""
+
+import json
+import os
+import re
+import threading
+import time
+from types import MappingProxyType
+from typing import Callable, Dict, List, Mapping, NamedTuple, Optional, Tuple
+
+import metrics
+from menu_catalog import DEFAULT_OWNER, release_catalog
+from structured_logging import get_logger
+
+log = get_logger("tenant")
+
+TENANT_IDLE_SECONDS = float(os.getenv("TENANT_IDLE_SECONDS", "1800"))
+
+TENANTS_LOADED = metrics.gauge("roomservice_tenants_loaded", "Tenants currently loaded")
+TENANT_LOADS = metrics.counter("roomservice_tenant_loads_total", "Tenant loads and evictions, by outcome", ("outcome",))
+
+
+class TenantError(ValueError):
+    """A tenant's configuration is invalid or its menu couldn't be loaded"""
+
+
+class TenantConfig(NamedTuple):
+    id: str
+    hotel: str = "Four Seasons Hotel Toronto"
+    concierge: str = "Nasrin"
+    numbers: Tuple[str, ...] = ()
+    menu_path: str = ""                    # Empty: the default menu
+    order_email: str = ""                  # Empty: ORDER_EMAIL
+    greetings: Mapping[str, str] = MappingProxyType({})   # Language code -> greeting ({version} allowed)
+
+    @property
+    def catalog_owner(self) -> str:
+        """Key of this tenant's catalog in menu_catalog"""
+        return self.id if self.menu_path else DEFAULT_OWNER
+
+
+DEFAULT_TENANT = TenantConfig(DEFAULT_OWNER)
+
+
+def normalize_number(number: Optional[str]) -> str:
+    """E.164-ish key for a phone number: "+1 (416) 555-0100" -> "+14165550100" """
+    if not number:
+        return ""
+    digits = re.sub(r"\D", "", number)
+    return f"+{digits}" if digits else ""
+
+
+def load_tenants(path: str) -> Dict[str, TenantConfig]:
+    """Tenant configs by normalized phone number"""
+    with open(path, encoding="utf-8") as f:
+        try:
+            data = json.load(f)
+        except json.JSONDecodeError as e:
+            raise TenantError(f"{path}: {e}") from e
+    by_number: Dict[str, TenantConfig] = {}
+    ids = {DEFAULT_OWNER}
+    base = os.path.dirname(os.path.abspath(path))
+    for entry in data.get("tenants", []):
+        tenant_id = entry.get("id")
+        if not tenant_id or tenant_id in ids:
+            raise TenantError(f"{path}: every tenant needs a unique id (got {tenant_id!r})")
+        ids.add(tenant_id)
+        numbers = tuple(normalize_number(number) for number in entry.get("numbers", ()))
+        if not numbers or not all(numbers):
+            raise TenantError(f"{path}: tenant {tenant_id!r} needs at least one phone number")
+        menu_path = entry.get("menu_path", "")
+        config = TenantConfig(
+            tenant_id,
+            entry.get("hotel", DEFAULT_TENANT.hotel),
+            entry.get("concierge", DEFAULT_TENANT.concierge),
+            numbers,
+            os.path.join(base, menu_path) if menu_path else "",
+            entry.get("order_email", ""),
+            MappingProxyType(dict(entry.get("greetings", {}))),
+        )
+        for number in numbers:
+            if number in by_number:
+                raise TenantError(f"{path}: {number} belongs to both {by_number[number].id!r} and {tenant_id!r}")
+            by_number[number] = config
+    return by_number
+
+
+class Tenant:
+    """A loaded tenant: its config and the per-tenant objects built for it"""
+    __slots__ = ("config", "agent", "speculations", "watcher", "calls", "last_used")
+
+    def __init__(self, config: TenantConfig, agent, speculations, watcher=None):
+        self.config = config
+        self.agent = agent
+        self.speculations = speculations
+        self.watcher = watcher
+        self.calls = 0
+        self.last_used = time.monotonic()
+
+    @property
+    def id(self) -> str:
+        return self.config.id
+
+    def close(self):
+        if self.watcher is not None:
+            self.watcher.stop()   # Waits out a reload in progress, which would install the catalog again
+        release_catalog(self.config.catalog_owner)
+
+
+class TenantRegistry:
+    """Resolves calls to tenants, loading tenants on first use and evicting idle ones"""
+
+    def __init__(self, build: Callable[[TenantConfig], Tenant], by_number: Mapping[str, TenantConfig] = None,
+                 idle_seconds: float = TENANT_IDLE_SECONDS):
+        self._build = build
+        self._by_number = dict(by_number or {})
+        self._by_id = {config.id: config for config in self._by_number.values()}
+        self._idle_seconds = idle_seconds
+        self._lock = threading.Lock()
+        self._loaded: Dict[str, Tenant] = {}
+        self._call_tenants: Dict[str, str] = {}
+        self.default = self._load(DEFAULT_TENANT)
+
+    def _load(self, config: TenantConfig) -> Tenant:
+        started = time.perf_counter()
+        tenant = self._build(config)
+        self._loaded[config.id] = tenant
+        TENANTS_LOADED.set(len(self._loaded))
+        TENANT_LOADS.inc(outcome="loaded")
+        log.info("tenant_loaded", tenant=config.id, ms=round((time.perf_counter() - started) * 1000, 1))
+        return tenant
+
+    def _resolve(self, tenant_id: str) -> Tenant:
+        """A tenant by id, loading it if needed (call with the lock held)"""
+        tenant = self._loaded.get(tenant_id)
+        if tenant is None:
+            config = self._by_id.get(tenant_id)
+            if config is None:
+                return self.default
+            try:
+                tenant = self._load(config)
+            except (TenantError, OSError) as e:
+                TENANT_LOADS.inc(outcome="failed")
+                log.error("tenant_load_failed", tenant=tenant_id, error=str(e))
+                return self.default
+        tenant.last_used = time.monotonic()
+        return tenant
+
+    def get(self, tenant_id: str) -> Tenant:
+        """A tenant by id, loading it if needed; the default tenant if it can't be loaded"""
+        tenant = self._loaded.get(tenant_id)
+        if tenant is not None:
+            tenant.last_used = time.monotonic()
+            return tenant
+        with self._lock:
+            return self._resolve(tenant_id)
+
+    def start_call(self, call_sid: str, to_number: Optional[str]) -> Tenant:
+        """Tenant answering a call to this number; the call stays with it until end_call"""
+        config = self._by_number.get(normalize_number(to_number))
+        # Looked up and counted in one step, so evict_idle can't close it in between
+        with self._lock:
+            tenant = self._resolve(config.id) if config is not None else self.default
+            if self._call_tenants.get(call_sid) != tenant.id:
+                self._call_tenants[call_sid] = tenant.id
+                tenant.calls += 1
+        return tenant
+
+    def for_call(self, call_sid: Optional[str], to_number: Optional[str] = None) -> Tenant:
+        """Tenant handling a call (resolved from `To` if the call wasn't seen at /voice)"""
+        tenant_id = self._call_tenants.get(call_sid)
+        if tenant_id is None:
+            return self.start_call(call_sid, to_number) if call_sid and to_number else self.default
+        return self.get(tenant_id)
+
+    def end_call(self, call_sid: str) -> Tenant:
+        with self._lock:
+            tenant_id = self._call_tenants.pop(call_sid, None)
+            tenant = self._loaded.get(tenant_id) if tenant_id else None
+            if tenant is not None:
+                tenant.calls -= 1
+                tenant.last_used = time.monotonic()
+        return tenant or self.default
+
+    def evict_idle(self, now: Optional[float] = None) -> List[str]:
+        """Unload tenants with no calls that haven't been used for the idle timeout"""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            idle = [tenant for tenant in self._loaded.values()
+                    if tenant is not self.default and tenant.calls <= 0
+                    and now - tenant.last_used >= self._idle_seconds]
+            for tenant in idle:
+                del self._loaded[tenant.id]
+            TENANTS_LOADED.set(len(self._loaded))
+        for tenant in idle:
+            tenant.close()
+            TENANT_LOADS.inc(outcome="evicted")
+            log.info("tenant_evicted", tenant=tenant.id)
+        return [tenant.id for tenant in idle]
+
+    def loaded(self) -> List[Tenant]:
+        return list(self._loaded.values())
+
+
+def registry_from_env(build: Callable[[TenantConfig], Tenant]) -> TenantRegistry:
+    """Registry for TENANTS_PATH, or with just the default tenant"""
+    path = os.getenv("TENANTS_PATH")
+    return TenantRegistry(build, load_tenants(path) if path else {})
@@ -0,0 +1,93 @@
+"""
+Tests for LLM/TTS admission control and the templated answers for shed turns
+"""
+
+import threading
+import time
+
+import admission
+import agent as agent_module
+import app as app_module
+from admission import ADMISSION_SHED, AdmissionGate, Decision, Limits, LocalBackend
+from test_dialogue import make_agent
+
+
+class FullBackend:
+    """Backend that is always over its limit"""
+
+    def acquire(self, resource, limits):
+        return Decision(False, "concurrency")
+
+    def release(self, resource, lease):
+        raise AssertionError("nothing was admitted")
+
+
+def test_token_bucket_sheds_once_the_burst_is_spent():
+    gate = AdmissionGate("test_rate", Limits(rate=0.001, burst=2, max_concurrent=0, wait_seconds=0), LocalBackend())
+    outcomes = []
+    for _ in range(3):
+        with gate.admit() as admitted:
+            outcomes.append(admitted)
+    assert outcomes == [True, True, False]
+    assert ADMISSION_SHED.value(resource="test_rate", reason="rate") == 1
+
+
+def test_concurrency_cap_and_wait_budget():
+    gate = AdmissionGate("test_slots", Limits(rate=0, burst=0, max_concurrent=1, wait_seconds=0), LocalBackend())
+    with gate.admit() as first:
+        with gate.admit() as second:
+            assert first and not second
+    with gate.admit() as again:
+        assert again
+
+    # A waiting request gets in once the slot frees up within its budget
+    held = threading.Event()
+
+    def hold_slot():
+        with gate.admit():
+            held.set()
+            time.sleep(0.05)
+
+    holder = threading.Thread(target=hold_slot)
+    holder.start()
+    held.wait()
+    with gate.admit(wait_seconds=1.0) as admitted:
+        assert admitted
+    holder.join()
+
+
+def test_backend_errors_admit_rather_than_fail():
+    class Broken:
+        def acquire(self, resource, limits):
+            raise ConnectionError("redis down")
+
+        def release(self, resource, lease):
+            raise ConnectionError("redis down")
+
+    with AdmissionGate("test_broken", Limits(0, 0, 1, 0), Broken()).admit() as admitted:
+        assert admitted
+
+
+def test_shed_llm_turns_answer_from_templates(monkeypatch):
+    monkeypatch.setattr(admission, "llm", AdmissionGate("llm", Limits(0, 0, 1, 0), FullBackend()))
+    agent, recorder = make_agent(monkeypatch)
+    shed_before = agent_module.TURNS.value(source="shed")
+
+    reply = agent.process_message("CAshed", "I'd like the truffle fries please")
+    total = agent.order_total_cents("CAshed")
+    assert reply == f"Truffle Fries is on your order. That's {total // 100}.{total % 100:02d} dollars so far. Anything else?"
+    reply = agent.process_message("CAshed", "¿Qué postres tienen?", "es-ES")
+    assert reply.startswith("Disculpe, estamos muy ocupados")
+    assert recorder.payloads == []
+    assert agent_module.TURNS.value(source="shed") == shed_before + 2
+
+    # Checkout is templated anyway, so a shed call can still be completed
+    agent.process_message("CAshed", "That's all")
+    assert agent.process_message("CAshed", "Room 1204").endswith("Enjoy your stay!")
+
+
+def test_shed_tts_falls_back_to_say(monkeypatch):
+    monkeypatch.setattr(admission, "tts", AdmissionGate("tts", Limits(0, 0, 1, 0), FullBackend()))
+    shed_before = ADMISSION_SHED.value(resource="tts", reason="concurrency")
+    assert app_module.synthesize_audio("Hello", "en-US", "shed-test") is None
+    assert ADMISSION_SHED.value(resource="tts", reason="concurrency") == shed_before + 1
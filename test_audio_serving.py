@@ -0,0 +1,115 @@
+"""
+Tests for telephony audio synthesis (deadlines, voice fallback) and conditional/range serving of clips
+"""
+
+import threading
+import time
+
+import pytest
+
+import app as app_module
+from audio_profiles import AUDIO_PROFILES, get_audio_profile
+from google.cloud import texttospeech
+
+
+class _FakeTTSClient:
+    def __init__(self, release=None, missing_voices=()):
+        self.configs = []
+        self.voices = []
+        self.release = release
+        self.missing_voices = missing_voices
+
+    def synthesize_speech(self, input, voice, audio_config):
+        self.configs.append(audio_config)
+        self.voices.append(voice.name)
+        if voice.name in self.missing_voices:
+            raise ValueError(f"Voice '{voice.name}' does not exist.")
+        if self.release is not None:
+            self.release.wait(5)
+        return type("Synthesis", (), {"audio_content": b"RIFF" + bytes(4000)})()
+
+
+@pytest.fixture
+def client():
+    yield app_module.app.test_client()
+    for audio_id in list(app_module.audio_cache):
+        app_module.discard_audio(audio_id)
+
+
+def test_synthesizes_telephony_mulaw(monkeypatch, client):
+    fake = _FakeTTSClient()
+    monkeypatch.setattr(app_module, "gcp_tts_client", fake)
+    monkeypatch.setattr(app_module, "audio_profile", get_audio_profile("mulaw"))
+
+    audio_id = app_module.generate_audio_with_gcp("Your order is on its way.", "en-US", "https://example.com")
+    assert app_module.generate_audio_with_gcp("Your order is on its way.", "en-US", "https://example.com") == audio_id
+
+    assert len(fake.configs) == 1
+    config = fake.configs[0]
+    assert config.audio_encoding == texttospeech.AudioEncoding.MULAW
+    assert config.sample_rate_hertz == 8000
+    assert config.volume_gain_db == 0
+    assert client.get(f"/audio/{audio_id}").headers["Content-Type"] == "audio/wav"
+
+
+def test_slow_synthesis_falls_back_and_finishes_in_background(monkeypatch, client):
+    release = threading.Event()
+    fake = _FakeTTSClient(release=release)
+    monkeypatch.setattr(app_module, "gcp_tts_client", fake)
+    text = "Perfect! May I have your room number, please?"
+
+    deadline = time.monotonic() + 0.05
+    assert app_module.generate_audio_with_gcp(text, "en-US", "https://example.com", deadline) is None
+    # A second request for the same text joins the synthesis already running
+    assert app_module.generate_audio_with_gcp(text, "en-US", "https://example.com", deadline) is None
+
+    future = app_module.tts_in_flight[app_module.audio_text_hash(text, "en-US")]
+    release.set()
+    future.result(5)
+    assert app_module.generate_audio_with_gcp(text, "en-US", "https://example.com") is not None
+    assert len(fake.configs) == 1
+
+
+def test_missing_voice_is_resolved_once(monkeypatch, client):
+    voice_name = app_module.get_language_profile("de-DE").gcp_voice[0]
+    fake = _FakeTTSClient(missing_voices=(voice_name,))
+    monkeypatch.setattr(app_module, "gcp_tts_client", fake)
+    monkeypatch.setattr(app_module, "default_voice_languages", set())
+
+    assert app_module.generate_audio_with_gcp("Guten Tag", "de-DE", "https://example.com")
+    assert app_module.generate_audio_with_gcp("Noch etwas?", "de-DE", "https://example.com")
+    assert fake.voices == [voice_name, "", ""]
+
+
+@pytest.mark.parametrize("in_memory", [True, False])
+def test_conditional_and_range_requests(monkeypatch, client, in_memory):
+    if not in_memory:
+        monkeypatch.setattr(app_module, "AUDIO_MEMORY_MAX_BYTES", 0)
+    content = bytes(range(256)) * 8
+    audio_id = app_module.store_audio(content, "test-hash", AUDIO_PROFILES["mp3"])
+    assert (app_module.audio_cache[audio_id]["path"] is None) == in_memory
+
+    full = client.get(f"/audio/{audio_id}")
+    assert full.status_code == 200
+    assert full.data == content
+    assert full.headers["Accept-Ranges"] == "bytes"
+    etag = full.headers["ETag"]
+    assert not etag.startswith("W/")
+
+    assert client.get(f"/audio/{audio_id}", headers={"If-None-Match": etag}).status_code == 304
+
+    partial = client.get(f"/audio/{audio_id}", headers={"Range": "bytes=100-199"})
+    assert partial.status_code == 206
+    assert partial.headers["Content-Range"] == f"bytes 100-199/{len(content)}"
+    assert partial.data == content[100:200]
+    for response in (full, partial):
+        response.close()
+
+
+def test_missing_clip_is_404(client):
+    assert client.get("/audio/unknown").status_code == 404
+
+    audio_id = app_module.store_audio(b"ID3" + bytes(10), "gone", AUDIO_PROFILES["mp3"])
+    app_module.discard_audio(audio_id)
+    assert client.get(f"/audio/{audio_id}").status_code == 404
+    assert "gone" not in app_module.response_cache
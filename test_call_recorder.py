@@ -0,0 +1,82 @@
+"""
+Tests for call transcripts and replaying them
+"""
+
+import app as app_module
+import call_replay
+from agent import RoomServiceAgent
+from call_recorder import CallRecorder, read_transcripts, redact
+from test_dialogue import make_agent
+
+
+def test_room_numbers_are_redacted():
+    assert redact("Room 1204.") == "Room 0000."
+    assert redact("room number 12 please") == "room number 00 please"
+    assert redact("It's 4402") == "It's 0000"
+    assert redact("two 12 ounce steaks") == "two 12 ounce steaks"
+    assert redact("Sending it to 77 now", room="77") == "Sending it to 00 now"
+
+
+def test_transcripts_are_appended_per_call(tmp_path):
+    recorder = CallRecorder(str(tmp_path))
+    recorder.write("CAone", {"path": "/voice", "form": {"CallSid": "CAone"}})
+    recorder.write("CAone", {"path": "/status", "form": {"CallSid": "CAone"}})
+    recorder.write("../CAtwo", {"path": "/voice", "form": {"CallSid": "CAtwo"}})
+    assert sorted(path.name for path in tmp_path.iterdir()) == ["CAone.jsonl", "CAtwo.jsonl"]
+    assert [len(records) for records in read_transcripts(str(tmp_path))] == [2, 1]
+    assert not CallRecorder(rate=0).wants("CAone") and CallRecorder().wants("CAone")
+
+
+def test_webhooks_are_recorded_and_replay_to_the_same_outcome(monkeypatch):
+    agent, _ = make_agent(monkeypatch)
+    monkeypatch.setattr(app_module, "recorder", CallRecorder())
+    monkeypatch.setattr(app_module.tenant_registry.default, "agent", agent)
+    client = app_module.app.test_client()
+    call = {"CallSid": "CArecorded", "From": "+14165550123"}
+    client.post("/voice", data=call)
+    for speech in ("I'd like the truffle fries please", "That's all", "Room 1204"):
+        client.post("/process-speech", data={**call, "SpeechResult": speech})
+    client.post("/status", data={**call, "CallStatus": "completed"})
+
+    records = app_module.recorder.calls["CArecorded"]
+    assert [record["path"] for record in records] == ["/voice"] + ["/process-speech"] * 3 + ["/status"]
+    assert records[3]["form"]["SpeechResult"] == "Room 0000" and "From" not in records[3]["form"]
+    assert records[3]["placed"] and records[3]["state"] == "complete"
+    assert "1204" not in str(records)
+
+    summary = call_replay.summarize([records])
+    assert summary["turn_ms"]["count"] == 3
+    assert summary["outcomes"]["CArecorded"] == {
+        "placed": True, "items": {"to_share/truffle-fries": 1}, "total_cents": records[3]["order"]["total_cents"],
+        "state": "complete"}
+    changed = {"CArecorded": dict(summary["outcomes"]["CArecorded"], placed=False)}
+    assert len(call_replay.outcome_diffs(summary["outcomes"], changed)) == 1
+    assert call_replay.outcome_diffs(summary["outcomes"], summary["outcomes"]) == []
+
+
+def test_replay_stubs_only_its_own_calls(monkeypatch):
+    agent, _ = make_agent(monkeypatch)
+    monkeypatch.setattr(app_module, "recorder", CallRecorder())
+    monkeypatch.setattr(app_module.tenant_registry.default, "agent", agent)
+    client = app_module.app.test_client()
+    call = {"CallSid": "CAreplayed"}
+    client.post("/voice", data=call)
+    for speech in ("I'd like the truffle fries please", "That's all", "Room 1204"):
+        client.post("/process-speech", data={**call, "SpeechResult": speech})
+    client.post("/status", data={**call, "CallStatus": "completed"})
+    recorded = app_module.recorder.calls["CAreplayed"]
+
+    # replay() sets these up for itself and leaves them; put them back after the test
+    for name in ("partial_callback", "gcp_tts_client", "recorder"):
+        monkeypatch.setattr(app_module, name, getattr(app_module, name))
+    send_order_email = RoomServiceAgent.send_order_email
+    replayed = call_replay.replay([recorded], speed=0)
+    assert call_replay.summarize(replayed)["outcomes"] == call_replay.summarize([recorded])["outcomes"]
+    # Nothing stays patched once the replay is over
+    assert RoomServiceAgent.xai_post is None and RoomServiceAgent.send_order_email is send_order_email
+
+    # Requests from threads that aren't replaying a call go out as usual
+    sent = []
+    monkeypatch.setattr(call_replay.requests, "post", lambda url, **kwargs: sent.append(url))
+    call_replay.ReplayXai()("https://api.x.ai/v1/chat/completions", json={})
+    assert sent == ["https://api.x.ai/v1/chat/completions"]
@@ -0,0 +1,54 @@
+"""
+Tests for the admin profiling endpoints
+"""
+
+import threading
+import time
+
+import app as app_module
+import diagnostics
+
+ADMIN = {"X-Admin-Token": "test-admin"}
+
+
+def test_profile_start_rejects_bad_durations(monkeypatch):
+    monkeypatch.setenv("ADMIN_TOKEN", "test-admin")
+    client = app_module.app.test_client()
+    for query in ("seconds=abc", "seconds=-5", "seconds=0", "seconds=nan", "interval_ms=x"):
+        assert client.post(f"/admin/profile/start?{query}", headers=ADMIN).status_code == 400
+
+
+def test_memory_endpoints_reject_bad_counts(monkeypatch):
+    monkeypatch.setenv("ADMIN_TOKEN", "test-admin")
+    client = app_module.app.test_client()
+    for query in ("frames=abc", "frames=0", "frames=-3", "frames=2.5"):
+        assert client.post(f"/admin/memory/start?{query}", headers=ADMIN).status_code == 400
+    for query in ("limit=abc", "limit=0", "limit=-1"):
+        assert client.get(f"/admin/memory/snapshot?{query}", headers=ADMIN).status_code == 400
+    assert client.get("/admin/memory/snapshot?limit=5", headers=ADMIN).status_code == 200
+
+
+def test_overlapping_requests_are_not_profiled_twice(monkeypatch):
+    monkeypatch.setattr(diagnostics, "_cprofile_until", time.monotonic() + 60)
+    monkeypatch.setattr(diagnostics, "_cprofile_stats", None)
+    monkeypatch.setattr(diagnostics, "_cprofile_skipped", 0)
+    started, release = threading.Barrier(3), threading.Event()
+    errors = []
+
+    def request():
+        try:
+            diagnostics.start_request_profile()
+            started.wait()
+            release.wait()
+            diagnostics.finish_request_profile()
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=request) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    release.set()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+    assert diagnostics._cprofile_skipped == 2 and diagnostics._cprofile_stats is not None
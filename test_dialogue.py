@@ -0,0 +1,108 @@
+"""
+Tests for the order-flow state machine and its templated turns
+"""
+
+import agent as agent_module
+import app as app_module
+import languages
+from agent import RoomServiceAgent
+from dialogue import DialogueEvent, DialogueState, TRANSITIONS, transition
+from test_prompt_budget import _RecordingPost
+
+
+def make_agent(monkeypatch, dispatched=True):
+    recorder = _RecordingPost()
+    monkeypatch.setattr(agent_module.requests, "post", recorder)
+    monkeypatch.setattr(RoomServiceAgent, "send_order_email", lambda self, call_sid: dispatched)
+    agent = RoomServiceAgent()
+    agent.xai_api_key = "test-key"
+    agent.xai_model = "test-model"
+    return agent, recorder
+
+
+def test_transitions_cover_the_happy_path():
+    state = DialogueState.BROWSING
+    for event in (DialogueEvent.ITEM_ADDED, DialogueEvent.CHECKOUT, DialogueEvent.ROOM_KNOWN, DialogueEvent.ORDER_PLACED):
+        state = transition(state, event)
+    assert state is DialogueState.COMPLETE
+    assert transition(DialogueState.BROWSING, DialogueEvent.CHECKOUT) is None
+    assert transition(DialogueState.COMPLETE, DialogueEvent.ITEM_ADDED) is DialogueState.ORDERING
+    assert all(transition(DialogueState.COMPLETE, event) is None for event in DialogueEvent
+               if event is not DialogueEvent.ITEM_ADDED)
+    assert set(state for state, _ in TRANSITIONS) == set(DialogueState)
+
+
+def test_room_number_places_the_order_from_templates(monkeypatch):
+    agent, recorder = make_agent(monkeypatch)
+    english = languages.get_language_profile("en-US")
+    agent.process_message("CAflow", "I'd like the truffle fries please")
+    assert agent.dialogue_state("CAflow") is DialogueState.ORDERING
+    total = agent.order_total_cents("CAflow")
+
+    assert agent.process_message("CAflow", "No thanks, that's all") == english.ask_room
+    assert agent.dialogue_state("CAflow") is DialogueState.AWAITING_ROOM
+
+    reply = agent.process_message("CAflow", "Room 1204")
+    assert reply == f"That comes to {total // 100}.{total % 100:02d} dollars, including service charge and delivery. {english.closing}"
+    assert agent.dialogue_state("CAflow") is DialogueState.COMPLETE
+    assert agent.room_number("CAflow") == "1204"
+    # Only the item turn went to the LLM
+    assert len(recorder.payloads) == 1
+
+
+def test_room_given_early_places_the_order_on_checkout(monkeypatch):
+    agent, recorder = make_agent(monkeypatch)
+    agent.process_message("CAearly", "I'd like the truffle fries")
+    agent.process_message("CAearly", "It's for room 802")
+    reply = agent.process_message("CAearly", "That's all", "es-ES")
+    assert reply.startswith("El total es de")
+    assert agent.dialogue_state("CAearly") is DialogueState.COMPLETE
+
+
+def test_ordering_again_after_the_order_is_placed(monkeypatch):
+    agent, _ = make_agent(monkeypatch)
+    sent = []
+    monkeypatch.setattr(RoomServiceAgent, "send_order_email",
+                        lambda self, call_sid: sent.append(self.orders[call_sid].to_dict()) or True)
+    for message in ("I'd like the truffle fries please", "That's all", "Room 1203"):
+        agent.process_message("CAagain", message)
+    assert agent.dialogue_state("CAagain") is DialogueState.COMPLETE and len(sent) == 1
+
+    # The follow-up order is not lost behind the closing line: it goes through checkout again
+    reply = agent.process_message("CAagain", "I'd like the truffle fries please")
+    assert agent.dialogue_state("CAagain") is DialogueState.ORDERING
+    assert reply != languages.get_language_profile("en-US").closing
+    reply = agent.process_message("CAagain", "That's all")
+    assert reply.startswith("That comes to") and agent.dialogue_state("CAagain") is DialogueState.COMPLETE
+    # Sent again, although it is the same order as the first, to the room already given
+    assert len(sent) == 2 and sent[0]["lines"] == sent[1]["lines"]
+
+
+def test_failed_dispatch_keeps_the_order(monkeypatch):
+    agent, recorder = make_agent(monkeypatch, dispatched=False)
+    agent.process_message("CAfail", "I'd like the truffle fries please")
+    agent.process_message("CAfail", "That's all")
+    agent.process_message("CAfail", "1204")
+    assert agent.dialogue_state("CAfail") is DialogueState.ORDERING
+    assert agent.orders["CAfail"].item_count == 1
+    assert "could not be sent to the kitchen" in recorder.payloads[-1]["messages"][-1]["content"]
+
+
+def test_webhooks_hang_up_after_the_room_and_clean_up(monkeypatch):
+    monkeypatch.setattr(agent_module.requests, "post", _RecordingPost())
+    monkeypatch.setattr(app_module.agent, "xai_api_key", "test-key")
+    monkeypatch.setattr(app_module.agent, "send_order_email", lambda call_sid: True)
+    client = app_module.app.test_client()
+    call_sid = "CAhangup"
+
+    client.post("/voice", data={"CallSid": call_sid})
+    client.post("/process-speech", data={"CallSid": call_sid, "SpeechResult": "I'd like the truffle fries please."})
+    body = client.post("/process-speech", data={"CallSid": call_sid, "SpeechResult": "No thanks, that's all."}).get_data(as_text=True)
+    assert "<Hangup" not in body and app_module.hint_state(call_sid) == "awaiting_room"
+    body = client.post("/process-speech", data={"CallSid": call_sid, "SpeechResult": "Room 1204."}).get_data(as_text=True)
+    assert "<Hangup />" in body
+
+    client.post("/status", data={"CallSid": call_sid, "CallStatus": "completed"})
+    agent = app_module.agent
+    for per_call in (agent.conversation_history, agent.orders, agent.dialogues, app_module.call_languages):
+        assert call_sid not in per_call
@@ -0,0 +1,81 @@
+"""
+Tests for adaptive speechTimeout and resuming calls that went quiet
+"""
+
+import app as app_module
+import endpointing
+from endpointing import NO_INPUT, EndpointTracker
+from speech_hints import AWAITING_ROOM, GREETING, ORDERING
+from test_dialogue import make_agent
+
+
+def speak(tracker, call_sid, gaps, language="en-US"):
+    """One utterance: partial results separated by `gaps` seconds, then the final result"""
+    now = 100.0
+    tracker.on_partial(call_sid, now)
+    for gap in gaps:
+        now += gap
+        tracker.on_partial(call_sid, now)
+    tracker.on_final(call_sid, language, now + 0.5)
+
+
+def test_timeouts_follow_the_guests_pauses():
+    tracker = EndpointTracker()
+    assert tracker.speech_timeout("CAnew", "en-US", ORDERING) == "auto"
+    assert tracker.speech_timeout("CAnew", "en-US", AWAITING_ROOM) == "1"
+
+    speak(tracker, "CAquick", [0.2, 0.4, 0.3])
+    assert tracker.speech_timeout("CAquick", "en-US", ORDERING) == "1"
+    speak(tracker, "CAslow", [0.3, 1.6, 0.4])
+    assert tracker.speech_timeout("CAslow", "en-US", ORDERING) == "3"
+    # A room number is short however long the guest's pauses are
+    assert tracker.speech_timeout("CAslow", "en-US", AWAITING_ROOM) == "1"
+
+    # One-word answers don't count as evidence of short pauses
+    speak(tracker, "CAslow", [])
+    assert tracker.speech_timeout("CAslow", "en-US", ORDERING) == "3"
+
+    assert EndpointTracker(adaptive=False).speech_timeout("CAquick", "en-US", AWAITING_ROOM) == "auto"
+
+
+def test_room_numbers_never_wait_longer_than_the_room_timeout(monkeypatch):
+    monkeypatch.setattr(endpointing, "ROOM_SPEECH_TIMEOUT", 2)
+    tracker = EndpointTracker()
+    speak(tracker, "CAslow", [0.3, 1.6, 0.4])
+    assert tracker.speech_timeout("CAslow", "en-US", ORDERING) == "3"
+    assert tracker.speech_timeout("CAslow", "en-US", AWAITING_ROOM) == "2"
+    speak(tracker, "CAquick", [0.2, 0.4, 0.3])
+    assert tracker.speech_timeout("CAquick", "en-US", AWAITING_ROOM) == "1"
+
+
+def test_new_callers_start_from_their_languages_average():
+    tracker = EndpointTracker()
+    for index in range(5):
+        speak(tracker, f"CAfa{index}", [0.9, 1.0], "fa-IR")
+    assert tracker.speech_timeout("CAnext", "fa-IR", GREETING) == "2"
+    assert tracker.speech_timeout("CAnext", "es-ES", GREETING) == "auto"
+
+
+def test_no_input_resumes_the_current_state(monkeypatch):
+    agent, _ = make_agent(monkeypatch)
+    monkeypatch.setattr(app_module.tenant_registry.default, "agent", agent)
+    client = app_module.app.test_client()
+    call = {"CallSid": "CAquiet"}
+
+    greeting = client.post("/voice", data=call).get_data(as_text=True)
+    assert "<Redirect>/no-input?state=greeting</Redirect>" in greeting and "<Redirect>/voice" not in greeting
+    again = client.post("/no-input?state=greeting", data=call).get_data(as_text=True)
+    greeting_text = app_module.greeting_for(app_module.tenant_registry.default, "en-US")
+    assert greeting_text[:15] in greeting and greeting_text[:15] not in again and "catch that" in again
+
+    agent.process_message("CAquiet", "I'd like the truffle fries please")
+    agent.process_message("CAquiet", "That's all")
+    before = NO_INPUT.value(state=AWAITING_ROOM)
+    body = client.post("/no-input", data=call).get_data(as_text=True)
+    assert "room number" in body and 'speechTimeout="1"' in body and "<Redirect>/no-input</Redirect>" in body
+    assert NO_INPUT.value(state=AWAITING_ROOM) == before + 1
+
+    # The fourth silent Gather in a row ends the call
+    client.post("/no-input", data=call)
+    assert "<Hangup" in client.post("/no-input", data=call).get_data(as_text=True)
+    client.post("/status", data={**call, "CallStatus": "completed"})
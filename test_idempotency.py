@@ -0,0 +1,79 @@
+"""
+Tests for answering Twilio's webhook retries without redoing the turn
+"""
+
+import re
+import threading
+
+import agent as agent_module
+import app as app_module
+from idempotency import WEBHOOK_DUPLICATES, ReplayCache, request_key
+from test_dialogue import make_agent
+from test_prompt_budget import _RecordingPost
+
+
+def turn_of(body):
+    return re.search(r'action="/process-speech\?turn=(\d+)"', body).group(1)
+
+
+def test_request_keys():
+    assert request_key("CA1", "3", "fries") == request_key("CA1", "3", "fries")
+    assert request_key("CA1", "3", "fries") != request_key("CA1", "4", "fries")
+    assert request_key("CA1", None, "", "tok") == "CA1:token:tok"
+    assert request_key("CA1", None, "fries") is None and request_key(None, "3") is None
+
+
+def test_duplicate_waits_for_the_original():
+    cache = ReplayCache(ttl=60, wait=5)
+    assert cache.claim("CA1:1:x", "CA1").owner
+    replies = []
+    duplicate = threading.Thread(target=lambda: replies.append(cache.claim("CA1:1:x", "CA1")))
+    duplicate.start()
+    cache.complete("CA1:1:x", "<Response/>")
+    duplicate.join()
+    assert replies[0] == (False, "<Response/>")
+
+    # An abandoned turn is redone by the next delivery
+    assert cache.claim("CA1:2:x", "CA1").owner
+    cache.abandon("CA1:2:x")
+    assert cache.claim("CA1:2:x", "CA1").owner
+    cache.end_call("CA1")
+    assert cache.next_turn("CA1") == 1
+
+
+def test_retried_turn_is_answered_from_the_cache(monkeypatch):
+    recorder = _RecordingPost()
+    monkeypatch.setattr(agent_module.requests, "post", recorder)
+    monkeypatch.setattr(app_module.agent, "xai_api_key", "test-key")
+    monkeypatch.setattr(app_module.agent, "xai_model", "test-model")
+    client = app_module.app.test_client()
+    call = {"CallSid": "CAretry"}
+
+    turn = turn_of(client.post("/voice", data=call).get_data(as_text=True))
+    url = f"/process-speech?turn={turn}"
+    speech = {**call, "SpeechResult": "What desserts do you have?"}
+    first = client.post(url, data=speech).get_data(as_text=True)
+    cached_before = WEBHOOK_DUPLICATES.value(outcome="cached")
+    assert client.post(url, data=speech).get_data(as_text=True) == first
+    assert len(recorder.payloads) == 1
+    assert WEBHOOK_DUPLICATES.value(outcome="cached") == cached_before + 1
+
+    # The same words on the next turn are a new request
+    client.post(f"/process-speech?turn={turn_of(first)}", data=speech)
+    assert len(recorder.payloads) == 2
+    client.post("/status", data={**call, "CallStatus": "completed"})
+
+
+def test_an_order_is_dispatched_once(monkeypatch):
+    agent, _ = make_agent(monkeypatch)
+    sent = []
+    monkeypatch.setattr(agent_module.RoomServiceAgent, "send_order_email", lambda self, call_sid: sent.append(call_sid) or True)
+    agent.process_message("CAonce", "I'd like the truffle fries please")
+    ledger = agent.order("CAonce")
+    agent.process_message("CAonce", "That's all")
+    agent.process_message("CAonce", "Room 1204")
+    assert sent == ["CAonce"]
+    agent.orders["CAonce"] = ledger          # a repeated checkout of the same order
+    assert agent.place_order("CAonce")
+    assert sent == ["CAonce"]
+    assert agent_module.DUPLICATE_DISPATCHES.value() >= 1
@@ -0,0 +1,81 @@
+"""
+Tests for in-process language identification, on a multilingual set of ordering utterances
+"""
+
+import pytest
+
+import app as app_module
+import language_id
+from test_dialogue import make_agent
+
+# (utterance, base language or None where the call's language should be kept)
+SAMPLES = (
+    ("I'd like the truffle fries please", "en"),
+    ("Can I get the lobster roll and a coke", "en"),
+    ("No thanks, that's all", "en"),
+    ("What do you have for dessert?", "en"),
+    ("Quiero las papas fritas, por favor", "es"),
+    ("¿Qué postres tienen?", "es"),
+    ("Eso es todo, gracias", "es"),
+    ("Je voudrais une salade niçoise, s'il vous plaît", "fr"),
+    ("C'est tout, merci", "fr"),
+    ("Ich möchte bitte einen Kaffee", "de"),
+    ("Was kostet das Steak?", "de"),
+    ("Vorrei un caffè, per favore", "it"),
+    ("Quanto costa la pizza?", "it"),
+    ("Eu quero um hambúrguer, por favor", "pt"),
+    ("Ik wil graag een biertje", "nl"),
+    ("Poproszę kawę", "pl"),
+    ("Bir kahve istiyorum lütfen", "tr"),
+    ("Jag vill ha en kaffe, tack", "sv"),
+    ("Jeg vil gerne have en kaffe, tak", "da"),
+    ("Jeg vil gjerne ha en kaffe, takk", "no"),
+    ("Haluaisin kahvia, kiitos", "fi"),
+    ("Chtěl bych kávu, prosím", "cs"),
+    ("Szeretnék egy kávét, kérem", "hu"),
+    ("Aș vrea o cafea, vă rog", "ro"),
+    ("Tôi muốn một ly cà phê", "vi"),
+    ("ボロネーゼをください", "ja"),
+    ("我想要一杯咖啡", "zh"),
+    ("룸서비스 부탁합니다", "ko"),
+    ("من یک چای می‌خواهم", "fa"),
+    ("شماره اتاقم ۱۲۰۴ است", "fa"),
+    ("أريد كوب قهوة من فضلك", "ar"),
+    ("मुझे एक चाय चाहिए", "hi"),
+    ("Я хочу заказать кофе", "ru"),
+    ("ขอกาแฟหนึ่งแก้ว", "th"),
+    # Too little to go on: keep the call's language
+    ("Room 1204", None),
+    ("Yes", None),
+    ("Truffle fries", None),
+    ("Crème brûlée", None),
+    ("The club sandwich", None),
+)
+
+
+@pytest.mark.parametrize("utterance, expected", SAMPLES)
+def test_identifies_the_multilingual_set(utterance, expected):
+    assert language_id.identify_base(utterance) == expected
+
+
+def test_regional_variants_are_kept():
+    assert language_id.identify("Quiero las papas fritas, por favor", "es-MX") == "es-MX"
+    assert language_id.identify("Quiero las papas fritas, por favor", "en-US") == "es-ES"
+    assert language_id.identify("Room 1204", "fa-IR") is None
+
+
+def test_each_turn_is_answered_in_the_language_spoken(monkeypatch):
+    agent, _ = make_agent(monkeypatch)
+    monkeypatch.setattr(app_module.tenant_registry.default, "agent", agent)
+    client = app_module.app.test_client()
+    call = {"CallSid": "CAlangid"}
+    client.post("/voice", data=call)
+
+    body = client.post("/process-speech", data={**call, "SpeechResult": "Quiero las papas fritas, por favor"})
+    assert app_module.call_languages["CAlangid"] == "es-ES"
+    assert 'language="es-ES"' in body.get_data(as_text=True)
+
+    # A bare number says nothing about the language, so the call keeps its Spanish voice
+    body = client.post("/process-speech", data={**call, "SpeechResult": "1204"}).get_data(as_text=True)
+    assert app_module.call_languages["CAlangid"] == "es-ES" and 'voice="Conchita"' in body
+    client.post("/status", data={**call, "CallStatus": "completed"})
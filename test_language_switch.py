@@ -0,0 +1,73 @@
+"""
+Tests for language switch detection, including a false-positive set built from the menu
+"""
+
+import pytest
+
+from language_switch import LanguageSwitchDetector, menu_item_names
+from languages import LANGUAGE_SWITCH_KEYWORDS
+from menu_catalog import get_catalog
+
+detector = LanguageSwitchDetector(LANGUAGE_SWITCH_KEYWORDS, menu_item_names(get_catalog()))
+
+SWITCH_REQUESTS = [
+    ("farsi", "fa-IR"),
+    ("Farsi please", "fa-IR"),
+    ("far see", "fa-IR"),
+    ("فارسی", "fa-IR"),
+    ("speak spanish", "es-ES"),
+    ("Español.", "es-ES"),
+    ("switch to german", "de-DE"),
+    ("can you speak french", "fr-FR"),
+    ("could you please speak farsi with me", "fa-IR"),
+    ("in italian please", "it-IT"),
+    ("use english", "en-US"),
+    ("русский", "ru-RU"),
+    ("日本語", "ja-JP"),
+    ("日本語で", "ja-JP"),
+    ("中文", "zh-CN"),
+]
+
+# Orders and questions that mention a language name without asking to switch
+NOT_SWITCH_REQUESTS = [
+    "french fries",
+    "French fries please",
+    "can I get some french fries and a coke",
+    "french toast",
+    "italian dressing on the side",
+    "I want spanish rice",
+    "do you have chinese chicken salad",
+    "what is in the english breakfast",
+    "",
+]
+
+
+def menu_utterances():
+    """Every menu item, alone and in typical order phrasings"""
+    for item in get_catalog().items:
+        name = item.name
+        yield name
+        yield f"I'd like the {name}"
+        yield f"can I get the {name} please"
+        yield f"{name.lower()} for room 1204"
+
+
+@pytest.mark.parametrize("utterance,expected", SWITCH_REQUESTS)
+def test_detects_switch_requests(utterance, expected):
+    assert detector.detect(utterance) == expected
+
+
+@pytest.mark.parametrize("utterance", NOT_SWITCH_REQUESTS)
+def test_ignores_dish_names(utterance):
+    assert detector.detect(utterance) is None
+
+
+def test_no_menu_item_triggers_a_switch():
+    false_positives = [u for u in menu_utterances() if detector.detect(u)]
+    assert false_positives == []
+
+
+def test_guard_is_derived_from_menu_names():
+    detector = LanguageSwitchDetector({"french": "fr-FR"}, ["French Macarons"])
+    assert detector.detect("french macarons") is None
+    assert detector.detect("french") == "fr-FR"
@@ -0,0 +1,107 @@
+"""
+Tests for the Media Streams call mode
+"""
+
+import base64
+import struct
+
+import agent as agent_module
+import app as app_module
+import media_stream
+import structured_logging
+from fakes import FakeTTSClient
+from media_stream import FakeRecognizer, MediaStreamSession, StreamReply, Transcript
+from media_stream_client import SILENCE_FRAME, local_connection, replay, synthetic_call, tone_frame
+from test_prompt_budget import _RecordingPost
+
+
+def test_mulaw_codec_round_trips():
+    assert media_stream.linear_to_mulaw(0) == 0xFF
+    for sample in (-30000, -1000, -40, 40, 1000, 30000):
+        decoded = media_stream.MULAW_TO_LINEAR[media_stream.linear_to_mulaw(sample)]
+        assert abs(decoded - sample) <= abs(sample) * 0.07 + 8
+
+
+def test_wav_header_is_stripped():
+    samples = bytes(range(200))
+    fmt = struct.pack("<HHIIHH", 7, 1, 8000, 8000, 1, 8)
+    wav = (b"RIFF" + struct.pack("<I", 0) + b"WAVE" + b"fmt " + struct.pack("<I", len(fmt)) + fmt
+           + b"LIST" + struct.pack("<I", 3) + b"abc\x00" + b"data" + struct.pack("<I", len(samples)) + samples)
+    assert media_stream.mulaw_payload(wav) == samples
+    assert media_stream.mulaw_payload(samples) == samples
+
+
+def test_fake_recognizer_ends_utterances_on_silence():
+    recognizer = FakeRecognizer(["one", "two"], silence_ms=100)
+    assert recognizer.feed(SILENCE_FRAME) is None
+    results = [recognizer.feed(tone_frame()) for _ in range(10)]
+    assert recognizer.speaking and not any(results)
+    results = [recognizer.feed(SILENCE_FRAME) for _ in range(5)]
+    assert results[-1] == Transcript("one") and not any(results[:-1])
+    assert not recognizer.speaking
+
+
+def make_session(replies, sent):
+    return MediaStreamSession(
+        greet=lambda call_sid: StreamReply("Welcome", "en-US"),
+        respond=lambda call_sid, transcript: replies.pop(0),
+        speak=lambda text, lang_code: bytes([0x7F]) * 6000,
+        send=sent.append,
+        recognizer_factory=lambda parameters: FakeRecognizer(["hello", "that's all"], silence_ms=100),
+    )
+
+
+def feed_utterance(session):
+    for audio in [tone_frame()] * 10 + [SILENCE_FRAME] * 5:
+        session.handle({"event": "media", "media": {"payload": base64.b64encode(audio).decode("ascii")}})
+
+
+def test_session_streams_replies_and_hangs_up_after_the_last_one_plays():
+    sent = []
+    session = make_session([StreamReply("Sure", "en-US"), StreamReply("Thank you", "en-US", hangup=True)], sent)
+    session.handle({"event": "start", "start": {"streamSid": "MZ1", "callSid": "CAsession"}})
+    # 6000 bytes of greeting in half-second chunks, then a mark
+    assert [message["event"] for message in sent] == ["media", "media", "mark"]
+    assert all(message["streamSid"] == "MZ1" for message in sent)
+
+    # Talking over the greeting clears it
+    sent.clear()
+    barge_ins = media_stream.STREAM_BARGE_INS.value()
+    feed_utterance(session)
+    assert sent[0]["event"] == "clear"
+    assert media_stream.STREAM_BARGE_INS.value() == barge_ins + 1
+    assert sent[-1] == {"event": "mark", "streamSid": "MZ1", "mark": {"name": "turn-2"}}
+
+    session.handle({"event": "mark", "mark": {"name": "turn-2"}})
+    feed_utterance(session)
+    assert not session.closed
+    session.handle({"event": "mark", "mark": {"name": "turn-3"}})
+    assert session.closed
+
+
+def test_voice_answers_with_a_stream_in_stream_mode(monkeypatch):
+    monkeypatch.setenv("CALL_MODE", "stream")
+    monkeypatch.setenv("BASE_URL", "https://example.com")
+    body = app_module.app.test_client().post("/voice", data={"CallSid": "CAstreamvoice"}).get_data(as_text=True)
+    assert '<Connect><Stream url="wss://example.com/media-stream" /></Connect><Hangup />' in body
+    assert "<Gather" not in body
+
+
+def test_replayed_frames_run_through_the_agent(monkeypatch):
+    monkeypatch.setattr(app_module, "gcp_tts_client", FakeTTSClient())
+    monkeypatch.setattr(agent_module.requests, "post", _RecordingPost())
+    monkeypatch.setattr(app_module.agent, "xai_api_key", "test-key")
+
+    script = ["What do you have for dessert?", "I'd like the truffle fries please"]
+    messages = list(synthetic_call(script))
+    call_sid = messages[1]["start"]["callSid"]
+    try:
+        turns = replay(iter(messages), *local_connection(app_module))
+        assert len(turns) == len(script) + 1
+        assert all(turn["bytes"] > 0 for turn in turns)
+        assert app_module.agent.orders[call_sid].lines[0].name == "Truffle Fries"
+    finally:
+        app_module.app.test_client().post("/status", data={"CallSid": call_sid, "CallStatus": "completed"})
+        for audio_id in list(app_module.audio_cache):
+            app_module.discard_audio(audio_id)
+        structured_logging.flush()
@@ -0,0 +1,56 @@
+"""
+Tests for the compiled menu catalog
+"""
+
+from menu_catalog import MenuCatalog, format_dollars, get_catalog, service_charge_cents, set_catalog, total_cents
+from menu_data import MENU_CATEGORIES
+
+catalog = MenuCatalog(MENU_CATEGORIES)
+
+
+def test_items_have_stable_ids_and_cent_prices():
+    assert len(catalog.by_id) == len(catalog.items) == sum(len(c["items"]) for c in MENU_CATEGORIES.values())
+    fries = catalog.get("to_share/truffle-fries")
+    assert fries.name == "Truffle Fries" and fries.price_cents == 1700 and fries.price == "17.00"
+    assert fries.category == "To Share"
+    assert MenuCatalog(MENU_CATEGORIES).get(fries.id) == fries
+
+
+def test_lookups_by_name_and_category():
+    assert catalog.by_name("truffle fries").id == "to_share/truffle-fries"
+    assert catalog.category_items("to_share") == catalog.category_items("To Share")
+    assert catalog.category_items("share") == catalog.category_items("to_share")
+    assert catalog.category_items("nothing like this") == ()
+    assert "Ossetra" in catalog.aliases("Caviar - Ossetra Prestige")
+
+
+def test_search_prefers_an_exact_name():
+    assert [item.name for item in catalog.search("Truffle Fries")] == ["Truffle Fries"]
+    assert all("tiramisu" in item.name.lower() or "tiramisu" in item.description.lower()
+               for item in catalog.search("tiramisu"))
+    assert catalog.search("no such dish") == []
+
+
+def test_version_and_prompt_text_are_per_content():
+    changed = {**MENU_CATEGORIES, "specials": {"name": "Specials", "items": [
+        {"name": "Soup of the Day", "description": "", "price": 11.5}]}}
+    other = MenuCatalog(changed)
+    assert other.version != catalog.version
+    assert other.get("specials/soup-of-the-day").price_cents == 1150
+    assert catalog.prompt_text() is catalog.prompt_text()
+    assert "  - Truffle Fries: $17.00 - Shaved Parmesan, Truffle Aioli\n" in catalog.prompt_text()
+
+
+def test_totals_are_exact_in_cents():
+    assert format_dollars(1705) == "17.05"
+    assert service_charge_cents(1703) == 341   # 340.6 rounds up
+    assert total_cents(1700) == 1700 + 340 + 600
+
+
+def test_catalog_swap():
+    previous = set_catalog(MenuCatalog({}))
+    try:
+        assert len(get_catalog()) == 0
+    finally:
+        set_catalog(previous)
+    assert get_catalog() is previous
@@ -0,0 +1,170 @@
+"""
+Tests for loading, validating and hot-reloading an external menu
+"""
+
+import json
+import os
+
+import pytest
+
+import app as app_module
+import menu_source
+from menu_catalog import CatalogCache, get_catalog, install_catalog
+from menu_data import MENU_ALIASES, MENU_CATEGORIES
+from menu_source import MenuError, MenuWatcher, load_menu
+
+SPECIALS = {
+    "categories": {"specials": {"name": "Specials", "items": [
+        {"name": "Lobster Roll", "description": "Brown butter", "price": 32},
+        {"name": "French Galette", "description": "Buckwheat, ham, egg", "price": 16},
+        {"name": "Soft Shell Crab", "description": "", "price": 28.5, "available": False},
+    ]}},
+    "aliases": {"Lobster Roll": ["lobster"]},
+}
+
+
+def write_menu(path, menu, mtime=None):
+    with open(path, "w") as f:
+        json.dump(menu, f)
+    if mtime is not None:
+        os.utime(path, ns=(mtime, mtime))
+
+
+@pytest.fixture
+def restore_catalog():
+    previous = get_catalog()
+    yield
+    install_catalog(previous)
+
+
+def test_loads_a_directory_in_filename_order(tmp_path):
+    write_menu(tmp_path / "10-specials.json", SPECIALS)
+    write_menu(tmp_path / "20-desserts.json", {"categories": {"dessert": {"name": "Dessert", "items": [
+        {"name": "Tiramisu", "price": 14}]}}})
+    categories, aliases = load_menu(str(tmp_path))
+    assert list(categories) == ["specials", "dessert"]
+    assert aliases == {"Lobster Roll": ("lobster",)}
+
+    catalog = menu_source.compile_menu(str(tmp_path))
+    assert catalog.by_name("soft shell crab") is None     # 86'd
+    assert catalog.get("specials/lobster-roll").price_cents == 3200
+
+
+@pytest.mark.parametrize("menu, problem", [
+    ({"categories": {}}, "no categories"),
+    ({"categories": {"x": {"name": "X", "items": [{"name": "Soup", "price": -1}]}}}, "non-negative price"),
+    ({"categories": {"x": {"name": "X", "items": [{"name": "Soup", "price": "12"}]}}}, "non-negative price"),
+    ({"categories": {"x": {"name": "X", "items": [{"name": "Soup", "price": float("nan")}]}}}, "non-negative price"),
+    ({"categories": {"x": {"name": "X", "items": [{"name": "Soup", "price": float("inf")}]}}}, "non-negative price"),
+    ({"categories": {"x": {"name": "X", "items": [{"name": "Soup", "price": True}]}}}, "non-negative price"),
+    ({"categories": {"x": {"name": "X", "items": [{"name": "Soup", "price": None}]}}}, "non-negative price"),
+    ({"categories": {"x": {"name": "X", "items": [{"name": "Soup", "price": 1}, {"name": "soup", "price": 2}]}}}, "duplicates"),
+    ({"categories": {"x": {"name": "X", "items": [{"name": "Soup", "price": 1}]}}, "aliases": {"Salad": ["greens"]}}, "unknown item"),
+])
+def test_invalid_menus_are_rejected(tmp_path, menu, problem):
+    write_menu(tmp_path / "menu.json", menu)
+    with pytest.raises(MenuError, match=problem):
+        load_menu(str(tmp_path / "menu.json"))
+
+
+@pytest.mark.parametrize("contents", [
+    b'{"categories": {"x": {"name": "X", "items": [{"name": "Soup", "price": NaN}]}}}',
+    '{"categories": {"x": {"name": "Café", "items": [{"name": "Soup", "price": 9}]}}}'.encode("latin-1"),
+])
+def test_bad_menu_files_leave_the_current_menu_in_service(tmp_path, contents, restore_catalog, monkeypatch):
+    path = tmp_path / "menu.json"
+    path.write_bytes(contents)
+    with pytest.raises(MenuError):
+        load_menu(str(path))
+
+    current = get_catalog()
+    invalid = menu_source.MENU_RELOADS.value(outcome="invalid")
+    assert not MenuWatcher(str(path)).check() and get_catalog() is current
+    assert menu_source.MENU_RELOADS.value(outcome="invalid") == invalid + 1
+
+    # ...including when MENU_PATH is loaded at startup
+    monkeypatch.setenv("MENU_PATH", str(path))
+    watcher = menu_source.watch_from_env()
+    watcher.stop()
+    assert get_catalog() is current
+
+
+def test_the_same_dish_may_appear_in_two_categories(tmp_path):
+    write_menu(tmp_path / "menu.json", {"categories": {
+        "starters": {"name": "Starters", "items": [{"name": "Soup", "price": 9}]},
+        "mains": {"name": "Mains", "items": [{"name": "Soup", "price": 16}]},
+    }})
+    catalog = menu_source.compile_menu(str(tmp_path / "menu.json"))
+    assert catalog.get("starters/soup").price_cents == 900
+    assert catalog.get("mains/soup").price_cents == 1600
+
+
+def test_the_built_in_menu_loads_from_a_file(tmp_path):
+    write_menu(tmp_path / "menu.json", {"categories": MENU_CATEGORIES, "aliases": MENU_ALIASES})
+    categories, aliases = load_menu(str(tmp_path / "menu.json"))
+    assert categories == MENU_CATEGORIES
+    assert aliases == MENU_ALIASES
+    catalog = menu_source.compile_menu(str(tmp_path / "menu.json"))
+    assert len(catalog.items) == sum(len(category["items"]) for category in MENU_CATEGORIES.values())
+
+
+@pytest.mark.parametrize("menu", [
+    {"categories": ["specials"]},
+    {"categories": SPECIALS["categories"], "aliases": ["lobster"]},
+    ["specials"],
+])
+def test_menus_with_the_wrong_structure_are_rejected(tmp_path, menu, restore_catalog):
+    path = tmp_path / "menu.json"
+    write_menu(path, menu)
+    with pytest.raises(MenuError):
+        load_menu(str(path))
+    # A malformed MENU_PATH at boot is logged and the built-in menu stays in service
+    current = get_catalog()
+    assert not MenuWatcher(str(path)).check() and get_catalog() is current
+
+
+def test_watcher_swaps_in_changes_and_keeps_the_last_good_menu(tmp_path, restore_catalog):
+    path = tmp_path / "menu.json"
+    write_menu(path, SPECIALS, mtime=1_000_000_000)
+    watcher = MenuWatcher(str(path))
+    assert watcher.check() and get_catalog().by_name("Lobster Roll")
+    assert not watcher.check()          # unchanged
+
+    write_menu(path, {"categories": {"specials": {"name": "Specials", "items": [{"name": "Lobster Roll"}]}}},
+               mtime=2_000_000_000)
+    assert not watcher.check()          # invalid: the old menu stays
+    assert get_catalog().by_name("Lobster Roll").price_cents == 3200
+
+    SPECIALS["categories"]["specials"]["items"][0]["price"] = 34
+    try:
+        write_menu(path, SPECIALS, mtime=3_000_000_000)
+        assert watcher.check()
+    finally:
+        SPECIALS["categories"]["specials"]["items"][0]["price"] = 32
+    assert get_catalog().by_name("Lobster Roll").price_cents == 3400
+
+
+def test_install_rebuilds_derived_caches_and_drops_old_versions(tmp_path, restore_catalog):
+    builds = []
+    cache = CatalogCache(lambda catalog: builds.append(catalog.version) or catalog.version)
+    old = get_catalog()
+    assert cache.get(old) == old.version
+    assert app_module.detect_language_switch("use french galette") == "fr-FR"
+
+    write_menu(tmp_path / "menu.json", SPECIALS)
+    new = menu_source.compile_menu(str(tmp_path / "menu.json"))
+    assert install_catalog(new) is old
+    assert builds == [old.version, new.version]       # built before the swap, not on a request
+    assert cache._built.keys() == {new.version}
+
+    # The webhooks pick up the new menu's hints and switch guard
+    gather = app_module.gather_for("en-US")
+    assert "Lobster Roll" in str(gather)
+    assert app_module.detect_language_switch("use french galette") is None
+
+
+def test_yaml_menus(tmp_path):
+    yaml = pytest.importorskip("yaml")
+    (tmp_path / "menu.yaml").write_text(yaml.safe_dump(SPECIALS))
+    categories, aliases = load_menu(str(tmp_path / "menu.yaml"))
+    assert categories["specials"]["items"][0]["name"] == "Lobster Roll"
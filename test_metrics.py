@@ -0,0 +1,45 @@
+"""
+Tests for per-turn tracing and the /metrics endpoint
+"""
+
+import metrics
+import tracing
+from app import app
+
+
+def test_histogram_renders_cumulative_buckets():
+    hist = metrics.Histogram("test_latency_seconds", "Test latency", ("span",), buckets=(0.1, 1.0))
+    hist.observe(0.05, span="a")
+    hist.observe(0.5, span="a")
+    hist.observe(5.0, span="a")
+
+    lines = hist.render()
+    assert 'test_latency_seconds_bucket{span="a",le="0.1"} 1' in lines
+    assert 'test_latency_seconds_bucket{span="a",le="1"} 2' in lines
+    assert 'test_latency_seconds_bucket{span="a",le="+Inf"} 3' in lines
+    assert 'test_latency_seconds_count{span="a"} 3' in lines
+
+
+def test_webhook_turn_is_traced_and_exposed():
+    client = app.test_client()
+    response = client.post("/process-speech", data={"CallSid": "CAtrace", "SpeechResult": "What desserts do you have?"})
+
+    assert response.status_code == 200
+    assert response.headers["X-Trace-Id"].startswith("CAtrace:")
+
+    body = client.get("/metrics").get_data(as_text=True)
+    for span_name in ("form_parse", "language_detect", "intent_parse", "prompt_build", "agent_turn", "twiml_serialize"):
+        assert f'roomservice_span_seconds_count{{span="{span_name}"}}' in body
+    assert 'roomservice_request_seconds_count{endpoint="/process-speech"}' in body
+
+    client.post("/status", data={"CallSid": "CAtrace", "CallStatus": "completed"})
+
+
+def test_trace_ids_count_turns_per_call():
+    first = tracing.start_trace("CAturns", "/process-speech")
+    tracing.finish_trace()
+    second = tracing.start_trace("CAturns", "/process-speech")
+    tracing.finish_trace()
+    tracing.end_call("CAturns")
+
+    assert (first.trace_id, second.trace_id) == ("CAturns:1", "CAturns:2")
@@ -0,0 +1,86 @@
+"""
+Tests for the per-call order ledger and the add/remove/undo turns that drive it
+"""
+
+import json
+
+from menu_catalog import get_catalog, service_charge_cents, total_cents
+from order_ledger import OrderLedger
+from test_dialogue import make_agent
+
+fries = get_catalog().get("to_share/truffle-fries")
+tacos = get_catalog().get("to_share/tuna-tacos")
+
+
+def test_quantities_merge_by_item_and_totals_stay_exact():
+    ledger = OrderLedger()
+    ledger.add(fries)
+    ledger.add(tacos)
+    assert ledger.add(fries, 2).quantity == 3
+    assert len(ledger) == 2 and ledger.item_count == 4
+    assert ledger.subtotal_cents == 3 * 1700 + tacos.price_cents
+    assert ledger.service_charge_cents == service_charge_cents(ledger.subtotal_cents)
+    assert ledger.total_cents == total_cents(ledger.subtotal_cents)
+    assert "- 3 x Truffle Fries - $17.00\n" in ledger.describe()
+
+
+def test_remove_and_undo_are_logged():
+    ledger = OrderLedger()
+    ledger.add(fries, 2)
+    ledger.add(tacos)
+    assert ledger.remove(fries.id, 1) == 1
+    assert ledger.remove(tacos.id) == 1 and ledger.get(tacos.id) is None
+    assert ledger.remove(tacos.id) == 0
+
+    assert ledger.undo().action == "remove"        # tacos are back
+    assert ledger.get(tacos.id).quantity == 1
+    assert ledger.undo().quantity == -1           # the fries removed earlier
+    assert ledger.subtotal_cents == 2 * 1700 + tacos.price_cents
+    assert [(e.action, e.quantity) for e in ledger.events] == [
+        ("add", 2), ("add", 1), ("remove", -1), ("remove", -1), ("undo", 1), ("undo", 1)]
+    assert [e.seq for e in ledger.events] == list(range(1, 7))
+
+    snapshot = json.loads(json.dumps(ledger.to_dict()))
+    assert snapshot["total_cents"] == ledger.total_cents and len(snapshot["events"]) == 6
+
+
+def test_lines_keep_the_price_they_were_ordered_at():
+    ledger = OrderLedger()
+    ledger.add(fries)
+    ledger.add(fries._replace(price_cents=1900))
+    assert ledger.get(fries.id).price_cents == 1700 and ledger.subtotal_cents == 3400
+
+
+def test_turns_add_another_remove_and_undo(monkeypatch):
+    agent, recorder = make_agent(monkeypatch)
+    agent.process_message("CAledger", "I'd like the truffle fries please")
+    agent.process_message("CAledger", "Can I get two more truffle fries")
+    ledger = agent.orders["CAledger"]
+    assert ledger.lines[0].quantity == 3 and len(ledger) == 1
+    assert "- 3 x Truffle Fries" in recorder.payloads[-1]["messages"][-1]["content"]
+
+    agent.process_message("CAledger", "Please remove one truffle fries from my order")
+    assert ledger.item_count == 2
+    agent.process_message("CAledger", "Take off the fries")
+    assert not ledger and agent.dialogue_state("CAledger").value == "browsing"
+
+    agent.process_message("CAledger", "Never mind")
+    assert ledger.item_count == 2 and agent.dialogue_state("CAledger").value == "ordering"
+    assert agent.order_total_cents("CAledger") == total_cents(3400)
+
+
+def test_a_request_after_an_undo_is_applied_too(monkeypatch):
+    agent, recorder = make_agent(monkeypatch)
+    agent.process_message("CAswap", "I'd like the truffle fries please")
+    agent.process_message("CAswap", "Scratch that, I'll take the classic caesar instead")
+    ledger = agent.orders["CAswap"]
+    assert [line.name for line in ledger.lines] == ["Classic Caesar"]
+    prompt = recorder.payloads[-1]["messages"][-1]["content"]
+    assert "undid adding Truffle Fries" in prompt and "added Classic Caesar" in prompt
+
+    agent.process_message("CAswap", "Never mind, can I get the tuna tacos")
+    assert [line.name for line in ledger.lines] == ["Tuna Tacos"]
+
+    # A request before the undo is what gets undone
+    agent.process_message("CAswap", "Add the truffle fries, no wait, cancel that")
+    assert [line.name for line in ledger.lines] == ["Tuna Tacos"]
@@ -0,0 +1,76 @@
+"""
+Tests for speculative processing of partial speech results
+"""
+
+import os
+import subprocess
+import sys
+
+import agent as agent_module
+import app as app_module
+import speculation
+import structured_logging
+from speculation import SPECULATIONS, SpeculationStore
+from test_prompt_budget import _RecordingPost
+from webhook_replayer import DEFAULT_SCRIPT, replay, local_poster
+
+store_agent = agent_module.RoomServiceAgent()
+
+
+def make_store():
+    return SpeculationStore(app_module.detect_language_switch, store_agent.parse_turn, stability_threshold=0.8)
+
+
+def test_only_stable_partials_are_speculated_on():
+    store = make_store()
+    assert store.on_partial("CAspec", "I'd like the", 0.1, 1) is None
+    assert store.on_partial("CAspec", "I'd like the truffle fries", 0.1, 2) is None
+    # Unchanged since the previous partial counts as stable
+    held = store.on_partial("CAspec", "I'd like the truffle fries", 0.1, 3)
+    assert held.parsed["items"][0].name == "Truffle Fries"
+    # Out-of-order callbacks are ignored
+    assert store.on_partial("CAspec", "I'd like", 0.95, 2) is held
+
+    committed = SPECULATIONS.value(outcome="committed")
+    assert store.take("CAspec", "I'd like the truffle fries.") is held
+    assert SPECULATIONS.value(outcome="committed") == committed + 1
+    assert store.take("CAspec", "I'd like the truffle fries.") is None
+
+
+def test_mismatched_final_discards_speculation():
+    store = make_store()
+    assert store.on_partial("CAmiss", "speak french", 0.9, 1).requested_lang == "fr-FR"
+    discarded = SPECULATIONS.value(outcome="discarded")
+    assert store.take("CAmiss", "Speak French fries please.") is None
+    assert SPECULATIONS.value(outcome="discarded") == discarded + 1
+
+
+def test_gather_requests_partial_results_when_enabled(monkeypatch):
+    monkeypatch.setattr(app_module, "partial_callback", speculation.PARTIAL_CALLBACK)
+    assert 'partialResultCallback="/partial-speech"' in app_module.gather_for("en-US")
+    monkeypatch.setattr(app_module, "partial_callback", "")
+    assert "partialResultCallback" not in app_module.gather_for("en-US")
+
+
+def test_replayed_call_commits_speculation(monkeypatch):
+    monkeypatch.setattr(agent_module.requests, "post", _RecordingPost())
+    monkeypatch.setattr(app_module.agent, "xai_api_key", "test-key")
+    monkeypatch.setattr(app_module.agent, "send_order_email", lambda call_sid: True)
+
+    script = ["What do you have for dessert?", "I'd like the truffle fries please", "No thanks, that's all"]
+    committed = SPECULATIONS.value(outcome="committed")
+    results = replay(local_poster(app_module.app), script, call_sid="CAreplay")
+
+    assert [turn["status"] for turn in results] == [200] * len(script)
+    assert SPECULATIONS.value(outcome="committed") == committed + len(script)
+    structured_logging.flush()
+
+
+def test_replayer_prints_only_its_report():
+    result = subprocess.run([sys.executable, "webhook_replayer.py"], cwd=os.path.dirname(os.path.abspath(__file__)),
+                            capture_output=True, text=True, timeout=60, env={**os.environ, "LOG_LEVEL": "DEBUG"})
+    assert result.returncode == 0, result.stderr
+    lines = result.stdout.splitlines()
+    assert len(lines) == len(DEFAULT_SCRIPT) + 2
+    assert not any(line.startswith("{") for line in lines)
+    assert lines[-2].startswith("final result -> TwiML") and lines[-1].startswith("speculation:")
@@ -0,0 +1,70 @@
+"""
+Tests for predictive prefetch of next-turn audio
+"""
+
+from concurrent.futures import Future
+
+import app as app_module
+import languages
+from dialogue import DialogueState
+from fakes import FakeTTSClient
+from prefetch import PREFETCH_PREDICTIONS, PREFETCH_REQUESTS, Prefetcher, predict_next_prompts
+
+
+def test_predictions_follow_the_order_state():
+    profile = languages.get_language_profile("es-ES")
+    assert predict_next_prompts(profile, DialogueState.BROWSING) == (profile.anything_else,)
+    assert predict_next_prompts(profile, DialogueState.ORDERING) == (profile.anything_else, profile.ask_room)
+    assert predict_next_prompts(profile, DialogueState.AWAITING_ROOM, "Total") == ("Total", profile.ask_room)
+    assert predict_next_prompts(profile, DialogueState.COMPLETE) == (profile.closing,)
+
+
+def test_prefetch_respects_the_concurrency_cap():
+    futures = []
+
+    def synthesize(text, lang_code):
+        futures.append(Future())
+        return futures[-1]
+
+    prefetcher = Prefetcher(synthesize, lambda text, lang_code: text == "cached", max_in_flight=1)
+    over_cap = PREFETCH_REQUESTS.value(outcome="over_cap")
+
+    prefetcher.prefetch("CAcap", "en-US", ("cached", "first", "second"))
+    assert len(futures) == 1
+    assert PREFETCH_REQUESTS.value(outcome="over_cap") == over_cap + 1
+
+    # The slot frees up once the synthesis finishes
+    futures[0].set_result("audio-id")
+    prefetcher.prefetch("CAcap", "en-US", ("second",))
+    assert len(futures) == 2
+
+    used = PREFETCH_PREDICTIONS.value(outcome="used")
+    prefetcher.score("CAcap", {("second", "en-US")})
+    assert PREFETCH_PREDICTIONS.value(outcome="used") == used + 1
+
+
+def test_next_turn_plays_prefetched_prompt(monkeypatch):
+    monkeypatch.setattr(app_module, "gcp_tts_client", FakeTTSClient())
+    monkeypatch.setattr(app_module.agent, "xai_api_key", None)
+    client = app_module.app.test_client()
+    call_sid = "CAprefetch"
+    anything_else = languages.get_language_profile("en-US").anything_else
+    try:
+        client.post("/process-speech", data={"CallSid": call_sid, "SpeechResult": "I'd like the truffle fries"})
+        for future in list(app_module.tts_in_flight.values()):
+            future.result(5)
+        assert app_module.audio_is_cached(anything_else, "en-US")
+
+        used = PREFETCH_PREDICTIONS.value(outcome="used")
+        unused = PREFETCH_PREDICTIONS.value(outcome="unused")
+        body = client.post("/process-speech", data={"CallSid": call_sid, "SpeechResult": "Tell me about dessert"}).get_data(as_text=True)
+        # "Anything else?" now plays from the cache instead of Twilio <Say>
+        assert anything_else not in body
+        assert body.count("<Play>") == 2
+        # ...but only as the no-input fallback, so neither prediction was this turn's reply
+        assert PREFETCH_PREDICTIONS.value(outcome="used") == used
+        assert PREFETCH_PREDICTIONS.value(outcome="unused") == unused + 2
+    finally:
+        client.post("/status", data={"CallSid": call_sid, "CallStatus": "completed"})
+        for audio_id in list(app_module.audio_cache):
+            app_module.discard_audio(audio_id)
@@ -0,0 +1,114 @@
+"""
+Prompt-size regression budget
+Runs a scripted conversation with the xAI API stubbed out and fails if the prompts
+we would send grow past the budget. Raise the budget only for intentional prompt changes.
+"""
+
+import json
+
+import agent as agent_module
+import llm_usage
+from agent import RoomServiceAgent
+
+# Largest single request (serialized messages) allowed during the scripted conversation
+MAX_PROMPT_BYTES = 7000
+
+# Total prompt bytes sent over the whole scripted conversation
+TOTAL_PROMPT_BYTES = 60000
+
+SCRIPTED_CONVERSATION = [
+    "Hi, what do you have on the menu tonight?",
+    "Tell me about the caviar options",
+    "I'd like the truffle fries please",
+    "Can I also get the tuna tacos?",
+    "What desserts do you have?",
+    "Add the matcha raspberry tiramisu",
+    "What's my order total?",
+    "No thanks, that's all",
+    "Room 1204",
+]
+
+# The last two turns (asking for the room, then the total and closing line) are templated
+LLM_TURNS = len(SCRIPTED_CONVERSATION) - 2
+
+
+class _RecordingPost:
+    """Captures the payloads that would be sent to xAI"""
+
+    def __init__(self):
+        self.payloads = []
+
+    def __call__(self, url, headers=None, json=None, timeout=None, stream=False):
+        self.payloads.append(json)
+        return _FakeResponse()
+
+
+class _FakeResponse:
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return {
+            "choices": [{"message": {"content": "Certainly! Anything else I can get for you?"}}],
+            "usage": {"prompt_tokens": 2500, "completion_tokens": 12},
+        }
+
+
+def run_scripted_conversation(monkeypatch, call_sid):
+    recorder = _RecordingPost()
+    monkeypatch.setattr(agent_module.requests, "post", recorder)
+    # Orders are placed by email at the end of the script - keep that offline
+    monkeypatch.setattr(RoomServiceAgent, "send_order_email", lambda self, call_sid: True)
+
+    agent = RoomServiceAgent()
+    agent.xai_api_key = "test-key"
+    agent.xai_model = "test-model"
+    for message in SCRIPTED_CONVERSATION:
+        agent.process_message(call_sid, message)
+    return recorder.payloads
+
+
+def test_prompt_size_stays_within_budget(monkeypatch):
+    payloads = run_scripted_conversation(monkeypatch, "CAbudget")
+    llm_usage.finish_call("CAbudget")
+    sizes = [llm_usage.prompt_bytes(payload["messages"]) for payload in payloads]
+
+    assert len(sizes) == LLM_TURNS
+    assert max(sizes) <= MAX_PROMPT_BYTES, f"Largest prompt grew to {max(sizes)} bytes (budget {MAX_PROMPT_BYTES})"
+    assert sum(sizes) <= TOTAL_PROMPT_BYTES, f"Conversation prompts grew to {sum(sizes)} bytes (budget {TOTAL_PROMPT_BYTES})"
+
+
+def test_usage_is_accounted_per_call(monkeypatch):
+    run_scripted_conversation(monkeypatch, "CAusage")
+
+    usage = llm_usage.call_usage("CAusage")
+    assert usage["llm_calls"] == LLM_TURNS
+    assert usage["prompt_tokens"] == 2500 * LLM_TURNS
+    assert usage["completion_tokens"] == 12 * LLM_TURNS
+
+    summary = llm_usage.finish_call("CAusage")
+    assert summary["max_prompt_bytes"] == usage["max_prompt_bytes"]
+    assert llm_usage.call_usage("CAusage") is None
+    json.dumps(summary)
+
+
+def test_prompt_size_is_constant_on_long_calls(monkeypatch):
+    recorder = _RecordingPost()
+    monkeypatch.setattr(agent_module.requests, "post", recorder)
+    agent = RoomServiceAgent()
+    agent.xai_api_key = "test-key"
+    agent.xai_model = "test-model"
+
+    for _ in range(20):
+        agent.process_message("CAlong", "Tell me about the caviar options", "fr-FR")
+    sizes = [llm_usage.prompt_bytes(payload["messages"]) for payload in recorder.payloads]
+    llm_usage.finish_call("CAlong")
+
+    # Once the history buffer is full, each request is the same size
+    assert len(set(sizes[10:])) == 1
+    history = agent.conversation_history["CAlong"]
+    assert len(history) == history.messages.maxlen
+    assert "Language: fr-FR" in history.summary.render()
+    # The current message is sent once, in the prompt, not again as a chat turn
+    messages = recorder.payloads[-1]["messages"]
+    assert sum("Tell me about the caviar options" in m["content"] for m in messages) == 1 + len(history) // 2
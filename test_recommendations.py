@@ -0,0 +1,90 @@
+"""
+Tests for dietary, spice and price recommendations over the menu
+"""
+
+from agent import TURNS
+from menu_catalog import MenuCatalog, get_catalog
+from menu_data import MENU_CATEGORIES
+from recommendations import index_for, item_attributes, parse_query
+from test_dialogue import make_agent
+
+
+def names(items):
+    return [item.name for item in items]
+
+
+def test_attributes_come_from_the_menu_tags_and_text():
+    catalog = get_catalog()
+    falafel = item_attributes(catalog.get("soups_salads/falafel"))
+    assert {"vegetarian", "vegan", "light"} <= falafel.tags and falafel.price_band == "moderate"
+    tacos = item_attributes(catalog.get("to_share/tuna-tacos"))
+    assert "spicy" in tacos.tags and tacos.spice == 2 and "vegetarian" not in tacos.tags
+    assert "gluten-free" in item_attributes(catalog.get("pasta/pasta-al-pomodoro")).tags
+    # No dietary tag is guessed from what a description leaves out
+    for item_id in ("sides/truffle-fries", "sides/french-fries", "sides/pomme-pur-e", "dessert/chocolate-caramel-mousse",
+                    "soups_salads/soup-of-the-day"):
+        assert not {"vegetarian", "vegan"} & item_attributes(catalog.get(item_id)).tags
+    assert "vegan" not in item_attributes(catalog.get("to_share/truffle-fries")).tags
+
+    # Tags the menu states outright are kept; vegan dishes are vegetarian
+    tagged = {"sides": {"name": "Sides", "items": [{"name": "Fries", "price": 12, "tags": ["gluten-free", "vegan"]}]}}
+    assert {"gluten-free", "vegan", "vegetarian"} <= item_attributes(MenuCatalog(tagged).get("sides/fries")).tags
+
+
+def test_requests_are_parsed():
+    query = parse_query("anything spicy under $20?")
+    assert query.tags == {"spicy"} and query.max_cents == 2000 and query.terms == ()
+    assert parse_query("something vegetarian, 25 dollars or less").max_cents == 2500
+    assert parse_query("i'd like something cheap").max_cents == 1500
+    query = parse_query("nothing spicy please, maybe a vegetarian pasta")
+    assert query.tags == {"vegetarian"} and query.excluded == {"spicy"} and query.terms == ("pasta",)
+    assert parse_query("something sweet and vegan").terms == ("dessert",)
+    for message in ("i'd like the truffle fries please", "room 1204", "what do you recommend", "that's all",
+                    "can you turn on the light in my room please", "what can i get for up to 2 people"):
+        assert parse_query(message) is None
+    assert parse_query("a light meal please").tags == {"light"}
+    assert parse_query("anything vegetarian under 100 dollars?").max_cents == 10000
+
+
+def test_recommendations_fit_the_request_and_batch():
+    index = index_for(get_catalog())
+    assert names(index.recommend(parse_query("any vegetarian pasta"))) == ["Pasta Al Pomodoro", "Basil Pesto Orecchiette"]
+    spicy = index.recommend(parse_query("something spicy"))
+    assert names(spicy)[0] in ("Tuna Tacos", "Buffalo Chicken Caesar Wrap") and len(spicy) == 3
+    light = index.recommend(parse_query("something light under $15"))
+    assert light and all(item.price_cents <= 1500 and "light" in index.attributes[item.id].tags for item in light)
+    # One dish per category unless the guest named what they want
+    assert len({item.category_id for item in index.recommend(parse_query("anything vegan"))}) == 3
+    assert index.recommend(parse_query("vegan desserts")) == []
+
+    queries = [parse_query(text) for text in ("vegan", "spicy", "something light under $15", "vegan desserts")]
+    assert index.recommend_many(queries) == [index.recommend(query) for query in queries]
+
+    # Built per catalog version, with the catalog
+    assert index_for(get_catalog()) is index
+    assert index_for(MenuCatalog(dict(MENU_CATEGORIES, extra={"name": "Extra", "items": []}))) is not index
+
+
+def test_recommendations_are_answered_without_the_llm(monkeypatch):
+    agent, recorder = make_agent(monkeypatch)
+    before = TURNS.value(source="recommendation")
+    reply = agent.process_message("CArecommend", "I'd like something vegetarian under $20")
+    assert reply.startswith("You might enjoy") and "Falafel" not in reply and "Truffle Fries" in reply
+    reply = agent.process_message("CArecommend", "Algo vegetariano, por favor", language="es-ES")
+    assert reply.startswith("Le podría gustar")
+    assert recorder.payloads == [] and TURNS.value(source="recommendation") == before + 2
+    assert not agent.order("CArecommend")
+
+    # A price isn't a room number
+    agent.process_message("CArecommend", "Anything vegetarian under 100 dollars?")
+    assert agent.room_number("CArecommend") == ""
+
+    # Nothing fits, or it wasn't about food: the LLM answers
+    for message in ("Anything vegan for dessert?", "These fries are cold, can I get fresh ones with no gluten",
+                    "Can you turn on the light in my room please", "What can I get for up to 2 people"):
+        agent.process_message("CArecommend", message)
+    assert len(recorder.payloads) == 4 and TURNS.value(source="recommendation") == before + 3
+
+    # Ordering a named dish still adds it
+    agent.process_message("CArecommend", "I'd like the falafel please")
+    assert len(agent.order("CArecommend")) == 1
@@ -0,0 +1,59 @@
+"""
+Tests for menu-derived Gather speech hints
+"""
+
+import speech_hints
+from menu_catalog import MenuCatalog
+from menu_data import MENU_CATEGORIES
+from speech_hints import AWAITING_ROOM, GREETING, ORDERING, HintTable
+
+table = HintTable(MenuCatalog(MENU_CATEGORIES))
+
+
+def phrases(hints):
+    return hints.split(", ")
+
+
+def test_hints_come_from_the_menu():
+    hints = phrases(table.hints("en-US", ORDERING))
+    for expected in ("Steamed Edamame", "edamame", "Ossetra", "stracciatella", "Truffle Fries", "Caviar Ossetra Prestige"):
+        assert expected in hints
+
+
+def test_hints_are_per_language_and_state():
+    spanish = phrases(table.hints("es-ES", ORDERING))
+    assert spanish[0] == "menú"
+    assert "habitación" not in spanish
+
+    room = phrases(table.hints("es-ES", AWAITING_ROOM))
+    assert room[0] == "habitación"
+    assert "$OOV_CLASS_DIGIT_SEQUENCE" in room
+
+    # Regional variants share their base language's words; unknown codes fall back to English
+    assert table.hints("es-MX", ORDERING) == table.hints("es-ES", ORDERING)
+    assert table.hints("xx-XX", ORDERING) == table.hints("en-US", ORDERING)
+
+    greeting = phrases(table.hints("en-US", GREETING))
+    assert "سفارش" in greeting and "menú" in greeting and "farsi" in greeting
+
+
+def test_hints_respect_twilio_limits():
+    big_menu = {
+        f"cat{c}": {"name": f"Category {c}", "items": [
+            {"name": f"Dish number {c}-{i} " + "x" * (i % 3) * 60, "description": "", "price": 1}
+            for i in range(100)
+        ]}
+        for c in range(10)
+    }
+    big = HintTable(MenuCatalog(big_menu))
+    for state in (GREETING, ORDERING, AWAITING_ROOM):
+        hints = phrases(big.hints("en-US", state))
+        assert len(hints) == speech_hints.MAX_HINT_PHRASES
+        assert max(len(p) for p in hints) <= speech_hints.MAX_HINT_CHARS
+        assert len(set(h.casefold() for h in hints)) == len(hints)
+
+
+def test_version_changes_with_the_menu():
+    changed = {**MENU_CATEGORIES, "specials": {"name": "Specials", "items": []}}
+    assert HintTable(MenuCatalog(changed)).version != table.version
+    assert HintTable(MenuCatalog(MENU_CATEGORIES)).version == table.version
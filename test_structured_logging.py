@@ -0,0 +1,67 @@
+"""
+Tests for the structured logging pipeline
+"""
+
+import io
+import json
+
+import structured_logging
+import tracing
+
+
+def read_records(capsys):
+    structured_logging.flush()
+    lines = capsys.readouterr().out.splitlines()
+    return [json.loads(line) for line in lines if line.startswith("{")]
+
+
+def test_records_are_json_with_call_sid_from_trace(capsys):
+    log = structured_logging.get_logger("test.events")
+    tracing.start_trace("CAlog", "/process-speech")
+    log.info("item_added", item="Truffle Fries", price=17)
+    tracing.finish_trace()
+    tracing.end_call("CAlog")
+
+    records = [r for r in read_records(capsys) if r["category"] == "test.events"]
+    assert records == [{
+        "ts": records[0]["ts"],
+        "level": "INFO",
+        "category": "test.events",
+        "event": "item_added",
+        "call_sid": "CAlog",
+        "trace_id": "CAlog:1",
+        "item": "Truffle Fries",
+        "price": 17,
+    }]
+
+
+def test_sampling_keeps_one_in_n_but_never_drops_warnings(capsys):
+    log = structured_logging.StructuredLogger("test.sampled", sample_rate=0.25)
+    for i in range(8):
+        log.info("cache_hit", n=i)
+    log.warning("cache_miss")
+
+    records = [r for r in read_records(capsys) if r["category"] == "test.sampled"]
+    assert [r["event"] for r in records] == ["cache_hit", "cache_hit", "cache_miss"]
+
+
+def test_parse_sample_rates():
+    assert structured_logging.parse_sample_rates("tts.cache=0.05, audio.fetch=2,bad") == {
+        "tts.cache": 0.05,
+        "audio.fetch": 1.0,
+    }
+
+
+def test_configuring_a_stream_later_redirects_the_output(capsys):
+    log = structured_logging.get_logger("test.redirect")
+    log.info("before")
+    stream = io.StringIO()
+    try:
+        structured_logging.configure(stream=stream)
+        log.info("after")
+        structured_logging.flush()
+    finally:
+        structured_logging.shutdown()
+        structured_logging.configure()
+    assert [r["event"] for r in read_records(capsys) if r["category"] == "test.redirect"] == ["before"]
+    assert [json.loads(line)["event"] for line in stream.getvalue().splitlines()] == ["after"]
@@ -0,0 +1,156 @@
+"""
+Tests for resolving calls to tenants by the number called
+"""
+
+import json
+import os
+import threading
+import time
+
+import pytest
+
+import agent as agent_module
+import app as app_module
+from menu_catalog import get_catalog, has_catalog, install_catalog
+from menu_source import MenuWatcher
+from tenants import (DEFAULT_TENANT, Tenant, TenantConfig, TenantError, TenantRegistry, load_tenants,
+                     normalize_number)
+from test_prompt_budget import _RecordingPost
+
+VANCOUVER = "+16045550100"
+
+
+@pytest.fixture
+def tenants_file(tmp_path):
+    (tmp_path / "vancouver.json").write_text(json.dumps({"categories": {"west_coast": {"name": "West Coast", "items": [
+        {"name": "Spot Prawns", "description": "Garlic butter", "price": 39}]}}}))
+    path = tmp_path / "tenants.json"
+    path.write_text(json.dumps({"tenants": [{
+        "id": "fs-vancouver", "numbers": ["+1 (604) 555-0100"], "hotel": "Four Seasons Hotel Vancouver",
+        "concierge": "Maya", "menu_path": "vancouver.json", "order_email": "ird-vancouver@example.com",
+        "greetings": {"en-US": "Hello, this is Maya at Four Seasons Vancouver. How can I help?"},
+    }]}))
+    return str(path)
+
+
+@pytest.fixture
+def registry(tenants_file, monkeypatch):
+    registry = TenantRegistry(app_module.build_tenant, load_tenants(tenants_file), idle_seconds=60)
+    monkeypatch.setattr(app_module, "tenant_registry", registry)
+    yield registry
+    registry.evict_idle(now=float("inf"))
+
+
+def test_load_tenants(tenants_file, tmp_path):
+    by_number = load_tenants(tenants_file)
+    config = by_number[VANCOUVER]
+    assert config.id == "fs-vancouver" and config.catalog_owner == "fs-vancouver"
+    assert config.menu_path == str(tmp_path / "vancouver.json")
+    assert normalize_number("tel: +1 604-555-0100") == VANCOUVER and normalize_number(None) == ""
+    assert DEFAULT_TENANT.catalog_owner == "default"
+
+    (tmp_path / "clash.json").write_text(json.dumps({"tenants": [
+        {"id": "a", "numbers": [VANCOUVER]}, {"id": "b", "numbers": ["16045550100"]}]}))
+    with pytest.raises(TenantError, match="belongs to both"):
+        load_tenants(str(tmp_path / "clash.json"))
+
+
+def test_tenants_load_lazily_and_evict_when_idle(registry):
+    assert [tenant.id for tenant in registry.loaded()] == ["default"]
+    tenant = registry.start_call("CAvan", VANCOUVER)
+    assert tenant.id == "fs-vancouver" and tenant.calls == 1
+    assert tenant.agent.catalog().by_name("spot prawns").price_cents == 3900
+    assert get_catalog().by_name("spot prawns") is None          # the default menu is untouched
+    assert registry.start_call("CAother", "+14165550199") is registry.default
+
+    assert registry.evict_idle(now=float("inf")) == []           # still on a call
+    assert registry.end_call("CAvan") is tenant
+    assert registry.evict_idle(now=tenant.last_used + 30) == []
+    assert registry.evict_idle(now=tenant.last_used + 60) == ["fs-vancouver"]
+    assert not has_catalog("fs-vancouver")
+    assert registry.for_call("CAvan-2", VANCOUVER) is not tenant  # loaded again
+
+
+def test_a_tenant_with_a_broken_menu_falls_back_to_the_default(tmp_path):
+    path = tmp_path / "tenants.json"
+    path.write_text(json.dumps({"tenants": [{"id": "broken", "numbers": [VANCOUVER], "menu_path": "missing.json"}]}))
+    registry = TenantRegistry(app_module.build_tenant, load_tenants(str(path)))
+    assert registry.start_call("CAbroken", VANCOUVER) is registry.default
+
+
+def test_webhooks_use_the_called_tenant(registry, monkeypatch):
+    recorder = _RecordingPost()
+    monkeypatch.setattr(agent_module.requests, "post", recorder)
+    client = app_module.app.test_client()
+    call = {"CallSid": "CAvancouver", "To": VANCOUVER}
+
+    body = client.post("/voice", data=call).get_data(as_text=True)
+    assert "Maya at Four Seasons Vancouver" in body
+    tenant = registry.for_call("CAvancouver")
+    tenant.agent.xai_api_key = "test-key"
+    tenant.agent.xai_model = "test-model"
+
+    client.post("/process-speech", data={**call, "SpeechResult": "I'd like the spot prawns please."})
+    assert tenant.agent.orders["CAvancouver"].lines[0].name == "Spot Prawns"
+    prompt = recorder.payloads[-1]["messages"][-1]["content"]
+    assert "You are Maya" in prompt and "Four Seasons Hotel Vancouver" in prompt and "Truffle Fries" not in prompt
+    assert "CAvancouver" not in app_module.agent.orders
+
+    client.post("/status", data={**call, "CallStatus": "completed"})
+    assert "CAvancouver" not in tenant.agent.conversation_history and tenant.calls == 0
+
+
+def test_a_call_starting_while_idle_tenants_are_evicted_keeps_its_tenant(tenants_file):
+    closed = []
+
+    class RacingTenant(Tenant):
+        """Runs an eviction pass whenever the registry marks it used"""
+
+        @property
+        def last_used(self):
+            return Tenant.last_used.__get__(self)
+
+        @last_used.setter
+        def last_used(self, value):
+            Tenant.last_used.__set__(self, value)
+            if getattr(self, "racing", False):
+                evictor = threading.Thread(target=registry.evict_idle, kwargs={"now": float("inf")})
+                evictor.start()
+                evictor.join(timeout=0.2)
+
+        def close(self):
+            closed.append(self.id)
+
+    registry = TenantRegistry(lambda config: RacingTenant(config, None, None), load_tenants(tenants_file))
+    tenant = registry.start_call("CAfirst", VANCOUVER)
+    registry.end_call("CAfirst")
+    tenant.racing = True
+    assert registry.start_call("CAsecond", VANCOUVER) is tenant
+    tenant.racing = False
+    assert closed == [] and tenant in registry.loaded() and tenant.calls == 1
+
+
+def test_closing_a_tenant_waits_for_a_menu_reload_in_progress(tmp_path):
+    path = tmp_path / "menu.json"
+    path.write_text(json.dumps({"categories": {"west_coast": {"name": "West Coast", "items": [
+        {"name": "Spot Prawns", "price": 39}]}}}))
+    installing, release = threading.Event(), threading.Event()
+
+    def install(catalog):
+        if installing.is_set():
+            release.wait()
+        install_catalog(catalog, owner="reloading")
+
+    watcher = MenuWatcher(str(path), interval=0.01, install=install).start()
+    installing.set()
+    path.write_text(path.read_text().replace("39", "41"))
+    os.utime(path, ns=(0, 0))
+    tenant = Tenant(TenantConfig("reloading", menu_path=str(path)), None, None, watcher)
+    closer = threading.Thread(target=tenant.close)
+    time.sleep(0.1)
+    closer.start()
+    closer.join(timeout=0.1)
+    assert closer.is_alive()                                      # held up by the reload
+    release.set()
+    closer.join(timeout=5)
+    assert not closer.is_alive() and not has_catalog("reloading")
@@ -0,0 +1,44 @@
+"""
+Tests for cached TwiML fragments and language profiles
+"""
+
+from twilio.twiml.voice_response import Gather, VoiceResponse
+
+import languages
+from twiml import TwimlResponse, gather_fragment
+
+
+def test_builder_matches_twilio_serialization():
+    expected = VoiceResponse()
+    expected.play("https://example.com/audio/abc?x=1&y=2")
+    expected.say('Fish & chips <today> "special"', voice="alice", language="en-US")
+    expected.append(Gather(input="speech", action="/process-speech", method="POST",
+                           speech_timeout="auto", language="auto", hints="menu, order"))
+    expected.pause(length=1)
+    expected.hangup()
+    expected.redirect("/voice")
+
+    built = TwimlResponse()
+    built.play("https://example.com/audio/abc?x=1&y=2")
+    built.say('Fish & chips <today> "special"', voice="alice", language="en-US")
+    built.append(gather_fragment("auto", "menu, order"))
+    built.pause(length=1)
+    built.hangup()
+    built.redirect("/voice")
+
+    assert str(built) == str(expected)
+
+
+def test_profiles_fall_back_to_english_prompts():
+    korean = languages.get_language_profile("ko-KR")
+    assert korean.twilio_voice == "Seoyeon"
+    assert korean.repeat_prompt == languages.LANGUAGE_PROFILES["en-US"].repeat_prompt
+
+    assert languages.get_language_profile("xx-XX").code == "en-US"
+
+
+def test_farsi_uses_twilio_supported_say_language():
+    farsi = languages.get_language_profile("fa-IR")
+    assert farsi.twilio_language == "ar-SA"
+    assert 'language="ar-SA"' in farsi.repeat_say
+    assert languages.LANGUAGE_SWITCH_KEYWORDS["farsy"] == "fa-IR"
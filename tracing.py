@@ -0,0 +1,111 @@
+"""
+Per-turn latency tracing for the Room Service Agent
+Each webhook request gets a trace (ID based on the Twilio CallSid) made of timed spans.
+Span durations are aggregated into histograms exposed on /metrics.
+"""
+
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Tuple
+
+import metrics
+
+SPAN_SECONDS = metrics.histogram(
+    "roomservice_span_seconds",
+    "Time spent in each stage of a webhook turn",
+    ("span",),
+)
+REQUEST_SECONDS = metrics.histogram(
+    "roomservice_request_seconds",
+    "End-to-end webhook handling time",
+    ("endpoint",),
+)
+REQUESTS_TOTAL = metrics.counter(
+    "roomservice_requests_total",
+    "Webhook requests handled",
+    ("endpoint", "status"),
+)
+
+# Number of requests seen per call, used to build per-turn trace IDs
+_call_turns: Dict[str, int] = {}
+_call_turns_lock = threading.Lock()
+
+_current_trace: contextvars.ContextVar[Optional["Trace"]] = contextvars.ContextVar("current_trace", default=None)
+
+
+class Trace:
+    """Timed spans for a single webhook request"""
+
+    def __init__(self, call_sid: str, endpoint: str):
+        self.call_sid = call_sid or "unknown"
+        self.endpoint = endpoint
+        self.turn = next_turn(self.call_sid)
+        self.trace_id = f"{self.call_sid}:{self.turn}"
+        self.started = time.perf_counter()
+        self.spans: List[Tuple[str, float]] = []
+
+    def add_span(self, name: str, seconds: float):
+        self.spans.append((name, seconds))
+
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.started
+
+    def summary(self) -> str:
+        """One-line human readable summary, e.g. 'CA12:3 /process-speech 812.3ms xai_request=790.1ms ...'"""
+        parts = " ".join(f"{name}={seconds * 1000:.1f}ms" for name, seconds in self.spans)
+        return f"{self.trace_id} {self.endpoint} {self.elapsed() * 1000:.1f}ms {parts}".rstrip()
+
+
+def next_turn(call_sid: str) -> int:
+    with _call_turns_lock:
+        turn = _call_turns.get(call_sid, 0) + 1
+        _call_turns[call_sid] = turn
+        return turn
+
+
+def end_call(call_sid: str):
+    """Forget per-call trace state once a call is over"""
+    with _call_turns_lock:
+        _call_turns.pop(call_sid, None)
+
+
+def start_trace(call_sid: str, endpoint: str) -> Trace:
+    """Begin a trace for the current request"""
+    trace = Trace(call_sid, endpoint)
+    _current_trace.set(trace)
+    return trace
+
+
+def current_trace() -> Optional[Trace]:
+    return _current_trace.get()
+
+
+def finish_trace(status: int = 200) -> Optional[Trace]:
+    """Close the current trace and record its end-to-end time"""
+    trace = _current_trace.get()
+    if trace is None:
+        return None
+    _current_trace.set(None)
+    REQUEST_SECONDS.observe(trace.elapsed(), endpoint=trace.endpoint)
+    REQUESTS_TOTAL.inc(endpoint=trace.endpoint, status=str(status))
+    return trace
+
+
+def record_span(name: str, seconds: float):
+    """Record an already-measured span on the histogram and current trace"""
+    SPAN_SECONDS.observe(seconds, span=name)
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.add_span(name, seconds)
+
+
+@contextmanager
+def span(name: str):
+    """Time a block of code as a named span"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_span(name, time.perf_counter() - start)
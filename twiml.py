@@ -0,0 +1,106 @@
+"""
+Lightweight TwiML assembly from cached fragments
+TwimlResponse supports the VoiceResponse methods our handlers use (play, say, pause, hangup,
+redirect, append) but keeps a flat list of XML strings instead of an element tree, so
+pre-rendered fragments can be reused across requests without re-serializing them.
+"""
+
+from functools import lru_cache
+from xml.sax.saxutils import escape
+
+from twilio.twiml import TwiML
+from twilio.twiml.voice_response import Connect, Gather, Say
+
+XML_DECLARATION = '<?xml version="1.0" encoding="UTF-8"?>'
+
+# Same escaping ElementTree applies to attribute values
+_ATTRIBUTE_ENTITIES = {'"': "&quot;", "\n": "&#10;", "\r": "&#13;", "\t": "&#09;"}
+
+
+def _attr(value) -> str:
+    return escape(str(value), _ATTRIBUTE_ENTITIES)
+
+
+def render(element: TwiML) -> str:
+    """Serialize a twilio TwiML element (without XML declaration)"""
+    return element.to_xml(xml_declaration=False)
+
+
+def say_fragment(text: str, voice: str, language: str) -> str:
+    """Render <Say> the way twilio's VoiceResponse.say would"""
+    return f'<Say language="{_attr(language)}" voice="{_attr(voice)}">{escape(text)}</Say>'
+
+
+@lru_cache(maxsize=1024)
+def cached_say_fragment(text: str, voice: str, language: str) -> str:
+    """<Say> for static prompts, rendered once"""
+    return render(Say(text, voice=voice, language=language))
+
+
+@lru_cache(maxsize=512)
+def gather_fragment(language: str, hints: str = "", action: str = "/process-speech",
+                    speech_timeout: str = "auto", partial_callback: str = "") -> str:
+    """Speech <Gather>, rendered once per distinct set of attributes"""
+    attributes = {
+        "input": "speech",
+        "action": action,
+        "method": "POST",
+        "speech_timeout": speech_timeout,
+        "language": language,
+    }
+    if hints:
+        attributes["hints"] = hints
+    if partial_callback:
+        attributes["partial_result_callback"] = partial_callback
+        attributes["partial_result_callback_method"] = "POST"
+    return render(Gather(**attributes))
+
+
+def with_turn(gather: str, turn: int) -> str:
+    """A cached <Gather> whose action carries the turn number (see idempotency.py)"""
+    return gather.replace('action="/process-speech"', f'action="/process-speech?turn={int(turn)}"', 1)
+
+
+@lru_cache(maxsize=16)
+def stream_fragment(url: str) -> str:
+    """<Connect><Stream> handing the call's audio to a WebSocket"""
+    connect = Connect()
+    connect.stream(url=url)
+    return render(connect)
+
+
+class TwimlResponse:
+    """Flat TwiML <Response> built from string fragments"""
+
+    def __init__(self):
+        self._parts = []
+
+    def append(self, fragment):
+        """Add a pre-rendered fragment (str) or a twilio TwiML element"""
+        self._parts.append(fragment if isinstance(fragment, str) else render(fragment))
+        return self
+
+    def play(self, url: str):
+        self._parts.append(f"<Play>{escape(url)}</Play>")
+        return self
+
+    def say(self, text: str, voice: str = None, language: str = None):
+        if voice is None or language is None:
+            return self.append(Say(text, voice=voice, language=language))
+        self._parts.append(say_fragment(text, voice, language))
+        return self
+
+    def pause(self, length: int = 1):
+        self._parts.append(f'<Pause length="{int(length)}" />')
+        return self
+
+    def hangup(self):
+        self._parts.append("<Hangup />")
+        return self
+
+    def redirect(self, url: str):
+        self._parts.append(f"<Redirect>{escape(url)}</Redirect>")
+        return self
+
+    def __str__(self) -> str:
+        return f"{XML_DECLARATION}<Response>{''.join(self._parts)}</Response>"
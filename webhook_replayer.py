@@ -0,0 +1,147 @@
+"""
+Replay a scripted call against the webhooks the way Twilio would drive them
+Each utterance is posted as a growing series of partial results to /partial-speech, then as the
+final SpeechResult to /process-speech, so speculative processing can be exercised and timed
+without a phone. Runs in-process with xAI and Google Cloud TTS stubbed, or against a live server.
+
+Usage:
+    python webhook_replayer.py                          # built-in script, in-process
+    python webhook_replayer.py --script call.json       # ["utterance", ...] or {"turns": [...]}
+    python webhook_replayer.py --no-partials            # final results only, for comparison
+    python webhook_replayer.py --url http://localhost:5000
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+import uuid
+from typing import Callable, Dict, Iterator, List, Tuple
+
+DEFAULT_SCRIPT = [
+    "What do you have for dessert?",
+    "I'd like the truffle fries please",
+    "Can I also get the tuna tacos?",
+    "No thanks, that's all",
+    "Room 1204",
+]
+
+# Stability Twilio reports for early partials and for a partial that has settled
+EARLY_STABILITY = 0.1
+SETTLED_STABILITY = 0.9
+
+Poster = Callable[[str, Dict[str, str]], Tuple[int, str]]
+
+
+def partial_results(utterance: str) -> Iterator[Tuple[str, float]]:
+    """Word-by-word partial transcripts with rising stability, like Twilio's callbacks"""
+    words = utterance.rstrip(".!?").split()
+    for count in range(1, len(words) + 1):
+        yield " ".join(words[:count]), EARLY_STABILITY
+    yield " ".join(words), SETTLED_STABILITY
+
+
+def final_transcript(utterance: str) -> str:
+    """Final results come back capitalized and punctuated"""
+    text = utterance.strip()
+    return text if text.endswith((".", "?", "!")) else f"{text}."
+
+
+def replay(post: Poster, script: List[str], call_sid: str = None, use_partials: bool = True) -> List[Dict]:
+    """Drive one call through /voice, each scripted turn and /status; returns per-turn results"""
+    call_sid = call_sid or f"CAreplay{uuid.uuid4().hex[:24]}"
+    post("/voice", {"CallSid": call_sid})
+    results = []
+    for utterance in script:
+        if use_partials:
+            for sequence, (partial, stability) in enumerate(partial_results(utterance), 1):
+                post("/partial-speech", {
+                    "CallSid": call_sid,
+                    "UnstableSpeechResult": partial,
+                    "Stability": str(stability),
+                    "SequenceNumber": str(sequence),
+                })
+        start = time.perf_counter()
+        status, body = post("/process-speech", {"CallSid": call_sid, "SpeechResult": final_transcript(utterance)})
+        results.append({
+            "utterance": utterance,
+            "status": status,
+            "final_ms": round((time.perf_counter() - start) * 1000, 2),
+            "hangup": "<Hangup" in body,
+        })
+    post("/status", {"CallSid": call_sid, "CallStatus": "completed"})
+    return results
+
+
+def local_poster(flask_app) -> Poster:
+    client = flask_app.test_client()
+
+    def post(path, form):
+        response = client.post(path, data=form)
+        return response.status_code, response.get_data(as_text=True)
+    return post
+
+
+def http_poster(base_url: str) -> Poster:
+    import requests
+    session = requests.Session()
+
+    def post(path, form):
+        response = session.post(f"{base_url.rstrip('/')}{path}", data=form, timeout=30)
+        return response.status_code, response.text
+    return post
+
+
+def load_script(path: str) -> List[str]:
+    with open(path) as f:
+        data = json.load(f)
+    return data["turns"] if isinstance(data, dict) else data
+
+
+def print_report(results: List[Dict], speculation_counts: Dict[str, float] = None):
+    for turn in results:
+        print(f"{turn['status']}  {turn['final_ms']:8.2f} ms  {turn['utterance']}{'  [hangup]' if turn['hangup'] else ''}")
+    latencies = [turn["final_ms"] for turn in results]
+    print(f"final result -> TwiML: median {statistics.median(latencies):.2f} ms, max {max(latencies):.2f} ms")
+    if speculation_counts:
+        print("speculation: " + ", ".join(f"{outcome}={int(count)}" for outcome, count in sorted(speculation_counts.items())))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Replay a scripted call against the Twilio webhooks")
+    parser.add_argument("--script", help="JSON list of utterances (or {\"turns\": [...]})")
+    parser.add_argument("--url", help="Base URL of a running server; default runs the app in-process")
+    parser.add_argument("--no-partials", action="store_true", help="Only post final results")
+    args = parser.parse_args(argv)
+    script = load_script(args.script) if args.script else DEFAULT_SCRIPT
+
+    if args.url:
+        print_report(replay(http_poster(args.url), script, use_partials=not args.no_partials))
+        return 0
+
+    # First, so nothing the app logs while it loads lands in the report
+    import structured_logging
+    structured_logging.configure(stream=open(os.devnull, "w"))
+    import benchmark
+    from fakes import FakeTTSClient
+    import app as app_module
+    import speculation
+
+    app_module.partial_callback = speculation.PARTIAL_CALLBACK
+    app_module.gcp_tts_client = FakeTTSClient()
+    app_module.agent.xai_api_key = app_module.agent.xai_api_key or "replay-key"
+    app_module.agent.xai_model = app_module.agent.xai_model or "replay-model"
+    app_module.agent.send_order_email = lambda call_sid: True
+    before = {outcome: speculation.SPECULATIONS.value(outcome=outcome)
+              for outcome in ("started", "committed", "discarded", "superseded", "stale")}
+    with benchmark.stubbed_network():
+        results = replay(local_poster(app_module.app), script, use_partials=not args.no_partials)
+    counts = {outcome: speculation.SPECULATIONS.value(outcome=outcome) - count for outcome, count in before.items()}
+    print_report(results, counts)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())